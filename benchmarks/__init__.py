@@ -0,0 +1,12 @@
+"""
+Бенчмарки и нагрузочное тестирование ComfyUI интеграций
+Автор: AI Assistant
+Версия: 1.0.0
+
+Замеры выполняются на локальных заменах сервисов (stand_ins): S3 сервер moto
+(или любой совместимый, например MinIO), имитация OpenAI Images API с
+настраиваемой задержкой и имитация ComfyUI API с очередью выполнения.
+
+Запуск: python -m benchmarks.run_benchmarks --help
+        python -m benchmarks.load_generator --help
+"""
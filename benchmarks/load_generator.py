@@ -0,0 +1,507 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный генератор пайплайнов ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Воспроизводит смесь шаблонных workflow (PipelineManager / PipelineTemplates)
+против ComfyUI endpoint или локальной имитации (--mock).
+
+Режимы:
+- --rate R - открытая модель: запросы отправляются по расписанию R в секунду
+  (равномерно или пуассоновским потоком) независимо от ответов сервера
+- --concurrency N - закрытая модель: N клиентов, каждый отправляет следующий
+  запрос после завершения предыдущего
+- --ramp 1,2,4,8 - ступени открытой модели до первой, не укладывающейся в SLO;
+  устойчивая пропускная способность - результат последней успешной ступени
+
+Замеры: задержка отправки (загрузка workflow + запуск), время до завершения
+(от запланированного момента отправки, поэтому очередь в самом генераторе не
+скрывает задержки; точность - интервал опроса), доли ошибок и throttling (429),
+достигнутая пропускная способность.
+
+Примеры:
+    python -m benchmarks.load_generator --mock --mock-workers 4 --rate 5 --duration 30
+    python -m benchmarks.load_generator --url http://gpu-host:8188 --concurrency 8 --mix openai_to_s3=3,complex=1
+    python -m benchmarks.load_generator --mock --ramp 1,2,4,8,16 --max-p99-ms 5000
+"""
+
+import argparse
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, replace
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+import logging
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.run_benchmarks import latency_stats
+from benchmarks.stand_ins import FakeComfyUIServer
+from examples.comfyui_pipeline_builder import ComfyUIPipelineBuilder, PipelineTemplates
+from examples.pipeline_manager import PipelineManager
+from examples.structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+# Шаблоны нагрузки: (менеджер, номер запроса, bucket) -> строитель пайплайна
+TEMPLATES: Dict[str, Callable[[PipelineManager, int, str], ComfyUIPipelineBuilder]] = {
+    'openai': lambda manager, index, bucket: manager.create_openai_pipeline(f"Load test image {index}"),
+    'openai_to_s3': lambda manager, index, bucket: PipelineTemplates.openai_to_s3_pipeline(
+        f"Load test image {index}", bucket),
+    's3_upload': lambda manager, index, bucket: manager.create_s3_upload_pipeline(bucket),
+    's3_to_preview': lambda manager, index, bucket: PipelineTemplates.s3_to_preview_pipeline(
+        f"comfyui/images/load_{index:06d}.png", bucket),
+    'complex': lambda manager, index, bucket: manager.create_complex_pipeline(f"Load test image {index}", bucket),
+}
+DEFAULT_MIX = {'openai_to_s3': 2.0, 'complex': 1.0, 's3_to_preview': 1.0}
+ARRIVALS = ('uniform', 'poisson')
+
+# Ступень нагрузки считается устойчивой, если завершается не меньше этой доли отправляемого потока
+KEEP_UP_FRACTION = 0.9
+
+
+def parse_mix(text: str) -> Dict[str, float]:
+    """
+    Разбор смеси шаблонов вида "openai_to_s3=3,complex=1"
+
+    Args:
+        text: Шаблоны через запятую с необязательными весами (по умолчанию 1)
+
+    Returns:
+        {шаблон: вес}
+    """
+    mix = {}
+    for item in text.split(','):
+        if not item.strip():
+            continue
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in TEMPLATES:
+            raise ValueError(f"Неизвестный шаблон: {name} (доступны: {', '.join(TEMPLATES)})")
+        mix[name] = float(weight) if weight else 1.0
+        if mix[name] <= 0:
+            raise ValueError(f"Вес шаблона {name} должен быть положительным")
+    if not mix:
+        raise ValueError("Смесь шаблонов пуста")
+    return mix
+
+
+@dataclass
+class LoadConfig:
+    """Параметры нагрузочного прогона"""
+    url: str = "http://localhost:8188"
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    rate: Optional[float] = None
+    concurrency: Optional[int] = None
+    duration: float = 30.0
+    requests: Optional[int] = None
+    arrival: str = 'uniform'
+    wait: bool = True
+    timeout: float = 300.0
+    poll_interval: float = 0.1
+    max_in_flight: int = 256
+    bucket_name: str = 'comfyui-load-test'
+    seed: int = 0
+
+
+class LoadGenerator:
+    """Воспроизведение смеси workflow и сбор результатов по запросам"""
+
+    def __init__(self, config: LoadConfig):
+        """
+        Args:
+            config: Параметры прогона (задается ровно один из rate и concurrency)
+        """
+        if (config.rate is None) == (config.concurrency is None):
+            raise ValueError("Укажите либо rate, либо concurrency")
+        if config.rate is not None and config.rate <= 0:
+            raise ValueError("rate должен быть положительным")
+        if config.concurrency is not None and config.concurrency < 1:
+            raise ValueError("concurrency должен быть положительным")
+        if config.arrival not in ARRIVALS:
+            raise ValueError(f"Неизвестный режим поступления: {config.arrival}")
+        for name in config.mix:
+            if name not in TEMPLATES:
+                raise ValueError(f"Неизвестный шаблон: {name}")
+
+        self.config = config
+        self.manager = PipelineManager(config.url)
+        self.records: List[Dict[str, Any]] = []
+        self._random = random.Random(config.seed)
+        self._lock = threading.Lock()
+        self._templates = list(config.mix)
+        self._weights = [config.mix[name] for name in self._templates]
+
+    def _choose_template(self) -> str:
+        """Случайный шаблон смеси"""
+        with self._lock:
+            return self._random.choices(self._templates, self._weights)[0]
+
+    def _build(self, template: str, index: int):
+        """Строитель шаблона"""
+        builder = TEMPLATES[template](self.manager, index, self.config.bucket_name)
+        # Шаблоны PipelineTemplates создаются с URL по умолчанию
+        builder.comfyui_url = self.manager.comfyui_url
+        return builder
+
+    def run_one(self, index: int, scheduled: float) -> Dict[str, Any]:
+        """
+        Отправка одного workflow и ожидание его завершения
+
+        Исключение при отправке или ожидании записывается как исход 'error'.
+
+        Args:
+            index: Номер запроса
+            scheduled: Запланированный момент отправки (perf_counter)
+
+        Returns:
+            Запись запроса: шаблон, исход и тайминги в секундах
+        """
+        template = self._choose_template()
+        start = time.perf_counter()
+        record = {
+            'template': template,
+            'lag_s': start - scheduled
+        }
+
+        try:
+            builder = self._build(template, index)
+            result = self.manager.execute_pipeline(builder, f"load-{template}-{index}", wait=False)
+            record['submit_s'] = time.perf_counter() - start
+
+            if not result['success']:
+                record['outcome'] = 'throttled' if result.get('status_code') == 429 else 'error'
+            elif not self.config.wait:
+                record['outcome'] = 'accepted'
+            else:
+                done = builder.wait_for_execution(result['execution_id'], self.config.timeout,
+                                                  self.config.poll_interval)
+                record['completion_s'] = time.perf_counter() - scheduled
+                if done['success']:
+                    record['outcome'] = 'completed'
+                else:
+                    record['outcome'] = 'failed' if done.get('status') == 'failed' else 'timeout'
+        except Exception as e:
+            logger.warning(f"⚠️ Запрос {index} ({template}) завершился исключением: {e}")
+            record.setdefault('submit_s', time.perf_counter() - start)
+            record['outcome'] = 'error'
+
+        with self._lock:
+            self.records.append(record)
+        return record
+
+    def _limit_reached(self, index: int) -> bool:
+        return self.config.requests is not None and index >= self.config.requests
+
+    def _run_open_loop(self, started: float) -> float:
+        """Отправка по расписанию; возвращает конец окна отправки"""
+        config = self.config
+        deadline = started + config.duration
+        scheduled = started
+        index = 0
+        futures = []
+        with ThreadPoolExecutor(max_workers=config.max_in_flight, thread_name_prefix='load') as executor:
+            while scheduled < deadline and not self._limit_reached(index):
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                futures.append(executor.submit(self.run_one, index, scheduled))
+                index += 1
+                if config.arrival == 'poisson':
+                    scheduled += self._random.expovariate(config.rate)
+                else:
+                    # От начала прогона, без накопления ошибки округления
+                    scheduled = started + index / config.rate
+            window_end = min(scheduled, deadline)
+        for future in futures:
+            future.result()
+        return window_end
+
+    def _run_closed_loop(self, started: float) -> float:
+        """N клиентов с последовательными запросами; возвращает конец окна отправки"""
+        config = self.config
+        deadline = started + config.duration
+        counter = itertools.count()
+
+        def client():
+            while time.perf_counter() < deadline:
+                with self._lock:
+                    index = next(counter)
+                if self._limit_reached(index):
+                    return
+                self.run_one(index, time.perf_counter())
+
+        with ThreadPoolExecutor(max_workers=config.concurrency, thread_name_prefix='load') as executor:
+            for future in [executor.submit(client) for _ in range(config.concurrency)]:
+                future.result()
+        return min(time.perf_counter(), deadline)
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Нагрузочный прогон
+
+        Returns:
+            Сводка (summarize_records) с параметрами прогона в 'meta'
+        """
+        config = self.config
+        mode = f"rate={config.rate}/s" if config.rate is not None else f"concurrency={config.concurrency}"
+        logger.info(f"🚦 Нагрузка {mode} на {config.url} в течение {config.duration} с")
+        started = time.perf_counter()
+        if config.rate is not None:
+            window_end = self._run_open_loop(started)
+        else:
+            window_end = self._run_closed_loop(started)
+        drained = time.perf_counter()
+
+        report = summarize_records(self.records, started, window_end, drained)
+        report['meta'] = {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'url': config.url,
+            'mode': 'open' if config.rate is not None else 'closed',
+            'rate': config.rate,
+            'concurrency': config.concurrency,
+            'arrival': config.arrival,
+            'duration_s': config.duration,
+            'mix': config.mix,
+            'wait': config.wait,
+            'poll_interval_s': config.poll_interval
+        }
+        return report
+
+
+def summarize_records(records: Sequence[Dict[str, Any]],
+                      started: float,
+                      window_end: float,
+                      drained: float) -> Dict[str, Any]:
+    """
+    Сводка по записям запросов
+
+    Пропускная способность - завершенные запросы за все время прогона, включая
+    дообработку очереди после окончания отправки: при перегрузке она совпадает
+    с емкостью сервера, а не с отправляемым потоком.
+
+    Args:
+        records: Записи run_one
+        started: Начало прогона (perf_counter)
+        window_end: Конец окна отправки
+        drained: Момент завершения последнего запроса
+
+    Returns:
+        Счетчики, доли ошибок и throttling, задержки и пропускная способность
+    """
+    total = len(records)
+    outcomes = {outcome: 0 for outcome in ('completed', 'accepted', 'failed', 'timeout', 'throttled', 'error')}
+    for record in records:
+        outcomes[record['outcome']] += 1
+    done_outcome = 'completed' if outcomes['accepted'] == 0 else 'accepted'
+    done = [record for record in records if record['outcome'] == done_outcome]
+    window = max(window_end - started, 1e-9)
+
+    by_template = {}
+    for template in sorted({record['template'] for record in records}):
+        template_records = [record for record in records if record['template'] == template]
+        by_template[template] = {
+            'requests': len(template_records),
+            'completed': sum(1 for record in template_records if record['outcome'] == 'completed'),
+            'completion_latency_ms': latency_stats(
+                [record['completion_s'] for record in template_records if record['outcome'] == 'completed'])
+        }
+
+    return {
+        'requests': total,
+        'outcomes': outcomes,
+        'error_rate': round((outcomes['error'] + outcomes['failed'] + outcomes['timeout']) / total, 4) if total else 0.0,
+        'throttle_rate': round(outcomes['throttled'] / total, 4) if total else 0.0,
+        'offered_rate_per_s': round(total / window, 3),
+        'throughput_per_s': round(len(done) / max(drained - started, 1e-9), 3),
+        'window_s': round(window, 3),
+        'drain_s': round(drained - window_end, 3),
+        'submission_latency_ms': latency_stats([record['submit_s'] for record in records]),
+        'completion_latency_ms': latency_stats([record['completion_s'] for record in done if 'completion_s' in record]),
+        'schedule_lag_ms': latency_stats([record['lag_s'] for record in records]),
+        'by_template': by_template
+    }
+
+
+def meets_slo(report: Dict[str, Any], max_error_rate: float = 0.01, max_p99_ms: Optional[float] = None) -> bool:
+    """
+    Укладывается ли прогон в SLO
+
+    В открытой модели сервер также должен успевать за отправляемым потоком;
+    закрытая модель подстраивается под сервер сама.
+
+    Args:
+        report: Сводка прогона
+        max_error_rate: Допустимая доля ошибок и throttling вместе
+        max_p99_ms: Допустимое p99 времени до завершения (None - без ограничения)
+    """
+    if report['error_rate'] + report['throttle_rate'] > max_error_rate:
+        return False
+    p99 = report['completion_latency_ms'].get('p99')
+    if max_p99_ms is not None and (p99 is None or p99 > max_p99_ms):
+        return False
+    if report['meta']['mode'] != 'open':
+        return True
+    return report['throughput_per_s'] >= KEEP_UP_FRACTION * report['offered_rate_per_s']
+
+
+def find_sustainable_rate(config: LoadConfig,
+                          rates: Sequence[float],
+                          max_error_rate: float = 0.01,
+                          max_p99_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Поиск устойчивой пропускной способности ступенями открытой нагрузки
+
+    Ступени выполняются по возрастанию до первой, не укладывающейся в SLO.
+
+    Args:
+        config: Базовые параметры прогона (rate заменяется ступенями)
+        rates: Запросов в секунду на ступенях
+        max_error_rate: Допустимая доля ошибок и throttling
+        max_p99_ms: Допустимое p99 времени до завершения
+
+    Returns:
+        {'sustainable_rate_per_s', 'sustainable_throughput_per_s', 'steps': [...]}
+    """
+    steps = []
+    sustainable = None
+    for rate in sorted(rates):
+        report = LoadGenerator(replace(config, rate=rate, concurrency=None)).run()
+        report['meets_slo'] = meets_slo(report, max_error_rate, max_p99_ms)
+        steps.append(report)
+        print_report(report)
+        if not report['meets_slo']:
+            break
+        sustainable = report
+    return {
+        'sustainable_rate_per_s': sustainable['meta']['rate'] if sustainable else None,
+        'sustainable_throughput_per_s': sustainable['throughput_per_s'] if sustainable else 0.0,
+        'slo': {'max_error_rate': max_error_rate, 'max_p99_ms': max_p99_ms},
+        'steps': steps
+    }
+
+
+def print_report(report: Dict[str, Any]) -> None:
+    """Краткий вывод сводки прогона"""
+    meta = report['meta']
+    mode = f"rate={meta['rate']}/s" if meta['mode'] == 'open' else f"concurrency={meta['concurrency']}"
+    outcomes = ', '.join(f"{name}={count}" for name, count in report['outcomes'].items() if count)
+    print(f"🚦 {mode}: {report['requests']} запросов ({outcomes})")
+    print(f"   пропускная способность {report['throughput_per_s']:.2f}/с при отправке "
+          f"{report['offered_rate_per_s']:.2f}/с, ошибки {report['error_rate']:.1%}, "
+          f"throttling {report['throttle_rate']:.1%}")
+    for title, key in (("отправка", 'submission_latency_ms'), ("до завершения", 'completion_latency_ms')):
+        stats = report[key]
+        if stats:
+            print(f"   {title}: p50 {stats['p50']:.1f} мс, p95 {stats['p95']:.1f} мс, p99 {stats['p99']:.1f} мс")
+    if 'meets_slo' in report:
+        print(f"   SLO: {'✅' if report['meets_slo'] else '❌'}")
+
+
+def _mix_argument(value: str) -> Dict[str, float]:
+    try:
+        return parse_mix(value)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _float_list(value: str) -> List[float]:
+    return [float(item) for item in value.split(',') if item.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Основная функция для работы с командной строкой"""
+    parser = argparse.ArgumentParser(description="Нагрузочный генератор пайплайнов ComfyUI")
+    parser.add_argument("--url", default="http://localhost:8188", help="URL ComfyUI сервера")
+    parser.add_argument("--mix", type=_mix_argument, default=dict(DEFAULT_MIX),
+                        help=f"Смесь шаблонов с весами, например openai_to_s3=3,complex=1 (доступны: {', '.join(TEMPLATES)})")
+    load = parser.add_mutually_exclusive_group(required=True)
+    load.add_argument("--rate", type=float, help="Запросов в секунду (открытая модель)")
+    load.add_argument("--concurrency", type=int, help="Число параллельных клиентов (закрытая модель)")
+    load.add_argument("--ramp", type=_float_list, help="Ступени запросов в секунду для поиска устойчивой нагрузки")
+    parser.add_argument("--duration", type=float, default=30.0, help="Длительность (ступени) в секундах")
+    parser.add_argument("--requests", type=int, help="Максимум запросов")
+    parser.add_argument("--arrival", choices=ARRIVALS, default="uniform", help="Поток запросов открытой модели")
+    parser.add_argument("--no-wait", action="store_true", help="Не ожидать завершения (только отправка)")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Таймаут ожидания выполнения в секундах")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="Интервал опроса статуса в секундах")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Максимум одновременных запросов генератора")
+    parser.add_argument("--bucket", default="comfyui-load-test", help="S3 bucket в шаблонах")
+    parser.add_argument("--seed", type=int, default=0, help="Зерно выбора шаблонов и пуассоновского потока")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="SLO: доля ошибок и throttling")
+    parser.add_argument("--max-p99-ms", type=float, help="SLO: p99 времени до завершения в мс")
+    parser.add_argument("--mock", action="store_true", help="Локальная имитация ComfyUI вместо --url")
+    parser.add_argument("--mock-workers", type=int, default=2, help="Слоты выполнения (GPU) имитации")
+    parser.add_argument("--mock-execution-time", type=float, default=0.5, help="Время выполнения workflow в имитации")
+    parser.add_argument("--mock-node-time", type=float, default=0.0, help="Дополнительное время на узел в имитации")
+    parser.add_argument("--mock-max-queue", type=int, default=0, help="Размер очереди имитации (0 - без ограничения)")
+    parser.add_argument("--mock-failure-rate", type=float, default=0.0, help="Доля неуспешных выполнений в имитации")
+    parser.add_argument("--output", default="load_results.json", help="Файл результатов JSON")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Уровень логирования")
+    args = parser.parse_args(argv)
+    configure_logging(getattr(logging, args.log_level))
+
+    mock = None
+    if args.mock:
+        mock = FakeComfyUIServer(
+            execution_time=args.mock_execution_time,
+            node_time=args.mock_node_time,
+            workers=args.mock_workers,
+            max_queue=args.mock_max_queue,
+            failure_rate=args.mock_failure_rate,
+            seed=args.seed
+        ).start()
+
+    config = LoadConfig(
+        url=mock.url if mock else args.url,
+        mix=args.mix,
+        rate=args.rate,
+        concurrency=args.concurrency,
+        duration=args.duration,
+        requests=args.requests,
+        arrival=args.arrival,
+        wait=not args.no_wait,
+        timeout=args.timeout,
+        poll_interval=args.poll_interval,
+        max_in_flight=args.max_in_flight,
+        bucket_name=args.bucket,
+        seed=args.seed
+    )
+
+    try:
+        if args.ramp:
+            report = find_sustainable_rate(config, args.ramp, args.max_error_rate, args.max_p99_ms)
+            rate = report['sustainable_rate_per_s']
+            print(f"📈 Устойчивая нагрузка: {rate if rate is not None else 'не найдена'} запросов/с, "
+                  f"пропускная способность {report['sustainable_throughput_per_s']:.2f}/с")
+        else:
+            try:
+                generator = LoadGenerator(config)
+            except ValueError as e:
+                parser.error(str(e))
+            report = generator.run()
+            report['meets_slo'] = meets_slo(report, args.max_error_rate, args.max_p99_ms)
+            print_report(report)
+    finally:
+        if mock is not None:
+            mock_stats = mock.stats()
+            mock.stop()
+            logger.info(f"🧪 Имитация ComfyUI: {mock_stats}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены в {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
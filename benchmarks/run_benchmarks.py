@@ -0,0 +1,580 @@
+#!/usr/bin/env python3
+"""
+Бенчмарки горячих путей узлов и хранилища
+Автор: AI Assistant
+Версия: 1.0.0
+
+Наборы замеров (--suites):
+- s3 - загрузка, чтение и скачивание изображений по размерам, пакетная загрузка
+  узлом (load_image_batch) по размерам пакета, загрузка тензоров
+- tensor - преобразование изображение <-> тензор: PNG против формата .tensor
+- workflow - сборка, сохранение и загрузка workflow (JSON и .cwf) на 10-10k узлов
+- listing - листинг префиксов на 10k-1M ключей (1M - на MinIO: листинг moto
+  квадратичен по числу ключей)
+- openai - генерация и скачивание через имитацию OpenAI с задержкой
+- comfyui - загрузка и запуск workflow в имитации ComfyUI
+
+Все сервисы - локальные замены из benchmarks.stand_ins (S3 - moto, либо
+--s3-endpoint для MinIO). Результаты сохраняются в JSON; --compare сравнивает
+их с прошлым запуском и завершается с кодом 1 при регрессии.
+
+Примеры:
+    python -m benchmarks.run_benchmarks --quick
+    python -m benchmarks.run_benchmarks --suites listing --list-keys 10000,1000000 --s3-endpoint http://localhost:9000
+    python -m benchmarks.run_benchmarks --output new.json --compare baseline.json
+"""
+
+import argparse
+import io
+import itertools
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+import logging
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from benchmarks.stand_ins import FakeComfyUIServer, FakeOpenAIServer, LocalS3, make_png
+from examples.structured_logging import configure_logging
+
+logger = logging.getLogger(__name__)
+
+SUITES = ('s3', 'tensor', 'workflow', 'listing', 'openai', 'comfyui')
+RESULTS_VERSION = 1
+
+# Число ключей, начиная с которого листинг замеряется один раз
+LARGE_LISTING = 100_000
+
+
+@dataclass
+class BenchmarkConfig:
+    """Параметры запуска бенчмарков"""
+    suites: Sequence[str] = SUITES
+    iterations: int = 5
+    warmup: int = 1
+    image_sizes: Sequence[int] = (256, 1024, 2048)
+    batch_sizes: Sequence[int] = (1, 8, 32)
+    batch_image_size: int = 512
+    workflow_nodes: Sequence[int] = (10, 100, 1000, 10000)
+    list_keys: Sequence[int] = (10000,)
+    openai_latency: float = 0.05
+    openai_concurrency: Sequence[int] = (1, 8)
+    s3_endpoint: Optional[str] = None
+    work_dir: Optional[str] = None
+
+    @classmethod
+    def quick(cls, **overrides) -> 'BenchmarkConfig':
+        """Быстрый набор параметров для проверки (секунды вместо минут)"""
+        params = dict(iterations=3, image_sizes=(64, 256), batch_sizes=(1, 4), batch_image_size=64,
+                      workflow_nodes=(10, 100), list_keys=(1000,), openai_latency=0.01,
+                      openai_concurrency=(1, 4))
+        params.update(overrides)
+        return cls(**params)
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """
+    Перцентиль методом ближайшего ранга
+
+    Args:
+        values: Значения
+        fraction: Доля (0.5 - медиана, 0.99 - p99)
+    """
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def latency_stats(durations: Sequence[float]) -> Dict[str, float]:
+    """
+    Сводка задержек в миллисекундах
+
+    Args:
+        durations: Длительности в секундах
+
+    Returns:
+        {'mean', 'p50', 'p95', 'p99', 'min', 'max'}
+    """
+    if not durations:
+        return {}
+    return {
+        'mean': round(sum(durations) / len(durations) * 1000, 3),
+        'p50': round(percentile(durations, 0.5) * 1000, 3),
+        'p95': round(percentile(durations, 0.95) * 1000, 3),
+        'p99': round(percentile(durations, 0.99) * 1000, 3),
+        'min': round(min(durations) * 1000, 3),
+        'max': round(max(durations) * 1000, 3)
+    }
+
+
+def measure(func: Callable[[], Any],
+            iterations: int,
+            warmup: int = 1,
+            bytes_per_call: int = 0,
+            ops_per_call: int = 1) -> Dict[str, Any]:
+    """
+    Замер задержки и пропускной способности вызова
+
+    Args:
+        func: Замеряемый вызов без аргументов
+        iterations: Число замеряемых вызовов
+        warmup: Число прогревочных вызовов (не учитываются)
+        bytes_per_call: Байт, обрабатываемых одним вызовом (для MB/s)
+        ops_per_call: Операций в одном вызове (пакет, параллельные запросы)
+
+    Returns:
+        {'iterations', 'latency_ms', 'throughput'}
+    """
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+
+    total = sum(durations) or 1e-9
+    throughput = {'ops_per_s': round(iterations * ops_per_call / total, 3)}
+    if bytes_per_call:
+        throughput['mb_per_s'] = round(iterations * bytes_per_call / total / 1e6, 3)
+    return {
+        'iterations': iterations,
+        'latency_ms': latency_stats(durations),
+        'throughput': throughput
+    }
+
+
+def _check(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Результат операции в стиле {'success': ...} или исключение"""
+    if not result.get('success'):
+        raise RuntimeError(result.get('error') or result.get('message'))
+    return result
+
+
+def build_chain_workflow(node_count: int):
+    """
+    Workflow из цепочки node_count узлов
+
+    Args:
+        node_count: Число узлов
+
+    Returns:
+        ComfyUIPipelineBuilder
+    """
+    from examples.comfyui_pipeline_builder import ComfyUIPipelineBuilder
+
+    builder = ComfyUIPipelineBuilder()
+    previous = None
+    for i in range(node_count):
+        node_id = builder.add_node("PreviewImage", inputs={"index": i, "label": f"node {i}"})
+        if previous is not None:
+            builder.connect_nodes(previous, 0, node_id, 0)
+        previous = node_id
+    return builder
+
+
+class BenchmarkRunner:
+    """Выполнение наборов замеров и сбор результатов"""
+
+    def __init__(self, config: BenchmarkConfig):
+        """
+        Args:
+            config: Параметры запуска
+        """
+        unknown = set(config.suites) - set(SUITES)
+        if unknown:
+            raise ValueError(f"Неизвестные наборы: {', '.join(sorted(unknown))}")
+        self.config = config
+        self.results: List[Dict[str, Any]] = []
+        self._s3: Optional[LocalS3] = None
+        self._manager = None
+        self._work_dir = config.work_dir
+
+    def add(self, suite: str, name: str, params: Dict[str, Any], stats: Dict[str, Any]) -> None:
+        """Добавление результата замера"""
+        result = {'suite': suite, 'name': name, 'params': params}
+        result.update(stats)
+        self.results.append(result)
+        throughput = stats['throughput']
+        mb_per_s = f" {throughput['mb_per_s']:>9.1f} MB/s" if 'mb_per_s' in throughput else ''
+        params_text = ' '.join(f"{key}={value}" for key, value in params.items())
+        print(f"  {name:<24} {params_text:<28} p50 {stats['latency_ms']['p50']:>10.3f} мс "
+              f"{throughput['ops_per_s']:>10.1f} оп/с{mb_per_s}")
+
+    def run(self) -> Dict[str, Any]:
+        """
+        Выполнение выбранных наборов
+
+        Returns:
+            {'meta': {...}, 'results': [...]}
+        """
+        started = time.perf_counter()
+        temp_dir = None
+        if self._work_dir is None:
+            temp_dir = self._work_dir = tempfile.mkdtemp(prefix='comfyui-bench-')
+        try:
+            for suite in SUITES:
+                if suite in self.config.suites:
+                    print(f"⏱️ {suite}")
+                    getattr(self, f"run_{suite}")()
+        finally:
+            if self._s3 is not None:
+                self._s3.stop()
+                self._s3 = None
+                self._manager = None
+            if temp_dir is not None:
+                shutil.rmtree(temp_dir, ignore_errors=True)
+                self._work_dir = None
+        return {
+            'meta': collect_meta(self.config, time.perf_counter() - started),
+            'results': self.results
+        }
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self._work_dir, name)
+
+    @property
+    def s3(self) -> LocalS3:
+        """Локальный S3 (запускается при первом обращении)"""
+        if self._s3 is None:
+            self._s3 = LocalS3(endpoint_url=self.config.s3_endpoint).start()
+        return self._s3
+
+    @property
+    def manager(self):
+        """S3StorageManager с настройками по умолчанию"""
+        if self._manager is None:
+            self._manager = self.s3.make_manager(metadata_cache_dir=self._path('metadata-index'))
+        return self._manager
+
+    def run_s3(self) -> None:
+        """Загрузка и скачивание изображений и тензоров, пакетная загрузка узлом"""
+        import numpy as np
+        from examples.comfyui_s3_nodes import load_image_batch
+
+        config = self.config
+        manager = self.manager
+        counter = itertools.count()
+
+        for size in config.image_sizes:
+            image_path = self._path(f"image_{size}.png")
+            with open(image_path, 'wb') as f:
+                f.write(make_png(size, seed=size))
+            file_size = os.path.getsize(image_path)
+            key = f"bench/s3/{size}/image.png"
+            params = {'size': size}
+
+            stats = measure(
+                lambda: _check(manager.upload_image(image_path, s3_key=f"bench/s3/{size}/{next(counter)}.png")),
+                config.iterations, config.warmup, bytes_per_call=file_size
+            )
+            self.add('s3', 'upload_image', params, stats)
+
+            _check(manager.upload_image(image_path, s3_key=key))
+            stats = measure(lambda: manager.read_image(key), config.iterations, config.warmup,
+                            bytes_per_call=file_size)
+            self.add('s3', 'read_image', params, stats)
+
+            download_path = self._path(f"download_{size}.png")
+            stats = measure(lambda: _check(manager.download_image(key, download_path)),
+                            config.iterations, config.warmup, bytes_per_call=file_size)
+            self.add('s3', 'download_image', params, stats)
+
+            array = np.random.default_rng(size).random((1, size, size, 3), dtype=np.float32)
+            tensor_size = array.size * 2
+            stats = measure(
+                lambda: _check(manager.upload_tensor(array, s3_key=f"bench/s3/{size}/{next(counter)}.tensor")),
+                config.iterations, config.warmup, bytes_per_call=tensor_size
+            )
+            self.add('s3', 'upload_tensor', params, stats)
+
+        batch_size = config.batch_image_size
+        image_bytes = make_png(batch_size, seed=batch_size)
+        max_batch = max(config.batch_sizes)
+        keys = [f"bench/batch/{batch_size}/{i:04d}.png" for i in range(max_batch)]
+        self.s3.put_objects(keys, image_bytes)
+        for count in config.batch_sizes:
+            stats = measure(lambda: load_image_batch(manager, keys[:count]), config.iterations, config.warmup,
+                            bytes_per_call=len(image_bytes) * count, ops_per_call=count)
+            self.add('s3', 'load_image_batch', {'size': batch_size, 'batch': count}, stats)
+
+    def run_tensor(self) -> None:
+        """Преобразование изображение <-> тензор: PNG против .tensor"""
+        import numpy as np
+        from PIL import Image
+        from examples.comfyui_s3_nodes import decode_image
+        from examples.s3_tensor_format import load_tensor, write_tensor
+
+        config = self.config
+        for size in config.image_sizes:
+            png = make_png(size, seed=size)
+            array = decode_image(png)
+            params = {'size': size}
+            raw_size = array.nbytes
+
+            def encode_png():
+                buffer = io.BytesIO()
+                Image.fromarray((array[0] * 255).astype(np.uint8)).save(buffer, 'PNG')
+                return buffer
+
+            self.add('tensor', 'png_encode', params,
+                     measure(encode_png, config.iterations, config.warmup, bytes_per_call=raw_size))
+            self.add('tensor', 'png_decode', params,
+                     measure(lambda: decode_image(png), config.iterations, config.warmup, bytes_per_call=raw_size))
+
+            for dtype in ('float16', 'float32'):
+                path = self._path(f"tensor_{size}_{dtype}.tensor")
+                dtype_params = {'size': size, 'dtype': dtype}
+                self.add('tensor', 'tensor_write', dtype_params,
+                         measure(lambda: write_tensor(path, array, dtype), config.iterations, config.warmup,
+                                 bytes_per_call=raw_size))
+                self.add('tensor', 'tensor_load', dtype_params,
+                         measure(lambda: load_tensor(path, mmap=False), config.iterations, config.warmup,
+                                 bytes_per_call=raw_size))
+
+    def run_workflow(self) -> None:
+        """Сборка, сохранение и загрузка workflow"""
+        from examples.comfyui_pipeline_builder import ComfyUIPipelineBuilder
+
+        config = self.config
+        for node_count in config.workflow_nodes:
+            params = {'nodes': node_count}
+            self.add('workflow', 'build', params,
+                     measure(lambda: build_chain_workflow(node_count).build_workflow(),
+                             config.iterations, config.warmup, ops_per_call=node_count))
+
+            builder = build_chain_workflow(node_count)
+            for extension in ('.json', '.cwf'):
+                path = self._path(f"workflow_{node_count}{extension}")
+                format_params = {'nodes': node_count, 'format': extension.lstrip('.')}
+
+                def save():
+                    if not builder.save_workflow(path):
+                        raise RuntimeError(f"Не удалось сохранить {path}")
+
+                def load():
+                    if not ComfyUIPipelineBuilder().load_workflow(path):
+                        raise RuntimeError(f"Не удалось загрузить {path}")
+
+                save()
+                file_size = os.path.getsize(path)
+                self.add('workflow', 'save', format_params,
+                         measure(save, config.iterations, config.warmup, bytes_per_call=file_size,
+                                 ops_per_call=node_count))
+                self.add('workflow', 'load', format_params,
+                         measure(load, config.iterations, config.warmup, bytes_per_call=file_size,
+                                 ops_per_call=node_count))
+
+    def run_listing(self) -> None:
+        """Полный обход префикса и одна страница list_images"""
+        config = self.config
+        manager = self.manager
+        for count in config.list_keys:
+            prefix = f"bench/listing/{count}/"
+            self.s3.seed_keys(prefix, count)
+            iterations = config.iterations if count < LARGE_LISTING else 1
+            warmup = config.warmup if count < LARGE_LISTING else 0
+            params = {'keys': count}
+
+            def scan():
+                scanned = sum(1 for _ in manager.iter_objects(prefix))
+                if scanned != count:
+                    raise RuntimeError(f"Ожидалось {count} ключей, получено {scanned}")
+
+            self.add('listing', 'iter_objects', params,
+                     measure(scan, iterations, warmup, ops_per_call=count))
+            self.add('listing', 'list_images_page', params,
+                     measure(lambda: _check(manager.list_images(prefix, max_keys=1000)), config.iterations,
+                             config.warmup, ops_per_call=min(count, 1000)))
+
+    def run_openai(self) -> None:
+        """Генерация и скачивание изображения через имитацию OpenAI"""
+        import requests
+        from examples.openai_image_generator import HTTP_POOL_SIZE, OpenAIImageGenerator
+        from requests.adapters import HTTPAdapter
+
+        config = self.config
+        with FakeOpenAIServer(latency=config.openai_latency, image_size=config.batch_image_size) as server:
+            session = requests.Session()
+            session.mount('http://', HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE))
+            generator = OpenAIImageGenerator(api_key='bench', session=session)
+            generator.base_url = f"{server.url}/v1"
+
+            def generate():
+                result = _check(generator.generate_image("benchmark prompt"))
+                return generator.fetch_image(result['images'][0]['url'])
+
+            for concurrency in config.openai_concurrency:
+                params = {'latency_ms': round(config.openai_latency * 1000), 'concurrency': concurrency}
+                with ThreadPoolExecutor(max_workers=concurrency) as executor:
+                    def generate_parallel():
+                        for future in [executor.submit(generate) for _ in range(concurrency)]:
+                            future.result()
+
+                    self.add('openai', 'generate_and_fetch', params,
+                             measure(generate_parallel, config.iterations, config.warmup,
+                                     bytes_per_call=len(server.image_bytes) * concurrency,
+                                     ops_per_call=concurrency))
+            session.close()
+
+    def run_comfyui(self) -> None:
+        """Загрузка и запуск workflow в имитации ComfyUI"""
+        from examples.comfyui_pipeline_builder import PipelineTemplates
+
+        config = self.config
+        with FakeComfyUIServer() as server:
+            builder = PipelineTemplates.openai_to_s3_pipeline("benchmark prompt", "comfyui-bench")
+            builder.comfyui_url = server.url
+            params = {'nodes': len(builder.nodes)}
+            self.add('comfyui', 'upload_workflow', params,
+                     measure(lambda: _check(builder.upload_to_comfyui("benchmark")),
+                             config.iterations, config.warmup))
+            self.add('comfyui', 'submit_workflow', params,
+                     measure(lambda: _check(builder.execute_workflow("benchmark", wait_for_completion=False)),
+                             config.iterations, config.warmup))
+            self.add('comfyui', 'get_available_nodes', {},
+                     measure(lambda: _check(builder.get_available_nodes()), config.iterations, config.warmup))
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def collect_meta(config: BenchmarkConfig, elapsed: float) -> Dict[str, Any]:
+    """Описание окружения запуска для сравнения результатов"""
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        's3_endpoint': config.s3_endpoint or 'moto',
+        'elapsed_s': round(elapsed, 3)
+    }
+
+
+def _result_key(result: Dict[str, Any]) -> Tuple[str, str, str]:
+    return result['suite'], result['name'], json.dumps(result['params'], sort_keys=True)
+
+
+def compare_results(baseline: Dict[str, Any],
+                    current: Dict[str, Any],
+                    threshold: float = 0.2,
+                    metric: str = 'p50') -> List[Dict[str, Any]]:
+    """
+    Сравнение с базовым запуском
+
+    Args:
+        baseline: Результаты базового запуска
+        current: Результаты текущего запуска
+        threshold: Допустимый рост задержки (0.2 - на 20%)
+        metric: Сравниваемая задержка ('p50', 'p95', 'mean', ...)
+
+    Returns:
+        Замеры из обоих запусков с изменением задержки; регрессии помечены 'regression'
+    """
+    baseline_results = {_result_key(result): result for result in baseline.get('results', [])}
+    comparison = []
+    for result in current.get('results', []):
+        previous = baseline_results.get(_result_key(result))
+        if previous is None:
+            continue
+        before = previous['latency_ms'].get(metric)
+        after = result['latency_ms'].get(metric)
+        if not before or after is None:
+            continue
+        change = after / before - 1
+        comparison.append({
+            'suite': result['suite'],
+            'name': result['name'],
+            'params': result['params'],
+            'baseline_ms': before,
+            'current_ms': after,
+            'change': round(change, 4),
+            'regression': change > threshold
+        })
+    return comparison
+
+
+def _int_list(value: str) -> Tuple[int, ...]:
+    return tuple(int(item) for item in value.split(',') if item.strip())
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    """Основная функция для работы с командной строкой"""
+    parser = argparse.ArgumentParser(description="Бенчмарки узлов и хранилища ComfyUI")
+    parser.add_argument("--suites", default=','.join(SUITES), help=f"Наборы через запятую ({', '.join(SUITES)})")
+    parser.add_argument("--quick", action="store_true", help="Малые размеры и число повторов")
+    parser.add_argument("--iterations", type=int, help="Число замеряемых вызовов")
+    parser.add_argument("--warmup", type=int, help="Число прогревочных вызовов")
+    parser.add_argument("--image-sizes", type=_int_list, help="Стороны изображений, например 256,1024,2048")
+    parser.add_argument("--batch-sizes", type=_int_list, help="Размеры пакетов load_image_batch")
+    parser.add_argument("--workflow-nodes", type=_int_list, help="Число узлов workflow, например 10,100,1000,10000")
+    parser.add_argument("--list-keys", type=_int_list, help="Число ключей для листинга, например 10000,1000000")
+    parser.add_argument("--openai-latency", type=float, help="Задержка имитации OpenAI в секундах")
+    parser.add_argument("--s3-endpoint", help="Внешний S3 endpoint (например MinIO) вместо moto")
+    parser.add_argument("--output", default="benchmark_results.json", help="Файл результатов JSON")
+    parser.add_argument("--compare", help="Файл результатов базового запуска для сравнения")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Допустимый рост p50 задержки (доля)")
+    parser.add_argument("--log-level", default="WARNING", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Уровень логирования")
+    args = parser.parse_args(argv)
+    configure_logging(getattr(logging, args.log_level))
+
+    overrides = {
+        'suites': tuple(suite.strip() for suite in args.suites.split(',') if suite.strip()),
+        'iterations': args.iterations,
+        'warmup': args.warmup,
+        'image_sizes': args.image_sizes,
+        'batch_sizes': args.batch_sizes,
+        'workflow_nodes': args.workflow_nodes,
+        'list_keys': args.list_keys,
+        'openai_latency': args.openai_latency,
+        's3_endpoint': args.s3_endpoint
+    }
+    overrides = {key: value for key, value in overrides.items() if value is not None}
+    config = BenchmarkConfig.quick(**overrides) if args.quick else BenchmarkConfig(**overrides)
+
+    try:
+        runner = BenchmarkRunner(config)
+    except ValueError as e:
+        parser.error(str(e))
+    report = runner.run()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 Результаты сохранены в {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        comparison = compare_results(baseline, report, args.threshold)
+        regressions = [item for item in comparison if item['regression']]
+        print(f"📊 Сравнение с {args.compare}: {len(comparison)} замеров, регрессий: {len(regressions)}")
+        for item in sorted(comparison, key=lambda item: -item['change']):
+            marker = '❌' if item['regression'] else '  '
+            params_text = ' '.join(f"{key}={value}" for key, value in item['params'].items())
+            print(f"{marker} {item['suite']}/{item['name']} {params_text}: "
+                  f"{item['baseline_ms']:.3f} -> {item['current_ms']:.3f} мс ({item['change']:+.1%})")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,502 @@
+#!/usr/bin/env python3
+"""
+Локальные замены сервисов для бенчмарков
+Автор: AI Assistant
+Версия: 1.0.0
+
+- LocalS3 - S3 сервер moto в процессе (или внешний совместимый endpoint, например MinIO)
+- FakeOpenAIServer - имитация OpenAI Images API с настраиваемой задержкой и throttling
+- FakeComfyUIServer - имитация ComfyUI API с очередью и ограниченным числом слотов GPU
+
+Все серверы слушают 127.0.0.1 на свободном порту и работают в фоновых потоках.
+"""
+
+import heapq
+import io
+import itertools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Sequence, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKET = 'comfyui-bench'
+# Параллельные PutObject при заполнении bucket
+SEED_WORKERS = 32
+
+
+class LocalS3:
+    """
+    S3 для бенчмарков: сервер moto в процессе или внешний endpoint
+
+    Сервер moto запускается как настоящий HTTP сервер, поэтому клиенты проходят
+    весь путь boto3 (подпись, HTTP, разбор XML), как с MinIO или AWS.
+    """
+
+    def __init__(self,
+                 endpoint_url: Optional[str] = None,
+                 bucket_name: str = DEFAULT_BUCKET,
+                 access_key: Optional[str] = None,
+                 secret_key: Optional[str] = None,
+                 region_name: str = 'us-east-1'):
+        """
+        Args:
+            endpoint_url: Внешний S3 endpoint (по умолчанию запускается moto)
+            bucket_name: Bucket для замеров (создается при необходимости)
+            access_key: Access Key (по умолчанию AWS_ACCESS_KEY_ID или 'bench')
+            secret_key: Secret Key (по умолчанию AWS_SECRET_ACCESS_KEY или 'bench')
+            region_name: Регион
+        """
+        self.endpoint_url = endpoint_url
+        self.bucket_name = bucket_name
+        self.access_key = access_key or os.getenv('AWS_ACCESS_KEY_ID') or 'bench'
+        self.secret_key = secret_key or os.getenv('AWS_SECRET_ACCESS_KEY') or 'bench'
+        self.region_name = region_name
+        self.client = None
+        self._server = None
+
+    @property
+    def is_moto(self) -> bool:
+        """Используется ли встроенный сервер moto"""
+        return self._server is not None
+
+    def start(self) -> 'LocalS3':
+        """Запуск сервера (для moto) и создание bucket"""
+        import boto3
+        from botocore.config import Config
+
+        if self.endpoint_url is None:
+            from moto.server import ThreadedMotoServer
+
+            self._server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+            self._server.start()
+            host, port = self._server.get_host_and_port()
+            # Журнал запросов werkzeug заглушает вывод замеров
+            logging.getLogger('werkzeug').setLevel(logging.WARNING)
+            self.endpoint_url = f"http://{host}:{port}"
+
+        self.client = boto3.client(
+            's3',
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            region_name=self.region_name,
+            endpoint_url=self.endpoint_url,
+            config=Config(max_pool_connections=SEED_WORKERS)
+        )
+        existing = {bucket['Name'] for bucket in self.client.list_buckets().get('Buckets', [])}
+        if self.bucket_name not in existing:
+            self.client.create_bucket(Bucket=self.bucket_name)
+        logger.info(f"🪣 S3 для бенчмарков: {self.endpoint_url}/{self.bucket_name}")
+        return self
+
+    def stop(self) -> None:
+        """Остановка сервера moto"""
+        if self._server is not None:
+            self._server.stop()
+            self._server = None
+            self.endpoint_url = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+    def make_manager(self, **kwargs):
+        """
+        S3StorageManager для bucket бенчмарков
+
+        Args:
+            **kwargs: Дополнительные параметры S3StorageManager
+
+        Returns:
+            S3StorageManager
+        """
+        from examples.s3_storage_manager import S3StorageManager
+
+        return S3StorageManager(
+            bucket_name=self.bucket_name,
+            aws_access_key_id=self.access_key,
+            aws_secret_access_key=self.secret_key,
+            region_name=self.region_name,
+            endpoint_url=self.endpoint_url,
+            **kwargs
+        )
+
+    def _moto_backend(self):
+        """Backend moto, в котором хранится bucket"""
+        from moto.core import DEFAULT_ACCOUNT_ID
+        from moto.s3.models import s3_backends
+
+        for backend in s3_backends[DEFAULT_ACCOUNT_ID].values():
+            if self.bucket_name in backend.buckets:
+                return backend
+        raise RuntimeError(f"Bucket {self.bucket_name} не найден в moto")
+
+    def put_objects(self, keys: Sequence[str], body: bytes) -> None:
+        """
+        Параллельная запись объектов через S3 API
+
+        Args:
+            keys: Ключи объектов
+            body: Содержимое объектов
+        """
+        def put(key: str) -> None:
+            self.client.put_object(Bucket=self.bucket_name, Key=key, Body=body)
+
+        with ThreadPoolExecutor(max_workers=SEED_WORKERS) as executor:
+            list(executor.map(put, keys))
+
+    def seed_keys(self, prefix: str, count: int, body: bytes = b'x') -> int:
+        """
+        Заполнение префикса объектами для замеров листинга
+
+        В moto объекты добавляются напрямую в backend (миллион ключей за десятки
+        секунд вместо часов через HTTP), во внешний S3 - параллельными PutObject.
+        Уже существующие объекты префикса учитываются.
+
+        Args:
+            prefix: Префикс ключей
+            count: Требуемое число объектов
+            body: Содержимое объектов
+
+        Returns:
+            Число добавленных объектов
+        """
+        paginator = self.client.get_paginator('list_objects_v2')
+        existing = sum(page.get('KeyCount', 0)
+                       for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix))
+        keys = [f"{prefix}{i:07d}.png" for i in range(existing, count)]
+        if not keys:
+            return 0
+
+        if self.is_moto:
+            backend = self._moto_backend()
+            for key in keys:
+                backend.put_object(self.bucket_name, key, body)
+        else:
+            self.put_objects(keys, body)
+        logger.info(f"🌱 Добавлено {len(keys)} объектов в {prefix}")
+        return len(keys)
+
+
+class _StandInHandler(BaseHTTPRequestHandler):
+    """Базовый обработчик: JSON ответы и тихий лог"""
+
+    protocol_version = 'HTTP/1.1'
+    # Заголовки и тело пишутся отдельно: без TCP_NODELAY ответ ждет delayed ACK клиента
+    disable_nagle_algorithm = True
+
+    @property
+    def stand_in(self):
+        return self.server.stand_in
+
+    def read_body(self) -> bytes:
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def read_json(self) -> Dict[str, Any]:
+        body = self.read_body()
+        try:
+            return json.loads(body) if body else {}
+        except ValueError:
+            return {}
+
+    def send_body(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_json(self, status: int, data: Any) -> None:
+        self.send_body(status, json.dumps(data).encode('utf-8'), 'application/json')
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _LocalHTTPServer:
+    """Базовый класс HTTP замены в фоновом потоке"""
+
+    handler_class = _StandInHandler
+
+    def __init__(self):
+        self._server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        """Базовый URL сервера"""
+        if self._server is None:
+            raise RuntimeError("Сервер не запущен")
+        return f"http://127.0.0.1:{self._server.server_port}"
+
+    def start(self):
+        """Запуск сервера на свободном порту"""
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self.handler_class)
+        self._server.daemon_threads = True
+        self._server.stand_in = self
+        threading.Thread(target=self._server.serve_forever,
+                         name=type(self).__name__, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        """Остановка сервера"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+def make_png(size: int, seed: int = 0) -> bytes:
+    """
+    PNG изображение size x size со случайным шумом (плохо сжимается, как фото)
+
+    Args:
+        size: Сторона изображения
+        seed: Зерно генератора
+
+    Returns:
+        Байты PNG
+    """
+    import numpy as np
+    from PIL import Image
+
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, 'PNG', compress_level=1)
+    return buffer.getvalue()
+
+
+class _OpenAIHandler(_StandInHandler):
+    """Маршруты имитации OpenAI Images API"""
+
+    def do_POST(self):
+        self.read_body()
+        if self.path.split('?')[0] not in ('/v1/images/generations', '/v1/images/variations'):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+        status, data = self.stand_in.handle_generation()
+        self.send_json(status, data)
+
+    def do_GET(self):
+        if not self.path.startswith('/images/'):
+            self.send_json(404, {"error": {"message": "not found"}})
+            return
+        self.send_body(200, self.stand_in.image_bytes, 'image/png')
+
+
+class FakeOpenAIServer(_LocalHTTPServer):
+    """
+    Имитация OpenAI Images API
+
+    POST /v1/images/generations и /v1/images/variations отвечают после задержки
+    latency списком с одним URL; GET /images/<n>.png возвращает заранее
+    закодированное PNG. Каждый throttle_every-й запрос получает 429.
+    """
+
+    handler_class = _OpenAIHandler
+
+    def __init__(self, latency: float = 0.0, image_size: int = 256, throttle_every: int = 0):
+        """
+        Args:
+            latency: Задержка ответа на генерацию в секундах
+            image_size: Сторона возвращаемого изображения
+            throttle_every: Каждый N-й запрос генерации отвечает 429 (0 - никогда)
+        """
+        super().__init__()
+        self.latency = latency
+        self.throttle_every = throttle_every
+        self.image_bytes = make_png(image_size)
+        self._counter = itertools.count(1)
+
+    def handle_generation(self) -> Tuple[int, Dict[str, Any]]:
+        """Ответ на запрос генерации: (HTTP статус, JSON)"""
+        number = next(self._counter)
+        if self.throttle_every and number % self.throttle_every == 0:
+            return 429, {"error": {"message": "Rate limit exceeded", "type": "rate_limit_exceeded"}}
+        if self.latency:
+            time.sleep(self.latency)
+        return 200, {
+            "created": int(time.time()),
+            "data": [{"url": f"{self.url}/images/{number}.png"}]
+        }
+
+
+class _ComfyUIHandler(_StandInHandler):
+    """Маршруты имитации ComfyUI API строителя пайплайнов"""
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if parts == ['system_stats']:
+            self.send_json(200, self.stand_in.system_stats())
+        elif parts == ['nodes']:
+            self.send_json(200, self.stand_in.node_types)
+        elif len(parts) == 3 and parts[0] == 'execution' and parts[2] in ('status', 'results'):
+            status, data = self.stand_in.execution_info(parts[1], parts[2] == 'results')
+            self.send_json(status, data)
+        else:
+            self.send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        data = self.read_json()
+        path = self.path.split('?')[0]
+        if path == '/workflow':
+            self.send_json(*self.stand_in.upload_workflow(data))
+        elif path == '/execute':
+            self.send_json(*self.stand_in.execute(data))
+        else:
+            self.send_json(404, {"error": "not found"})
+
+
+class FakeComfyUIServer(_LocalHTTPServer):
+    """
+    Имитация ComfyUI API с очередью выполнения
+
+    Выполнение моделируется без фоновых потоков: при запуске задача занимает
+    ближайший свободный из workers слотов GPU на execution_time + node_time *
+    число узлов секунд, а статус вычисляется по текущему времени. Если в
+    очереди (ожидают слота) уже max_queue задач, POST /execute отвечает 429.
+    """
+
+    handler_class = _ComfyUIHandler
+
+    node_types = {
+        "OpenAIImageGenerator": {"category": "OpenAI"},
+        "S3ImageUploader": {"category": "S3"},
+        "S3ImageDownloader": {"category": "S3"},
+        "S3WorkflowSaver": {"category": "S3"},
+        "PreviewImage": {"category": "image"},
+    }
+
+    def __init__(self,
+                 execution_time: float = 0.0,
+                 node_time: float = 0.0,
+                 workers: int = 1,
+                 max_queue: int = 0,
+                 failure_rate: float = 0.0,
+                 seed: int = 0):
+        """
+        Args:
+            execution_time: Базовое время выполнения workflow в секундах
+            node_time: Дополнительное время на каждый узел workflow
+            workers: Число параллельных слотов выполнения (GPU)
+            max_queue: Максимум задач в очереди (0 - без ограничения)
+            failure_rate: Доля выполнений, завершающихся ошибкой
+            seed: Зерно генератора ошибок
+        """
+        super().__init__()
+        if workers < 1:
+            raise ValueError("Число слотов должно быть положительным")
+        self.execution_time = execution_time
+        self.node_time = node_time
+        self.workers = workers
+        self.max_queue = max_queue
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self._slots = [0.0] * workers
+        self._queued_starts: deque = deque()
+        self._workflows: Dict[str, int] = {}
+        self._executions: Dict[str, Dict[str, Any]] = {}
+        self.rejected = 0
+
+    def system_stats(self) -> Dict[str, Any]:
+        """Ответ /system_stats"""
+        return {
+            "system": {"os": "posix", "python_version": "fake"},
+            "devices": [{"name": f"fake-gpu-{i}", "type": "cuda"} for i in range(self.workers)]
+        }
+
+    def upload_workflow(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Ответ POST /workflow"""
+        workflow = data.get("workflow")
+        if not isinstance(workflow, dict):
+            return 400, {"error": "workflow required"}
+        with self._lock:
+            workflow_id = f"wf-{next(self._ids)}"
+            self._workflows[workflow_id] = len(workflow.get("nodes", []))
+        return 200, {"id": workflow_id}
+
+    def execute(self, data: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        """Ответ POST /execute: постановка в очередь или 429"""
+        with self._lock:
+            node_count = self._workflows.get(data.get("workflow_id"))
+            if node_count is None:
+                return 404, {"error": "workflow not found"}
+
+            now = time.monotonic()
+            while self._queued_starts and self._queued_starts[0] <= now:
+                self._queued_starts.popleft()
+            if self.max_queue and len(self._queued_starts) >= self.max_queue:
+                self.rejected += 1
+                return 429, {"error": "queue is full"}
+
+            start = max(now, heapq.heappop(self._slots))
+            finish = start + self.execution_time + self.node_time * node_count
+            heapq.heappush(self._slots, finish)
+            if start > now:
+                self._queued_starts.append(start)
+
+            execution_id = f"ex-{next(self._ids)}"
+            self._executions[execution_id] = {
+                "start": start,
+                "finish": finish,
+                "failed": self._random.random() < self.failure_rate,
+                "nodes": node_count
+            }
+        return 200, {"execution_id": execution_id}
+
+    def execution_info(self, execution_id: str, results: bool) -> Tuple[int, Dict[str, Any]]:
+        """Ответ /execution/<id>/status и /execution/<id>/results"""
+        with self._lock:
+            execution = self._executions.get(execution_id)
+        if execution is None:
+            return 404, {"error": "execution not found"}
+
+        now = time.monotonic()
+        if now < execution["start"]:
+            status = "queued"
+        elif now < execution["finish"]:
+            status = "running"
+        else:
+            status = "failed" if execution["failed"] else "completed"
+
+        if not results:
+            data = {"status": status}
+            if status == "failed":
+                data["error"] = "simulated failure"
+            return 200, data
+        if status != "completed":
+            return 409, {"error": f"execution is {status}"}
+        return 200, {
+            "outputs": {"images": [f"{execution_id}.png"]},
+            "execution_time": execution["finish"] - execution["start"],
+            "nodes": execution["nodes"]
+        }
+
+    def stats(self) -> Dict[str, int]:
+        """Счетчики сервера: принятые, отклоненные и завершенные выполнения"""
+        now = time.monotonic()
+        with self._lock:
+            executions = list(self._executions.values())
+            rejected = self.rejected
+        return {
+            "accepted": len(executions),
+            "rejected": rejected,
+            "finished": sum(1 for execution in executions if execution["finish"] <= now)
+        }
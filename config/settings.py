@@ -26,6 +26,8 @@ class AWSSettings:
     secret_access_key: Optional[str] = None
     region_name: str = "us-east-1"
     default_bucket: str = "comfyui-images"
+    key_naming_scheme: str = "ulid"
+    key_shard_chars: int = 0
     
     def __post_init__(self):
         # Получение из переменных окружения если не указаны
@@ -108,7 +110,9 @@ class Settings:
                 "access_key_id": self.aws.access_key_id,
                 "secret_access_key": "***" if self.aws.secret_access_key else None,
                 "region_name": self.aws.region_name,
-                "default_bucket": self.aws.default_bucket
+                "default_bucket": self.aws.default_bucket,
+                "key_naming_scheme": self.aws.key_naming_scheme,
+                "key_shard_chars": self.aws.key_shard_chars
             },
             "openai": {
                 "api_key": "***" if self.openai.api_key else None,
@@ -148,6 +152,10 @@ def load_settings_from_env():
         settings.aws.region_name = os.getenv('AWS_DEFAULT_REGION')
     if os.getenv('AWS_DEFAULT_BUCKET'):
         settings.aws.default_bucket = os.getenv('AWS_DEFAULT_BUCKET')
+    if os.getenv('S3_KEY_NAMING_SCHEME'):
+        settings.aws.key_naming_scheme = os.getenv('S3_KEY_NAMING_SCHEME')
+    if os.getenv('S3_KEY_SHARD_CHARS'):
+        settings.aws.key_shard_chars = int(os.getenv('S3_KEY_SHARD_CHARS'))
     
     # OpenAI
     if os.getenv('OPENAI_API_KEY'):
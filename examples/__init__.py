@@ -4,49 +4,97 @@ ComfyUI Integration Examples Package
 Версия: 1.0.0
 
 Пакет с примерами интеграции ComfyUI с внешними сервисами
+
+Компоненты импортируются лениво (PEP 562): boto3, PIL и requests загружаются
+только при первом обращении к использующему их классу, поэтому, например,
+строитель пайплайнов не платит за импорт boto3.
 """
 
+import importlib
+import threading
+from typing import List, Optional
+
 __version__ = "1.0.0"
 __author__ = "AI Assistant"
 
-# Основные компоненты
-from .comfyui_pipeline_builder import ComfyUIPipelineBuilder, PipelineTemplates
-from .pipeline_manager import PipelineManager
-from .s3_storage_manager import S3StorageManager
-from .openai_image_generator import OpenAIImageGenerator
-
-# ComfyUI узлы
-from .comfyui_s3_nodes import (
-    S3ImageUploader,
-    S3ImageDownloader,
-    S3ImageLister,
-    S3WorkflowSaver,
-    S3WorkflowLoader,
-    S3StorageInfo
-)
-
-from .comfyui_openai_node import (
-    OpenAIImageNode,
-    OpenAIImageVariationNode
-)
-
-__all__ = [
+# Имя атрибута -> модуль пакета, из которого он импортируется при первом обращении
+_LAZY_ATTRIBUTES = {
     # Основные компоненты
-    'ComfyUIPipelineBuilder',
-    'PipelineTemplates',
-    'PipelineManager',
-    'S3StorageManager',
-    'OpenAIImageGenerator',
-    
+    'ComfyUIPipelineBuilder': '.comfyui_pipeline_builder',
+    'PipelineTemplates': '.comfyui_pipeline_builder',
+    'PipelineManager': '.pipeline_manager',
+    'S3StorageManager': '.s3_storage_manager',
+    'OpenAIImageGenerator': '.openai_image_generator',
+
     # S3 узлы
-    'S3ImageUploader',
-    'S3ImageDownloader',
-    'S3ImageLister',
-    'S3WorkflowSaver',
-    'S3WorkflowLoader',
-    'S3StorageInfo',
-    
+    'S3ImageUploader': '.comfyui_s3_nodes',
+    'S3ImageDownloader': '.comfyui_s3_nodes',
+    'S3BatchImageDownloader': '.comfyui_s3_nodes',
+    'S3ImageStream': '.comfyui_s3_nodes',
+    'S3ImageStreamLoader': '.comfyui_s3_nodes',
+    'S3ImageLister': '.comfyui_s3_nodes',
+    'S3ImageSearch': '.comfyui_s3_nodes',
+    'S3WorkflowSaver': '.comfyui_s3_nodes',
+    'S3WorkflowLoader': '.comfyui_s3_nodes',
+    'S3StorageInfo': '.comfyui_s3_nodes',
+
     # OpenAI узлы
-    'OpenAIImageNode',
-    'OpenAIImageVariationNode'
-] 
\ No newline at end of file
+    'OpenAIImageNode': '.comfyui_openai_node',
+    'OpenAIImageVariationNode': '.comfyui_openai_node',
+
+    # Логирование
+    'EventLogger': '.structured_logging',
+    'configure_logging': '.structured_logging',
+
+    # Метрики
+    'render_metrics': '.metrics',
+    'serve_metrics': '.metrics',
+    'write_metrics_file': '.metrics',
+
+    # Трассировка
+    'enable_tracing': '.tracing',
+    'disable_tracing': '.tracing',
+    'summarize_trace': '.tracing',
+}
+
+__all__ = list(_LAZY_ATTRIBUTES) + ['warmup']
+
+
+def __getattr__(name: str):
+    module_name = _LAZY_ATTRIBUTES.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    # Последующие обращения не проходят через __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> List[str]:
+    return sorted(set(globals()) | set(__all__))
+
+
+def warmup(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Прогрев клиентов при запуске ComfyUI
+
+    Импортирует тяжелые зависимости и создает пулы соединений S3 и OpenAI
+    (учетные данные из переменных окружения), чтобы первый запуск узлов
+    не ждал импорта boto3 и установки TLS соединений.
+
+    Args:
+        background: Выполнить в фоновом потоке
+
+    Returns:
+        Фоновый поток или None
+    """
+    def run():
+        importlib.import_module('.comfyui_s3_nodes', __name__).warmup(background=False)
+        importlib.import_module('.comfyui_openai_node', __name__).warmup(background=False)
+
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="comfyui-warmup", daemon=True)
+    thread.start()
+    return thread
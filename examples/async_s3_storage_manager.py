@@ -0,0 +1,866 @@
+#!/usr/bin/env python3
+"""
+Async S3 Storage Manager для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Асинхронный аналог S3StorageManager для приложений на asyncio (aiobotocore).
+Методы повторяют API синхронного менеджера и возвращают те же словари,
+но являются корутинами; iter_objects - асинхронный генератор.
+"""
+
+import asyncio
+import json
+import os
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime, timezone
+from typing import Any, AsyncIterable, AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Optional, Union
+import logging
+
+import boto3
+from botocore.exceptions import ClientError
+
+try:
+    from .s3_storage_manager import (
+        ALIAS_METADATA_KEY, CONTENT_HASH_METADATA_KEY, COMPRESSION_ALGORITHMS,
+        COMPRESSION_METADATA_KEY, DEDUP_MODES, DELETE_BATCH_SIZE,
+        compress_body, content_key, decode_metadata_value, decompress_body,
+        encode_metadata_value, hash_file
+    )
+    from .s3_key_generator import KeyGenerator
+    from .s3_metadata_index import S3MetadataIndex
+    from .s3_url_cache import PresignedUrlCache, shared_url_cache
+    from .s3_retry import DEFAULT_OPERATION_BUDGETS
+    from .structured_logging import EventLogger
+    from .workflow_serialization import (
+        BINARY_EXTENSION, decode_workflow_binary, is_binary_workflow, workflow_to_binary
+    )
+except ImportError:
+    from s3_storage_manager import (
+        ALIAS_METADATA_KEY, CONTENT_HASH_METADATA_KEY, COMPRESSION_ALGORITHMS,
+        COMPRESSION_METADATA_KEY, DEDUP_MODES, DELETE_BATCH_SIZE,
+        compress_body, content_key, decode_metadata_value, decompress_body,
+        encode_metadata_value, hash_file
+    )
+    from s3_key_generator import KeyGenerator
+    from s3_metadata_index import S3MetadataIndex
+    from s3_url_cache import PresignedUrlCache, shared_url_cache
+    from s3_retry import DEFAULT_OPERATION_BUDGETS
+    from structured_logging import EventLogger
+    from workflow_serialization import (
+        BINARY_EXTENSION, decode_workflow_binary, is_binary_workflow, workflow_to_binary
+    )
+
+# Асинхронный клиент S3 (опционально)
+try:
+    from aiobotocore.config import AioConfig
+    from aiobotocore.session import get_session
+except ImportError:
+    AioConfig = None
+    get_session = None
+
+logger = logging.getLogger(__name__)
+# События по отдельным объектам пишутся с выборкой, итоги пакетов - целиком
+events = EventLogger(logger)
+
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+async def _aiterate(items: Union[Iterable[Any], AsyncIterable[Any]]) -> AsyncIterator[Any]:
+    """Обход обычного или асинхронного итератора"""
+    if hasattr(items, '__aiter__'):
+        async for item in items:
+            yield item
+    else:
+        for item in items:
+            yield item
+
+
+async def aiter_batches(items: Union[Iterable[Any], AsyncIterable[Any]], batch_size: int) -> AsyncIterator[List[Any]]:
+    """
+    Разбиение обычного или асинхронного итератора на списки фиксированного размера
+
+    Args:
+        items: Итератор элементов
+        batch_size: Размер пакета
+
+    Returns:
+        Асинхронный итератор пакетов (последний может быть короче)
+    """
+    batch = []
+    async for item in _aiterate(items):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+async def abounded_map(func: Callable[[Any], Awaitable[Any]],
+                       items: Union[Iterable[Any], AsyncIterable[Any]],
+                       max_concurrency: int = 16) -> AsyncIterator[Any]:
+    """
+    Параллельное выполнение корутин для потока элементов с ограничением числа задач
+
+    Элементы читаются из итератора по мере завершения задач, поэтому в памяти
+    одновременно не больше max_concurrency задач. Результаты выдаются в порядке завершения.
+
+    Args:
+        func: Асинхронная функция
+        items: Итератор аргументов (обычный или асинхронный)
+        max_concurrency: Максимальное число задач в работе
+
+    Returns:
+        Асинхронный итератор результатов
+    """
+    in_flight = set()
+    try:
+        async for item in _aiterate(items):
+            in_flight.add(asyncio.ensure_future(func(item)))
+            if len(in_flight) >= max_concurrency:
+                done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield task.result()
+
+        while in_flight:
+            done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield task.result()
+    finally:
+        for task in in_flight:
+            task.cancel()
+
+
+class AsyncS3StorageManager:
+    """
+    Асинхронный менеджер для работы с AWS S3 хранилищем
+
+    Использование:
+        async with AsyncS3StorageManager("comfyui-images") as s3:
+            result = await s3.upload_image("image.png")
+    """
+
+    def __init__(self,
+                 bucket_name: str,
+                 aws_access_key_id: Optional[str] = None,
+                 aws_secret_access_key: Optional[str] = None,
+                 region_name: str = 'us-east-1',
+                 endpoint_url: Optional[str] = None,
+                 compression: Optional[str] = 'gzip',
+                 compression_level: Optional[int] = None,
+                 metadata_index: bool = True,
+                 metadata_cache_dir: Optional[str] = None,
+                 deduplicate: Optional[str] = None,
+                 key_generator: Optional[KeyGenerator] = None,
+                 max_concurrency: int = 32,
+                 url_cache: Optional[PresignedUrlCache] = None):
+        """
+        Инициализация асинхронного S3 менеджера
+
+        Args:
+            bucket_name: Название S3 bucket
+            aws_access_key_id: AWS Access Key ID
+            aws_secret_access_key: AWS Secret Access Key
+            region_name: AWS регион
+            endpoint_url: URL эндпоинта (для совместимости с MinIO и др.)
+            compression: Сжатие workflow ('gzip', 'zstd' или None)
+            compression_level: Уровень сжатия (по умолчанию - стандартный для алгоритма)
+            metadata_index: Вести индекс метаданных в comfyui/metadata/ (общий с S3StorageManager)
+            metadata_cache_dir: Директория локального кэша индекса
+            deduplicate: Дедупликация загрузок по SHA-256 ('skip', 'alias'; None - отключена)
+            key_generator: Генератор ключей (по умолчанию - по настройкам config/settings.py)
+            max_concurrency: Максимальное число одновременных запросов массовых операций
+            url_cache: Кэш подписанных URL (по умолчанию общий с синхронными менеджерами)
+        """
+        if get_session is None:
+            raise ImportError("Для AsyncS3StorageManager нужен пакет aiobotocore: pip install aiobotocore")
+        if compression and compression not in COMPRESSION_ALGORITHMS:
+            raise ValueError(f"Неизвестный алгоритм сжатия: {compression}")
+        if deduplicate and deduplicate not in DEDUP_MODES:
+            raise ValueError(f"Неизвестный режим дедупликации: {deduplicate}")
+
+        self.bucket_name = bucket_name
+        self.region_name = region_name
+        self.endpoint_url = endpoint_url
+        self.compression = compression or None
+        self.compression_level = compression_level
+        self.deduplicate = deduplicate or None
+        self.key_generator = key_generator or KeyGenerator.from_settings()
+        self.max_concurrency = max_concurrency
+        self.url_cache = url_cache or shared_url_cache
+        self.use_metadata_index = metadata_index
+        self.metadata_cache_dir = metadata_cache_dir
+
+        # Получение учетных данных
+        self.aws_access_key_id = aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID')
+        self.aws_secret_access_key = aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY')
+
+        if not self.aws_access_key_id or not self.aws_secret_access_key:
+            raise ValueError("AWS credentials not provided. Set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables.")
+
+        self.s3_client = None
+        self.metadata_index: Optional[S3MetadataIndex] = None
+        self._exit_stack: Optional[AsyncExitStack] = None
+
+    async def __aenter__(self) -> 'AsyncS3StorageManager':
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """Создание клиента S3 и проверка доступа к bucket"""
+        if self.s3_client is not None:
+            return
+
+        config = AioConfig(
+            retries={
+                'mode': 'adaptive',
+                'max_attempts': DEFAULT_OPERATION_BUDGETS['default'].max_attempts
+            },
+            max_pool_connections=self.max_concurrency
+        )
+        self._exit_stack = AsyncExitStack()
+        self.s3_client = await self._exit_stack.enter_async_context(
+            get_session().create_client(
+                's3',
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                region_name=self.region_name,
+                endpoint_url=self.endpoint_url,
+                config=config
+            )
+        )
+
+        try:
+            await self.s3_client.head_bucket(Bucket=self.bucket_name)
+            logger.info(f"✅ Доступ к bucket '{self.bucket_name}' подтвержден")
+        except Exception:
+            logger.error(f"❌ Нет доступа к bucket '{self.bucket_name}'")
+            await self.close()
+            raise
+
+        if self.use_metadata_index:
+            # Индекс синхронный: вызовы выполняются в потоках, чтобы не блокировать цикл
+            index_client = boto3.client(
+                's3',
+                aws_access_key_id=self.aws_access_key_id,
+                aws_secret_access_key=self.aws_secret_access_key,
+                region_name=self.region_name,
+                endpoint_url=self.endpoint_url
+            )
+            self.metadata_index = await asyncio.to_thread(
+                S3MetadataIndex, index_client, self.bucket_name, cache_dir=self.metadata_cache_dir
+            )
+
+    async def close(self) -> None:
+        """Публикация буфера индекса метаданных и закрытие клиента S3"""
+        if self.metadata_index is not None:
+            try:
+                await asyncio.to_thread(self.metadata_index.close)
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось опубликовать буфер индекса метаданных: {e}")
+            self.metadata_index.s3_client.close()
+            self.metadata_index = None
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+        self._exit_stack = None
+        self.s3_client = None
+
+    # ------------------------------------------------------------------
+    # Изображения
+    # ------------------------------------------------------------------
+
+    async def _head_exists(self, s3_key: str) -> bool:
+        try:
+            await self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    async def upload_image(self,
+                           image_path: str,
+                           s3_key: Optional[str] = None,
+                           metadata: Optional[Dict] = None) -> Dict:
+        """
+        Загрузка изображения в S3 (семантика ключей и дедупликации как у S3StorageManager)
+
+        Args:
+            image_path: Путь к локальному файлу изображения
+            s3_key: Ключ в S3 (если не указан, генерируется автоматически)
+            metadata: Дополнительные метаданные
+
+        Returns:
+            Dict с информацией о загруженном файле
+        """
+        try:
+            if not os.path.exists(image_path):
+                raise FileNotFoundError(f"Файл не найден: {image_path}")
+
+            extension = os.path.splitext(image_path)[1].lower()
+            file_metadata = {
+                'upload_time': datetime.now(timezone.utc).isoformat(),
+                'original_path': image_path,
+                'file_size': os.path.getsize(image_path),
+                'file_type': extension
+            }
+            if metadata:
+                file_metadata.update(metadata)
+
+            # Дедупликация по содержимому (хэширование - в потоке, чтобы не блокировать цикл)
+            duplicate = False
+            alias_of = None
+            if self.deduplicate:
+                content_hash = await asyncio.to_thread(hash_file, image_path)
+                file_metadata[CONTENT_HASH_METADATA_KEY] = content_hash
+                canonical_key = content_key(content_hash, extension)
+
+                if not s3_key:
+                    s3_key = canonical_key
+                    duplicate = await self._head_exists(canonical_key)
+                elif s3_key != canonical_key and self.deduplicate == 'alias':
+                    if await self._head_exists(canonical_key):
+                        alias_of = canonical_key
+
+            if not s3_key:
+                s3_key = self.key_generator.key('comfyui/images/', os.path.basename(image_path))
+
+            s3_metadata = {k: encode_metadata_value(v) for k, v in file_metadata.items()}
+
+            if alias_of:
+                file_metadata[ALIAS_METADATA_KEY] = alias_of
+                s3_metadata[ALIAS_METADATA_KEY] = alias_of
+                await self.s3_client.put_object(
+                    Bucket=self.bucket_name, Key=s3_key, Body=b'', Metadata=s3_metadata
+                )
+            elif not duplicate:
+                body = await asyncio.to_thread(_read_file, image_path)
+                await self.s3_client.put_object(
+                    Bucket=self.bucket_name, Key=s3_key, Body=body, Metadata=s3_metadata
+                )
+
+            if not duplicate:
+                await self._index_metadata(s3_key, file_metadata)
+
+            url = await self.get_file_url(s3_key)
+
+            events.sampled(logging.INFO, 'image_uploaded', "✅ Загружено изображение: %s", s3_key, key=s3_key)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'url': url,
+                'metadata': file_metadata,
+                'deduplicated': duplicate or bool(alias_of),
+                'message': (f"Изображение уже загружено: {s3_key}" if duplicate
+                            else f"Изображение успешно загружено: {s3_key}")
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки изображения: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка загрузки изображения: {e}"
+            }
+
+    async def download_image(self,
+                             s3_key: str,
+                             local_path: Optional[str] = None) -> Dict:
+        """
+        Скачивание изображения из S3
+
+        Args:
+            s3_key: Ключ файла в S3
+            local_path: Локальный путь для сохранения (если не указан, генерируется)
+
+        Returns:
+            Dict с информацией о скачанном файле
+        """
+        try:
+            if not local_path:
+                local_path = f"/tmp/{os.path.basename(s3_key)}"
+            await asyncio.to_thread(os.makedirs, os.path.dirname(local_path), exist_ok=True)
+
+            response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            metadata = {k: decode_metadata_value(v) for k, v in response.get('Metadata', {}).items()}
+            alias_of = metadata.get(ALIAS_METADATA_KEY)
+            if alias_of:
+                async with response['Body']:
+                    pass
+                response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=alias_of)
+
+            # Метаданные приходят в ответе GET, отдельный HEAD не нужен;
+            # запись на диск - в потоке, чтобы большие файлы не блокировали цикл
+            async with response['Body'] as stream:
+                file = await asyncio.to_thread(open, local_path, 'wb')
+                try:
+                    while True:
+                        chunk = await stream.read(DOWNLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        await asyncio.to_thread(file.write, chunk)
+                finally:
+                    await asyncio.to_thread(file.close)
+
+            events.sampled(logging.INFO, 'image_downloaded', "✅ Скачано изображение: %s -> %s", s3_key, local_path,
+                           key=s3_key, path=local_path)
+            return {
+                'success': True,
+                'local_path': local_path,
+                's3_key': s3_key,
+                'metadata': metadata,
+                'message': f"Изображение успешно скачано: {local_path}"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка скачивания изображения: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка скачивания изображения: {e}"
+            }
+
+    async def list_images(self,
+                          prefix: str = 'comfyui/images/',
+                          max_keys: int = 100) -> Dict:
+        """
+        Список изображений в S3
+
+        Args:
+            prefix: Префикс для поиска
+            max_keys: Максимальное количество ключей
+
+        Returns:
+            Dict со списком файлов
+        """
+        try:
+            response = await self.s3_client.list_objects_v2(
+                Bucket=self.bucket_name, Prefix=prefix, MaxKeys=max_keys
+            )
+            contents = response.get('Contents', [])
+            urls = await asyncio.gather(*(self.get_file_url(obj['Key']) for obj in contents))
+
+            files = [
+                {
+                    'key': obj['Key'],
+                    'size': obj['Size'],
+                    'last_modified': obj['LastModified'].isoformat(),
+                    'url': url
+                }
+                for obj, url in zip(contents, urls)
+            ]
+
+            logger.info(f"📋 Список изображений: {len(files)} файлов")
+            return {
+                'success': True,
+                'files': files,
+                'count': len(files),
+                'message': f"Найдено {len(files)} файлов"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения списка файлов: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка получения списка файлов: {e}"
+            }
+
+    async def delete_image(self, s3_key: str) -> Dict:
+        """
+        Удаление изображения из S3
+
+        Args:
+            s3_key: Ключ файла в S3
+
+        Returns:
+            Dict с результатом операции
+        """
+        try:
+            await self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            await self._unindex_keys([s3_key])
+            events.sampled(logging.INFO, 'image_deleted', "🗑️ Удалено изображение: %s", s3_key, key=s3_key)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'message': f"Изображение удалено: {s3_key}"
+            }
+        except Exception as e:
+            logger.error(f"❌ Ошибка удаления изображения: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка удаления изображения: {e}"
+            }
+
+    async def _index_metadata(self, s3_key: str, metadata: Dict) -> None:
+        """Запись метаданных в индекс (ошибка индекса не прерывает загрузку)"""
+        if not self.metadata_index:
+            return
+        try:
+            await asyncio.to_thread(self.metadata_index.record, s3_key, metadata)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить индекс метаданных для {s3_key}: {e}")
+
+    async def _unindex_keys(self, keys: List[str]) -> None:
+        """Пометка удаленных изображений в индексе метаданных"""
+        if not self.metadata_index:
+            return
+        keys = [key for key in keys if key.startswith('comfyui/images/')]
+        if not keys:
+            return
+        try:
+            await asyncio.to_thread(self.metadata_index.remove_many, keys)
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось обновить индекс метаданных: {e}")
+
+    async def iter_objects(self,
+                           prefix: str = 'comfyui/',
+                           page_size: int = 1000) -> AsyncIterator[Dict]:
+        """
+        Потоковый обход объектов по префиксу через постраничный листинг
+
+        Args:
+            prefix: Префикс для поиска
+            page_size: Размер страницы листинга (не более 1000)
+
+        Returns:
+            Асинхронный итератор описаний объектов (Key, Size, LastModified, ETag)
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        async for page in paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': page_size}
+        ):
+            for obj in page.get('Contents', []):
+                yield obj
+
+    async def get_file_url(self, s3_key: str, expires_in: int = 3600) -> str:
+        """
+        Получение URL для доступа к файлу (через общий кэш подписанных URL)
+
+        Args:
+            s3_key: Ключ файла в S3
+            expires_in: Минимальное время жизни URL в секундах
+
+        Returns:
+            URL для доступа к файлу
+        """
+        cache_key = (self.aws_access_key_id, self.endpoint_url, self.region_name,
+                     self.bucket_name, s3_key, 'get_object')
+        url = self.url_cache.lookup(cache_key, expires_in)
+        if url is not None:
+            return url
+
+        try:
+            signed_at = time.time()
+            url = await self.s3_client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket_name, 'Key': s3_key},
+                ExpiresIn=self.url_cache.signed_lifetime(expires_in)
+            )
+            self.url_cache.store(cache_key, expires_in, url, signed_at)
+            return url
+        except Exception as e:
+            logger.error(f"❌ Ошибка генерации URL: {e}")
+            return ""
+
+    async def get_file_metadata(self, s3_key: str) -> Dict:
+        """
+        Получение метаданных файла
+
+        Args:
+            s3_key: Ключ файла в S3
+
+        Returns:
+            Dict с метаданными
+        """
+        try:
+            response = await self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return {k: decode_metadata_value(v) for k, v in response.get('Metadata', {}).items()}
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения метаданных: {e}")
+            return {}
+
+    # ------------------------------------------------------------------
+    # Workflow
+    # ------------------------------------------------------------------
+
+    async def save_workflow(self,
+                            workflow_data: Dict,
+                            workflow_name: Optional[str] = None,
+                            binary: bool = False) -> Dict:
+        """
+        Сохранение workflow в S3
+
+        Args:
+            workflow_data: Данные workflow
+            workflow_name: Название workflow
+            binary: Сохранить в компактном бинарном формате (.cwf)
+
+        Returns:
+            Dict с результатом операции
+        """
+        try:
+            if not workflow_name:
+                extension = BINARY_EXTENSION if binary else ".json"
+                workflow_name = self.key_generator.name(f"workflow{extension}")
+
+            s3_key = f"comfyui/workflows/{workflow_name}"
+
+            if binary:
+                body = workflow_to_binary(workflow_data)
+                content_type = 'application/octet-stream'
+            else:
+                body = json.dumps(workflow_data, indent=2).encode('utf-8')
+                content_type = 'application/json'
+
+            put_args = {'Bucket': self.bucket_name, 'Key': s3_key, 'Body': body, 'ContentType': content_type}
+            if self.compression:
+                put_args['Body'] = await asyncio.to_thread(
+                    compress_body, body, self.compression, self.compression_level
+                )
+                put_args['ContentEncoding'] = self.compression
+                put_args['Metadata'] = {COMPRESSION_METADATA_KEY: self.compression}
+            await self.s3_client.put_object(**put_args)
+
+            events.sampled(logging.INFO, 'workflow_saved', "💾 Сохранен workflow: %s", s3_key, key=s3_key)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'workflow_name': workflow_name,
+                'size': len(body),
+                'stored_size': len(put_args['Body']),
+                'compression': self.compression,
+                'message': f"Workflow сохранен: {s3_key}"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения workflow: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка сохранения workflow: {e}"
+            }
+
+    async def load_workflow(self, workflow_name: str) -> Dict:
+        """
+        Загрузка workflow из S3
+
+        Args:
+            workflow_name: Название workflow (формат и сжатие определяются автоматически)
+
+        Returns:
+            Dict с данными workflow
+        """
+        try:
+            s3_key = f"comfyui/workflows/{workflow_name}"
+
+            response = await self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+            async with response['Body'] as stream:
+                body = await stream.read()
+
+            algorithm = response.get('Metadata', {}).get(COMPRESSION_METADATA_KEY)
+            if not algorithm and response.get('ContentEncoding') in COMPRESSION_ALGORITHMS:
+                algorithm = response['ContentEncoding']
+            body = decompress_body(body, algorithm)
+
+            if is_binary_workflow(body):
+                workflow_data = decode_workflow_binary(body)
+            else:
+                workflow_data = json.loads(body.decode('utf-8'))
+
+            events.sampled(logging.INFO, 'workflow_loaded', "📂 Загружен workflow: %s", s3_key, key=s3_key)
+            return {
+                'success': True,
+                'workflow_data': workflow_data,
+                's3_key': s3_key,
+                'message': f"Workflow загружен: {s3_key}"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки workflow: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка загрузки workflow: {e}"
+            }
+
+    # ------------------------------------------------------------------
+    # Массовые операции
+    # ------------------------------------------------------------------
+
+    async def upload_many(self,
+                          image_paths: Iterable[str],
+                          metadata: Optional[Dict] = None,
+                          max_concurrency: Optional[int] = None) -> Dict:
+        """
+        Параллельная загрузка набора изображений
+
+        Args:
+            image_paths: Пути к локальным файлам
+            metadata: Метаданные, общие для всех файлов
+            max_concurrency: Число одновременных загрузок (по умолчанию max_concurrency менеджера)
+
+        Returns:
+            Dict с результатами по файлам (в порядке завершения)
+        """
+        with events.batch('upload_batch', "⬆️ Пакетная загрузка") as summary:
+            results = [
+                result async for result in abounded_map(
+                    lambda path: self.upload_image(path, metadata=metadata),
+                    image_paths,
+                    max_concurrency or self.max_concurrency
+                )
+            ]
+            failed = sum(1 for result in results if not result['success'])
+            summary.add('uploaded', len(results) - failed)
+            summary.add('failed', failed)
+        return {
+            'success': failed == 0,
+            'results': results,
+            'uploaded': len(results) - failed,
+            'failed': failed,
+            'message': f"Загружено {len(results) - failed} из {len(results)} изображений"
+        }
+
+    async def download_many(self,
+                            s3_keys: Iterable[str],
+                            local_dir: str,
+                            max_concurrency: Optional[int] = None) -> Dict:
+        """
+        Параллельное скачивание набора изображений
+
+        Args:
+            s3_keys: Ключи файлов в S3
+            local_dir: Директория для сохранения
+            max_concurrency: Число одновременных скачиваний
+
+        Returns:
+            Dict с результатами по файлам (в порядке завершения)
+        """
+        with events.batch('download_batch', "⬇️ Пакетное скачивание") as summary:
+            results = [
+                result async for result in abounded_map(
+                    lambda key: self.download_image(key, os.path.join(local_dir, os.path.basename(key))),
+                    s3_keys,
+                    max_concurrency or self.max_concurrency
+                )
+            ]
+            failed = sum(1 for result in results if not result['success'])
+            summary.add('downloaded', len(results) - failed)
+            summary.add('failed', failed)
+        return {
+            'success': failed == 0,
+            'results': results,
+            'downloaded': len(results) - failed,
+            'failed': failed,
+            'message': f"Скачано {len(results) - failed} из {len(results)} изображений"
+        }
+
+    async def _delete_batch(self, keys: List[str]) -> Dict:
+        """Удаление одного пакета ключей запросом DeleteObjects"""
+        try:
+            response = await self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+            errors = [
+                {'key': error.get('Key'), 'code': error.get('Code'), 'message': error.get('Message')}
+                for error in response.get('Errors', [])
+            ]
+        except Exception as e:
+            errors = [{'key': key, 'code': type(e).__name__, 'message': str(e)} for key in keys]
+
+        failed = {error['key'] for error in errors}
+        await self._unindex_keys([key for key in keys if key not in failed])
+
+        return {'requested': len(keys), 'errors': errors}
+
+    async def delete_many(self,
+                          keys: Optional[Union[Iterable[str], AsyncIterable[str]]] = None,
+                          prefix: Optional[str] = None,
+                          dry_run: bool = False,
+                          max_concurrency: int = 8,
+                          batch_size: int = DELETE_BATCH_SIZE) -> Dict:
+        """
+        Массовое удаление объектов пакетами DeleteObjects
+
+        Ключи читаются потоково (из переданного итератора или из постраничного листинга
+        префикса) и удаляются пакетами до 1000 ключей, в памяти не больше max_concurrency
+        пакетов. Маркер папки, совпадающий с префиксом, не удаляется.
+
+        Args:
+            keys: Итератор ключей для удаления (обычный или асинхронный)
+            prefix: Префикс, все объекты которого нужно удалить
+            dry_run: Только подсчитать объекты, ничего не удаляя
+            max_concurrency: Число одновременно выполняемых пакетов
+            batch_size: Размер пакета (не более 1000)
+
+        Returns:
+            Dict с количеством удаленных объектов и ошибками по ключам
+        """
+        try:
+            if (keys is None) == (prefix is None):
+                raise ValueError("Укажите либо keys, либо prefix")
+
+            batch_size = max(1, min(batch_size, DELETE_BATCH_SIZE))
+
+            if keys is None:
+                keys = (obj['Key'] async for obj in self.iter_objects(prefix) if obj['Key'] != prefix)
+
+            batches = aiter_batches(keys, batch_size)
+
+            if dry_run:
+                matched = 0
+                sample: List[str] = []
+                async for batch in batches:
+                    matched += len(batch)
+                    sample.extend(batch[:max(0, 100 - len(sample))])
+
+                logger.info(f"🔍 Пробный запуск удаления: {matched} объектов")
+                return {
+                    'success': True,
+                    'dry_run': True,
+                    'matched': matched,
+                    'deleted': 0,
+                    'sample_keys': sample,
+                    'errors': [],
+                    'message': f"Будет удалено {matched} объектов"
+                }
+
+            requested = 0
+            errors = []
+            async for batch_result in abounded_map(self._delete_batch, batches, max_concurrency):
+                requested += batch_result['requested']
+                errors.extend(batch_result['errors'])
+
+            deleted = requested - len(errors)
+            events.event(logging.INFO, 'delete_batch', "🗑️ Массовое удаление: %d объектов, ошибок %d",
+                         deleted, len(errors), deleted=deleted, errors=len(errors))
+            return {
+                'success': not errors,
+                'dry_run': False,
+                'matched': requested,
+                'deleted': deleted,
+                'errors': errors,
+                'message': f"Удалено {deleted} объектов"
+            }
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка массового удаления: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка массового удаления: {e}"
+            }
+
+def _read_file(path: str) -> bytes:
+    with open(path, 'rb') as file:
+        return file.read()
@@ -7,24 +7,60 @@ OpenAI Image Generator Node для ComfyUI
 и интегрировать их в пайплайны ComfyUI.
 """
 
+import importlib
 import os
 import sys
 import json
+import threading
 import time
-import requests
-from PIL import Image
 import io
-import base64
 from typing import Dict, Any, List, Optional
 
-# Добавляем путь к нашему скрипту
-current_dir = os.path.dirname(os.path.abspath(__file__))
-sys.path.append(current_dir)
 
-try:
-    from openai_image_generator import OpenAIImageGenerator
-except ImportError:
-    print("Ошибка импорта openai_image_generator.py")
+def _import_sibling(name: str):
+    """
+    Импорт соседнего модуля
+    
+    Внутри пакета модуль импортируется относительно, при загрузке файла
+    напрямую (как single-file custom node) - из директории файла.
+    """
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if directory not in sys.path:
+        sys.path.append(directory)
+    return importlib.import_module(name)
+
+
+# Метрики фаз узлов (модуль без тяжелых зависимостей)
+metrics = _import_sibling('metrics')
+
+
+def warmup(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Предварительный импорт requests, PIL и numpy и создание общей HTTP сессии
+    
+    Args:
+        background: Выполнить в фоновом потоке
+        
+    Returns:
+        Фоновый поток или None
+    """
+    def run():
+        try:
+            import numpy  # noqa: F401
+            from PIL import Image  # noqa: F401
+            _import_sibling('openai_image_generator').get_http_session()
+        except Exception as e:
+            print(f"Не удалось прогреть HTTP клиент OpenAI: {e}")
+    
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="comfyui-openai-warmup", daemon=True)
+    thread.start()
+    return thread
+
 
 class OpenAIImageNode:
     """Кастомный узел ComfyUI для генерации изображений через OpenAI"""
@@ -74,8 +110,8 @@ class OpenAIImageNode:
             if not api_key:
                 raise ValueError("OpenAI API ключ не указан")
             
-            # Создаем генератор
-            generator = OpenAIImageGenerator(api_key)
+            # Создаем генератор (модуль клиента импортируется при первом запуске узла)
+            generator = _import_sibling('openai_image_generator').OpenAIImageGenerator(api_key)
             
             # Генерируем изображение
             result = generator.generate_image(
@@ -99,16 +135,17 @@ class OpenAIImageNode:
             if not image_url:
                 raise Exception("URL изображения не найден")
             
-            # Скачиваем изображение
-            response = requests.get(image_url)
-            response.raise_for_status()
+            # Скачиваем изображение через общий пул соединений
+            image_data = generator.fetch_image(image_url)
             
             # Конвертируем в PIL Image
-            image = Image.open(io.BytesIO(response.content))
-            
-            # Конвертируем в формат ComfyUI (RGB)
-            if image.mode != "RGB":
-                image = image.convert("RGB")
+            from PIL import Image
+            with metrics.track('encode', 'decode_image'):
+                image = Image.open(io.BytesIO(image_data))
+                
+                # Конвертируем в формат ComfyUI (RGB)
+                if image.mode != "RGB":
+                    image = image.convert("RGB")
             
             # Создаем имя файла
             timestamp = int(time.time())
@@ -119,12 +156,14 @@ class OpenAIImageNode:
                 output_dir = "output"
                 os.makedirs(output_dir, exist_ok=True)
                 filepath = os.path.join(output_dir, filename)
-                image.save(filepath)
+                with metrics.track('disk', 'save_output'):
+                    image.save(filepath)
             
             # Конвертируем в формат ComfyUI (numpy array)
             import numpy as np
-            image_array = np.array(image).astype(np.float32) / 255.0
-            image_array = np.expand_dims(image_array, axis=0)  # Добавляем batch dimension
+            with metrics.track('encode', 'to_tensor'):
+                image_array = np.array(image).astype(np.float32) / 255.0
+                image_array = np.expand_dims(image_array, axis=0)  # Добавляем batch dimension
             
             # Создаем метаданные
             metadata = {
@@ -187,22 +226,22 @@ class OpenAIImageVariationNode:
             
             # Конвертируем изображение ComfyUI в PIL Image
             import numpy as np
+            from PIL import Image
             if len(image.shape) == 4:
                 image_array = image[0]  # Берем первый batch
             else:
                 image_array = image
             
-            # Конвертируем из [0,1] в [0,255]
-            image_array = (image_array * 255).astype(np.uint8)
-            pil_image = Image.fromarray(image_array)
-            
-            # Сохраняем временный файл
+            # Конвертируем из [0,1] в [0,255] и сохраняем временный файл
             temp_path = f"temp_variation_{int(time.time())}.png"
-            pil_image.save(temp_path)
+            with metrics.track('encode', 'encode_png'):
+                image_array = (image_array * 255).astype(np.uint8)
+                pil_image = Image.fromarray(image_array)
+                pil_image.save(temp_path)
             
             try:
                 # Создаем генератор
-                generator = OpenAIImageGenerator(api_key)
+                generator = _import_sibling('openai_image_generator').OpenAIImageGenerator(api_key)
                 
                 # Генерируем вариацию
                 result = generator.generate_image_variation(
@@ -223,16 +262,16 @@ class OpenAIImageVariationNode:
                 if not image_url:
                     raise Exception("URL изображения не найден")
                 
-                # Скачиваем изображение
-                response = requests.get(image_url)
-                response.raise_for_status()
+                # Скачиваем изображение через общий пул соединений
+                image_data = generator.fetch_image(image_url)
                 
                 # Конвертируем в PIL Image
-                new_image = Image.open(io.BytesIO(response.content))
-                
-                # Конвертируем в формат ComfyUI (RGB)
-                if new_image.mode != "RGB":
-                    new_image = new_image.convert("RGB")
+                with metrics.track('encode', 'decode_image'):
+                    new_image = Image.open(io.BytesIO(image_data))
+                    
+                    # Конвертируем в формат ComfyUI (RGB)
+                    if new_image.mode != "RGB":
+                        new_image = new_image.convert("RGB")
                 
                 # Создаем имя файла
                 timestamp = int(time.time())
@@ -243,11 +282,13 @@ class OpenAIImageVariationNode:
                     output_dir = "output"
                     os.makedirs(output_dir, exist_ok=True)
                     filepath = os.path.join(output_dir, filename)
-                    new_image.save(filepath)
+                    with metrics.track('disk', 'save_output'):
+                        new_image.save(filepath)
                 
                 # Конвертируем в формат ComfyUI (numpy array)
-                new_image_array = np.array(new_image).astype(np.float32) / 255.0
-                new_image_array = np.expand_dims(new_image_array, axis=0)
+                with metrics.track('encode', 'to_tensor'):
+                    new_image_array = np.array(new_image).astype(np.float32) / 255.0
+                    new_image_array = np.expand_dims(new_image_array, axis=0)
                 
                 # Создаем метаданные
                 metadata = {
@@ -283,5 +324,15 @@ NODE_DISPLAY_NAME_MAPPINGS = {
     "OpenAIImageVariation": "OpenAI Image Variation"
 }
 
+# Прогрев клиента при загрузке ComfyUI (опционально)
+if os.getenv('COMFYUI_OPENAI_WARMUP', '').lower() in ('1', 'true', 'yes'):
+    warmup()
+
+# Экспорт метрик (COMFYUI_METRICS_PORT / COMFYUI_METRICS_FILE)
+metrics.start_exporters_from_env()
+
+# Трассировка запусков узлов (COMFYUI_TRACE_FILE)
+_import_sibling('tracing').enable_from_env(NODE_CLASS_MAPPINGS)
+
 # Экспорт для ComfyUI
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS'] 
\ No newline at end of file
@@ -8,14 +8,27 @@ ComfyUI Pipeline Builder
 """
 
 import json
-import requests
 import time
-from typing import Dict, List, Optional, Tuple, Union, Any
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union, Any
 from dataclasses import dataclass, asdict
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+try:
+    from .workflow_serialization import (
+        BINARY_EXTENSION, BINARY_MAGIC, encode_workflow_binary,
+        iter_binary_workflow_items, iter_workflow_items, write_workflow_stream
+    )
+    from .structured_logging import EventLogger, configure_logging
+    from .metrics import THROTTLES, instrumented
+except ImportError:
+    from workflow_serialization import (
+        BINARY_EXTENSION, BINARY_MAGIC, encode_workflow_binary,
+        iter_binary_workflow_items, iter_workflow_items, write_workflow_stream
+    )
+    from structured_logging import EventLogger, configure_logging
+    from metrics import THROTTLES, instrumented
+
+# Логгер модуля (корневой логгер настраивается только в точке входа)
 logger = logging.getLogger(__name__)
 
 
@@ -56,6 +69,8 @@ class ComfyUIPipelineBuilder:
         self.connections: List[Connection] = []
         self.next_node_id = 1
         self.next_link_id = 1
+        # События по узлам и соединениям пишутся с выборкой (счетчики на граф)
+        self._events = EventLogger(logger)
         
     def add_node(self, 
                  node_type: str, 
@@ -98,7 +113,8 @@ class ComfyUIPipelineBuilder:
         )
         
         self.nodes[node_id] = node_config
-        logger.info(f"✅ Добавлен узел {node_type} с ID {node_id}")
+        self._events.sampled(logging.DEBUG, 'node_added', "✅ Добавлен узел %s с ID %s",
+                             node_type, node_id, node_type=node_type, node_id=node_id)
         
         return node_id
     
@@ -135,7 +151,8 @@ class ComfyUIPipelineBuilder:
         link_id = self.next_link_id
         self.next_link_id += 1
         
-        logger.info(f"🔗 Соединен узел {from_node}:{from_output} -> {to_node}:{to_input}")
+        self._events.sampled(logging.DEBUG, 'nodes_connected', "🔗 Соединен узел %s:%s -> %s:%s",
+                             from_node, from_output, to_node, to_input, link_id=link_id)
         
         return link_id
     
@@ -160,6 +177,7 @@ class ComfyUIPipelineBuilder:
             "OpenAIImageGenerator": (300, 200),
             "S3ImageUploader": (300, 250),
             "S3ImageDownloader": (300, 200),
+            "S3BatchImageDownloader": (300, 300),
             "PreviewImage": (300, 200),
             "LoadImage": (300, 150),
             "SaveImage": (300, 150),
@@ -174,21 +192,13 @@ class ComfyUIPipelineBuilder:
         
         return default_sizes.get(node_type, (300, 200))
     
-    def build_workflow(self) -> Dict[str, Any]:
+    def iter_node_data(self) -> Iterator[Dict[str, Any]]:
         """
-        Сборка workflow в формате ComfyUI
+        Итератор данных узлов в формате ComfyUI
         
         Returns:
-            Словарь с workflow
+            Итератор словарей узлов
         """
-        workflow = {
-            "last_node_id": self.next_node_id - 1,
-            "last_link_id": self.next_link_id - 1,
-            "nodes": [],
-            "links": []
-        }
-        
-        # Добавление узлов
         for node_id, node_config in self.nodes.items():
             node_data = {
                 "id": node_id,
@@ -206,48 +216,95 @@ class ComfyUIPipelineBuilder:
             if node_config.description:
                 node_data["description"] = node_config.description
             
-            workflow["nodes"].append(node_data)
+            yield node_data
+    
+    def iter_link_data(self) -> Iterator[List[int]]:
+        """
+        Итератор данных соединений в формате ComfyUI
         
-        # Добавление соединений
+        Returns:
+            Итератор списков [link_id, from_node, from_output, to_node, to_input]
+        """
         for i, connection in enumerate(self.connections):
-            link_data = [
+            yield [
                 i + 1,  # link_id
                 connection.from_node,
                 connection.from_output,
                 connection.to_node,
                 connection.to_input
             ]
-            workflow["links"].append(link_data)
+    
+    def build_workflow(self) -> Dict[str, Any]:
+        """
+        Сборка workflow в формате ComfyUI
         
-        return workflow
+        Returns:
+            Словарь с workflow
+        """
+        return {
+            "last_node_id": self.next_node_id - 1,
+            "last_link_id": self.next_link_id - 1,
+            "nodes": list(self.iter_node_data()),
+            "links": list(self.iter_link_data())
+        }
     
-    def save_workflow(self, filepath: str) -> bool:
+    @instrumented('disk')
+    def save_workflow(self,
+                      filepath: str,
+                      compact: bool = False,
+                      binary: Optional[bool] = None) -> bool:
         """
         Сохранение workflow в файл
         
+        Узлы и соединения записываются потоково, без сборки полного словаря workflow.
+        
         Args:
             filepath: Путь к файлу для сохранения
+            compact: Компактный JSON без отступов
+            binary: Сохранить в бинарном формате (по умолчанию - по расширению .cwf)
             
         Returns:
             True если сохранение успешно
         """
         try:
-            workflow = self.build_workflow()
+            if binary is None:
+                binary = filepath.lower().endswith(BINARY_EXTENSION)
             
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(workflow, f, indent=2, ensure_ascii=False)
+            header = {
+                "last_node_id": self.next_node_id - 1,
+                "last_link_id": self.next_link_id - 1
+            }
             
-            logger.info(f"💾 Workflow сохранен в {filepath}")
+            with open(filepath, 'wb') as f:
+                if binary:
+                    f.write(encode_workflow_binary(header, self.iter_node_data(), self.iter_link_data()))
+                else:
+                    write_workflow_stream(
+                        f,
+                        header,
+                        self.iter_node_data(),
+                        self.iter_link_data(),
+                        compact=compact
+                    )
+            
+            self._events.event(logging.INFO, 'workflow_saved', "💾 Workflow сохранен в %s (%d узлов, %d соединений)",
+                               filepath, len(self.nodes), len(self.connections),
+                               path=filepath, nodes=len(self.nodes), links=len(self.connections))
             return True
             
         except Exception as e:
             logger.error(f"❌ Ошибка сохранения workflow: {e}")
             return False
     
+    @instrumented('disk')
     def load_workflow(self, filepath: str) -> bool:
         """
         Загрузка workflow из файла
         
+        Формат (JSON или бинарный) определяется по сигнатуре файла.
+        JSON разбирается инкрементально: узлы и соединения читаются по одному.
+        Текущее состояние заменяется только после успешного разбора.
+        
         Args:
             filepath: Путь к файлу workflow
             
@@ -255,46 +312,69 @@ class ComfyUIPipelineBuilder:
             True если загрузка успешна
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                workflow = json.load(f)
-            
-            # Очистка текущего состояния
-            self.nodes.clear()
-            self.connections.clear()
-            
-            # Загрузка узлов
-            for node_data in workflow.get("nodes", []):
-                node_config = NodeConfig(
-                    node_type=node_data["type"],
-                    inputs=node_data.get("inputs", {}),
-                    position=tuple(node_data["pos"]),
-                    size=(node_data["size"]["0"], node_data["size"]["1"]),
-                    title=node_data.get("title"),
-                    description=node_data.get("description")
-                )
-                
-                self.nodes[node_data["id"]] = node_config
-                self.next_node_id = max(self.next_node_id, node_data["id"] + 1)
-            
-            # Загрузка соединений
-            for link_data in workflow.get("links", []):
-                connection = Connection(
-                    from_node=link_data[1],
-                    from_output=link_data[2],
-                    to_node=link_data[3],
-                    to_input=link_data[4]
-                )
-                
-                self.connections.append(connection)
-                self.next_link_id = max(self.next_link_id, link_data[0] + 1)
+            with open(filepath, 'rb') as f:
+                is_binary = f.read(len(BINARY_MAGIC)) == BINARY_MAGIC
             
-            logger.info(f"📂 Workflow загружен из {filepath}")
+            if is_binary:
+                with open(filepath, 'rb') as f:
+                    self.load_workflow_items(iter_binary_workflow_items(f.read()))
+            else:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    self.load_workflow_items(iter_workflow_items(f))
+            
+            self._events.event(logging.INFO, 'workflow_loaded', "📂 Workflow загружен из %s (%d узлов, %d соединений)",
+                               filepath, len(self.nodes), len(self.connections),
+                               path=filepath, nodes=len(self.nodes), links=len(self.connections))
             return True
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки workflow: {e}")
             return False
     
+    def load_workflow_items(self, items: Iterable[Tuple[str, Any, Any]]) -> None:
+        """
+        Замена состояния строителя элементами разобранного workflow
+        
+        Args:
+            items: Элементы workflow ("field" / "node" / "link")
+        """
+        nodes: Dict[int, NodeConfig] = {}
+        connections: List[Connection] = []
+        next_node_id = self.next_node_id
+        next_link_id = self.next_link_id
+        
+        for kind, _, data in items:
+            if kind == "node":
+                # Загрузка узла
+                size = data["size"]
+                if isinstance(size, dict):
+                    size = (size["0"], size["1"])
+                nodes[data["id"]] = NodeConfig(
+                    node_type=data["type"],
+                    inputs=data.get("inputs", {}),
+                    position=tuple(data["pos"]),
+                    size=tuple(size),
+                    title=data.get("title"),
+                    description=data.get("description")
+                )
+                next_node_id = max(next_node_id, data["id"] + 1)
+            
+            elif kind == "link":
+                # Загрузка соединения
+                connections.append(Connection(
+                    from_node=data[1],
+                    from_output=data[2],
+                    to_node=data[3],
+                    to_input=data[4]
+                ))
+                next_link_id = max(next_link_id, data[0] + 1)
+        
+        self.nodes = nodes
+        self.connections = connections
+        self.next_node_id = next_node_id
+        self.next_link_id = next_link_id
+    
+    @instrumented('comfyui')
     def upload_to_comfyui(self, workflow_name: str = None) -> Dict[str, Any]:
         """
         Загрузка workflow в ComfyUI
@@ -305,6 +385,9 @@ class ComfyUIPipelineBuilder:
         Returns:
             Результат загрузки
         """
+        # HTTP клиент импортируется только при обращении к ComfyUI
+        import requests
+        
         try:
             workflow = self.build_workflow()
             
@@ -341,9 +424,11 @@ class ComfyUIPipelineBuilder:
                 }
             else:
                 logger.error(f"❌ Ошибка загрузки: {response.status_code} - {response.text}")
+                self._count_throttle(response.status_code, 'upload_to_comfyui')
                 return {
                     "success": False,
                     "error": f"HTTP {response.status_code}: {response.text}",
+                    "status_code": response.status_code,
                     "message": "Ошибка загрузки workflow"
                 }
                 
@@ -355,10 +440,12 @@ class ComfyUIPipelineBuilder:
                 "message": "Ошибка загрузки в ComfyUI"
             }
     
+    @instrumented('comfyui')
     def execute_workflow(self, 
                         workflow_name: str = None,
                         wait_for_completion: bool = True,
-                        timeout: int = 300) -> Dict[str, Any]:
+                        timeout: int = 300,
+                        poll_interval: float = 1.0) -> Dict[str, Any]:
         """
         Выполнение workflow в ComfyUI
         
@@ -366,10 +453,13 @@ class ComfyUIPipelineBuilder:
             workflow_name: Название workflow
             wait_for_completion: Ожидать завершения выполнения
             timeout: Таймаут ожидания в секундах
+            poll_interval: Интервал опроса статуса в секундах
             
         Returns:
             Результат выполнения
         """
+        import requests
+        
         try:
             # Загрузка workflow
             upload_result = self.upload_to_comfyui(workflow_name)
@@ -391,9 +481,11 @@ class ComfyUIPipelineBuilder:
             )
             
             if response.status_code != 200:
+                self._count_throttle(response.status_code, 'execute_workflow')
                 return {
                     "success": False,
                     "error": f"HTTP {response.status_code}: {response.text}",
+                    "status_code": response.status_code,
                     "message": "Ошибка запуска выполнения"
                 }
             
@@ -406,57 +498,7 @@ class ComfyUIPipelineBuilder:
                     "message": "Выполнение запущено"
                 }
             
-            # Ожидание завершения
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                try:
-                    status_response = requests.get(
-                        f"{self.comfyui_url}/execution/{execution_id}/status",
-                        timeout=10
-                    )
-                    
-                    if status_response.status_code == 200:
-                        status_data = status_response.json()
-                        status = status_data.get("status")
-                        
-                        if status == "completed":
-                            # Получение результатов
-                            results_response = requests.get(
-                                f"{self.comfyui_url}/execution/{execution_id}/results",
-                                timeout=10
-                            )
-                            
-                            if results_response.status_code == 200:
-                                results = results_response.json()
-                                return {
-                                    "success": True,
-                                    "execution_id": execution_id,
-                                    "status": "completed",
-                                    "results": results,
-                                    "message": "Выполнение завершено успешно"
-                                }
-                        
-                        elif status == "failed":
-                            return {
-                                "success": False,
-                                "execution_id": execution_id,
-                                "status": "failed",
-                                "error": status_data.get("error", "Неизвестная ошибка"),
-                                "message": "Выполнение завершилось с ошибкой"
-                            }
-                    
-                    time.sleep(1)
-                    
-                except requests.exceptions.RequestException as e:
-                    logger.warning(f"Ошибка получения статуса: {e}")
-                    time.sleep(2)
-            
-            return {
-                "success": False,
-                "execution_id": execution_id,
-                "error": "Таймаут ожидания",
-                "message": "Превышен таймаут ожидания выполнения"
-            }
+            return self.wait_for_execution(execution_id, timeout, poll_interval)
             
         except Exception as e:
             logger.error(f"❌ Ошибка выполнения workflow: {e}")
@@ -466,6 +508,82 @@ class ComfyUIPipelineBuilder:
                 "message": "Ошибка выполнения workflow"
             }
     
+    @instrumented('comfyui')
+    def wait_for_execution(self,
+                           execution_id: str,
+                           timeout: int = 300,
+                           poll_interval: float = 1.0) -> Dict[str, Any]:
+        """
+        Ожидание завершения запущенного выполнения
+        
+        Args:
+            execution_id: Идентификатор выполнения (из execute_workflow без ожидания)
+            timeout: Таймаут ожидания в секундах
+            poll_interval: Интервал опроса статуса в секундах
+            
+        Returns:
+            Результат выполнения
+        """
+        import requests
+        
+        start_time = time.time()
+        while time.time() - start_time < timeout:
+            try:
+                status_response = requests.get(
+                    f"{self.comfyui_url}/execution/{execution_id}/status",
+                    timeout=10
+                )
+                
+                if status_response.status_code == 200:
+                    status_data = status_response.json()
+                    status = status_data.get("status")
+                    
+                    if status == "completed":
+                        # Получение результатов
+                        results_response = requests.get(
+                            f"{self.comfyui_url}/execution/{execution_id}/results",
+                            timeout=10
+                        )
+                        
+                        if results_response.status_code == 200:
+                            results = results_response.json()
+                            return {
+                                "success": True,
+                                "execution_id": execution_id,
+                                "status": "completed",
+                                "results": results,
+                                "message": "Выполнение завершено успешно"
+                            }
+                    
+                    elif status == "failed":
+                        return {
+                            "success": False,
+                            "execution_id": execution_id,
+                            "status": "failed",
+                            "error": status_data.get("error", "Неизвестная ошибка"),
+                            "message": "Выполнение завершилось с ошибкой"
+                        }
+                
+                time.sleep(poll_interval)
+                
+            except requests.exceptions.RequestException as e:
+                logger.warning(f"Ошибка получения статуса: {e}")
+                time.sleep(2 * poll_interval)
+        
+        return {
+            "success": False,
+            "execution_id": execution_id,
+            "error": "Таймаут ожидания",
+            "message": "Превышен таймаут ожидания выполнения"
+        }
+    
+    @staticmethod
+    def _count_throttle(status_code: int, operation: str) -> None:
+        """Учет ответов 429 (очередь ComfyUI переполнена)"""
+        if status_code == 429:
+            THROTTLES.labels('comfyui', operation).inc()
+    
+    @instrumented('comfyui')
     def get_available_nodes(self) -> Dict[str, Any]:
         """
         Получение списка доступных узлов
@@ -473,6 +591,8 @@ class ComfyUIPipelineBuilder:
         Returns:
             Словарь с информацией о доступных узлах
         """
+        import requests
+        
         try:
             response = requests.get(
                 f"{self.comfyui_url}/nodes",
@@ -720,6 +840,8 @@ class PipelineTemplates:
 
 # Пример использования
 if __name__ == "__main__":
+    configure_logging()
+    
     # Создание простого пайплайна
     builder = ComfyUIPipelineBuilder("http://localhost:8188")
     
@@ -7,25 +7,414 @@ ComfyUI S3 Storage Nodes
 Кастомные узлы ComfyUI для работы с AWS S3 хранилищем
 """
 
+import contextvars
+import importlib
+import io
 import os
 import sys
 import json
 import tempfile
-from typing import Dict, List, Optional, Tuple, Union
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple, Union
 import logging
 
-# Добавление пути к модулям
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+# Логгер модуля (логирование настраивает ComfyUI)
+logger = logging.getLogger(__name__)
 
-try:
-    from s3_storage_manager import S3StorageManager
-except ImportError:
-    print("❌ Ошибка импорта S3StorageManager. Убедитесь, что файл s3_storage_manager.py находится в той же директории.")
-    S3StorageManager = None
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+
+def _import_sibling(name: str):
+    """
+    Импорт соседнего модуля
+    
+    Внутри пакета модуль импортируется относительно, при загрузке файла
+    напрямую (как single-file custom node) - из директории файла.
+    """
+    if __package__:
+        return importlib.import_module(f"{__package__}.{name}")
+    directory = os.path.dirname(os.path.abspath(__file__))
+    if directory not in sys.path:
+        sys.path.append(directory)
+    return importlib.import_module(name)
+
+
+# Итоги пакетных загрузок и метрики фаз (модули без тяжелых зависимостей)
+events = _import_sibling('structured_logging').EventLogger(logger)
+metrics = _import_sibling('metrics')
+
+
+def load_storage_manager():
+    """
+    Отложенный импорт S3StorageManager
+    
+    boto3 импортируется при первом запуске S3 узла, а не при загрузке ComfyUI.
+    
+    Returns:
+        Класс S3StorageManager или None, если модуль недоступен
+    """
+    try:
+        return _import_sibling('s3_storage_manager').S3StorageManager
+    except ImportError as e:
+        logger.error(f"❌ Ошибка импорта S3StorageManager: {e}")
+        return None
+
+
+# Число общих менеджеров S3 (LRU); вытесненные менеджеры не закрываются
+STORAGE_MANAGER_CACHE_SIZE = 16
+_storage_managers: 'OrderedDict[Tuple, object]' = OrderedDict()
+_storage_managers_lock = threading.Lock()
+
+
+def _close_storage_manager(manager) -> None:
+    """Закрытие менеджера: публикация буфера индекса и освобождение пула соединений"""
+    try:
+        manager.close()
+    except Exception as e:
+        logger.warning(f"⚠️ Не удалось закрыть S3StorageManager: {e}")
+
+
+def get_storage_manager(**kwargs):
+    """
+    Общий S3StorageManager для узлов с одинаковыми параметрами
+    
+    Клиент boto3 и его пул соединений создаются один раз и переиспользуются
+    между запусками узлов. Хранится не больше STORAGE_MANAGER_CACHE_SIZE
+    менеджеров. Давно не использовавшиеся только удаляются из кэша, но не
+    закрываются: ими еще могут пользоваться запущенный узел или потоки
+    S3ImageStream. Клиент освобождается сборщиком мусора, когда ссылок на
+    менеджер не остается, а буфер индекса публикуется его таймером.
+    
+    Args:
+        **kwargs: Параметры S3StorageManager
+        
+    Returns:
+        Экземпляр S3StorageManager
+    """
+    key = tuple(sorted(kwargs.items()))
+    with _storage_managers_lock:
+        manager = _storage_managers.get(key)
+        if manager is not None:
+            _storage_managers.move_to_end(key)
+            return manager
+    
+    # Создание (с проверкой bucket) выполняется без блокировки
+    manager = load_storage_manager()(**kwargs)
+    duplicate = None
+    with _storage_managers_lock:
+        existing = _storage_managers.get(key)
+        if existing is not None:
+            # Параллельный вызов успел создать такой же менеджер
+            duplicate, manager = manager, existing
+        else:
+            _storage_managers[key] = manager
+            while len(_storage_managers) > STORAGE_MANAGER_CACHE_SIZE:
+                _storage_managers.popitem(last=False)
+    if duplicate is not None:
+        # Лишний менеджер никому не передавался - его можно закрыть
+        _close_storage_manager(duplicate)
+    return manager
+
+
+def _clear_storage_managers() -> None:
+    """Закрытие и удаление всех общих менеджеров"""
+    with _storage_managers_lock:
+        managers = list(_storage_managers.values())
+        _storage_managers.clear()
+    for manager in managers:
+        _close_storage_manager(manager)
+
+
+get_storage_manager.cache_clear = _clear_storage_managers
+
+
+def warmup(bucket_name: Optional[str] = None,
+           region_name: Optional[str] = None,
+           background: bool = True) -> Optional[threading.Thread]:
+    """
+    Предварительный импорт boto3, PIL и numpy и создание пула соединений S3
+    
+    Учетные данные и bucket берутся из переменных окружения (AWS_ACCESS_KEY_ID,
+    AWS_SECRET_ACCESS_KEY, AWS_DEFAULT_BUCKET, AWS_DEFAULT_REGION). Созданный
+    менеджер попадает в кэш get_storage_manager и используется узлами.
+    
+    Args:
+        bucket_name: Bucket (по умолчанию AWS_DEFAULT_BUCKET или comfyui-images)
+        region_name: Регион (по умолчанию AWS_DEFAULT_REGION или us-east-1)
+        background: Выполнить в фоновом потоке
+        
+    Returns:
+        Фоновый поток или None
+    """
+    def run():
+        try:
+            import numpy  # noqa: F401
+            from PIL import Image  # noqa: F401
+            
+            access_key = os.getenv('AWS_ACCESS_KEY_ID')
+            secret_key = os.getenv('AWS_SECRET_ACCESS_KEY')
+            if load_storage_manager() is None or not access_key or not secret_key:
+                return
+            get_storage_manager(
+                bucket_name=bucket_name or os.getenv('AWS_DEFAULT_BUCKET', 'comfyui-images'),
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region_name or os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+            )
+            logger.info("🔥 S3 клиент прогрет")
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось прогреть S3 клиент: {e}")
+    
+    if not background:
+        run()
+        return None
+    thread = threading.Thread(target=run, name="comfyui-s3-warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+# Приведение изображений пакета к общему размеру
+BATCH_RESIZE_MODES = ["resize", "crop", "none"]
+# Форматы хранения сырых тензоров в S3ImageUploader и тип данных в файле
+TENSOR_STORAGE_FORMATS = {"tensor_f16": "float16", "tensor_f32": "float32"}
+# Число открытых потоков S3ImageStreamLoader (LRU); вытесненные потоки закрываются
+STREAM_CACHE_SIZE = 8
+# Расширения файлов, которые S3ImageStream считает изображениями
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.bmp', '.gif', '.tif', '.tiff')
+
+
+def parse_key_list(text: str) -> List[str]:
+    """
+    Разбор списка ключей S3
+    
+    Принимает JSON массив строк или объектов с полем 'key' (выход S3ImageLister
+    и S3ImageSearch) либо ключи, разделенные переводами строк или запятыми.
+    
+    Args:
+        text: Текст со списком ключей
+        
+    Returns:
+        Список ключей
+    """
+    text = (text or "").strip()
+    if not text:
+        return []
+    if text.startswith('['):
+        items = json.loads(text)
+        return [item['key'] if isinstance(item, dict) else str(item) for item in items]
+    return [key.strip() for line in text.splitlines() for key in line.split(',') if key.strip()]
+
+
+def _decode_into(batch, index: int, data: bytes, resize_mode: str) -> None:
+    """Декодирование изображения прямо в строку index предвыделенного пакета"""
+    import numpy as np
+    from PIL import Image, ImageOps
+    
+    height, width = batch.shape[1:3]
+    with metrics.track('encode', 'decode_image'), Image.open(io.BytesIO(data)) as image:
+        if image.size != (width, height):
+            if resize_mode == "none":
+                raise ValueError(f"Размер изображения {image.size[0]}x{image.size[1]} "
+                                 f"отличается от размера пакета {width}x{height}")
+            # JPEG декодируется сразу в уменьшенном масштабе
+            image.draft('RGB', (width, height))
+        image = image.convert('RGB')
+        if image.size != (width, height):
+            if resize_mode == "crop":
+                image = ImageOps.fit(image, (width, height), Image.LANCZOS)
+            else:
+                image = image.resize((width, height), Image.LANCZOS)
+        np.multiply(np.asarray(image), np.float32(1 / 255), out=batch[index], dtype=np.float32)
+
+
+def decode_image(data: bytes, width: int = 0, height: int = 0, resize_mode: str = "resize"):
+    """
+    Декодирование одного изображения в массив (1, H, W, 3) float32
+    
+    Args:
+        data: Байты изображения
+        width: Ширина (0 - исходная)
+        height: Высота (0 - исходная)
+        resize_mode: 'resize', 'crop' или 'none'
+        
+    Returns:
+        numpy массив формы (1, H, W, 3)
+    """
+    import numpy as np
+    from PIL import Image
+    
+    if not width or not height:
+        # Читается только заголовок, без декодирования пикселей
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = width or image.width, height or image.height
+    batch = np.empty((1, height, width, 3), dtype=np.float32)
+    _decode_into(batch, 0, data, resize_mode)
+    return batch
+
+
+class S3ImageStream:
+    """
+    Итератор изображений префикса S3 с упреждающей загрузкой
+    
+    Обходит префикс постраничным листингом и держит в работе до lookahead
+    скачиваний и декодирований следующих изображений, пока вызывающий код
+    обрабатывает текущее. В памяти одновременно не больше lookahead изображений.
+    Изображения выдаются в порядке листинга как (ключ, массив (1, H, W, 3)).
+    """
+    
+    def __init__(self,
+                 s3_manager,
+                 prefix: str = 'comfyui/images/',
+                 lookahead: int = 8,
+                 width: int = 0,
+                 height: int = 0,
+                 resize_mode: str = "resize",
+                 extensions: Tuple[str, ...] = IMAGE_EXTENSIONS,
+                 page_size: int = 1000):
+        """
+        Инициализация потока
+        
+        Args:
+            s3_manager: Экземпляр S3StorageManager
+            prefix: Префикс изображений
+            lookahead: Число изображений, скачиваемых и декодируемых заранее
+            width: Ширина изображений (0 - исходная)
+            height: Высота изображений (0 - исходная)
+            resize_mode: 'resize', 'crop' или 'none'
+            extensions: Расширения ключей, считающихся изображениями
+            page_size: Размер страницы листинга
+        """
+        if resize_mode not in BATCH_RESIZE_MODES:
+            raise ValueError(f"Неизвестный режим приведения размера: {resize_mode}")
+        self.s3_manager = s3_manager
+        self.prefix = prefix
+        self.lookahead = max(1, lookahead)
+        self.width = width
+        self.height = height
+        self.resize_mode = resize_mode
+        self.position = 0
+        self._keys = (
+            obj['Key'] for obj in s3_manager.iter_objects(prefix, page_size=page_size)
+            if obj['Key'].lower().endswith(extensions) and obj['Size'] > 0
+        )
+        self._window = deque()
+        self._executor = ThreadPoolExecutor(max_workers=self.lookahead)
+        self._lock = threading.Lock()
+        self._exhausted = False
+    
+    def _load(self, s3_key: str):
+        """Скачивание и декодирование одного изображения"""
+        data = self.s3_manager.read_image(s3_key)
+        return s3_key, decode_image(data, self.width, self.height, self.resize_mode)
+    
+    def _fill(self) -> None:
+        """Дополнение окна упреждающей загрузки"""
+        while not self._exhausted and len(self._window) < self.lookahead:
+            s3_key = next(self._keys, None)
+            if s3_key is None:
+                self._exhausted = True
+                break
+            self._window.append(self._executor.submit(self._load, s3_key))
+    
+    def __iter__(self) -> Iterator[Tuple[str, object]]:
+        return self
+    
+    def __next__(self) -> Tuple[str, object]:
+        with self._lock:
+            self._fill()
+            if not self._window:
+                raise StopIteration
+            future = self._window.popleft()
+            # Следующее изображение начинает загружаться до возврата текущего
+            self._fill()
+            self.position += 1
+        return future.result()
+    
+    def close(self) -> None:
+        """Отмена упреждающих загрузок и остановка потоков"""
+        with self._lock:
+            for future in self._window:
+                future.cancel()
+            self._window.clear()
+            self._exhausted = True
+        self._executor.shutdown(wait=False)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def load_image_batch(s3_manager,
+                     keys: List[str],
+                     width: int = 0,
+                     height: int = 0,
+                     resize_mode: str = "resize",
+                     max_workers: int = 16,
+                     decode_workers: Optional[int] = None):
+    """
+    Загрузка изображений S3 в один тензор (B, H, W, C) float32
+    
+    Объекты скачиваются параллельно в память и декодируются в отдельном пуле
+    потоков прямо в предвыделенный массив. Если width или height равны 0, размер
+    берется из заголовка первого изображения списка.
+    
+    Args:
+        s3_manager: Экземпляр S3StorageManager
+        keys: Ключи изображений
+        width: Ширина пакета (0 - по первому изображению)
+        height: Высота пакета (0 - по первому изображению)
+        resize_mode: 'resize', 'crop' (масштаб с обрезкой по центру) или 'none'
+        max_workers: Число параллельных скачиваний
+        decode_workers: Число потоков декодирования (по умолчанию - число CPU)
+        
+    Returns:
+        numpy массив формы (len(keys), H, W, 3)
+    """
+    import numpy as np
+    from PIL import Image
+    
+    if not keys:
+        raise ValueError("Список ключей пуст")
+    if resize_mode not in BATCH_RESIZE_MODES:
+        raise ValueError(f"Неизвестный режим приведения размера: {resize_mode}")
+    
+    bounded_map = _import_sibling('s3_storage_manager').bounded_map
+    
+    def fetch(item):
+        index, key = item
+        return index, s3_manager.read_image(key)
+    
+    batch = None
+    waiting = []
+    decoding = []
+    with events.batch('image_batch_loaded', "🖼️ Пакет изображений S3") as summary, \
+            ThreadPoolExecutor(max_workers=decode_workers or os.cpu_count() or 4) as decoder:
+        for index, data in bounded_map(fetch, enumerate(keys), max_workers=max_workers,
+                                       governor=s3_manager.governor):
+            summary.add('images')
+            summary.add('bytes', len(data))
+            waiting.append((index, data))
+            if batch is None:
+                if width and height:
+                    batch = np.empty((len(keys), height, width, 3), dtype=np.float32)
+                elif index == 0:
+                    # Читается только заголовок, без декодирования пикселей
+                    with Image.open(io.BytesIO(data)) as first:
+                        batch = np.empty((len(keys), height or first.height, width or first.width, 3),
+                                         dtype=np.float32)
+                else:
+                    continue
+            decoding.extend(decoder.submit(contextvars.copy_context().run, _decode_into, batch, i, d, resize_mode)
+                            for i, d in waiting)
+            waiting = []
+        
+        for future in decoding:
+            future.result()
+    
+    return batch
 
 
 class S3ImageUploader:
@@ -49,6 +438,10 @@ class S3ImageUploader:
                 "prompt": ("STRING", {"default": "", "multiline": True}),
                 "model": ("STRING", {"default": ""}),
                 "workflow_name": ("STRING", {"default": ""}),
+                "thumbnail_sizes": ("STRING", {"default": "", "multiline": False}),
+                "thumbnail_format": (["webp", "jpeg"], {"default": "webp"}),
+                "storage_format": (["png"] + list(TENSOR_STORAGE_FORMATS), {"default": "png"}),
+                "compress_tensor": ("BOOLEAN", {"default": False}),
             }
         }
     
@@ -67,13 +460,21 @@ class S3ImageUploader:
                     metadata, 
                     prompt="", 
                     model="", 
-                    workflow_name=""):
+                    workflow_name="",
+                    thumbnail_sizes="",
+                    thumbnail_format="webp",
+                    storage_format="png",
+                    compress_tensor=False):
         """
         Загрузка изображения в S3
+        
+        thumbnail_sizes - размеры миниатюр через запятую (например "256,1024").
+        storage_format 'tensor_f16'/'tensor_f32' сохраняет весь пакет сырым тензором
+        (.tensor) для передачи промежуточных изображений между workflow.
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return "", "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -83,33 +484,16 @@ class S3ImageUploader:
             if not access_key or not secret_key:
                 return "", "", "❌ AWS credentials не настроены"
             
+            import numpy as np
+            
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
                 region_name=region_name
             )
             
-            # Сохранение изображения во временный файл
-            import numpy as np
-            from PIL import Image
-            
-            # Конвертация numpy array в PIL Image
-            if len(image.shape) == 4:
-                image = image[0]  # Берем первый батч
-            
-            # Нормализация значений (0-1 -> 0-255)
-            if image.max() <= 1.0:
-                image = (image * 255).astype(np.uint8)
-            
-            pil_image = Image.fromarray(image)
-            
-            # Создание временного файла
-            with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
-                temp_path = temp_file.name
-                pil_image.save(temp_path, 'PNG')
-            
             # Подготовка метаданных
             try:
                 metadata_dict = json.loads(metadata) if metadata else {}
@@ -124,11 +508,47 @@ class S3ImageUploader:
             if workflow_name:
                 metadata_dict['workflow_name'] = workflow_name
             
-            # Загрузка в S3
+            # Сырой тензор: весь пакет без квантования и кодирования PNG
+            if storage_format in TENSOR_STORAGE_FORMATS:
+                result = s3_manager.upload_tensor(
+                    np.asarray(image),
+                    s3_key=s3_key if s3_key else None,
+                    dtype=TENSOR_STORAGE_FORMATS[storage_format],
+                    compress=compress_tensor,
+                    metadata=metadata_dict
+                )
+                if result['success']:
+                    return result['s3_key'], result['url'], f"✅ {result['message']}"
+                return "", "", f"❌ {result['error']}"
+            
+            # Сохранение изображения во временный файл
+            from PIL import Image
+            
+            # Конвертация numpy array в PIL Image
+            if len(image.shape) == 4:
+                image = image[0]  # Берем первый батч
+            
+            with metrics.track('encode', 'encode_png'):
+                # Нормализация значений (0-1 -> 0-255)
+                if image.max() <= 1.0:
+                    image = (image * 255).astype(np.uint8)
+                
+                pil_image = Image.fromarray(image)
+                
+                # Создание временного файла
+                with tempfile.NamedTemporaryFile(suffix='.png', delete=False) as temp_file:
+                    temp_path = temp_file.name
+                    pil_image.save(temp_path, 'PNG')
+            
+            # Загрузка в S3 (миниатюры кодируются из уже декодированного изображения)
+            sizes = [int(size) for size in thumbnail_sizes.replace(' ', '').split(',') if size]
             result = s3_manager.upload_image(
                 image_path=temp_path,
                 s3_key=s3_key if s3_key else None,
-                metadata=metadata_dict
+                metadata=metadata_dict,
+                image=pil_image,
+                thumbnail_sizes=sizes,
+                thumbnail_format=thumbnail_format
             )
             
             # Удаление временного файла
@@ -177,7 +597,7 @@ class S3ImageDownloader:
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return None, "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -191,13 +611,27 @@ class S3ImageDownloader:
                 return None, "", "❌ S3 ключ не указан"
             
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
                 region_name=region_name
             )
             
+            # Сырой тензор читается через memmap без декодирования
+            if s3_key.endswith(_import_sibling('s3_tensor_format').TENSOR_EXTENSION):
+                import numpy as np
+                
+                result = s3_manager.download_tensor(s3_key)
+                if not result['success']:
+                    return None, "", f"❌ {result['error']}"
+                image_array = result['tensor']
+                if image_array.dtype != np.float32:
+                    image_array = image_array.astype(np.float32)
+                if len(image_array.shape) == 3:
+                    image_array = np.expand_dims(image_array, axis=0)
+                return image_array, result['local_path'], f"✅ {result['message']}"
+            
             # Скачивание изображения
             result = s3_manager.download_image(s3_key=s3_key)
             
@@ -206,8 +640,9 @@ class S3ImageDownloader:
                 from PIL import Image
                 import numpy as np
                 
-                pil_image = Image.open(result['local_path'])
-                image_array = np.array(pil_image).astype(np.float32) / 255.0
+                with metrics.track('encode', 'decode_image'):
+                    pil_image = Image.open(result['local_path'])
+                    image_array = np.array(pil_image).astype(np.float32) / 255.0
                 
                 # Добавление размерности батча
                 if len(image_array.shape) == 3:
@@ -222,6 +657,237 @@ class S3ImageDownloader:
             return None, "", f"❌ Ошибка: {str(e)}"
 
 
+class S3BatchImageDownloader:
+    """
+    Узел для пакетного скачивания изображений из S3 в один тензор
+    """
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "bucket_name": ("STRING", {"default": "comfyui-images"}),
+                "aws_access_key_id": ("STRING", {"default": "", "multiline": False}),
+                "aws_secret_access_key": ("STRING", {"default": "", "multiline": False}),
+                "region_name": ("STRING", {"default": "us-east-1"}),
+                "keys": ("STRING", {"default": "", "multiline": True}),
+                "prefix": ("STRING", {"default": "comfyui/images/"}),
+                "limit": ("INT", {"default": 16, "min": 1, "max": 4096}),
+                "width": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "resize_mode": (BATCH_RESIZE_MODES, {"default": "resize"}),
+                "max_workers": ("INT", {"default": 16, "min": 1, "max": 128}),
+            }
+        }
+    
+    RETURN_TYPES = ("IMAGE", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("images", "keys", "count", "status")
+    FUNCTION = "download_batch"
+    CATEGORY = "S3 Storage"
+    
+    def download_batch(self,
+                       bucket_name,
+                       aws_access_key_id,
+                       aws_secret_access_key,
+                       region_name,
+                       keys,
+                       prefix,
+                       limit,
+                       width,
+                       height,
+                       resize_mode,
+                       max_workers):
+        """
+        Пакетное скачивание изображений из S3
+        
+        Ключи берутся из keys (список или JSON выход S3ImageLister), а если он
+        пуст - из листинга prefix. В пакет попадает не больше limit изображений.
+        """
+        try:
+            # Проверка доступности S3StorageManager
+            if load_storage_manager() is None:
+                return None, "", 0, "❌ S3StorageManager недоступен"
+            
+            # Получение учетных данных
+            access_key = aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID')
+            secret_key = aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY')
+            
+            if not access_key or not secret_key:
+                return None, "", 0, "❌ AWS credentials не настроены"
+            
+            # Инициализация S3 менеджера
+            s3_manager = get_storage_manager(
+                bucket_name=bucket_name,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region_name
+            )
+            
+            key_list = parse_key_list(keys)[:limit]
+            if not key_list:
+                # Только изображения: без тензоров, маркеров папок и пустых ссылок-псевдонимов
+                key_list = []
+                for obj in s3_manager.iter_objects(prefix):
+                    if obj['Key'].lower().endswith(IMAGE_EXTENSIONS) and obj['Size'] > 0:
+                        key_list.append(obj['Key'])
+                        if len(key_list) >= limit:
+                            break
+            
+            if not key_list:
+                return None, "[]", 0, "❌ Изображения не найдены"
+            
+            images = load_image_batch(
+                s3_manager, key_list, width=width, height=height,
+                resize_mode=resize_mode, max_workers=max_workers
+            )
+            
+            status = f"✅ Скачано {len(key_list)} изображений ({images.shape[2]}x{images.shape[1]})"
+            return images, json.dumps(key_list, ensure_ascii=False), len(key_list), status
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка пакетного скачивания изображений: {e}")
+            return None, "", 0, f"❌ Ошибка: {str(e)}"
+
+
+class S3ImageStreamLoader:
+    """
+    Узел, выдающий при каждом запуске следующее изображение префикса S3
+    
+    Поток S3ImageStream сохраняется между запусками, поэтому следующие
+    изображения скачиваются, пока GPU обрабатывает текущее.
+    """
+    
+    # Открытые потоки по параметрам узла (LRU не больше STREAM_CACHE_SIZE)
+    _streams: 'OrderedDict[Tuple, S3ImageStream]' = OrderedDict()
+    _streams_lock = threading.Lock()
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "bucket_name": ("STRING", {"default": "comfyui-images"}),
+                "aws_access_key_id": ("STRING", {"default": "", "multiline": False}),
+                "aws_secret_access_key": ("STRING", {"default": "", "multiline": False}),
+                "region_name": ("STRING", {"default": "us-east-1"}),
+                "prefix": ("STRING", {"default": "comfyui/images/"}),
+                "lookahead": ("INT", {"default": 8, "min": 1, "max": 128}),
+                "width": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "height": ("INT", {"default": 0, "min": 0, "max": 8192}),
+                "resize_mode": (BATCH_RESIZE_MODES, {"default": "resize"}),
+                "loop": ("BOOLEAN", {"default": False}),
+            }
+        }
+    
+    RETURN_TYPES = ("IMAGE", "STRING", "INT", "STRING")
+    RETURN_NAMES = ("image", "s3_key", "index", "status")
+    FUNCTION = "next_image"
+    CATEGORY = "S3 Storage"
+    
+    @classmethod
+    def IS_CHANGED(cls, **kwargs):
+        # Каждый запуск выдает новое изображение
+        return float("nan")
+    
+    @classmethod
+    def _register_stream(cls, stream_key: Tuple, stream: S3ImageStream) -> S3ImageStream:
+        """Сохранение потока; давно не использовавшиеся потоки закрываются"""
+        evicted = []
+        with cls._streams_lock:
+            existing = cls._streams.get(stream_key)
+            if existing is not None:
+                # Параллельный запуск успел открыть такой же поток
+                evicted.append(stream)
+                stream = existing
+            else:
+                cls._streams[stream_key] = stream
+                while len(cls._streams) > STREAM_CACHE_SIZE:
+                    evicted.append(cls._streams.popitem(last=False)[1])
+        for old_stream in evicted:
+            old_stream.close()
+        return stream
+    
+    @classmethod
+    def _discard_stream(cls, stream_key: Tuple, stream: S3ImageStream) -> None:
+        """Закрытие потока и удаление его из сохраненных"""
+        with cls._streams_lock:
+            if cls._streams.get(stream_key) is stream:
+                del cls._streams[stream_key]
+        stream.close()
+    
+    @classmethod
+    def close_streams(cls) -> None:
+        """Закрытие всех сохраненных потоков"""
+        with cls._streams_lock:
+            streams = list(cls._streams.values())
+            cls._streams.clear()
+        for stream in streams:
+            stream.close()
+    
+    def next_image(self,
+                   bucket_name,
+                   aws_access_key_id,
+                   aws_secret_access_key,
+                   region_name,
+                   prefix,
+                   lookahead,
+                   width,
+                   height,
+                   resize_mode,
+                   loop):
+        """
+        Получение следующего изображения потока
+        """
+        try:
+            # Проверка доступности S3StorageManager
+            if load_storage_manager() is None:
+                return None, "", 0, "❌ S3StorageManager недоступен"
+            
+            # Получение учетных данных
+            access_key = aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID')
+            secret_key = aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY')
+            
+            if not access_key or not secret_key:
+                return None, "", 0, "❌ AWS credentials не настроены"
+            
+            stream_key = (bucket_name, access_key, region_name, prefix, lookahead, width, height, resize_mode)
+            
+            def open_stream():
+                s3_manager = get_storage_manager(
+                    bucket_name=bucket_name,
+                    aws_access_key_id=access_key,
+                    aws_secret_access_key=secret_key,
+                    region_name=region_name,
+                    metadata_index=False
+                )
+                stream = S3ImageStream(s3_manager, prefix, lookahead, width, height, resize_mode)
+                return self._register_stream(stream_key, stream)
+            
+            with self._streams_lock:
+                stream = self._streams.get(stream_key)
+                if stream is not None:
+                    self._streams.move_to_end(stream_key)
+            stream = stream or open_stream()
+            try:
+                s3_key, image = next(stream)
+            except StopIteration:
+                self._discard_stream(stream_key, stream)
+                if not loop:
+                    return None, "", 0, "⏹️ Изображения префикса закончились"
+                stream = open_stream()
+                try:
+                    s3_key, image = next(stream)
+                except StopIteration:
+                    # Префикс пуст: поток закрывается и не сохраняется
+                    self._discard_stream(stream_key, stream)
+                    return None, "", 0, "❌ Изображения не найдены"
+            
+            return image, s3_key, stream.position - 1, f"✅ Изображение {stream.position}: {s3_key}"
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка потока изображений: {e}")
+            return None, "", 0, f"❌ Ошибка: {str(e)}"
+
+
 class S3ImageLister:
     """
     Узел для получения списка изображений из S3
@@ -237,6 +903,9 @@ class S3ImageLister:
                 "region_name": ("STRING", {"default": "us-east-1"}),
                 "prefix": ("STRING", {"default": "comfyui/images/"}),
                 "max_keys": ("INT", {"default": 50, "min": 1, "max": 1000}),
+            },
+            "optional": {
+                "thumbnail_size": ("INT", {"default": 0, "min": 0, "max": 4096}),
             }
         }
     
@@ -251,13 +920,16 @@ class S3ImageLister:
                    aws_secret_access_key, 
                    region_name, 
                    prefix, 
-                   max_keys):
+                   max_keys,
+                   thumbnail_size=0):
         """
         Получение списка изображений из S3
+        
+        При thumbnail_size > 0 в список добавляются URL миниатюр.
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -268,7 +940,7 @@ class S3ImageLister:
                 return "", "❌ AWS credentials не настроены"
             
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
@@ -276,18 +948,23 @@ class S3ImageLister:
             )
             
             # Получение списка изображений
-            result = s3_manager.list_images(prefix=prefix, max_keys=max_keys)
+            result = s3_manager.list_images(
+                prefix=prefix, max_keys=max_keys, thumbnail_size=thumbnail_size or None
+            )
             
             if result['success']:
                 # Форматирование списка для вывода
                 images_info = []
                 for file_info in result['files']:
-                    images_info.append({
+                    image_info = {
                         'key': file_info['key'],
                         'size_mb': round(file_info['size'] / (1024 * 1024), 2),
                         'last_modified': file_info['last_modified'],
                         'url': file_info['url']
-                    })
+                    }
+                    if thumbnail_size:
+                        image_info['thumbnail_url'] = file_info['thumbnail_url']
+                    images_info.append(image_info)
                 
                 images_json = json.dumps(images_info, indent=2, ensure_ascii=False)
                 return images_json, f"✅ Найдено {result['count']} изображений"
@@ -299,6 +976,91 @@ class S3ImageLister:
             return "", f"❌ Ошибка: {str(e)}"
 
 
+class S3ImageSearch:
+    """
+    Узел для поиска изображений в S3 по метаданным
+    """
+    
+    @classmethod
+    def INPUT_TYPES(cls):
+        return {
+            "required": {
+                "bucket_name": ("STRING", {"default": "comfyui-images"}),
+                "aws_access_key_id": ("STRING", {"default": "", "multiline": False}),
+                "aws_secret_access_key": ("STRING", {"default": "", "multiline": False}),
+                "region_name": ("STRING", {"default": "us-east-1"}),
+                "query": ("STRING", {"default": "", "multiline": False}),
+                "max_results": ("INT", {"default": 50, "min": 1, "max": 1000}),
+            },
+            "optional": {
+                "model": ("STRING", {"default": ""}),
+                "workflow_name": ("STRING", {"default": ""}),
+                "since": ("STRING", {"default": ""}),
+                "until": ("STRING", {"default": ""}),
+            }
+        }
+    
+    RETURN_TYPES = ("STRING", "STRING", "STRING")
+    RETURN_NAMES = ("images_list", "first_key", "status")
+    FUNCTION = "search_images"
+    CATEGORY = "S3 Storage"
+    
+    def search_images(self, 
+                     bucket_name, 
+                     aws_access_key_id, 
+                     aws_secret_access_key, 
+                     region_name, 
+                     query, 
+                     max_results, 
+                     model="", 
+                     workflow_name="", 
+                     since="", 
+                     until=""):
+        """
+        Поиск изображений по словам промпта, модели, workflow и интервалу времени (ISO)
+        """
+        try:
+            # Проверка доступности S3StorageManager
+            if load_storage_manager() is None:
+                return "", "", "❌ S3StorageManager недоступен"
+            
+            # Получение учетных данных
+            access_key = aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID')
+            secret_key = aws_secret_access_key or os.getenv('AWS_SECRET_ACCESS_KEY')
+            
+            if not access_key or not secret_key:
+                return "", "", "❌ AWS credentials не настроены"
+            
+            # Инициализация S3 менеджера
+            s3_manager = get_storage_manager(
+                bucket_name=bucket_name,
+                aws_access_key_id=access_key,
+                aws_secret_access_key=secret_key,
+                region_name=region_name
+            )
+            
+            # Поиск по индексу метаданных
+            result = s3_manager.search_images(
+                query=query or None,
+                model=model or None,
+                workflow_name=workflow_name or None,
+                since=since or None,
+                until=until or None,
+                limit=max_results
+            )
+            
+            if result['success']:
+                images_json = json.dumps(result['files'], indent=2, ensure_ascii=False)
+                first_key = result['files'][0]['key'] if result['files'] else ""
+                return images_json, first_key, f"✅ Найдено {result['count']} изображений"
+            else:
+                return "", "", f"❌ {result['error']}"
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка поиска изображений: {e}")
+            return "", "", f"❌ Ошибка: {str(e)}"
+
+
 class S3WorkflowSaver:
     """
     Узел для сохранения workflow в S3
@@ -314,6 +1076,9 @@ class S3WorkflowSaver:
                 "aws_secret_access_key": ("STRING", {"default": "", "multiline": False}),
                 "region_name": ("STRING", {"default": "us-east-1"}),
                 "workflow_name": ("STRING", {"default": "", "multiline": False}),
+            },
+            "optional": {
+                "binary_format": ("BOOLEAN", {"default": False}),
             }
         }
     
@@ -328,13 +1093,14 @@ class S3WorkflowSaver:
                      aws_access_key_id, 
                      aws_secret_access_key, 
                      region_name, 
-                     workflow_name):
+                     workflow_name,
+                     binary_format=False):
         """
         Сохранение workflow в S3
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -351,7 +1117,7 @@ class S3WorkflowSaver:
                 return "", "❌ Неверный формат JSON в workflow_data"
             
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
@@ -361,7 +1127,8 @@ class S3WorkflowSaver:
             # Сохранение workflow
             result = s3_manager.save_workflow(
                 workflow_data=workflow_dict,
-                workflow_name=workflow_name if workflow_name else None
+                workflow_name=workflow_name if workflow_name else None,
+                binary=binary_format
             )
             
             if result['success']:
@@ -407,7 +1174,7 @@ class S3WorkflowLoader:
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -421,7 +1188,7 @@ class S3WorkflowLoader:
                 return "", "❌ Название workflow не указано"
             
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
@@ -473,7 +1240,7 @@ class S3StorageInfo:
         """
         try:
             # Проверка доступности S3StorageManager
-            if S3StorageManager is None:
+            if load_storage_manager() is None:
                 return "", "❌ S3StorageManager недоступен"
             
             # Получение учетных данных
@@ -484,7 +1251,7 @@ class S3StorageInfo:
                 return "", "❌ AWS credentials не настроены"
             
             # Инициализация S3 менеджера
-            s3_manager = S3StorageManager(
+            s3_manager = get_storage_manager(
                 bucket_name=bucket_name,
                 aws_access_key_id=access_key,
                 aws_secret_access_key=secret_key,
@@ -509,7 +1276,10 @@ class S3StorageInfo:
 NODE_CLASS_MAPPINGS = {
     "S3ImageUploader": S3ImageUploader,
     "S3ImageDownloader": S3ImageDownloader,
+    "S3BatchImageDownloader": S3BatchImageDownloader,
+    "S3ImageStreamLoader": S3ImageStreamLoader,
     "S3ImageLister": S3ImageLister,
+    "S3ImageSearch": S3ImageSearch,
     "S3WorkflowSaver": S3WorkflowSaver,
     "S3WorkflowLoader": S3WorkflowLoader,
     "S3StorageInfo": S3StorageInfo,
@@ -518,11 +1288,24 @@ NODE_CLASS_MAPPINGS = {
 NODE_DISPLAY_NAME_MAPPINGS = {
     "S3ImageUploader": "S3 Image Uploader",
     "S3ImageDownloader": "S3 Image Downloader", 
+    "S3BatchImageDownloader": "S3 Batch Image Downloader",
+    "S3ImageStreamLoader": "S3 Image Stream",
     "S3ImageLister": "S3 Image Lister",
+    "S3ImageSearch": "S3 Image Search",
     "S3WorkflowSaver": "S3 Workflow Saver",
     "S3WorkflowLoader": "S3 Workflow Loader",
     "S3StorageInfo": "S3 Storage Info",
 }
 
+# Прогрев клиента при загрузке ComfyUI (опционально)
+if os.getenv('COMFYUI_S3_WARMUP', '').lower() in ('1', 'true', 'yes'):
+    warmup()
+
+# Экспорт метрик (COMFYUI_METRICS_PORT / COMFYUI_METRICS_FILE)
+metrics.start_exporters_from_env()
+
+# Трассировка запусков узлов (COMFYUI_TRACE_FILE)
+_import_sibling('tracing').enable_from_env(NODE_CLASS_MAPPINGS)
+
 # Экспорт для ComfyUI
 __all__ = ['NODE_CLASS_MAPPINGS', 'NODE_DISPLAY_NAME_MAPPINGS'] 
\ No newline at end of file
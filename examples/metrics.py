@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Metrics для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Метрики в стиле Prometheus для клиентов S3, OpenAI и ComfyUI.
+
+- comfyui_operation_duration_seconds - гистограмма длительности операций (service, operation)
+- comfyui_operations_total - число операций по результату (service, operation, status)
+- comfyui_operations_in_flight - операции в процессе выполнения (service, operation)
+- comfyui_transferred_bytes_total - переданные байты (service, direction)
+- comfyui_cache_requests_total - обращения к кэшам (cache, result)
+- comfyui_retries_total / comfyui_throttles_total - повторы и throttling (service, operation)
+
+Метрики хранятся в процессе без внешних зависимостей и выводятся в текстовом
+формате Prometheus: HTTP endpoint (serve_metrics) или файл для textfile
+collector node_exporter (write_metrics_file / start_file_exporter).
+"""
+
+import bisect
+import functools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+import logging
+
+try:
+    from .tracing import begin_span, end_span
+except ImportError:
+    from tracing import begin_span, end_span
+
+logger = logging.getLogger(__name__)
+
+# Границы корзин гистограммы длительности (секунды): от запросов S3 до генерации OpenAI
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = '') -> str:
+    """Метки в формате экспозиции: {name="value",...}"""
+    parts = [
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for name, value in zip(names, values)
+    ]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+def _format_value(value: float) -> str:
+    value = float(value)
+    if value == float('inf'):
+        return '+Inf'
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric:
+    """Базовый класс метрики с метками"""
+
+    type_name = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """
+        Дочерняя метрика для набора значений меток
+
+        Args:
+            *values: Значения меток в порядке labelnames
+
+        Returns:
+            Объект с методами inc/dec/set/observe (по типу метрики)
+        """
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}")
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _items(self) -> List[Tuple[Tuple[str, ...], object]]:
+        with self._lock:
+            return sorted(self._children.items(), key=lambda item: item[0])
+
+    def _samples(self) -> Iterator[Tuple[str, str, float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        """Строки текстового формата Prometheus"""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in self._samples())
+        return lines
+
+
+class _Value:
+    """Значение счетчика или индикатора"""
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self.value = value
+
+
+class Counter(_Metric):
+    """Монотонный счетчик"""
+
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _Value()
+
+    def _samples(self):
+        for values, child in self._items():
+            yield self.name, _format_labels(self.labelnames, values), child.value
+
+
+class Gauge(Counter):
+    """Индикатор (значение может уменьшаться)"""
+
+    type_name = 'gauge'
+
+
+class _HistogramValue:
+    """Значения гистограммы для одного набора меток"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def snapshot(self) -> Tuple[List[int], float]:
+        with self._lock:
+            return list(self.counts), self.sum
+
+
+class Histogram(_Metric):
+    """Гистограмма с фиксированными корзинами"""
+
+    type_name = 'histogram'
+
+    def __init__(self,
+                 name: str,
+                 documentation: str,
+                 labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramValue(self.buckets)
+
+    def _samples(self):
+        for values, child in self._items():
+            counts, total = child.snapshot()
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = 'le="{}"'.format(_format_value(bound))
+                yield f"{self.name}_bucket", _format_labels(self.labelnames, values, le), cumulative
+            yield f"{self.name}_sum", _format_labels(self.labelnames, values), total
+            yield f"{self.name}_count", _format_labels(self.labelnames, values), cumulative
+
+
+class MetricsRegistry:
+    """Набор метрик процесса"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric_class, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = metric_class(name, *args, **kwargs)
+            elif type(metric) is not metric_class:
+                raise ValueError(f"Метрика {name} уже зарегистрирована с другим типом")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Счетчик (создается при первом обращении)"""
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        """Индикатор (создается при первом обращении)"""
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Гистограмма (создается при первом обращении)"""
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+# Реестр процесса и общие метрики клиентов
+REGISTRY = MetricsRegistry()
+
+OPERATION_DURATION = REGISTRY.histogram(
+    'comfyui_operation_duration_seconds', 'Длительность операций клиентов', ('service', 'operation')
+)
+OPERATIONS = REGISTRY.counter(
+    'comfyui_operations_total', 'Число операций по результату', ('service', 'operation', 'status')
+)
+IN_FLIGHT = REGISTRY.gauge(
+    'comfyui_operations_in_flight', 'Операции в процессе выполнения', ('service', 'operation')
+)
+TRANSFERRED_BYTES = REGISTRY.counter(
+    'comfyui_transferred_bytes_total', 'Переданные байты', ('service', 'direction')
+)
+CACHE_REQUESTS = REGISTRY.counter(
+    'comfyui_cache_requests_total', 'Обращения к кэшам', ('cache', 'result')
+)
+RETRIES = REGISTRY.counter(
+    'comfyui_retries_total', 'Повторные попытки запросов', ('service', 'operation')
+)
+THROTTLES = REGISTRY.counter(
+    'comfyui_throttles_total', 'Ответы throttling (429, 503 SlowDown)', ('service', 'operation')
+)
+
+
+@contextmanager
+def track(service: str, operation: str) -> Iterator[None]:
+    """
+    Учет длительности, результата и числа выполняемых операций
+
+    Операция считается неудачной, если блок завершился исключением. При включенной
+    трассировке операция также записывается дочерним span'ом узла.
+
+    Args:
+        service: Сервис ('s3', 'openai', 'comfyui', 'encode', 'disk')
+        operation: Имя операции
+    """
+    in_flight = IN_FLIGHT.labels(service, operation)
+    in_flight.inc()
+    trace_span = begin_span(operation, service)
+    started = time.perf_counter()
+    status = 'error'
+    try:
+        yield
+        status = 'ok'
+    finally:
+        OPERATION_DURATION.labels(service, operation).observe(time.perf_counter() - started)
+        OPERATIONS.labels(service, operation, status).inc()
+        in_flight.dec()
+        end_span(trace_span, error=status == 'error')
+
+
+def instrumented(service: str, operation: Optional[str] = None) -> Callable:
+    """
+    Декоратор учета метрик метода
+
+    Ошибкой считается исключение, результат False и словарь с 'success': False.
+
+    Args:
+        service: Сервис
+        operation: Имя операции (по умолчанию - имя функции)
+    """
+    def decorator(func: Callable) -> Callable:
+        name = operation or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            in_flight = IN_FLIGHT.labels(service, name)
+            in_flight.inc()
+            trace_span = begin_span(name, service)
+            started = time.perf_counter()
+            status = 'error'
+            try:
+                result = func(*args, **kwargs)
+                if result is not False and not (isinstance(result, dict) and result.get('success') is False):
+                    status = 'ok'
+                return result
+            finally:
+                OPERATION_DURATION.labels(service, name).observe(time.perf_counter() - started)
+                OPERATIONS.labels(service, name, status).inc()
+                in_flight.dec()
+                end_span(trace_span, error=status == 'error')
+
+        return wrapper
+    return decorator
+
+
+def record_bytes(service: str, direction: str, amount: int) -> None:
+    """Учет переданных байтов (direction: 'upload' или 'download')"""
+    if amount:
+        TRANSFERRED_BYTES.labels(service, direction).inc(amount)
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    """Учет обращения к кэшу"""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def render_metrics(registry: MetricsRegistry = REGISTRY) -> str:
+    """Метрики в текстовом формате Prometheus"""
+    return registry.render()
+
+
+def write_metrics_file(path: str, registry: MetricsRegistry = REGISTRY) -> None:
+    """
+    Запись метрик в файл (формат textfile collector node_exporter)
+
+    Файл заменяется атомарно, поэтому читатель не видит частичную запись.
+
+    Args:
+        path: Путь к файлу (обычно *.prom)
+        registry: Реестр метрик
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.render())
+    os.replace(temp_path, path)
+
+
+def start_file_exporter(path: str,
+                        interval: float = 15.0,
+                        registry: MetricsRegistry = REGISTRY) -> threading.Thread:
+    """
+    Периодическая запись метрик в файл в фоновом потоке
+
+    Args:
+        path: Путь к файлу
+        interval: Период записи в секундах
+        registry: Реестр метрик
+
+    Returns:
+        Фоновый поток
+    """
+    def run():
+        while True:
+            try:
+                write_metrics_file(path, registry)
+            except OSError as e:
+                logger.warning(f"⚠️ Не удалось записать метрики в {path}: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="comfyui-metrics-file", daemon=True)
+    thread.start()
+    return thread
+
+
+def serve_metrics(port: int = 9464,
+                  host: str = '127.0.0.1',
+                  registry: MetricsRegistry = REGISTRY) -> ThreadingHTTPServer:
+    """
+    HTTP endpoint /metrics в фоновом потоке
+
+    Args:
+        port: Порт (0 - выбрать свободный)
+        host: Адрес (по умолчанию только локальный)
+        registry: Реестр метрик
+
+    Returns:
+        Запущенный сервер (server.shutdown() для остановки)
+    """
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="comfyui-metrics-http", daemon=True).start()
+    logger.info(f"📈 Метрики доступны на http://{host}:{server.server_port}/metrics")
+    return server
+
+
+_exporters_started = False
+_exporters_lock = threading.Lock()
+
+
+def start_exporters_from_env() -> None:
+    """
+    Запуск экспортеров, заданных переменными окружения (один раз на процесс)
+
+    COMFYUI_METRICS_PORT - порт HTTP endpoint /metrics,
+    COMFYUI_METRICS_FILE - файл для textfile collector
+    (COMFYUI_METRICS_INTERVAL - период записи, по умолчанию 15 с).
+    """
+    global _exporters_started
+    with _exporters_lock:
+        if _exporters_started:
+            return
+        _exporters_started = True
+    try:
+        port = os.getenv('COMFYUI_METRICS_PORT')
+        if port:
+            serve_metrics(int(port), os.getenv('COMFYUI_METRICS_HOST', '127.0.0.1'))
+        path = os.getenv('COMFYUI_METRICS_FILE')
+        if path:
+            start_file_exporter(path, float(os.getenv('COMFYUI_METRICS_INTERVAL', '15')))
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Не удалось запустить экспорт метрик: {e}")
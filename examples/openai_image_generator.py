@@ -11,32 +11,65 @@ OpenAI Image Generator для ComfyUI
 import os
 import json
 import base64
+import threading
 import requests
-from PIL import Image
+from requests.adapters import HTTPAdapter
 import io
 import time
 from typing import Optional, Dict, Any, List
 
+try:
+    from .metrics import THROTTLES, instrumented, record_bytes
+except ImportError:
+    from metrics import THROTTLES, instrumented, record_bytes
+
+# Общая HTTP сессия с пулом соединений (TLS соединения переиспользуются между вызовами)
+HTTP_POOL_SIZE = 16
+_http_session: Optional[requests.Session] = None
+_http_session_lock = threading.Lock()
+
+
+def get_http_session() -> requests.Session:
+    """
+    Общая для процесса HTTP сессия с пулом соединений
+    
+    Returns:
+        requests.Session
+    """
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _http_session = session
+        return _http_session
+
+
 class OpenAIImageGenerator:
     """Класс для генерации изображений через OpenAI API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(self, api_key: Optional[str] = None, session: Optional[requests.Session] = None):
         """
         Инициализация генератора изображений
         
         Args:
             api_key: OpenAI API ключ. Если не указан, берется из переменной окружения OPENAI_API_KEY
+            session: HTTP сессия (по умолчанию общая сессия с пулом соединений)
         """
         self.api_key = api_key or os.getenv('OPENAI_API_KEY')
         if not self.api_key:
             raise ValueError("OpenAI API ключ не найден. Укажите его в параметре или установите переменную окружения OPENAI_API_KEY")
         
         self.base_url = "https://api.openai.com/v1"
+        self.session = session or get_http_session()
         self.headers = {
             "Authorization": f"Bearer {self.api_key}",
             "Content-Type": "application/json"
         }
     
+    @instrumented('openai')
     def generate_image(
         self,
         prompt: str,
@@ -76,7 +109,7 @@ class OpenAIImageGenerator:
             payload["n"] = 1  # DALL-E 3 поддерживает только 1 изображение за раз
         
         try:
-            response = requests.post(endpoint, headers=self.headers, json=payload)
+            response = self.session.post(endpoint, headers=self.headers, json=payload)
             response.raise_for_status()
             
             result = response.json()
@@ -89,12 +122,14 @@ class OpenAIImageGenerator:
             }
             
         except requests.exceptions.RequestException as e:
+            self._count_throttle(e, 'generate_image')
             return {
                 "success": False,
                 "error": str(e),
                 "status_code": getattr(e.response, 'status_code', None)
             }
     
+    @instrumented('openai')
     def generate_image_variation(
         self,
         image_path: str,
@@ -122,8 +157,9 @@ class OpenAIImageGenerator:
         data = {"size": size, "n": n}
         
         try:
-            response = requests.post(endpoint, headers={"Authorization": f"Bearer {self.api_key}"}, files=files, data=data)
+            response = self.session.post(endpoint, headers={"Authorization": f"Bearer {self.api_key}"}, files=files, data=data)
             response.raise_for_status()
+            record_bytes('openai', 'upload', len(image_data))
             
             result = response.json()
             return {
@@ -134,12 +170,14 @@ class OpenAIImageGenerator:
             }
             
         except requests.exceptions.RequestException as e:
+            self._count_throttle(e, 'generate_image_variation')
             return {
                 "success": False,
                 "error": str(e),
                 "status_code": getattr(e.response, 'status_code', None)
             }
     
+    @instrumented('openai')
     def download_image(self, url: str, save_path: str) -> bool:
         """
         Скачивание изображения по URL
@@ -152,11 +190,8 @@ class OpenAIImageGenerator:
             True если успешно, False в противном случае
         """
         try:
-            response = requests.get(url)
-            response.raise_for_status()
-            
             with open(save_path, 'wb') as f:
-                f.write(response.content)
+                f.write(self.fetch_image(url))
             
             return True
             
@@ -164,6 +199,28 @@ class OpenAIImageGenerator:
             print(f"Ошибка при скачивании изображения: {e}")
             return False
     
+    @instrumented('openai')
+    def fetch_image(self, url: str) -> bytes:
+        """
+        Скачивание изображения по URL в память через пул соединений
+        
+        Args:
+            url: URL изображения
+            
+        Returns:
+            Байты изображения (исключение при ошибке)
+        """
+        response = self.session.get(url)
+        response.raise_for_status()
+        record_bytes('openai', 'download', len(response.content))
+        return response.content
+    
+    @staticmethod
+    def _count_throttle(error: requests.exceptions.RequestException, operation: str) -> None:
+        """Учет ответа 429 (превышен лимит запросов OpenAI)"""
+        if getattr(error.response, 'status_code', None) == 429:
+            THROTTLES.labels('openai', operation).inc()
+    
     def save_images_from_result(self, result: Dict[str, Any], output_dir: str = "output") -> List[str]:
         """
         Сохранение изображений из результата генерации
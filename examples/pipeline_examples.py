@@ -11,6 +11,7 @@ import json
 import os
 from .comfyui_pipeline_builder import ComfyUIPipelineBuilder, PipelineTemplates
 from .pipeline_manager import PipelineManager
+from .structured_logging import configure_logging
 
 
 def example_simple_openai_pipeline():
@@ -202,18 +203,24 @@ def example_batch_processing_pipeline():
         description="Получение списка изображений"
     )
     
-    # Узел скачивания изображения
+    # Узел пакетного скачивания: ключи из списка, общий размер 512x512
     download_node = builder.add_node(
-        node_type="S3ImageDownloader",
+        node_type="S3BatchImageDownloader",
         inputs={
-            "s3_key": "comfyui/images/20241201_120000_image.png",
             "bucket_name": "comfyui-images",
             "aws_access_key_id": "",
             "aws_secret_access_key": "",
-            "region_name": "us-east-1"
+            "region_name": "us-east-1",
+            "keys": "",
+            "prefix": "comfyui/images/",
+            "limit": 10,
+            "width": 512,
+            "height": 512,
+            "resize_mode": "crop",
+            "max_workers": 16
         },
-        title="Image Downloader",
-        description="Скачивание изображения"
+        title="Batch Image Downloader",
+        description="Пакетное скачивание изображений"
     )
     
     # Узел предварительного просмотра
@@ -239,6 +246,8 @@ def example_batch_processing_pipeline():
     )
     
     # Соединения
+    # Выход S3ImageLister - на вход keys (слот 4 в порядке INPUT_TYPES)
+    builder.connect_nodes(lister_node, 0, download_node, 4)
     builder.connect_nodes(download_node, 0, preview_node, 0)
     builder.connect_nodes(download_node, 0, upload_node, 0)
     
@@ -417,6 +426,7 @@ def example_advanced_pipeline():
 
 def main():
     """Основная функция для запуска примеров"""
+    configure_logging()
     print("🎯 Запуск примеров Pipeline Builder")
     print("=" * 50)
     
@@ -12,10 +12,10 @@ import json
 import argparse
 from typing import Dict, List, Optional, Any
 from .comfyui_pipeline_builder import ComfyUIPipelineBuilder, PipelineTemplates
+from .structured_logging import configure_logging
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+# Логгер модуля (корневой логгер настраивается в main)
 logger = logging.getLogger(__name__)
 
 
@@ -275,7 +275,7 @@ class PipelineManager:
         Загрузка пайплайна из файла
         
         Args:
-            filepath: Путь к файлу пайплайна
+            filepath: Путь к файлу пайплайна (JSON или бинарный .cwf)
             
         Returns:
             Строитель пайплайна
@@ -288,18 +288,22 @@ class PipelineManager:
         else:
             raise ValueError(f"Не удалось загрузить пайплайн из {filepath}")
     
-    def save_pipeline_to_file(self, builder: ComfyUIPipelineBuilder, filepath: str) -> bool:
+    def save_pipeline_to_file(self,
+                              builder: ComfyUIPipelineBuilder,
+                              filepath: str,
+                              compact: bool = False) -> bool:
         """
         Сохранение пайплайна в файл
         
         Args:
             builder: Строитель пайплайна
             filepath: Путь к файлу для сохранения
+            compact: Компактный JSON без отступов
             
         Returns:
             True если сохранение успешно
         """
-        return builder.save_workflow(filepath)
+        return builder.save_workflow(filepath, compact=compact)
     
     def upload_pipeline(self, builder: ComfyUIPipelineBuilder, name: str = None) -> Dict[str, Any]:
         """
@@ -318,7 +322,8 @@ class PipelineManager:
                         builder: ComfyUIPipelineBuilder,
                         name: str = None,
                         wait: bool = True,
-                        timeout: int = 300) -> Dict[str, Any]:
+                        timeout: int = 300,
+                        poll_interval: float = 1.0) -> Dict[str, Any]:
         """
         Выполнение пайплайна
         
@@ -327,11 +332,12 @@ class PipelineManager:
             name: Название пайплайна
             wait: Ожидать завершения
             timeout: Таймаут ожидания
+            poll_interval: Интервал опроса статуса в секундах
             
         Returns:
             Результат выполнения
         """
-        return builder.execute_workflow(name, wait, timeout)
+        return builder.execute_workflow(name, wait, timeout, poll_interval)
     
     def validate_pipeline(self, builder: ComfyUIPipelineBuilder) -> Dict[str, Any]:
         """
@@ -359,6 +365,10 @@ def main():
     """Основная функция для работы с командной строкой"""
     parser = argparse.ArgumentParser(description="Pipeline Manager для ComfyUI")
     parser.add_argument("--url", default="http://localhost:8188", help="URL ComfyUI сервера")
+    parser.add_argument("--compact", action="store_true", help="Сохранять пайплайн в компактном JSON")
+    parser.add_argument("--log-level", default="INFO", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                        help="Уровень логирования")
+    parser.add_argument("--log-json", action="store_true", help="Структурированные логи (JSON строки)")
     
     subparsers = parser.add_subparsers(dest="command", help="Доступные команды")
     
@@ -367,7 +377,7 @@ def main():
     openai_parser.add_argument("--prompt", required=True, help="Промпт для генерации")
     openai_parser.add_argument("--model", default="dall-e-3", help="Модель OpenAI")
     openai_parser.add_argument("--size", default="1024x1024", help="Размер изображения")
-    openai_parser.add_argument("--output", help="Файл для сохранения пайплайна")
+    openai_parser.add_argument("--output", help="Файл для сохранения пайплайна (.cwf - бинарный формат)")
     openai_parser.add_argument("--upload", action="store_true", help="Загрузить в ComfyUI")
     openai_parser.add_argument("--execute", action="store_true", help="Выполнить пайплайн")
     
@@ -379,7 +389,7 @@ def main():
     s3_parser.add_argument("--aws-key", help="AWS Access Key ID")
     s3_parser.add_argument("--aws-secret", help="AWS Secret Access Key")
     s3_parser.add_argument("--region", default="us-east-1", help="AWS регион")
-    s3_parser.add_argument("--output", help="Файл для сохранения пайплайна")
+    s3_parser.add_argument("--output", help="Файл для сохранения пайплайна (.cwf - бинарный формат)")
     s3_parser.add_argument("--upload", action="store_true", help="Загрузить в ComfyUI")
     
     # Команда создания сложного пайплайна
@@ -389,13 +399,13 @@ def main():
     complex_parser.add_argument("--aws-key", help="AWS Access Key ID")
     complex_parser.add_argument("--aws-secret", help="AWS Secret Access Key")
     complex_parser.add_argument("--region", default="us-east-1", help="AWS регион")
-    complex_parser.add_argument("--output", help="Файл для сохранения пайплайна")
+    complex_parser.add_argument("--output", help="Файл для сохранения пайплайна (.cwf - бинарный формат)")
     complex_parser.add_argument("--upload", action="store_true", help="Загрузить в ComfyUI")
     complex_parser.add_argument("--execute", action="store_true", help="Выполнить пайплайн")
     
     # Команда загрузки пайплайна
     load_parser = subparsers.add_parser("load", help="Загрузить пайплайн из файла")
-    load_parser.add_argument("--file", required=True, help="Файл пайплайна")
+    load_parser.add_argument("--file", required=True, help="Файл пайплайна (JSON или бинарный .cwf)")
     load_parser.add_argument("--upload", action="store_true", help="Загрузить в ComfyUI")
     load_parser.add_argument("--execute", action="store_true", help="Выполнить пайплайн")
     load_parser.add_argument("--validate", action="store_true", help="Валидировать пайплайн")
@@ -404,6 +414,7 @@ def main():
     nodes_parser = subparsers.add_parser("nodes", help="Получить список доступных узлов")
     
     args = parser.parse_args()
+    configure_logging(getattr(logging, args.log_level), structured=args.log_json)
     
     if not args.command:
         parser.print_help()
@@ -422,7 +433,7 @@ def main():
             )
             
             if args.output:
-                manager.save_pipeline_to_file(builder, args.output)
+                manager.save_pipeline_to_file(builder, args.output, compact=args.compact)
                 print(f"✅ Пайплайн сохранен в {args.output}")
             
             if args.upload:
@@ -457,7 +468,7 @@ def main():
                 )
             
             if args.output:
-                manager.save_pipeline_to_file(builder, args.output)
+                manager.save_pipeline_to_file(builder, args.output, compact=args.compact)
                 print(f"✅ Пайплайн сохранен в {args.output}")
             
             if args.upload:
@@ -475,7 +486,7 @@ def main():
             )
             
             if args.output:
-                manager.save_pipeline_to_file(builder, args.output)
+                manager.save_pipeline_to_file(builder, args.output, compact=args.compact)
                 print(f"✅ Пайплайн сохранен в {args.output}")
             
             if args.upload:
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+S3 Key Generator для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Генерация ключей S3 без коллизий при высокой частоте загрузок.
+
+Идентификаторы - монотонные ULID (48 бит времени в мс + 80 бит случайности,
+Crockford Base32): уникальны между процессами и сортируются по времени создания.
+Необязательный хэш-префикс распределяет ключи по разным префиксам S3, чтобы
+нагрузка не упиралась в лимит запросов одного префикса (503 SlowDown).
+Схема имен подключаемая: register_naming_scheme.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Callable, Dict
+import logging
+
+logger = logging.getLogger(__name__)
+
+_CROCKFORD_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'
+_RANDOM_BITS = 80
+_RANDOM_MAX = (1 << _RANDOM_BITS) - 1
+
+
+def encode_base32(value: int, length: int) -> str:
+    """Кодирование числа в Crockford Base32 фиксированной длины"""
+    chars = []
+    for _ in range(length):
+        chars.append(_CROCKFORD_ALPHABET[value & 31])
+        value >>= 5
+    return ''.join(reversed(chars))
+
+
+class ULIDGenerator:
+    """
+    Потокобезопасный генератор монотонных ULID
+
+    В пределах одной миллисекунды случайная часть увеличивается на единицу,
+    поэтому идентификаторы строго возрастают даже при переводе часов назад.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._last_ms = -1
+        self._last_random = 0
+
+    def new(self) -> str:
+        """
+        Новый идентификатор
+
+        Returns:
+            Строка из 26 символов Crockford Base32
+        """
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._last_random = int.from_bytes(os.urandom(10), 'big')
+            elif self._last_random < _RANDOM_MAX:
+                self._last_random += 1
+            else:
+                # Переполнение случайной части - занимаем следующую миллисекунду
+                self._last_ms += 1
+                self._last_random = int.from_bytes(os.urandom(10), 'big') >> 1
+            return encode_base32(self._last_ms, 10) + encode_base32(self._last_random, 16)
+
+
+# Схема имен: (ulid, filename) -> имя объекта относительно префикса
+NamingScheme = Callable[[str, str], str]
+NAMING_SCHEMES: Dict[str, NamingScheme] = {}
+
+
+def register_naming_scheme(name: str) -> Callable[[NamingScheme], NamingScheme]:
+    """
+    Регистрация схемы имен
+
+    Args:
+        name: Название схемы (значение key_naming_scheme в настройках)
+    """
+    def decorator(func: NamingScheme) -> NamingScheme:
+        NAMING_SCHEMES[name] = func
+        return func
+    return decorator
+
+
+@register_naming_scheme('ulid')
+def _ulid_scheme(ulid: str, filename: str) -> str:
+    """01HZX3...Q_image.png"""
+    return f"{ulid}_{filename}" if filename else ulid
+
+
+@register_naming_scheme('dated')
+def _dated_scheme(ulid: str, filename: str) -> str:
+    """2024/12/01/01HZX3...Q_image.png (дата в UTC)"""
+    day = datetime.now(timezone.utc).strftime('%Y/%m/%d')
+    return f"{day}/{_ulid_scheme(ulid, filename)}"
+
+
+class KeyGenerator:
+    """
+    Генератор ключей S3 по настраиваемой схеме
+    """
+
+    def __init__(self, scheme: str = 'ulid', shard_chars: int = 0):
+        """
+        Инициализация генератора
+
+        Args:
+            scheme: Название зарегистрированной схемы имен
+            shard_chars: Длина шестнадцатеричного хэш-префикса (0 - без шардирования)
+        """
+        if scheme not in NAMING_SCHEMES:
+            raise ValueError(f"Неизвестная схема имен ключей: {scheme}")
+        if not 0 <= shard_chars <= 8:
+            raise ValueError("shard_chars должен быть от 0 до 8")
+
+        self.scheme = scheme
+        self.shard_chars = shard_chars
+        self._ulids = ULIDGenerator()
+
+    @classmethod
+    def from_settings(cls, aws_settings=None) -> 'KeyGenerator':
+        """
+        Создание генератора по настройкам AWS (config/settings.py)
+
+        Args:
+            aws_settings: Экземпляр AWSSettings (по умолчанию - глобальные настройки, если доступны)
+        """
+        if aws_settings is None:
+            try:
+                from config.settings import settings
+                aws_settings = settings.aws
+            except ImportError:
+                return cls()
+        return cls(
+            scheme=getattr(aws_settings, 'key_naming_scheme', 'ulid'),
+            shard_chars=getattr(aws_settings, 'key_shard_chars', 0)
+        )
+
+    def name(self, filename: str = '') -> str:
+        """
+        Имя объекта относительно префикса
+
+        Args:
+            filename: Исходное имя файла (сохраняется в конце имени)
+
+        Returns:
+            Уникальное имя вида [<shard>/]<схема>
+        """
+        ulid = self._ulids.new()
+        name = NAMING_SCHEMES[self.scheme](ulid, filename)
+        if self.shard_chars:
+            shard = hashlib.md5(ulid.encode('ascii')).hexdigest()[:self.shard_chars]
+            name = f"{shard}/{name}"
+        return name
+
+    def key(self, prefix: str, filename: str = '') -> str:
+        """
+        Полный ключ объекта
+
+        Args:
+            prefix: Префикс с завершающим '/' (например, comfyui/images/)
+            filename: Исходное имя файла
+        """
+        return f"{prefix}{self.name(filename)}"
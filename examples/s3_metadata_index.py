@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+"""
+S3 Metadata Index для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Индекс метаданных изображений в S3 без запросов HEAD к каждому объекту.
+
+Записи загрузок накапливаются в буфере и публикуются пачками в сегменты индекса
+под comfyui/metadata/segments/ (шардированные JSONL файлы, сжатые gzip). Сегменты
+синхронизируются в локальный SQLite кэш, из которого обслуживаются поиск метаданных
+по ключу и запросы "найти изображения по prompt/model". Когда сегментов шарда
+становится много, они сливаются в один (compact); отметки об удалении хранятся в
+слитом сегменте TOMBSTONE_GRACE_PERIOD секунд, чтобы их успели увидеть все кэши.
+"""
+
+import gzip
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+import logging
+
+logger = logging.getLogger(__name__)
+
+METADATA_SEGMENTS_PREFIX = 'comfyui/metadata/segments/'
+SEGMENT_EXTENSION = '.jsonl.gz'
+DEFAULT_SHARD_COUNT = 16
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'comfyui-s3-index')
+# Публикация буфера: по числу записей или не позже чем через интервал (секунды)
+DEFAULT_FLUSH_THRESHOLD = 100
+DEFAULT_FLUSH_INTERVAL = 5.0
+# Число сегментов шарда, после которого слияние запускается автоматически
+DEFAULT_COMPACT_THRESHOLD = 32
+# Срок хранения отметок об удалении при слиянии (секунды); кэш, не синхронизировавшийся
+# дольше этого срока, перестраивается целиком
+TOMBSTONE_GRACE_PERIOD = 7 * 24 * 3600
+
+# Поля метаданных, вынесенные в отдельные колонки для поиска
+INDEXED_FIELDS = ('prompt', 'model', 'workflow_name', 'upload_time', 'file_size')
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    key TEXT PRIMARY KEY,
+    updated_at TEXT NOT NULL,
+    deleted INTEGER NOT NULL DEFAULT 0,
+    prompt TEXT,
+    model TEXT,
+    workflow_name TEXT,
+    upload_time TEXT,
+    file_size INTEGER,
+    metadata TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS records_model ON records(model);
+CREATE INDEX IF NOT EXISTS records_workflow ON records(workflow_name);
+CREATE INDEX IF NOT EXISTS records_upload_time ON records(upload_time);
+CREATE TABLE IF NOT EXISTS segments (
+    segment_key TEXT PRIMARY KEY
+);
+CREATE TABLE IF NOT EXISTS postings (
+    token TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (token, key)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_key ON postings(key);
+CREATE TABLE IF NOT EXISTS state (
+    name TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+# Версия схемы кэша (user_version SQLite); 2 - добавлен обратный индекс postings,
+# 3 - таблица state со временем последней синхронизации, 4 - upload_time в UTC
+SCHEMA_VERSION = 4
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """
+    Разбиение текста на токены обратного индекса
+
+    Args:
+        text: Текст промпта или поискового запроса
+
+    Returns:
+        Список уникальных токенов в нижнем регистре (в порядке появления)
+    """
+    if not text:
+        return []
+    return list(dict.fromkeys(_TOKEN_RE.findall(str(text).lower())))
+
+
+def _utc_now() -> str:
+    """Текущее время в ISO формате (UTC)"""
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _utc_before(seconds: float) -> str:
+    """Момент seconds секунд назад в ISO формате (UTC)"""
+    return datetime.fromtimestamp(time.time() - seconds, timezone.utc).isoformat()
+
+
+def utc_iso(value: Union[datetime, str, None]) -> Optional[str]:
+    """
+    Время в ISO формате UTC (для сравнения строк upload_time в индексе)
+
+    Время без часового пояса считается локальным временем хоста: так upload_time
+    записывался раньше. Строки, не являющиеся ISO временем, возвращаются как есть.
+
+    Args:
+        value: datetime или строка ISO 8601
+
+    Returns:
+        Строка вида 2024-12-01T09:00:00.000000+00:00
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+    if not isinstance(value, datetime):
+        return value
+    return value.astimezone(timezone.utc).isoformat(timespec='microseconds')
+
+
+def _segment_name() -> str:
+    """Имя нового сегмента, упорядоченное по времени создания"""
+    return f"{time.time_ns():020d}-{uuid.uuid4().hex[:12]}{SEGMENT_EXTENSION}"
+
+
+class S3MetadataIndex:
+    """
+    Шардированный индекс метаданных с локальным SQLite кэшем
+    """
+
+    def __init__(self,
+                 s3_client,
+                 bucket_name: str,
+                 cache_dir: Optional[str] = None,
+                 shard_count: int = DEFAULT_SHARD_COUNT,
+                 flush_threshold: int = DEFAULT_FLUSH_THRESHOLD,
+                 flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+                 sync_interval: float = 60.0,
+                 compact_threshold: int = DEFAULT_COMPACT_THRESHOLD,
+                 tombstone_grace: float = TOMBSTONE_GRACE_PERIOD):
+        """
+        Инициализация индекса
+
+        Args:
+            s3_client: Клиент boto3 S3
+            bucket_name: Название S3 bucket
+            cache_dir: Директория локального кэша (по умолчанию ~/.cache/comfyui-s3-index)
+            shard_count: Число шардов сегментов
+            flush_threshold: Число записей, после которого буфер публикуется в S3
+            flush_interval: Максимальное время ожидания записи в буфере в секундах
+            sync_interval: Минимальный интервал автоматической синхронизации в секундах
+            compact_threshold: Число сегментов шарда для автоматического слияния (0 - отключено)
+            tombstone_grace: Срок хранения отметок об удалении при слиянии в секундах
+                (не меньше удвоенного sync_interval)
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.shard_count = shard_count
+        self.flush_threshold = max(1, flush_threshold)
+        self.flush_interval = flush_interval
+        self.sync_interval = sync_interval
+        self.compact_threshold = compact_threshold
+        self.tombstone_grace = max(tombstone_grace, 2 * sync_interval)
+
+        cache_dir = cache_dir or DEFAULT_CACHE_DIR
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache_path = os.path.join(cache_dir, f"{bucket_name}.sqlite")
+
+        self._lock = threading.RLock()
+        self._pending: List[Dict[str, Any]] = []
+        self._flush_timer: Optional[threading.Timer] = None
+        self._last_sync = 0.0
+        self._db = sqlite3.connect(self.cache_path, check_same_thread=False)
+        self._db.executescript(_SCHEMA)
+        if self._db.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+            self._rebuild_postings()
+            self._normalize_upload_times()
+            self._db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        self._db.commit()
+
+    def _rebuild_postings(self) -> None:
+        """Построение обратного индекса по записям кэша старой версии"""
+        self._db.execute("DELETE FROM postings")
+        rows = self._db.execute("SELECT key, prompt FROM records WHERE deleted = 0").fetchall()
+        self._db.executemany(
+            "INSERT OR IGNORE INTO postings VALUES (?, ?)",
+            [(token, key) for key, prompt in rows for token in tokenize(prompt)]
+        )
+
+    def _normalize_upload_times(self) -> None:
+        """Приведение upload_time записей кэша старой версии к UTC"""
+        rows = self._db.execute("SELECT key, upload_time FROM records WHERE upload_time IS NOT NULL").fetchall()
+        self._db.executemany(
+            "UPDATE records SET upload_time = ? WHERE key = ?",
+            [(utc_iso(upload_time), key) for key, upload_time in rows]
+        )
+
+    def shard_for(self, key: str) -> int:
+        """Номер шарда для ключа объекта"""
+        return zlib.crc32(key.encode('utf-8')) % self.shard_count
+
+    def _shard_prefix(self, shard: int) -> str:
+        return f"{METADATA_SEGMENTS_PREFIX}{shard:02x}/"
+
+    # ------------------------------------------------------------------
+    # Запись
+    # ------------------------------------------------------------------
+
+    def _apply(self, entry: Dict[str, Any]) -> None:
+        """Применение записи к локальному кэшу (более старые записи игнорируются)"""
+        metadata = entry.get('metadata') or {}
+        values = [metadata.get(field) for field in INDEXED_FIELDS]
+        try:
+            values[4] = int(values[4]) if values[4] is not None else None
+        except (TypeError, ValueError):
+            values[4] = None
+        values[3] = utc_iso(values[3])
+
+        self._db.execute(
+            """
+            INSERT INTO records (key, updated_at, deleted, prompt, model, workflow_name,
+                                 upload_time, file_size, metadata)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                updated_at = excluded.updated_at,
+                deleted = excluded.deleted,
+                prompt = excluded.prompt,
+                model = excluded.model,
+                workflow_name = excluded.workflow_name,
+                upload_time = excluded.upload_time,
+                file_size = excluded.file_size,
+                metadata = excluded.metadata
+            WHERE excluded.updated_at >= records.updated_at
+            """,
+            (entry['key'], entry['ts'], int(bool(entry.get('deleted'))), *values,
+             json.dumps(metadata, ensure_ascii=False))
+        )
+
+        # Обновление обратного индекса по фактическому состоянию записи
+        key = entry['key']
+        deleted, prompt = self._db.execute(
+            "SELECT deleted, prompt FROM records WHERE key = ?", (key,)
+        ).fetchone()
+        self._db.execute("DELETE FROM postings WHERE key = ?", (key,))
+        if not deleted:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO postings VALUES (?, ?)",
+                [(token, key) for token in tokenize(prompt)]
+            )
+
+    def _add_entries(self, entries: List[Dict[str, Any]], publish: bool) -> None:
+        with self._lock:
+            for entry in entries:
+                self._apply(entry)
+            self._db.commit()
+            if not publish:
+                return
+            self._pending.extend(entries)
+            if len(self._pending) < self.flush_threshold:
+                # Неполный буфер публикуется таймером не позже чем через flush_interval
+                if self._flush_timer is None:
+                    self._flush_timer = threading.Timer(self.flush_interval, self._flush_on_timer)
+                    self._flush_timer.daemon = True
+                    self._flush_timer.start()
+                return
+        self.flush()
+
+    def _flush_on_timer(self) -> None:
+        """Публикация буфера по таймеру (ошибка оставляет записи в буфере)"""
+        try:
+            self.flush()
+        except Exception as e:
+            logger.warning(f"⚠️ Не удалось опубликовать буфер индекса метаданных: {e}")
+
+    def record(self, key: str, metadata: Dict[str, Any], publish: bool = True) -> None:
+        """
+        Добавление метаданных объекта в индекс
+
+        Args:
+            key: Ключ объекта в S3
+            metadata: Метаданные объекта
+            publish: Опубликовать запись в S3 (False - только локальный кэш)
+        """
+        self.record_many([(key, metadata)], publish)
+
+    def record_many(self, items: Iterable[Tuple[str, Dict[str, Any]]], publish: bool = True) -> None:
+        """
+        Добавление метаданных нескольких объектов одной пачкой
+
+        Args:
+            items: Пары (ключ объекта, метаданные)
+            publish: Опубликовать записи в S3 (False - только локальный кэш)
+        """
+        now = _utc_now()
+        entries = [{'key': key, 'ts': now, 'metadata': metadata} for key, metadata in items]
+        if entries:
+            self._add_entries(entries, publish)
+
+    def remove_many(self, keys: Iterable[str]) -> None:
+        """
+        Пометка объектов как удаленных
+
+        Args:
+            keys: Ключи удаленных объектов
+        """
+        now = _utc_now()
+        entries = [{'key': key, 'ts': now, 'deleted': True} for key in keys]
+        if entries:
+            self._add_entries(entries, publish=True)
+
+    def remove(self, key: str) -> None:
+        """Пометка объекта как удаленного"""
+        self.remove_many([key])
+
+    def flush(self) -> int:
+        """
+        Публикация накопленных записей в S3 (по одному сегменту на шард)
+
+        Шарды, в которых набралось compact_threshold сегментов, затем сливаются.
+
+        Returns:
+            Число опубликованных записей
+        """
+        with self._lock:
+            pending, self._pending = self._pending, []
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+
+        if not pending:
+            return 0
+
+        by_shard: Dict[int, List[Dict[str, Any]]] = {}
+        for entry in pending:
+            by_shard.setdefault(self.shard_for(entry['key']), []).append(entry)
+
+        try:
+            for shard, entries in by_shard.items():
+                segment_key = self._shard_prefix(shard) + _segment_name()
+                self._put_segment(segment_key, entries)
+                with self._lock:
+                    self._db.execute("INSERT OR IGNORE INTO segments VALUES (?)", (segment_key,))
+                    self._db.commit()
+        except Exception:
+            # Записи вернутся в буфер и будут опубликованы при следующем flush
+            with self._lock:
+                self._pending = pending + self._pending
+            raise
+
+        if self.compact_threshold:
+            for shard in by_shard:
+                if self._known_segment_count(shard) >= self.compact_threshold:
+                    try:
+                        self._compact_shard(shard, self.compact_threshold, _utc_before(self.tombstone_grace))
+                    except Exception as e:
+                        logger.warning(f"⚠️ Не удалось слить шард индекса метаданных {shard:02x}: {e}")
+
+        return len(pending)
+
+    def _known_segment_count(self, shard: int) -> int:
+        """Число сегментов шарда, известных локальному кэшу"""
+        with self._lock:
+            return self._db.execute(
+                "SELECT COUNT(*) FROM segments WHERE segment_key LIKE ?", (self._shard_prefix(shard) + '%',)
+            ).fetchone()[0]
+
+    def _put_segment(self, segment_key: str, entries: List[Dict[str, Any]]) -> None:
+        body = '\n'.join(json.dumps(entry, ensure_ascii=False) for entry in entries) + '\n'
+        self.s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=segment_key,
+            Body=gzip.compress(body.encode('utf-8'), mtime=0),
+            ContentType='application/x-ndjson',
+            ContentEncoding='gzip'
+        )
+
+    def _read_segment(self, segment_key: str) -> List[Dict[str, Any]]:
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=segment_key)
+        body = gzip.decompress(response['Body'].read()).decode('utf-8')
+        return [json.loads(line) for line in body.splitlines() if line]
+
+    # ------------------------------------------------------------------
+    # Синхронизация и обслуживание
+    # ------------------------------------------------------------------
+
+    def _list_segments(self, prefix: str = METADATA_SEGMENTS_PREFIX) -> List[str]:
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        keys = []
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get('Contents', []):
+                if obj['Key'].endswith(SEGMENT_EXTENSION):
+                    keys.append(obj['Key'])
+        return keys
+
+    def sync(self, max_workers: int = 8) -> int:
+        """
+        Загрузка новых сегментов из S3 в локальный кэш
+
+        Args:
+            max_workers: Число параллельных загрузок сегментов
+
+        Returns:
+            Число примененных сегментов
+        """
+        remote = self._list_segments()
+        started_at = _utc_now()
+        with self._lock:
+            last_sync = self._db.execute("SELECT value FROM state WHERE name = 'last_sync'").fetchone()
+            if last_sync and last_sync[0] < _utc_before(self.tombstone_grace):
+                # Отметки об удалении могли быть слиты без этого кэша - перестроение
+                logger.info("🔄 Индекс метаданных: кэш устарел, полная синхронизация")
+                self._db.execute("DELETE FROM records")
+                self._db.execute("DELETE FROM postings")
+                self._db.execute("DELETE FROM segments")
+                for entry in self._pending:
+                    self._apply(entry)
+                self._db.commit()
+            known = {row[0] for row in self._db.execute("SELECT segment_key FROM segments")}
+
+        new_segments = [key for key in remote if key not in known]
+        if new_segments:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                contents = list(executor.map(self._read_segment, new_segments))
+            with self._lock:
+                for segment_key, entries in zip(new_segments, contents):
+                    for entry in entries:
+                        self._apply(entry)
+                    self._db.execute("INSERT OR IGNORE INTO segments VALUES (?)", (segment_key,))
+                self._db.commit()
+
+        # Сегменты, удаленные при слиянии, больше не нужно помнить
+        stale = known - set(remote)
+        with self._lock:
+            if stale:
+                self._db.executemany("DELETE FROM segments WHERE segment_key = ?", [(k,) for k in stale])
+            self._db.execute("INSERT OR REPLACE INTO state VALUES ('last_sync', ?)", (started_at,))
+            self._db.commit()
+
+        self._last_sync = time.monotonic()
+        if new_segments:
+            logger.info(f"🔄 Индекс метаданных: применено сегментов {len(new_segments)}")
+        return len(new_segments)
+
+    def maybe_sync(self) -> bool:
+        """Синхронизация, если с прошлой прошло больше sync_interval секунд"""
+        if time.monotonic() - self._last_sync < self.sync_interval:
+            return False
+        self.sync()
+        return True
+
+    def compact(self, min_segments: int = 2) -> Dict[str, int]:
+        """
+        Слияние сегментов каждого шарда в один
+
+        Для каждого ключа остается последняя запись. Отметки об удалении моложе
+        tombstone_grace сохраняются, чтобы их получили кэши, еще не видевшие удаление.
+        Удаляются только прочитанные сегменты, поэтому параллельные записи не теряются.
+
+        Args:
+            min_segments: Минимальное число сегментов шарда для слияния
+
+        Returns:
+            Dict со статистикой слияния
+        """
+        stats = {'shards': 0, 'segments_removed': 0, 'records': 0, 'tombstones': 0}
+        cutoff = _utc_before(self.tombstone_grace)
+
+        for shard in range(self.shard_count):
+            result = self._compact_shard(shard, min_segments, cutoff)
+            if result is None:
+                continue
+            stats['shards'] += 1
+            stats['segments_removed'] += result[0]
+            stats['records'] += result[1]
+            stats['tombstones'] += result[2]
+
+        logger.info(f"🗜️ Индекс метаданных: слито шардов {stats['shards']}")
+        return stats
+
+    def _compact_shard(self, shard: int, min_segments: int, cutoff: str) -> Optional[Tuple[int, int, int]]:
+        """
+        Слияние сегментов одного шарда
+
+        Args:
+            shard: Номер шарда
+            min_segments: Минимальное число сегментов для слияния
+            cutoff: Отметки об удалении старше этого момента отбрасываются
+
+        Returns:
+            (удалено сегментов, живых записей, отметок об удалении) или None
+        """
+        segments = sorted(self._list_segments(self._shard_prefix(shard)))
+        if len(segments) < min_segments:
+            return None
+
+        latest: Dict[str, Dict[str, Any]] = {}
+        for segment_key in segments:
+            for entry in self._read_segment(segment_key):
+                current = latest.get(entry['key'])
+                if current is None or entry['ts'] >= current['ts']:
+                    latest[entry['key']] = entry
+
+        kept = [entry for entry in latest.values() if not entry.get('deleted') or entry['ts'] >= cutoff]
+        tombstones = sum(1 for entry in kept if entry.get('deleted'))
+        merged_key = None
+        if kept:
+            merged_key = self._shard_prefix(shard) + _segment_name()
+            self._put_segment(merged_key, kept)
+
+        for start in range(0, len(segments), 1000):
+            self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': k} for k in segments[start:start + 1000]], 'Quiet': True}
+            )
+
+        # Прочитанные записи применяются к кэшу, поэтому слитый сегмент уже известен
+        with self._lock:
+            for entry in latest.values():
+                self._apply(entry)
+            self._db.executemany("DELETE FROM segments WHERE segment_key = ?", [(k,) for k in segments])
+            if merged_key:
+                self._db.execute("INSERT OR IGNORE INTO segments VALUES (?)", (merged_key,))
+            self._db.commit()
+
+        return len(segments), len(kept) - tombstones, tombstones
+
+    # ------------------------------------------------------------------
+    # Запросы
+    # ------------------------------------------------------------------
+
+    def _lookup(self, key: str) -> Optional[Tuple[int, str]]:
+        with self._lock:
+            return self._db.execute(
+                "SELECT deleted, metadata FROM records WHERE key = ?", (key,)
+            ).fetchone()
+
+    def get(self, key: str, refresh: bool = True) -> Optional[Dict[str, Any]]:
+        """
+        Метаданные объекта из локального кэша
+
+        Args:
+            key: Ключ объекта в S3
+            refresh: При промахе синхронизировать кэш (не чаще sync_interval)
+
+        Returns:
+            Метаданные или None, если объект не найден в индексе
+        """
+        row = self._lookup(key)
+        if row is None and refresh and self.maybe_sync():
+            row = self._lookup(key)
+        if row is None or row[0]:
+            return None
+        return json.loads(row[1])
+
+    def find(self,
+             prompt: Optional[str] = None,
+             model: Optional[str] = None,
+             workflow_name: Optional[str] = None,
+             limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Поиск изображений по метаданным
+
+        Args:
+            prompt: Подстрока промпта (без учета регистра)
+            model: Модель (точное совпадение)
+            workflow_name: Название workflow (точное совпадение)
+            limit: Максимальное число результатов
+
+        Returns:
+            Список словарей {'key', 'metadata'}, новые сначала
+        """
+        conditions = ["deleted = 0"]
+        params: List[Any] = []
+        if prompt:
+            conditions.append("prompt LIKE ? ESCAPE '\\'")
+            escaped = prompt.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(f"%{escaped}%")
+        if model:
+            conditions.append("model = ?")
+            params.append(model)
+        if workflow_name:
+            conditions.append("workflow_name = ?")
+            params.append(workflow_name)
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT key, metadata FROM records WHERE {' AND '.join(conditions)} "
+                f"ORDER BY upload_time DESC, key LIMIT ?",
+                params
+            ).fetchall()
+        return [{'key': key, 'metadata': json.loads(metadata)} for key, metadata in rows]
+
+    def search(self,
+               query: Optional[str] = None,
+               model: Optional[str] = None,
+               workflow_name: Optional[str] = None,
+               since: Optional[Union[datetime, str]] = None,
+               until: Optional[Union[datetime, str]] = None,
+               limit: int = 100) -> List[Dict[str, Any]]:
+        """
+        Поиск по обратному индексу токенов промпта
+
+        Args:
+            query: Слова промпта (должны встречаться все)
+            model: Модель (точное совпадение)
+            workflow_name: Название workflow (точное совпадение)
+            since: Начало интервала по upload_time (включительно; без часового пояса - локальное время)
+            until: Конец интервала по upload_time (не включительно)
+            limit: Максимальное число результатов
+
+        Returns:
+            Список словарей {'key', 'metadata'}, новые сначала
+        """
+        conditions = ["r.deleted = 0"]
+        params: List[Any] = []
+
+        tokens = tokenize(query)
+        if tokens:
+            placeholders = ', '.join('?' * len(tokens))
+            conditions.append(
+                f"r.key IN (SELECT key FROM postings WHERE token IN ({placeholders}) "
+                f"GROUP BY key HAVING COUNT(*) = ?)"
+            )
+            params.extend(tokens)
+            params.append(len(tokens))
+        if model:
+            conditions.append("r.model = ?")
+            params.append(model)
+        if workflow_name:
+            conditions.append("r.workflow_name = ?")
+            params.append(workflow_name)
+        if since:
+            conditions.append("r.upload_time >= ?")
+            params.append(utc_iso(since))
+        if until:
+            conditions.append("r.upload_time < ?")
+            params.append(utc_iso(until))
+        params.append(limit)
+
+        with self._lock:
+            rows = self._db.execute(
+                f"SELECT r.key, r.metadata FROM records r WHERE {' AND '.join(conditions)} "
+                f"ORDER BY r.upload_time DESC, r.key LIMIT ?",
+                params
+            ).fetchall()
+        return [{'key': key, 'metadata': json.loads(metadata)} for key, metadata in rows]
+
+    def unknown_keys(self, keys: Iterable[str]) -> List[str]:
+        """
+        Ключи, которых нет в локальном кэше
+
+        Args:
+            keys: Ключи объектов из листинга
+
+        Returns:
+            Список ключей без записей в индексе
+        """
+        keys = list(keys)
+        missing = []
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                known = {
+                    row[0] for row in self._db.execute(
+                        f"SELECT key FROM records WHERE key IN ({', '.join('?' * len(chunk))})", chunk
+                    )
+                }
+                missing.extend(key for key in chunk if key not in known)
+        return missing
+
+    def close(self) -> None:
+        """Публикация буфера и закрытие локального кэша"""
+        try:
+            self.flush()
+        finally:
+            with self._lock:
+                self._db.close()
@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+S3 Retry для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Повторные попытки S3 запросов и обратное давление при throttling.
+
+Клиент создается в адаптивном режиме повторов botocore (клиентский ограничитель
+частоты запросов). Стандартный обработчик повторов заменяется диспетчером с
+бюджетами по операциям: число попыток и общее время на запрос. Регулятор
+параллелизма (AIMD) уменьшает число одновременных запросов вдвое при 503 SlowDown
+и throttling и увеличивает его на единицу после серии успешных ответов.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, Iterator, Optional
+import logging
+
+from botocore.config import Config
+from botocore.retries import quota, standard
+
+try:
+    from .metrics import RETRIES, THROTTLES
+except ImportError:
+    from metrics import RETRIES, THROTTLES
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class OperationBudget:
+    """Бюджет повторов операции S3"""
+    max_attempts: int = 5
+    max_seconds: float = 60.0
+
+
+# Бюджеты по названиям операций API S3; 'default' - для остальных
+DEFAULT_OPERATION_BUDGETS: Dict[str, OperationBudget] = {
+    'default': OperationBudget(max_attempts=5, max_seconds=60.0),
+    'HeadObject': OperationBudget(max_attempts=3, max_seconds=10.0),
+    'HeadBucket': OperationBudget(max_attempts=3, max_seconds=10.0),
+    'DeleteObjects': OperationBudget(max_attempts=8, max_seconds=120.0),
+    'CopyObject': OperationBudget(max_attempts=6, max_seconds=300.0),
+    'UploadPartCopy': OperationBudget(max_attempts=6, max_seconds=300.0),
+    'UploadPart': OperationBudget(max_attempts=8, max_seconds=300.0),
+    'CompleteMultipartUpload': OperationBudget(max_attempts=8, max_seconds=120.0),
+}
+
+
+def make_client_config(budgets: Optional[Dict[str, OperationBudget]] = None,
+                       max_pool_connections: int = 50) -> Config:
+    """
+    Конфигурация клиента botocore в адаптивном режиме повторов
+
+    Args:
+        budgets: Бюджеты операций (max_attempts клиента - максимум по бюджетам)
+        max_pool_connections: Размер пула HTTP соединений
+    """
+    budgets = budgets or DEFAULT_OPERATION_BUDGETS
+    return Config(
+        retries={
+            'mode': 'adaptive',
+            'max_attempts': max(budget.max_attempts for budget in budgets.values())
+        },
+        max_pool_connections=max_pool_connections
+    )
+
+
+class ConcurrencyGovernor:
+    """
+    Клиентский регулятор параллелизма (AIMD)
+
+    Throttling уменьшает лимит в decrease_factor раз (не чаще раза в cooldown секунд),
+    каждые `limit` успешных ответов подряд увеличивают его на единицу.
+    """
+
+    def __init__(self,
+                 max_limit: int = 32,
+                 min_limit: int = 1,
+                 initial_limit: Optional[int] = None,
+                 decrease_factor: float = 0.5,
+                 cooldown: float = 1.0):
+        """
+        Инициализация регулятора
+
+        Args:
+            max_limit: Максимальное число одновременных запросов
+            min_limit: Минимальное число одновременных запросов
+            initial_limit: Начальный лимит (по умолчанию max_limit)
+            decrease_factor: Множитель лимита при throttling
+            cooldown: Минимальный интервал между уменьшениями в секундах
+        """
+        self.max_limit = max_limit
+        self.min_limit = max(1, min_limit)
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+
+        self._limit = float(initial_limit or max_limit)
+        self._condition = threading.Condition()
+        self._in_flight = 0
+        self._streak = 0
+        self._last_decrease = float('-inf')
+        self._throttles = 0
+        self._successes = 0
+        self._decreases = 0
+
+    @property
+    def limit(self) -> int:
+        """Текущий лимит одновременных запросов"""
+        return max(self.min_limit, int(self._limit))
+
+    def acquire(self) -> None:
+        """Ожидание свободного слота"""
+        with self._condition:
+            while self._in_flight >= self.limit:
+                self._condition.wait()
+            self._in_flight += 1
+
+    def release(self) -> None:
+        """Освобождение слота"""
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Контекст выполнения одного запроса"""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def on_throttle(self) -> None:
+        """Сигнал throttling (503 SlowDown, 429 и т.п.)"""
+        with self._condition:
+            self._throttles += 1
+            self._streak = 0
+            now = time.monotonic()
+            if now - self._last_decrease >= self.cooldown:
+                previous = self.limit
+                self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                self._last_decrease = now
+                self._decreases += 1
+                logger.warning(f"🐢 Throttling S3: параллелизм {previous} -> {self.limit}")
+
+    def on_success(self) -> None:
+        """Сигнал успешного ответа"""
+        with self._condition:
+            self._successes += 1
+            self._streak += 1
+            if self._streak >= self.limit and self._limit < self.max_limit:
+                self._limit = min(float(self.max_limit), self._limit + 1)
+                self._streak = 0
+                self._condition.notify_all()
+
+    def state(self) -> Dict[str, Any]:
+        """Текущее состояние регулятора"""
+        with self._condition:
+            return {
+                'limit': self.limit,
+                'min_limit': self.min_limit,
+                'max_limit': self.max_limit,
+                'in_flight': self._in_flight,
+                'throttles': self._throttles,
+                'successes': self._successes,
+                'decreases': self._decreases
+            }
+
+
+class RetryDispatcher:
+    """
+    Обработчик события needs-retry с бюджетами по операциям
+
+    Для каждой операции используется стандартная политика повторов botocore
+    с собственным max_attempts; дополнительно ограничивается общее время запроса.
+    """
+
+    def __init__(self,
+                 budgets: Optional[Dict[str, OperationBudget]] = None,
+                 governor: Optional[ConcurrencyGovernor] = None,
+                 service_name: str = 's3'):
+        self.budgets = dict(budgets or DEFAULT_OPERATION_BUDGETS)
+        self.budgets.setdefault('default', DEFAULT_OPERATION_BUDGETS['default'])
+        self.governor = governor
+        self.service_name = service_name
+
+        self._adapter = standard.RetryEventAdapter()
+        self._throttling = standard.ThrottlingErrorDetector(self._adapter)
+        self._quota = standard.RetryQuotaChecker(quota.RetryQuota(), self._throttling)
+        self._handlers: Dict[str, standard.RetryHandler] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def budget_for(self, operation_name: str) -> OperationBudget:
+        """Бюджет операции"""
+        return self.budgets.get(operation_name, self.budgets['default'])
+
+    def _handler_for(self, operation_name: str) -> standard.RetryHandler:
+        with self._lock:
+            handler = self._handlers.get(operation_name)
+            if handler is None:
+                handler = standard.RetryHandler(
+                    retry_policy=standard.RetryPolicy(
+                        retry_checker=standard.StandardRetryConditions(
+                            max_attempts=self.budget_for(operation_name).max_attempts
+                        ),
+                        retry_backoff=standard.ExponentialBackoff(
+                            service_name=self.service_name,
+                            throttling_detector=self._throttling
+                        )
+                    ),
+                    retry_event_adapter=self._adapter,
+                    retry_quota=self._quota,
+                    service_name=self.service_name
+                )
+                self._handlers[operation_name] = handler
+            return handler
+
+    def _count(self, operation_name: str, field: str) -> None:
+        with self._lock:
+            stats = self._stats.setdefault(
+                operation_name, {'attempts': 0, 'retries': 0, 'throttles': 0, 'exhausted': 0}
+            )
+            stats[field] += 1
+
+    def needs_retry(self, **kwargs) -> Optional[float]:
+        """Обработчик события needs-retry.<service>"""
+        operation_name = kwargs['operation'].name
+        request_context = kwargs['request_dict'].setdefault('context', {})
+        started = request_context.setdefault('comfyui_retry_started', time.monotonic())
+        self._count(operation_name, 'attempts')
+
+        throttled = self._throttling.is_throttling_error(**kwargs)
+        if throttled:
+            self._count(operation_name, 'throttles')
+            THROTTLES.labels(self.service_name, operation_name).inc()
+        if self.governor:
+            if throttled:
+                self.governor.on_throttle()
+            elif kwargs.get('caught_exception') is None:
+                self.governor.on_success()
+
+        delay = self._handler_for(operation_name).needs_retry(**kwargs)
+        if delay is None:
+            response = kwargs.get('response')
+            failed = kwargs.get('caught_exception') is not None or (
+                response is not None and response[0].status_code >= 500
+            )
+            if failed:
+                self._count(operation_name, 'exhausted')
+            return None
+
+        # Общий бюджет времени на операцию
+        budget = self.budget_for(operation_name)
+        if time.monotonic() - started + delay > budget.max_seconds:
+            self._count(operation_name, 'exhausted')
+            return None
+
+        self._count(operation_name, 'retries')
+        RETRIES.labels(self.service_name, operation_name).inc()
+        return delay
+
+    def release_quota(self, **kwargs) -> None:
+        """Обработчик события after-call: возврат квоты повторов"""
+        self._quota.release_retry_quota(**kwargs)
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Счетчики попыток по операциям"""
+        with self._lock:
+            return {name: dict(stats) for name, stats in self._stats.items()}
+
+    def state(self) -> Dict[str, Any]:
+        """Бюджеты и счетчики"""
+        return {
+            'budgets': {name: asdict(budget) for name, budget in self.budgets.items()},
+            'operations': self.stats()
+        }
+
+
+def install_retry_dispatcher(client,
+                             budgets: Optional[Dict[str, OperationBudget]] = None,
+                             governor: Optional[ConcurrencyGovernor] = None) -> RetryDispatcher:
+    """
+    Замена стандартного обработчика повторов клиента на диспетчер с бюджетами
+
+    Адаптивный ограничитель частоты botocore (если включен) продолжает работать.
+
+    Args:
+        client: Клиент boto3
+        budgets: Бюджеты операций
+        governor: Регулятор параллелизма, получающий сигналы throttling
+
+    Returns:
+        Установленный диспетчер
+    """
+    service_name = client.meta.service_model.service_id.hyphenize()
+    dispatcher = RetryDispatcher(budgets, governor, service_name=service_name)
+    events = client.meta.events
+    events.unregister(f'needs-retry.{service_name}', unique_id=f'retry-config-{service_name}')
+    events.register(
+        f'needs-retry.{service_name}',
+        dispatcher.needs_retry,
+        unique_id=f'retry-config-{service_name}'
+    )
+    events.register(f'after-call.{service_name}', dispatcher.release_quota)
+    return dispatcher
@@ -9,16 +9,369 @@ S3 Storage Manager для ComfyUI
 
 import os
 import boto3
+from boto3.s3.transfer import TransferConfig
 import json
+import base64
+import contextvars
+import gzip
 import hashlib
-from datetime import datetime
-from typing import Dict, List, Optional, Tuple, Union
+import heapq
+import math
+import mimetypes
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
 from botocore.exceptions import ClientError, NoCredentialsError
 import logging
 
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)
+try:
+    from .workflow_serialization import (
+        BINARY_EXTENSION, decode_workflow_binary, is_binary_workflow, workflow_to_binary
+    )
+except ImportError:
+    from workflow_serialization import (
+        BINARY_EXTENSION, decode_workflow_binary, is_binary_workflow, workflow_to_binary
+    )
+
+try:
+    from .s3_metadata_index import S3MetadataIndex
+    from .s3_key_generator import KeyGenerator
+    from .s3_tensor_format import TENSOR_CONTENT_TYPE, TENSOR_EXTENSION, load_tensor, tensor_stream
+    from .s3_url_cache import PresignedUrlCache, shared_url_cache
+    from .s3_retry import (
+        ConcurrencyGovernor, OperationBudget, install_retry_dispatcher, make_client_config
+    )
+    from .structured_logging import EventLogger, configure_logging
+    from .metrics import instrumented, record_bytes, record_cache
+except ImportError:
+    from s3_metadata_index import S3MetadataIndex
+    from s3_key_generator import KeyGenerator
+    from s3_tensor_format import TENSOR_CONTENT_TYPE, TENSOR_EXTENSION, load_tensor, tensor_stream
+    from s3_url_cache import PresignedUrlCache, shared_url_cache
+    from s3_retry import (
+        ConcurrencyGovernor, OperationBudget, install_retry_dispatcher, make_client_config
+    )
+    from structured_logging import EventLogger, configure_logging
+    from metrics import instrumented, record_bytes, record_cache
+
+# Сжатие zstd (опционально)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Логгер модуля (корневой логгер настраивается только в точке входа)
 logger = logging.getLogger(__name__)
+# События по отдельным объектам пишутся с выборкой, итоги пакетов - целиком
+events = EventLogger(logger)
+
+# Ключ пользовательских метаданных S3 с алгоритмом сжатия объекта
+COMPRESSION_METADATA_KEY = 'comfyui-compression'
+COMPRESSION_ALGORITHMS = ('gzip', 'zstd')
+_DEFAULT_COMPRESSION_LEVELS = {'gzip': 6, 'zstd': 3}
+_GZIP_MAGIC = b'\x1f\x8b'
+_ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+# Максимальное число ключей в одном запросе DeleteObjects
+DELETE_BATCH_SIZE = 1000
+# Резервные копии: манифест, указатель на последнюю копию и порог multipart-копирования
+BACKUP_MANIFEST_NAME = '_manifest.json'
+LATEST_BACKUP_POINTER_KEY = 'comfyui/backups/latest.json'
+BACKUP_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+BACKUP_MULTIPART_CHUNKSIZE = 64 * 1024 * 1024
+# Префикс ID правил жизненного цикла, которыми управляет менеджер
+LIFECYCLE_RULE_PREFIX = 'comfyui-retention-'
+# Интервал автоматического сканирования листинга для индекса метаданных (секунды)
+METADATA_SCAN_INTERVAL = 3600
+# Дедупликация загрузок: адресуемые по содержимому ключи и ссылки-псевдонимы
+CONTENT_PREFIX = 'comfyui/images/sha256/'
+CONTENT_HASH_METADATA_KEY = 'content_sha256'
+ALIAS_METADATA_KEY = 'comfyui-alias-of'
+DEDUP_MODES = ('skip', 'alias')
+HASH_CHUNK_SIZE = 1024 * 1024
+# Прямые загрузки клиентов по подписанным PUT/POST и multipart URL
+DIRECT_UPLOAD_METHODS = ('put', 'post')
+MULTIPART_MIN_PART_SIZE = 5 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10_000
+DIRECT_UPLOAD_PART_SIZE = 16 * 1024 * 1024
+# Миниатюры: параллельный префикс, форматы и поля метаданных со ссылками на них
+THUMBNAIL_PREFIX = 'comfyui/thumbnails/'
+THUMBNAIL_FORMATS = {'webp': ('WEBP', '.webp', 'image/webp'), 'jpeg': ('JPEG', '.jpg', 'image/jpeg')}
+THUMBNAIL_SIZES_METADATA_KEY = 'thumbnail_sizes'
+THUMBNAIL_FORMAT_METADATA_KEY = 'thumbnail_format'
+# Локальный кэш скачанных тензоров (читаются через memmap)
+DEFAULT_TENSOR_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'comfyui-s3-tensors')
+
+
+@dataclass
+class RetentionPolicy:
+    """Политика хранения объектов под префиксом"""
+    prefix: str
+    max_age_days: Optional[int] = None
+    max_count: Optional[int] = None
+    max_bytes: Optional[int] = None
+
+
+# Политики по умолчанию для служебных префиксов
+DEFAULT_RETENTION_POLICIES = [
+    RetentionPolicy(prefix='comfyui/temp/', max_age_days=1),
+    RetentionPolicy(prefix='comfyui/backups/', max_age_days=30),
+]
+
+
+def encode_metadata_value(value: Any) -> str:
+    """
+    Значение пользовательских метаданных S3 (только ASCII строки)
+    
+    Не-ASCII значения кодируются как encoded-word RFC 2047 (=?UTF-8?B?...?=).
+    """
+    text = str(value)
+    if text.isascii():
+        return text
+    return f"=?UTF-8?B?{base64.b64encode(text.encode('utf-8')).decode('ascii')}?="
+
+
+def decode_metadata_value(value: str) -> str:
+    """Обратное преобразование для encode_metadata_value"""
+    if value.startswith('=?UTF-8?B?') and value.endswith('?='):
+        try:
+            return base64.b64decode(value[10:-2]).decode('utf-8')
+        except ValueError:
+            return value
+    return value
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    SHA-256 содержимого файла, вычисляемый потоково по частям
+    
+    Args:
+        path: Путь к файлу
+        chunk_size: Размер читаемой части в байтах
+        
+    Returns:
+        Шестнадцатеричный дайджест
+    """
+    digest = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_key(content_hash: str, extension: str = '') -> str:
+    """Ключ объекта, адресуемый по содержимому"""
+    return f"{CONTENT_PREFIX}{content_hash[:2]}/{content_hash}{extension.lower()}"
+
+
+def thumbnail_key(s3_key: str, size: int, thumbnail_format: str = 'webp') -> str:
+    """
+    Ключ миниатюры изображения
+    
+    comfyui/images/<путь>.png -> comfyui/thumbnails/<size>/<путь>.webp
+    
+    Args:
+        s3_key: Ключ изображения
+        size: Максимальная сторона миниатюры в пикселях
+        thumbnail_format: Формат миниатюры ('webp' или 'jpeg')
+        
+    Returns:
+        Ключ миниатюры
+    """
+    relative = s3_key[len('comfyui/images/'):] if s3_key.startswith('comfyui/images/') else s3_key
+    return f"{THUMBNAIL_PREFIX}{size}/{os.path.splitext(relative)[0]}{THUMBNAIL_FORMATS[thumbnail_format][1]}"
+
+
+@instrumented('encode', 'thumbnail')
+def encode_thumbnail(image, size: int, thumbnail_format: str = 'webp', quality: int = 80) -> bytes:
+    """
+    Кодирование миниатюры из декодированного изображения PIL
+    
+    Args:
+        image: Изображение PIL (не изменяется)
+        size: Максимальная сторона миниатюры в пикселях
+        thumbnail_format: Формат миниатюры ('webp' или 'jpeg')
+        quality: Качество сжатия
+        
+    Returns:
+        Байты миниатюры
+    """
+    import io
+    from PIL import Image
+    
+    pil_format = THUMBNAIL_FORMATS[thumbnail_format][0]
+    thumbnail = image.copy()
+    thumbnail.thumbnail((size, size), Image.LANCZOS, reducing_gap=2.0)
+    if thumbnail.mode not in ('RGB', 'RGBA') or (pil_format == 'JPEG' and thumbnail.mode != 'RGB'):
+        thumbnail = thumbnail.convert('RGB')
+    buffer = io.BytesIO()
+    thumbnail.save(buffer, pil_format, quality=quality)
+    return buffer.getvalue()
+
+
+class BloomFilter:
+    """
+    Фильтр Блума для SHA-256 дайджестов
+    
+    Отрицательный ответ точен, положительный требует проверки (HEAD).
+    Позиции битов берутся из самого дайджеста (двойное хэширование).
+    """
+    
+    def __init__(self, capacity: int = 1_000_000, error_rate: float = 0.01):
+        """
+        Инициализация фильтра
+        
+        Args:
+            capacity: Ожидаемое число элементов
+            error_rate: Допустимая доля ложных срабатываний
+        """
+        self.size = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, hex_digest: str) -> Iterator[int]:
+        h1 = int(hex_digest[:16], 16)
+        h2 = int(hex_digest[16:32], 16) | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+    
+    def add(self, hex_digest: str) -> None:
+        """Добавление дайджеста"""
+        for position in self._positions(hex_digest):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, hex_digest: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(hex_digest))
+
+
+def compress_body(data: bytes, algorithm: str, level: Optional[int] = None) -> bytes:
+    """
+    Сжатие тела объекта
+    
+    Args:
+        data: Исходные данные
+        algorithm: Алгоритм сжатия ('gzip' или 'zstd')
+        level: Уровень сжатия (по умолчанию - стандартный для алгоритма)
+        
+    Returns:
+        Сжатые данные
+    """
+    if level is None:
+        level = _DEFAULT_COMPRESSION_LEVELS.get(algorithm)
+    
+    if algorithm == 'gzip':
+        # mtime=0 делает результат детерминированным
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ValueError("Для сжатия zstd установите пакет zstandard")
+        return zstandard.ZstdCompressor(level=level).compress(data)
+    raise ValueError(f"Неизвестный алгоритм сжатия: {algorithm}")
+
+
+def decompress_body(data: bytes, algorithm: Optional[str] = None) -> bytes:
+    """
+    Распаковка тела объекта
+    
+    Args:
+        data: Данные объекта
+        algorithm: Алгоритм сжатия (если не указан, определяется по сигнатуре)
+        
+    Returns:
+        Распакованные данные (или исходные, если данные не сжаты)
+    """
+    if algorithm is None:
+        if data.startswith(_GZIP_MAGIC):
+            algorithm = 'gzip'
+        elif data.startswith(_ZSTD_MAGIC):
+            algorithm = 'zstd'
+        else:
+            return data
+    
+    if algorithm == 'gzip':
+        return gzip.decompress(data)
+    if algorithm == 'zstd':
+        if zstandard is None:
+            raise ValueError("Для распаковки zstd установите пакет zstandard")
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    raise ValueError(f"Неизвестный алгоритм сжатия: {algorithm}")
+
+
+def _count_uploaded(amount: int) -> None:
+    """Callback загрузки boto3: учет переданных байтов"""
+    record_bytes('s3', 'upload', amount)
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    Разбиение потока элементов на пакеты без материализации всего потока
+    
+    Args:
+        items: Итератор элементов
+        batch_size: Размер пакета
+        
+    Returns:
+        Итератор списков элементов
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def bounded_map(func: Callable[[Any], Any],
+                items: Iterable[Any],
+                max_workers: int = 8,
+                governor: Optional[ConcurrencyGovernor] = None) -> Iterator[Any]:
+    """
+    Параллельное выполнение func для потока элементов с ограничением числа задач в работе
+    
+    В отличие от ThreadPoolExecutor.map, элементы читаются из итератора по мере
+    освобождения потоков, поэтому память ограничена числом задач в работе.
+    Результаты выдаются в порядке завершения. Задачи выполняются в контексте
+    вызывающего потока (contextvars), поэтому попадают в span узла трассировки.
+    
+    Args:
+        func: Выполняемая функция
+        items: Итератор аргументов
+        max_workers: Число потоков
+        governor: Регулятор, ограничивающий число одновременно выполняемых func
+        
+    Returns:
+        Итератор результатов
+    """
+    iterator = iter(items)
+    max_in_flight = max_workers * 2
+    
+    if governor is not None:
+        unguarded = func
+        
+        def func(item):
+            with governor.slot():
+                return unguarded(item)
+    
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = set()
+        for item in iterator:
+            in_flight.add(executor.submit(contextvars.copy_context().run, func, item))
+            if len(in_flight) >= max_in_flight:
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+        
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield future.result()
 
 
 class S3StorageManager:
@@ -31,7 +384,19 @@ class S3StorageManager:
                  aws_access_key_id: Optional[str] = None,
                  aws_secret_access_key: Optional[str] = None,
                  region_name: str = 'us-east-1',
-                 endpoint_url: Optional[str] = None):
+                 endpoint_url: Optional[str] = None,
+                 compression: Optional[str] = 'gzip',
+                 compression_level: Optional[int] = None,
+                 metadata_index: bool = True,
+                 metadata_cache_dir: Optional[str] = None,
+                 deduplicate: Optional[str] = None,
+                 key_generator: Optional[KeyGenerator] = None,
+                 operation_budgets: Optional[Dict[str, OperationBudget]] = None,
+                 max_concurrency: int = 32,
+                 url_cache: Optional[PresignedUrlCache] = None,
+                 thumbnail_sizes: Sequence[int] = (),
+                 thumbnail_format: str = 'webp',
+                 thumbnail_quality: int = 80):
         """
         Инициализация S3 менеджера
         
@@ -41,9 +406,39 @@ class S3StorageManager:
             aws_secret_access_key: AWS Secret Access Key
             region_name: AWS регион
             endpoint_url: URL эндпоинта (для совместимости с MinIO и др.)
+            compression: Сжатие workflow и резервных копий ('gzip', 'zstd' или None)
+            compression_level: Уровень сжатия (по умолчанию - стандартный для алгоритма)
+            metadata_index: Вести индекс метаданных в comfyui/metadata/
+            metadata_cache_dir: Директория локального кэша индекса
+            deduplicate: Дедупликация загрузок по SHA-256 ('skip', 'alias'; None - отключена)
+            key_generator: Генератор ключей (по умолчанию - по настройкам config/settings.py)
+            operation_budgets: Бюджеты повторов по операциям S3 (по умолчанию DEFAULT_OPERATION_BUDGETS)
+            max_concurrency: Максимальный параллелизм массовых операций
+            url_cache: Кэш подписанных URL (по умолчанию общий для всех менеджеров)
+            thumbnail_sizes: Размеры миниатюр, создаваемых при загрузке (по умолчанию не создаются)
+            thumbnail_format: Формат миниатюр ('webp' или 'jpeg')
+            thumbnail_quality: Качество сжатия миниатюр
         """
+        if compression and compression not in COMPRESSION_ALGORITHMS:
+            raise ValueError(f"Неизвестный алгоритм сжатия: {compression}")
+        if deduplicate and deduplicate not in DEDUP_MODES:
+            raise ValueError(f"Неизвестный режим дедупликации: {deduplicate}")
+        if thumbnail_format not in THUMBNAIL_FORMATS:
+            raise ValueError(f"Неизвестный формат миниатюр: {thumbnail_format}")
+        
         self.bucket_name = bucket_name
         self.region_name = region_name
+        self.compression = compression or None
+        self.compression_level = compression_level
+        self.deduplicate = deduplicate or None
+        self.key_generator = key_generator or KeyGenerator.from_settings()
+        self.url_cache = url_cache or shared_url_cache
+        self.endpoint_url = endpoint_url
+        self.thumbnail_sizes = tuple(thumbnail_sizes)
+        self.thumbnail_format = thumbnail_format
+        self.thumbnail_quality = thumbnail_quality
+        self._content_filter: Optional[BloomFilter] = None
+        self._content_filter_lock = threading.Lock()
         
         # Получение учетных данных
         self.aws_access_key_id = aws_access_key_id or os.getenv('AWS_ACCESS_KEY_ID')
@@ -58,7 +453,14 @@ class S3StorageManager:
             aws_access_key_id=self.aws_access_key_id,
             aws_secret_access_key=self.aws_secret_access_key,
             region_name=self.region_name,
-            endpoint_url=endpoint_url
+            endpoint_url=endpoint_url,
+            config=make_client_config(operation_budgets)
+        )
+        
+        # Повторы с бюджетами по операциям и регулятор параллелизма
+        self.governor = ConcurrencyGovernor(max_limit=max_concurrency)
+        self.retry_dispatcher = install_retry_dispatcher(
+            self.s3_client, operation_budgets, self.governor
         )
         
         # Проверка доступности bucket
@@ -66,6 +468,14 @@ class S3StorageManager:
         
         # Создание структуры папок
         self._create_folder_structure()
+        
+        # Индекс метаданных (поиск без HEAD-запросов к каждому объекту)
+        self.metadata_index = None
+        self._last_index_scan = 0.0
+        if metadata_index:
+            self.metadata_index = S3MetadataIndex(
+                self.s3_client, self.bucket_name, cache_dir=metadata_cache_dir
+            )
     
     def _check_bucket_access(self) -> bool:
         """Проверка доступа к bucket"""
@@ -90,7 +500,8 @@ class S3StorageManager:
             'comfyui/workflows/',
             'comfyui/metadata/',
             'comfyui/temp/',
-            'comfyui/backups/'
+            'comfyui/backups/',
+            'comfyui/thumbnails/'
         ]
         
         for folder in folders:
@@ -104,50 +515,209 @@ class S3StorageManager:
             except ClientError as e:
                 logger.warning(f"⚠️ Не удалось создать папку {folder}: {e}")
     
+    def _load_content_filter(self) -> BloomFilter:
+        """Фильтр Блума известных дайджестов, заполняемый листингом CONTENT_PREFIX"""
+        with self._content_filter_lock:
+            if self._content_filter is None:
+                content_filter = BloomFilter()
+                for obj in self.iter_objects(CONTENT_PREFIX):
+                    digest = os.path.splitext(os.path.basename(obj['Key']))[0]
+                    if len(digest) == 64:
+                        content_filter.add(digest)
+                self._content_filter = content_filter
+                logger.info(f"🧮 Фильтр дедупликации: {content_filter.count} объектов")
+            return self._content_filter
+    
+    def _content_exists(self, content_hash: str, extension: str) -> bool:
+        """
+        Проверка наличия объекта с таким содержимым
+        
+        Отрицательный ответ фильтра Блума не требует запросов к S3;
+        положительный подтверждается HEAD-запросом.
+        """
+        if content_hash not in self._load_content_filter():
+            return False
+        try:
+            self.s3_client.head_object(Bucket=self.bucket_name, Key=content_key(content_hash, extension))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+    
+    def _start_thumbnails(self,
+                          executor: ThreadPoolExecutor,
+                          s3_key: str,
+                          image,
+                          image_path: str,
+                          sizes: Sequence[int],
+                          thumbnail_format: str) -> Dict[int, Any]:
+        """Запуск параллельного кодирования и загрузки миниатюр"""
+        if image is None:
+            from PIL import Image
+            image = Image.open(image_path)
+            # JPEG декодируется сразу в уменьшенном масштабе
+            image.draft('RGB', (max(sizes), max(sizes)))
+            image.load()
+        
+        content_type = THUMBNAIL_FORMATS[thumbnail_format][2]
+        
+        def upload(size: int) -> str:
+            key = thumbnail_key(s3_key, size, thumbnail_format)
+            body = encode_thumbnail(image, size, thumbnail_format, self.thumbnail_quality)
+            self.s3_client.put_object(
+                Bucket=self.bucket_name,
+                Key=key,
+                Body=body,
+                ContentType=content_type
+            )
+            record_bytes('s3', 'upload', len(body))
+            return key
+        
+        return {size: executor.submit(contextvars.copy_context().run, upload, size) for size in sizes}
+    
+    def _discard_thumbnails(self, futures: Dict[int, Any]) -> None:
+        """Отмена миниатюр неудавшейся загрузки и удаление уже записанных"""
+        written = []
+        for future in futures.values():
+            if future.cancel():
+                continue
+            try:
+                written.append(future.result())
+            except Exception:
+                continue
+        if written:
+            result = self._delete_batch(written)
+            if result['errors']:
+                logger.warning(f"⚠️ Не удалось удалить миниатюры: {[e['key'] for e in result['errors']]}")
+    
+    @instrumented('s3')
     def upload_image(self, 
                     image_path: str, 
                     s3_key: Optional[str] = None,
-                    metadata: Optional[Dict] = None) -> Dict:
+                    metadata: Optional[Dict] = None,
+                    image=None,
+                    thumbnail_sizes: Optional[Sequence[int]] = None,
+                    thumbnail_format: Optional[str] = None) -> Dict:
         """
         Загрузка изображения в S3
         
+        При включенной дедупликации изображения без явного ключа хранятся под ключом
+        comfyui/images/sha256/<xx>/<sha256><ext>: повторная загрузка тех же байтов
+        пропускается и возвращает тот же ключ. Для явного ключа в режиме 'alias'
+        дубликат сохраняется пустым объектом-ссылкой на существующее содержимое.
+        
+        Миниатюры (thumbnail_sizes) кодируются параллельно с загрузкой оригинала
+        и сохраняются под comfyui/thumbnails/<size>/; их размеры и формат
+        записываются в метаданные изображения.
+        
         Args:
             image_path: Путь к локальному файлу изображения
             s3_key: Ключ в S3 (если не указан, генерируется автоматически)
             metadata: Дополнительные метаданные
+            image: Уже декодированное изображение PIL (чтобы не читать файл повторно)
+            thumbnail_sizes: Размеры миниатюр (по умолчанию - заданные в менеджере)
+            thumbnail_format: Формат миниатюр (по умолчанию - заданный в менеджере)
             
         Returns:
             Dict с информацией о загруженном файле
         """
+        thumbnail_executor = None
+        thumbnail_futures = {}
         try:
             if not os.path.exists(image_path):
                 raise FileNotFoundError(f"Файл не найден: {image_path}")
+            thumbnail_format = thumbnail_format or self.thumbnail_format
+            if thumbnail_format not in THUMBNAIL_FORMATS:
+                raise ValueError(f"Неизвестный формат миниатюр: {thumbnail_format}")
             
-            # Генерация ключа S3 если не указан
-            if not s3_key:
-                filename = os.path.basename(image_path)
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                s3_key = f"comfyui/images/{timestamp}_{filename}"
+            extension = os.path.splitext(image_path)[1].lower()
             
             # Подготовка метаданных
             file_metadata = {
-                'upload_time': datetime.now().isoformat(),
+                'upload_time': datetime.now(timezone.utc).isoformat(),
                 'original_path': image_path,
                 'file_size': os.path.getsize(image_path),
-                'file_type': os.path.splitext(image_path)[1].lower()
+                'file_type': extension
             }
             
             if metadata:
                 file_metadata.update(metadata)
             
-            # Загрузка файла
-            with open(image_path, 'rb') as file:
-                self.s3_client.upload_fileobj(
-                    file,
-                    self.bucket_name,
-                    s3_key,
-                    ExtraArgs={'Metadata': file_metadata}
+            # Дедупликация по содержимому
+            duplicate = False
+            alias_of = None
+            if self.deduplicate:
+                content_hash = hash_file(image_path)
+                file_metadata[CONTENT_HASH_METADATA_KEY] = content_hash
+                canonical_key = content_key(content_hash, extension)
+                
+                if not s3_key:
+                    s3_key = canonical_key
+                    duplicate = self._content_exists(content_hash, extension)
+                    record_cache('dedup', duplicate)
+                elif s3_key != canonical_key and self.deduplicate == 'alias':
+                    if self._content_exists(content_hash, extension):
+                        alias_of = canonical_key
+            
+            # Генерация ключа S3 если не указан
+            if not s3_key:
+                s3_key = self.key_generator.key('comfyui/images/', os.path.basename(image_path))
+            
+            # Миниатюры кодируются и загружаются параллельно с оригиналом
+            if thumbnail_sizes is None:
+                thumbnail_sizes = self.thumbnail_sizes
+            thumbnail_sizes = sorted(set(thumbnail_sizes)) if not duplicate else []
+            if thumbnail_sizes:
+                file_metadata[THUMBNAIL_SIZES_METADATA_KEY] = ','.join(str(size) for size in thumbnail_sizes)
+                file_metadata[THUMBNAIL_FORMAT_METADATA_KEY] = thumbnail_format
+                thumbnail_executor = ThreadPoolExecutor(max_workers=min(len(thumbnail_sizes), os.cpu_count() or 4))
+                thumbnail_futures = self._start_thumbnails(
+                    thumbnail_executor, s3_key, image, image_path, thumbnail_sizes, thumbnail_format
+                )
+            
+            # Значения метаданных S3 - ASCII строки
+            s3_metadata = {k: encode_metadata_value(v) for k, v in file_metadata.items()}
+            
+            if duplicate:
+                events.sampled(logging.INFO, 'image_deduplicated', "♻️ Изображение уже загружено: %s", s3_key, key=s3_key)
+            elif alias_of:
+                # Пустой объект-ссылка вместо повторной копии байтов
+                file_metadata[ALIAS_METADATA_KEY] = alias_of
+                s3_metadata[ALIAS_METADATA_KEY] = alias_of
+                self.s3_client.put_object(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    Body=b'',
+                    Metadata=s3_metadata
                 )
+            else:
+                # Загрузка файла
+                with open(image_path, 'rb') as file:
+                    self.s3_client.upload_fileobj(
+                        file,
+                        self.bucket_name,
+                        s3_key,
+                        ExtraArgs={'Metadata': s3_metadata},
+                        Callback=_count_uploaded
+                    )
+                
+                if s3_key.startswith(CONTENT_PREFIX) and self._content_filter is not None:
+                    self._content_filter.add(file_metadata[CONTENT_HASH_METADATA_KEY])
+            
+            thumbnails = {}
+            if thumbnail_executor is not None:
+                for size, future in thumbnail_futures.items():
+                    try:
+                        thumbnails[size] = future.result()
+                    except Exception as e:
+                        logger.warning(f"⚠️ Не удалось создать миниатюру {size}px для {s3_key}: {e}")
+                thumbnail_futures = {}
+                # В индекс попадают только успешно загруженные миниатюры
+                file_metadata[THUMBNAIL_SIZES_METADATA_KEY] = ','.join(str(size) for size in thumbnails)
+            
+            if not duplicate:
+                self._index_metadata(s3_key, file_metadata)
             
             # Получение URL
             url = self.get_file_url(s3_key)
@@ -157,20 +727,56 @@ class S3StorageManager:
                 's3_key': s3_key,
                 'url': url,
                 'metadata': file_metadata,
-                'message': f"Изображение успешно загружено: {s3_key}"
+                'deduplicated': duplicate or bool(alias_of),
+                'thumbnails': {size: self.get_file_url(key) for size, key in thumbnails.items()},
+                'message': (f"Изображение уже загружено: {s3_key}" if duplicate
+                            else f"Изображение успешно загружено: {s3_key}")
             }
             
-            logger.info(f"✅ Загружено изображение: {s3_key}")
+            if not duplicate:
+                events.sampled(logging.INFO, 'image_uploaded', "✅ Загружено изображение: %s", s3_key, key=s3_key)
             return result
             
         except Exception as e:
             logger.error(f"❌ Ошибка загрузки изображения: {e}")
+            # Миниатюры без оригинала не нужны
+            if thumbnail_futures:
+                self._discard_thumbnails(thumbnail_futures)
             return {
                 'success': False,
                 'error': str(e),
                 'message': f"Ошибка загрузки изображения: {e}"
             }
+        finally:
+            if thumbnail_executor is not None:
+                thumbnail_executor.shutdown(cancel_futures=True)
+    
+    def _get_image_object(self, s3_key: str) -> Dict:
+        """GET изображения с переходом по ссылке-псевдониму дедупликации"""
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+        alias_of = response.get('Metadata', {}).get(ALIAS_METADATA_KEY)
+        if alias_of:
+            # Объект-ссылка дедупликации: содержимое хранится под другим ключом
+            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=alias_of)
+        return response
+    
+    @instrumented('s3')
+    def read_image(self, s3_key: str) -> bytes:
+        """
+        Чтение изображения из S3 в память без записи на диск
+        
+        Args:
+            s3_key: Ключ файла в S3
+            
+        Returns:
+            Байты изображения (исключение при ошибке)
+        """
+        with self._get_image_object(s3_key)['Body'] as body:
+            data = body.read()
+        record_bytes('s3', 'download', len(data))
+        return data
     
+    @instrumented('s3')
     def download_image(self, 
                       s3_key: str, 
                       local_path: Optional[str] = None) -> Dict:
@@ -193,11 +799,18 @@ class S3StorageManager:
             # Создание директории если не существует
             os.makedirs(os.path.dirname(local_path), exist_ok=True)
             
-            # Скачивание файла
-            self.s3_client.download_file(self.bucket_name, s3_key, local_path)
+            # Скачивание файла одним GET (download_file делает дополнительный HEAD)
+            response = self._get_image_object(s3_key)
+            with open(local_path, 'wb') as file:
+                shutil.copyfileobj(response['Body'], file, 1024 * 1024)
+                record_bytes('s3', 'download', file.tell())
             
-            # Получение метаданных
-            metadata = self.get_file_metadata(s3_key)
+            # Получение метаданных из индекса, HEAD-запрос только при промахе
+            metadata = self.metadata_index.get(s3_key) if self.metadata_index else None
+            if metadata is None:
+                metadata = self.get_file_metadata(s3_key)
+                if metadata and self.metadata_index:
+                    self.metadata_index.record(s3_key, metadata, publish=False)
             
             result = {
                 'success': True,
@@ -207,7 +820,8 @@ class S3StorageManager:
                 'message': f"Изображение успешно скачано: {local_path}"
             }
             
-            logger.info(f"✅ Скачано изображение: {s3_key} -> {local_path}")
+            events.sampled(logging.INFO, 'image_downloaded', "✅ Скачано изображение: %s -> %s", s3_key, local_path,
+                           key=s3_key, path=local_path)
             return result
             
         except Exception as e:
@@ -218,15 +832,52 @@ class S3StorageManager:
                 'message': f"Ошибка скачивания изображения: {e}"
             }
     
+    def _thumbnail_variants(self, s3_key: str) -> Tuple[List[int], str]:
+        """
+        Размеры и формат миниатюр изображения
+        
+        Берутся из метаданных в локальном индексе (без запросов к S3); для
+        неизвестных индексу объектов - из настроек менеджера.
+        """
+        metadata = self.metadata_index.get(s3_key, refresh=False) if self.metadata_index else None
+        if metadata is None:
+            return sorted(self.thumbnail_sizes), self.thumbnail_format
+        sizes = str(metadata.get(THUMBNAIL_SIZES_METADATA_KEY, ''))
+        return ([int(size) for size in sizes.split(',') if size],
+                metadata.get(THUMBNAIL_FORMAT_METADATA_KEY, self.thumbnail_format))
+    
+    def get_thumbnail_url(self, s3_key: str, size: int, expires_in: int = 3600) -> Optional[str]:
+        """
+        URL миниатюры изображения
+        
+        Выбирается наименьшая миниатюра не меньше size (или наибольшая из имеющихся).
+        
+        Args:
+            s3_key: Ключ изображения
+            size: Желаемая максимальная сторона в пикселях
+            expires_in: Время жизни URL в секундах
+            
+        Returns:
+            URL или None, если миниатюр у изображения нет
+        """
+        sizes, thumbnail_format = self._thumbnail_variants(s3_key)
+        if not sizes:
+            return None
+        chosen = next((candidate for candidate in sizes if candidate >= size), sizes[-1])
+        return self.get_file_url(thumbnail_key(s3_key, chosen, thumbnail_format), expires_in)
+    
+    @instrumented('s3')
     def list_images(self, 
                    prefix: str = 'comfyui/images/',
-                   max_keys: int = 100) -> Dict:
+                   max_keys: int = 100,
+                   thumbnail_size: Optional[int] = None) -> Dict:
         """
         Список изображений в S3
         
         Args:
             prefix: Префикс для поиска
             max_keys: Максимальное количество ключей
+            thumbnail_size: Добавить thumbnail_url миниатюры этого размера
             
         Returns:
             Dict со списком файлов
@@ -241,12 +892,15 @@ class S3StorageManager:
             files = []
             if 'Contents' in response:
                 for obj in response['Contents']:
-                    files.append({
+                    file_info = {
                         'key': obj['Key'],
                         'size': obj['Size'],
                         'last_modified': obj['LastModified'].isoformat(),
                         'url': self.get_file_url(obj['Key'])
-                    })
+                    }
+                    if thumbnail_size:
+                        file_info['thumbnail_url'] = self.get_thumbnail_url(obj['Key'], thumbnail_size)
+                    files.append(file_info)
             
             result = {
                 'success': True,
@@ -266,6 +920,7 @@ class S3StorageManager:
                 'message': f"Ошибка получения списка файлов: {e}"
             }
     
+    @instrumented('s3')
     def delete_image(self, s3_key: str) -> Dict:
         """
         Удаление изображения из S3
@@ -277,7 +932,15 @@ class S3StorageManager:
             Dict с результатом операции
         """
         try:
+            # Миниатюры, известные индексу, удаляются вместе с изображением
+            if self.metadata_index and s3_key.startswith('comfyui/images/'):
+                sizes, thumbnail_format = self._thumbnail_variants(s3_key)
+                for size in sizes:
+                    self.s3_client.delete_object(
+                        Bucket=self.bucket_name, Key=thumbnail_key(s3_key, size, thumbnail_format)
+                    )
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=s3_key)
+            self._unindex_keys([s3_key])
             
             result = {
                 'success': True,
@@ -285,7 +948,7 @@ class S3StorageManager:
                 'message': f"Изображение удалено: {s3_key}"
             }
             
-            logger.info(f"🗑️ Удалено изображение: {s3_key}")
+            events.sampled(logging.INFO, 'image_deleted', "🗑️ Удалено изображение: %s", s3_key, key=s3_key)
             return result
             
         except Exception as e:
@@ -296,191 +959,1388 @@ class S3StorageManager:
                 'message': f"Ошибка удаления изображения: {e}"
             }
     
-    def get_file_url(self, s3_key: str, expires_in: int = 3600) -> str:
-        """
-        Получение URL для доступа к файлу
-        
-        Args:
-            s3_key: Ключ файла в S3
-            expires_in: Время жизни URL в секундах
-            
-        Returns:
-            URL для доступа к файлу
-        """
+    def _index_metadata(self, s3_key: str, metadata: Dict) -> None:
+        """Запись метаданных в индекс (ошибка индекса не прерывает загрузку)"""
+        if not self.metadata_index:
+            return
         try:
-            url = self.s3_client.generate_presigned_url(
-                'get_object',
-                Params={'Bucket': self.bucket_name, 'Key': s3_key},
-                ExpiresIn=expires_in
-            )
-            return url
+            self.metadata_index.record(s3_key, metadata)
         except Exception as e:
-            logger.error(f"❌ Ошибка генерации URL: {e}")
-            return ""
+            logger.warning(f"⚠️ Не удалось обновить индекс метаданных для {s3_key}: {e}")
     
-    def get_file_metadata(self, s3_key: str) -> Dict:
-        """
-        Получение метаданных файла
-        
-        Args:
-            s3_key: Ключ файла в S3
-            
-        Returns:
-            Dict с метаданными
-        """
+    def _unindex_keys(self, keys: List[str]) -> None:
+        """Пометка удаленных изображений в индексе метаданных"""
+        if not self.metadata_index:
+            return
+        keys = [key for key in keys if key.startswith('comfyui/images/')]
+        if not keys:
+            return
         try:
-            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
-            return response.get('Metadata', {})
+            self.metadata_index.remove_many(keys)
         except Exception as e:
-            logger.error(f"❌ Ошибка получения метаданных: {e}")
-            return {}
+            logger.warning(f"⚠️ Не удалось обновить индекс метаданных: {e}")
     
-    def save_workflow(self, 
-                     workflow_data: Dict, 
-                     workflow_name: Optional[str] = None) -> Dict:
+    @instrumented('s3')
+    def find_images(self,
+                    prompt: Optional[str] = None,
+                    model: Optional[str] = None,
+                    workflow_name: Optional[str] = None,
+                    limit: int = 100,
+                    refresh: bool = True) -> Dict:
         """
-        Сохранение workflow в S3
+        Поиск изображений по метаданным через индекс
         
         Args:
-            workflow_data: Данные workflow
+            prompt: Подстрока промпта
+            model: Модель генерации
             workflow_name: Название workflow
+            limit: Максимальное количество результатов
+            refresh: Синхронизировать индекс с S3 перед поиском
             
         Returns:
-            Dict с результатом операции
+            Dict со списком найденных файлов
         """
         try:
-            if not workflow_name:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                workflow_name = f"workflow_{timestamp}.json"
-            
-            s3_key = f"comfyui/workflows/{workflow_name}"
+            if not self.metadata_index:
+                raise RuntimeError("Индекс метаданных отключен")
+            if refresh:
+                self.metadata_index.sync()
             
-            # Сохранение workflow
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=json.dumps(workflow_data, indent=2),
-                ContentType='application/json'
-            )
+            files = [
+                {
+                    'key': item['key'],
+                    'metadata': item['metadata'],
+                    'url': self.get_file_url(item['key'])
+                }
+                for item in self.metadata_index.find(
+                    prompt=prompt, model=model, workflow_name=workflow_name, limit=limit
+                )
+            ]
             
-            result = {
+            logger.info(f"🔍 Найдено по метаданным: {len(files)} файлов")
+            return {
                 'success': True,
-                's3_key': s3_key,
-                'workflow_name': workflow_name,
-                'message': f"Workflow сохранен: {s3_key}"
+                'files': files,
+                'count': len(files),
+                'message': f"Найдено {len(files)} файлов"
             }
             
-            logger.info(f"💾 Сохранен workflow: {s3_key}")
-            return result
-            
         except Exception as e:
-            logger.error(f"❌ Ошибка сохранения workflow: {e}")
+            logger.error(f"❌ Ошибка поиска по метаданным: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'message': f"Ошибка сохранения workflow: {e}"
+                'message': f"Ошибка поиска по метаданным: {e}"
             }
     
-    def load_workflow(self, workflow_name: str) -> Dict:
+    @instrumented('s3')
+    def scan_metadata_index(self,
+                            prefix: str = 'comfyui/images/',
+                            max_workers: int = 16) -> Dict:
         """
-        Загрузка workflow из S3
+        Дополнение индекса объектами, загруженными в обход менеджера
+        
+        Листинг префикса сравнивается с локальным кэшем, HEAD-запросы выполняются
+        только для объектов, которых еще нет в индексе.
         
         Args:
-            workflow_name: Название workflow
+            prefix: Префикс изображений
+            max_workers: Число параллельных HEAD-запросов
             
         Returns:
-            Dict с данными workflow
+            Dict со статистикой сканирования
         """
         try:
-            s3_key = f"comfyui/workflows/{workflow_name}"
+            if not self.metadata_index:
+                raise RuntimeError("Индекс метаданных отключен")
+            self.metadata_index.sync()
             
-            response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
-            workflow_data = json.loads(response['Body'].read().decode('utf-8'))
+            def fetch(key: str) -> Tuple[str, Dict]:
+                return key, self.get_file_metadata(key)
             
-            result = {
+            listed = 0
+            added = 0
+            for batch in iter_batches((obj['Key'] for obj in self.iter_objects(prefix)
+                                       if not obj['Key'].endswith('/')), DELETE_BATCH_SIZE):
+                listed += len(batch)
+                unknown = self.metadata_index.unknown_keys(batch)
+                # Найденные метаданные публикуются одной пачкой на страницу листинга
+                found = [(key, metadata) for key, metadata in bounded_map(fetch, unknown, max_workers, self.governor)
+                         if metadata]
+                self.metadata_index.record_many(found)
+                added += len(found)
+            
+            self._last_index_scan = time.monotonic()
+            events.event(logging.INFO, 'index_scanned', "🔎 Сканирование индекса: %d объектов, добавлено %d",
+                         listed, added, listed=listed, added=added)
+            return {
                 'success': True,
-                'workflow_data': workflow_data,
-                's3_key': s3_key,
-                'message': f"Workflow загружен: {s3_key}"
+                'listed': listed,
+                'added': added,
+                'message': f"Добавлено в индекс: {added} из {listed} объектов"
             }
             
-            logger.info(f"📂 Загружен workflow: {s3_key}")
-            return result
-            
         except Exception as e:
-            logger.error(f"❌ Ошибка загрузки workflow: {e}")
+            logger.error(f"❌ Ошибка сканирования индекса метаданных: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'message': f"Ошибка загрузки workflow: {e}"
+                'message': f"Ошибка сканирования индекса метаданных: {e}"
             }
     
-    def backup_images(self, backup_name: Optional[str] = None) -> Dict:
+    @instrumented('s3')
+    def search_images(self,
+                      query: Optional[str] = None,
+                      model: Optional[str] = None,
+                      workflow_name: Optional[str] = None,
+                      since: Optional[Union[datetime, str]] = None,
+                      until: Optional[Union[datetime, str]] = None,
+                      limit: int = 100,
+                      scan: Optional[bool] = None) -> Dict:
         """
-        Создание резервной копии всех изображений
+        Поиск изображений по словам промпта, модели, workflow и времени загрузки
         
         Args:
-            backup_name: Название резервной копии
+            query: Слова промпта (должны встречаться все, регистр не важен)
+            model: Модель генерации
+            workflow_name: Название workflow
+            since: Начало интервала upload_time (включительно)
+            until: Конец интервала upload_time (не включительно)
+            limit: Максимальное количество результатов
+            scan: Сканировать листинг перед поиском (None - раз в METADATA_SCAN_INTERVAL)
             
         Returns:
-            Dict с результатом операции
+            Dict со списком найденных файлов
         """
         try:
-            if not backup_name:
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                backup_name = f"backup_{timestamp}"
+            if not self.metadata_index:
+                raise RuntimeError("Индекс метаданных отключен")
             
-            # Получение списка всех изображений
-            images_list = self.list_images()
-            if not images_list['success']:
-                return images_list
-            
-            backup_data = {
-                'backup_name': backup_name,
-                'created_at': datetime.now().isoformat(),
-                'images_count': len(images_list['files']),
-                'images': images_list['files']
-            }
+            if scan is None:
+                scan = time.monotonic() - self._last_index_scan >= METADATA_SCAN_INTERVAL
+            if scan:
+                scan_result = self.scan_metadata_index()
+                if not scan_result['success']:
+                    raise RuntimeError(scan_result['error'])
+            else:
+                self.metadata_index.maybe_sync()
             
-            # Сохранение резервной копии
-            s3_key = f"comfyui/backups/{backup_name}.json"
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=s3_key,
-                Body=json.dumps(backup_data, indent=2),
-                ContentType='application/json'
-            )
+            files = [
+                {
+                    'key': item['key'],
+                    'metadata': item['metadata'],
+                    'url': self.get_file_url(item['key'])
+                }
+                for item in self.metadata_index.search(
+                    query=query, model=model, workflow_name=workflow_name,
+                    since=since, until=until, limit=limit
+                )
+            ]
             
-            result = {
+            logger.info(f"🔍 Поиск изображений: {len(files)} результатов")
+            return {
                 'success': True,
-                'backup_name': backup_name,
-                's3_key': s3_key,
-                'images_count': len(images_list['files']),
-                'message': f"Резервная копия создана: {backup_name}"
+                'files': files,
+                'count': len(files),
+                'message': f"Найдено {len(files)} файлов"
             }
             
-            logger.info(f"💾 Создана резервная копия: {backup_name}")
-            return result
-            
         except Exception as e:
-            logger.error(f"❌ Ошибка создания резервной копии: {e}")
+            logger.error(f"❌ Ошибка поиска изображений: {e}")
             return {
                 'success': False,
                 'error': str(e),
-                'message': f"Ошибка создания резервной копии: {e}"
+                'message': f"Ошибка поиска изображений: {e}"
             }
     
-    def get_storage_info(self) -> Dict:
+    def compact_metadata_index(self, min_segments: int = 2) -> Dict:
         """
-        Получение информации о хранилище
+        Слияние сегментов индекса метаданных
         
+        Args:
+            min_segments: Минимальное число сегментов шарда для слияния
+            
         Returns:
-            Dict с информацией о хранилище
+            Dict со статистикой слияния
         """
         try:
-            # Подсчет файлов по категориям
-            categories = {
-                'images': self.list_images('comfyui/images/'),
+            if not self.metadata_index:
+                raise RuntimeError("Индекс метаданных отключен")
+            self.metadata_index.flush()
+            stats = self.metadata_index.compact(min_segments=min_segments)
+            return {
+                'success': True,
+                **stats,
+                'message': f"Слито шардов индекса: {stats['shards']}"
+            }
+        except Exception as e:
+            logger.error(f"❌ Ошибка слияния индекса метаданных: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка слияния индекса метаданных: {e}"
+            }
+    
+    def iter_objects(self, 
+                    prefix: str = 'comfyui/',
+                    page_size: int = 1000) -> Iterator[Dict]:
+        """
+        Потоковый обход объектов по префиксу через постраничный листинг
+        
+        Args:
+            prefix: Префикс для поиска
+            page_size: Размер страницы листинга (не более 1000)
+            
+        Returns:
+            Итератор описаний объектов (Key, Size, LastModified, ETag)
+        """
+        paginator = self.s3_client.get_paginator('list_objects_v2')
+        pages = paginator.paginate(
+            Bucket=self.bucket_name,
+            Prefix=prefix,
+            PaginationConfig={'PageSize': page_size}
+        )
+        for page in pages:
+            for obj in page.get('Contents', []):
+                yield obj
+    
+    def _delete_batch(self, keys: List[str]) -> Dict:
+        """Удаление одного пакета ключей запросом DeleteObjects"""
+        try:
+            response = self.s3_client.delete_objects(
+                Bucket=self.bucket_name,
+                Delete={'Objects': [{'Key': key} for key in keys], 'Quiet': True}
+            )
+            errors = [
+                {
+                    'key': error.get('Key'),
+                    'code': error.get('Code'),
+                    'message': error.get('Message')
+                }
+                for error in response.get('Errors', [])
+            ]
+        except Exception as e:
+            # Ошибка всего запроса относится ко всем ключам пакета
+            errors = [{'key': key, 'code': type(e).__name__, 'message': str(e)} for key in keys]
+        
+        failed = {error['key'] for error in errors}
+        self._unindex_keys([key for key in keys if key not in failed])
+        
+        return {'requested': len(keys), 'errors': errors}
+    
+    @instrumented('s3')
+    def delete_many(self,
+                    keys: Optional[Iterable[str]] = None,
+                    prefix: Optional[str] = None,
+                    dry_run: bool = False,
+                    max_workers: int = 8,
+                    batch_size: int = DELETE_BATCH_SIZE) -> Dict:
+        """
+        Массовое удаление объектов пакетами DeleteObjects
+        
+        Ключи читаются потоково (из переданного итератора или из постраничного листинга
+        префикса) и удаляются пакетами до 1000 ключей, пакеты выполняются параллельно.
+        Маркер папки, совпадающий с префиксом, не удаляется.
+        
+        Args:
+            keys: Итератор ключей для удаления
+            prefix: Префикс, все объекты которого нужно удалить
+            dry_run: Только подсчитать объекты, ничего не удаляя
+            max_workers: Число параллельных запросов
+            batch_size: Размер пакета (не более 1000)
+            
+        Returns:
+            Dict с числом удаленных объектов и ошибками по ключам
+        """
+        try:
+            if (keys is None) == (prefix is None):
+                raise ValueError("Укажите либо keys, либо prefix")
+            
+            batch_size = max(1, min(batch_size, DELETE_BATCH_SIZE))
+            
+            if keys is None:
+                keys = (obj['Key'] for obj in self.iter_objects(prefix) if obj['Key'] != prefix)
+            
+            batches = iter_batches(keys, batch_size)
+            
+            if dry_run:
+                matched = 0
+                sample: List[str] = []
+                for batch in batches:
+                    matched += len(batch)
+                    sample.extend(batch[:max(0, 100 - len(sample))])
+                
+                logger.info(f"🔍 Пробный запуск удаления: {matched} объектов")
+                return {
+                    'success': True,
+                    'dry_run': True,
+                    'matched': matched,
+                    'deleted': 0,
+                    'sample_keys': sample,
+                    'errors': [],
+                    'message': f"Будет удалено {matched} объектов"
+                }
+            
+            requested = 0
+            errors: List[Dict] = []
+            batch_count = 0
+            for batch_result in bounded_map(self._delete_batch, batches, max_workers, self.governor):
+                requested += batch_result['requested']
+                errors.extend(batch_result['errors'])
+                batch_count += 1
+            
+            deleted = requested - len(errors)
+            result = {
+                'success': not errors,
+                'dry_run': False,
+                'matched': requested,
+                'deleted': deleted,
+                'batches': batch_count,
+                'errors': errors,
+                'message': f"Удалено {deleted} из {requested} объектов"
+            }
+            
+            if errors:
+                result['error'] = f"Не удалось удалить {len(errors)} объектов"
+                logger.warning(f"⚠️ Массовое удаление: {len(errors)} ошибок из {requested}")
+            events.event(logging.INFO, 'delete_batch', "🗑️ Массовое удаление: %d объектов, %d пакетов",
+                         deleted, batch_count, deleted=deleted, batches=batch_count, errors=len(errors))
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка массового удаления: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка массового удаления: {e}"
+            }
+    
+    def apply_lifecycle_rules(self, policies: Optional[List[RetentionPolicy]] = None) -> Dict:
+        """
+        Установка правил жизненного цикла bucket по политикам хранения
+        
+        Ограничение по возрасту переносится в правило Expiration и выполняется самим S3.
+        Ограничения по количеству и объему правилами не выражаются - для них
+        используйте enforce_retention. Правила bucket, не созданные менеджером, сохраняются.
+        
+        Args:
+            policies: Политики хранения (по умолчанию DEFAULT_RETENTION_POLICIES)
+            
+        Returns:
+            Dict с установленными правилами
+        """
+        try:
+            policies = DEFAULT_RETENTION_POLICIES if policies is None else policies
+            
+            try:
+                existing = self.s3_client.get_bucket_lifecycle_configuration(
+                    Bucket=self.bucket_name
+                ).get('Rules', [])
+            except ClientError as e:
+                if e.response['Error']['Code'] != 'NoSuchLifecycleConfiguration':
+                    raise
+                existing = []
+            
+            rules = [rule for rule in existing if not rule.get('ID', '').startswith(LIFECYCLE_RULE_PREFIX)]
+            installed = []
+            skipped = []
+            
+            for policy in policies:
+                if policy.max_age_days is None:
+                    skipped.append(policy.prefix)
+                    continue
+                rule = {
+                    'ID': f"{LIFECYCLE_RULE_PREFIX}{policy.prefix}"[:255],
+                    'Filter': {'Prefix': policy.prefix},
+                    'Status': 'Enabled',
+                    'Expiration': {'Days': max(1, int(policy.max_age_days))},
+                    'AbortIncompleteMultipartUpload': {'DaysAfterInitiation': 1}
+                }
+                rules.append(rule)
+                installed.append(rule['ID'])
+            
+            if rules:
+                self.s3_client.put_bucket_lifecycle_configuration(
+                    Bucket=self.bucket_name,
+                    LifecycleConfiguration={'Rules': rules}
+                )
+            else:
+                self.s3_client.delete_bucket_lifecycle(Bucket=self.bucket_name)
+            
+            logger.info(f"♻️ Установлено правил жизненного цикла: {len(installed)}")
+            return {
+                'success': True,
+                'installed_rules': installed,
+                'skipped_prefixes': skipped,
+                'message': f"Установлено правил жизненного цикла: {len(installed)}"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка установки правил жизненного цикла: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка установки правил жизненного цикла: {e}"
+            }
+    
+    def _iter_expired_keys(self,
+                           policy: RetentionPolicy,
+                           now: datetime,
+                           stats: Dict) -> Iterator[str]:
+        """
+        Потоковый отбор ключей, нарушающих политику хранения
+        
+        Устаревшие объекты выдаются сразу. Для ограничений по количеству и объему
+        хранится куча самых новых объектов, а вытесненные из нее самые старые
+        объекты выдаются по ходу листинга, поэтому память ограничена размером
+        сохраняемого набора, а не всего префикса.
+        """
+        cutoff = now - timedelta(days=policy.max_age_days) if policy.max_age_days is not None else None
+        kept: List[Tuple[datetime, str, int]] = []
+        kept_bytes = 0
+        
+        for obj in self.iter_objects(policy.prefix):
+            key = obj['Key']
+            if key == policy.prefix:
+                continue
+            stats['scanned'] += 1
+            size = obj.get('Size', 0)
+            
+            if cutoff is not None and obj['LastModified'] < cutoff:
+                stats['expired'] += 1
+                stats['bytes'] += size
+                yield key
+                continue
+            
+            if policy.max_count is None and policy.max_bytes is None:
+                continue
+            
+            heapq.heappush(kept, (obj['LastModified'], key, size))
+            kept_bytes += size
+            while kept and ((policy.max_count is not None and len(kept) > policy.max_count) or
+                            (policy.max_bytes is not None and kept_bytes > policy.max_bytes)):
+                _, old_key, old_size = heapq.heappop(kept)
+                kept_bytes -= old_size
+                stats['evicted'] += 1
+                stats['bytes'] += old_size
+                yield old_key
+    
+    @instrumented('s3')
+    def enforce_retention(self,
+                          policies: Optional[List[RetentionPolicy]] = None,
+                          dry_run: bool = False,
+                          max_workers: int = 8,
+                          now: Optional[datetime] = None) -> Dict:
+        """
+        Применение политик хранения потоковым обходом префиксов
+        
+        Args:
+            policies: Политики хранения (по умолчанию DEFAULT_RETENTION_POLICIES)
+            dry_run: Только подсчитать объекты, ничего не удаляя
+            max_workers: Число параллельных запросов удаления
+            now: Текущее время (для тестов)
+            
+        Returns:
+            Dict с отчетом по каждой политике
+        """
+        policies = DEFAULT_RETENTION_POLICIES if policies is None else policies
+        now = now or datetime.now(timezone.utc)
+        reports = []
+        success = True
+        
+        for policy in policies:
+            stats = {'scanned': 0, 'expired': 0, 'evicted': 0, 'bytes': 0}
+            result = self.delete_many(
+                keys=self._iter_expired_keys(policy, now, stats),
+                dry_run=dry_run,
+                max_workers=max_workers
+            )
+            success = success and result['success']
+            reports.append({
+                'prefix': policy.prefix,
+                'scanned': stats['scanned'],
+                'expired': stats['expired'],
+                'evicted': stats['evicted'],
+                'bytes_freed': stats['bytes'],
+                'deleted': result.get('deleted', 0),
+                'errors': result.get('errors', []),
+                'error': result.get('error')
+            })
+        
+        total = sum(report['expired'] + report['evicted'] for report in reports)
+        action = "Будет удалено" if dry_run else "Удалено"
+        logger.info(f"♻️ Политики хранения: {action.lower()} {total} объектов")
+        return {
+            'success': success,
+            'dry_run': dry_run,
+            'policies': reports,
+            'message': f"{action} {total} объектов по политикам хранения"
+        }
+    
+    def get_file_url(self, s3_key: str, expires_in: int = 3600) -> str:
+        """
+        Получение URL для доступа к файлу
+        
+        URL берется из кэша подписанных URL: он подписывается с запасом и
+        переиспользуется, пока до его истечения остается не меньше expires_in.
+        
+        Args:
+            s3_key: Ключ файла в S3
+            expires_in: Минимальное время жизни URL в секундах
+            
+        Returns:
+            URL для доступа к файлу
+        """
+        def sign(signed_expires_in: int) -> str:
+            try:
+                return self.s3_client.generate_presigned_url(
+                    'get_object',
+                    Params={'Bucket': self.bucket_name, 'Key': s3_key},
+                    ExpiresIn=signed_expires_in
+                )
+            except Exception as e:
+                logger.error(f"❌ Ошибка генерации URL: {e}")
+                return ""
+        
+        cache_key = (self.aws_access_key_id, self.endpoint_url, self.region_name,
+                     self.bucket_name, s3_key, 'get_object')
+        return self.url_cache.get_or_sign(cache_key, expires_in, sign)
+    
+    def _direct_upload_target(self,
+                              filename: str,
+                              prefix: str,
+                              metadata: Optional[Dict],
+                              content_type: Optional[str]) -> Tuple[str, str, Dict, Dict]:
+        """
+        Ключ, MIME-тип и метаданные объекта для прямой загрузки клиентом
+        
+        Returns:
+            (ключ, MIME-тип, метаданные, метаданные S3 в ASCII)
+        """
+        s3_key = self.key_generator.key(prefix, os.path.basename(filename))
+        content_type = content_type or mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+        file_metadata = {
+            'upload_time': datetime.now(timezone.utc).isoformat(),
+            'original_path': filename,
+            'file_type': os.path.splitext(filename)[1].lower(),
+            'upload_mode': 'direct'
+        }
+        if metadata:
+            file_metadata.update(metadata)
+        s3_metadata = {k: encode_metadata_value(v) for k, v in file_metadata.items()}
+        return s3_key, content_type, file_metadata, s3_metadata
+    
+    @instrumented('s3')
+    def create_upload(self,
+                      filename: str,
+                      prefix: str = 'comfyui/images/',
+                      method: str = 'put',
+                      metadata: Optional[Dict] = None,
+                      content_type: Optional[str] = None,
+                      max_size: Optional[int] = None,
+                      expires_in: int = 3600) -> Dict:
+        """
+        Выдача подписанного PUT URL или POST формы для загрузки клиентом напрямую в S3
+        
+        Байты не проходят через хост ComfyUI. Метаданные подписываются вместе с
+        запросом: клиент должен отправить возвращенные headers (PUT) или fields (POST)
+        без изменений. После загрузки вызовите complete_upload.
+        
+        Args:
+            filename: Имя файла клиента (для ключа и MIME-типа)
+            prefix: Префикс ключа
+            method: 'put' (URL) или 'post' (HTML форма)
+            metadata: Дополнительные метаданные
+            content_type: MIME-тип (по умолчанию определяется по имени файла)
+            max_size: Максимальный размер файла в байтах (только POST)
+            expires_in: Время жизни подписи в секундах
+            
+        Returns:
+            Dict с ключом, URL и заголовками или полями формы
+        """
+        try:
+            if method not in DIRECT_UPLOAD_METHODS:
+                raise ValueError(f"Неизвестный метод загрузки: {method}")
+            
+            s3_key, content_type, file_metadata, s3_metadata = self._direct_upload_target(
+                filename, prefix, metadata, content_type
+            )
+            result = {
+                'success': True,
+                's3_key': s3_key,
+                'method': method,
+                'expires_in': expires_in,
+                'metadata': file_metadata
+            }
+            
+            if method == 'put':
+                result['url'] = self.s3_client.generate_presigned_url(
+                    'put_object',
+                    Params={'Bucket': self.bucket_name, 'Key': s3_key,
+                            'ContentType': content_type, 'Metadata': s3_metadata},
+                    ExpiresIn=expires_in
+                )
+                result['headers'] = {'Content-Type': content_type}
+                result['headers'].update({f"x-amz-meta-{k}": v for k, v in s3_metadata.items()})
+            else:
+                fields = {'Content-Type': content_type}
+                fields.update({f"x-amz-meta-{k}": v for k, v in s3_metadata.items()})
+                conditions = [{k: v} for k, v in fields.items()]
+                if max_size:
+                    conditions.append(['content-length-range', 1, max_size])
+                post = self.s3_client.generate_presigned_post(
+                    self.bucket_name, s3_key, Fields=fields, Conditions=conditions, ExpiresIn=expires_in
+                )
+                result['url'] = post['url']
+                result['fields'] = post['fields']
+            
+            result['message'] = f"Подписана прямая загрузка ({method.upper()}): {s3_key}"
+            events.sampled(logging.INFO, 'direct_upload_signed', "✍️ Подписана прямая загрузка (%s): %s",
+                           method.upper(), s3_key, key=s3_key, method=method)
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка подписи прямой загрузки: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка подписи прямой загрузки: {e}"
+            }
+    
+    @instrumented('s3')
+    def create_multipart_upload(self,
+                                filename: str,
+                                size: int,
+                                prefix: str = 'comfyui/images/',
+                                part_size: int = DIRECT_UPLOAD_PART_SIZE,
+                                metadata: Optional[Dict] = None,
+                                content_type: Optional[str] = None,
+                                expires_in: int = 3600) -> Dict:
+        """
+        Создание multipart загрузки с подписанными URL частей для клиента
+        
+        Клиент загружает части PUT-запросами по выданным URL (параллельно, в любом
+        порядке) и передает полученные ETag в complete_upload.
+        
+        Args:
+            filename: Имя файла клиента
+            size: Размер файла в байтах
+            prefix: Префикс ключа
+            part_size: Желаемый размер части (увеличивается, чтобы уложиться в 10 000 частей)
+            metadata: Дополнительные метаданные
+            content_type: MIME-тип
+            expires_in: Время жизни подписей частей в секундах
+            
+        Returns:
+            Dict с ключом, upload_id, размером части и URL частей
+        """
+        try:
+            part_size = max(part_size, MULTIPART_MIN_PART_SIZE, math.ceil(size / MULTIPART_MAX_PARTS))
+            part_count = max(1, math.ceil(size / part_size))
+            
+            s3_key, content_type, file_metadata, s3_metadata = self._direct_upload_target(
+                filename, prefix, metadata, content_type
+            )
+            upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket_name, Key=s3_key, ContentType=content_type, Metadata=s3_metadata
+            )['UploadId']
+            
+            parts = [
+                {
+                    'part_number': number,
+                    'url': self.s3_client.generate_presigned_url(
+                        'upload_part',
+                        Params={'Bucket': self.bucket_name, 'Key': s3_key,
+                                'UploadId': upload_id, 'PartNumber': number},
+                        ExpiresIn=expires_in
+                    )
+                }
+                for number in range(1, part_count + 1)
+            ]
+            
+            events.sampled(logging.INFO, 'multipart_upload_signed', "✍️ Подписана multipart загрузка: %s (%d частей)",
+                           s3_key, part_count, key=s3_key, parts=part_count)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'upload_id': upload_id,
+                'part_size': part_size,
+                'parts': parts,
+                'expires_in': expires_in,
+                'metadata': file_metadata,
+                'message': f"Подписана multipart загрузка: {s3_key} ({part_count} частей)"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания multipart загрузки: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка создания multipart загрузки: {e}"
+            }
+    
+    @instrumented('s3')
+    def complete_upload(self,
+                        s3_key: str,
+                        upload_id: Optional[str] = None,
+                        parts: Optional[List[Dict]] = None,
+                        metadata: Optional[Dict] = None) -> Dict:
+        """
+        Завершение прямой загрузки клиентом и регистрация метаданных
+        
+        Для multipart загрузки собирает объект из частей (ETag частей берутся из
+        parts или из ListParts). Затем читает метаданные объекта и записывает их
+        в индекс метаданных, как после upload_image.
+        
+        Args:
+            s3_key: Ключ загруженного объекта
+            upload_id: ID multipart загрузки (для create_multipart_upload)
+            parts: Части [{'part_number': 1, 'etag': '...'}] (по умолчанию из ListParts)
+            metadata: Дополнительные метаданные для индекса (в объект S3 не записываются)
+            
+        Returns:
+            Dict с информацией о загруженном файле
+        """
+        try:
+            if upload_id:
+                if parts is None:
+                    parts = []
+                    paginator = self.s3_client.get_paginator('list_parts')
+                    for page in paginator.paginate(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id):
+                        parts.extend({'part_number': part['PartNumber'], 'etag': part['ETag']}
+                                     for part in page.get('Parts', []))
+                self.s3_client.complete_multipart_upload(
+                    Bucket=self.bucket_name,
+                    Key=s3_key,
+                    UploadId=upload_id,
+                    MultipartUpload={'Parts': [
+                        {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                        for part in sorted(parts, key=lambda part: part['part_number'])
+                    ]}
+                )
+            
+            head = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            file_metadata = {k: decode_metadata_value(v) for k, v in head.get('Metadata', {}).items()}
+            file_metadata['file_size'] = head['ContentLength']
+            if metadata:
+                file_metadata.update(metadata)
+            self._index_metadata(s3_key, file_metadata)
+            
+            events.sampled(logging.INFO, 'direct_upload_completed', "✅ Завершена прямая загрузка: %s", s3_key, key=s3_key)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'url': self.get_file_url(s3_key),
+                'metadata': file_metadata,
+                'message': f"Прямая загрузка завершена: {s3_key}"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка завершения прямой загрузки: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка завершения прямой загрузки: {e}"
+            }
+    
+    @instrumented('s3')
+    def abort_upload(self, s3_key: str, upload_id: str) -> Dict:
+        """
+        Отмена multipart загрузки и удаление загруженных частей
+        
+        Args:
+            s3_key: Ключ объекта
+            upload_id: ID multipart загрузки
+            
+        Returns:
+            Dict с результатом отмены
+        """
+        try:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket_name, Key=s3_key, UploadId=upload_id)
+            events.sampled(logging.INFO, 'multipart_upload_aborted', "🗑️ Отменена multipart загрузка: %s", s3_key, key=s3_key)
+            return {'success': True, 's3_key': s3_key, 'message': f"Загрузка отменена: {s3_key}"}
+        except Exception as e:
+            logger.error(f"❌ Ошибка отмены multipart загрузки: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка отмены multipart загрузки: {e}"
+            }
+    
+    @instrumented('s3')
+    def get_file_metadata(self, s3_key: str) -> Dict:
+        """
+        Получение метаданных файла
+        
+        Args:
+            s3_key: Ключ файла в S3
+            
+        Returns:
+            Dict с метаданными
+        """
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=s3_key)
+            return {k: decode_metadata_value(v) for k, v in response.get('Metadata', {}).items()}
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения метаданных: {e}")
+            return {}
+    
+    def _put_document(self, s3_key: str, body: bytes, content_type: str) -> Dict:
+        """
+        Сохранение документа (workflow, резервной копии) со сжатием
+        
+        Args:
+            s3_key: Ключ в S3
+            body: Несжатое тело документа
+            content_type: MIME-тип документа
+            
+        Returns:
+            Dict с размерами до и после сжатия
+        """
+        put_args = {
+            'Bucket': self.bucket_name,
+            'Key': s3_key,
+            'Body': body,
+            'ContentType': content_type
+        }
+        
+        if self.compression:
+            put_args['Body'] = compress_body(body, self.compression, self.compression_level)
+            put_args['ContentEncoding'] = self.compression
+            put_args['Metadata'] = {COMPRESSION_METADATA_KEY: self.compression}
+        
+        self.s3_client.put_object(**put_args)
+        record_bytes('s3', 'upload', len(put_args['Body']))
+        
+        return {
+            'size': len(body),
+            'stored_size': len(put_args['Body']),
+            'compression': self.compression
+        }
+    
+    def _read_document(self, s3_key: str) -> bytes:
+        """
+        Чтение документа из S3 с автоматической распаковкой
+        
+        Args:
+            s3_key: Ключ в S3
+            
+        Returns:
+            Несжатое тело документа
+        """
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=s3_key)
+        body = response['Body'].read()
+        record_bytes('s3', 'download', len(body))
+        
+        algorithm = response.get('Metadata', {}).get(COMPRESSION_METADATA_KEY)
+        if not algorithm and response.get('ContentEncoding') in COMPRESSION_ALGORITHMS:
+            algorithm = response['ContentEncoding']
+        
+        return decompress_body(body, algorithm)
+    
+    @instrumented('s3')
+    def upload_tensor(self,
+                      array,
+                      s3_key: Optional[str] = None,
+                      dtype: str = 'float16',
+                      compress: bool = False,
+                      metadata: Optional[Dict] = None) -> Dict:
+        """
+        Загрузка тензора (промежуточного изображения) в сыром формате .tensor
+        
+        В отличие от PNG, значения не квантуются до 8 бит и не требуют кодирования:
+        данные передаются прямо из буфера массива (без копии, если тип совпадает).
+        
+        Args:
+            array: Тензор numpy, например пакет изображений (B, H, W, C)
+            s3_key: Ключ в S3 (если не указан, генерируется автоматически)
+            dtype: Тип данных в файле ('float16' или 'float32')
+            compress: Сжать данные zstd (нужен пакет zstandard)
+            metadata: Дополнительные метаданные
+            
+        Returns:
+            Dict с информацией о загруженном тензоре
+        """
+        try:
+            if not s3_key:
+                s3_key = self.key_generator.key('comfyui/images/', f"tensor{TENSOR_EXTENSION}")
+            
+            file_metadata = {
+                'upload_time': datetime.now(timezone.utc).isoformat(),
+                'file_type': TENSOR_EXTENSION,
+                'tensor_dtype': dtype,
+                'tensor_shape': 'x'.join(str(dim) for dim in array.shape),
+                'tensor_compression': 'zstd' if compress else 'none'
+            }
+            if metadata:
+                file_metadata.update(metadata)
+            s3_metadata = {k: encode_metadata_value(v) for k, v in file_metadata.items()}
+            
+            with tensor_stream(array, dtype, compress) as stream:
+                self.s3_client.upload_fileobj(
+                    stream,
+                    self.bucket_name,
+                    s3_key,
+                    ExtraArgs={'Metadata': s3_metadata, 'ContentType': TENSOR_CONTENT_TYPE},
+                    Callback=_count_uploaded
+                )
+            
+            if s3_key.startswith('comfyui/images/'):
+                self._index_metadata(s3_key, file_metadata)
+            
+            events.sampled(logging.INFO, 'tensor_uploaded', "✅ Загружен тензор: %s (%s, %s)",
+                           s3_key, file_metadata['tensor_shape'], dtype, key=s3_key, dtype=dtype)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'url': self.get_file_url(s3_key),
+                'metadata': file_metadata,
+                'message': f"Тензор успешно загружен: {s3_key}"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки тензора: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка загрузки тензора: {e}"
+            }
+    
+    @instrumented('s3')
+    def download_tensor(self,
+                        s3_key: str,
+                        local_path: Optional[str] = None,
+                        mmap: bool = True,
+                        refresh: bool = False) -> Dict:
+        """
+        Скачивание тензора .tensor и чтение без декодирования
+        
+        Файл сохраняется в локальный кэш (~/.cache/comfyui-s3-tensors/<bucket>/<ключ>)
+        и отображается в память через np.memmap. Рядом с файлом хранится ETag объекта:
+        кэш проверяется условным GET (IfNoneMatch), и перезаписанный ключ скачивается заново.
+        
+        Args:
+            s3_key: Ключ тензора в S3 (без сегментов '..')
+            local_path: Локальный путь (по умолчанию - в кэше)
+            mmap: Отобразить файл в память вместо чтения в np.frombuffer
+            refresh: Скачать файл заново, даже если он есть в кэше
+            
+        Returns:
+            Dict с тензором (tensor) и локальным путем
+        """
+        try:
+            if not local_path:
+                parts = s3_key.split('/')
+                if '..' in parts:
+                    raise ValueError(f"Недопустимый ключ тензора: {s3_key}")
+                local_path = os.path.join(DEFAULT_TENSOR_CACHE_DIR, self.bucket_name, *parts)
+            
+            # Кэш действителен, пока ETag объекта не изменился
+            etag_path = f"{local_path}.etag"
+            request = {'Bucket': self.bucket_name, 'Key': s3_key}
+            if not refresh and os.path.exists(local_path) and os.path.exists(etag_path):
+                with open(etag_path, 'r', encoding='utf-8') as file:
+                    request['IfNoneMatch'] = file.read().strip()
+            
+            try:
+                response = self.s3_client.get_object(**request)
+            except ClientError as e:
+                if 'IfNoneMatch' not in request or e.response['Error']['Code'] not in ('304', 'NotModified'):
+                    raise
+                response = None
+            
+            cached = response is None
+            record_cache('tensor', cached)
+            if not cached:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                temp_path = f"{local_path}.{os.getpid()}.{threading.get_ident()}.part"
+                with open(temp_path, 'wb') as file:
+                    shutil.copyfileobj(response['Body'], file, 1024 * 1024)
+                    record_bytes('s3', 'download', file.tell())
+                os.replace(temp_path, local_path)
+                with open(temp_path, 'w', encoding='utf-8') as file:
+                    file.write(response['ETag'])
+                os.replace(temp_path, etag_path)
+            
+            tensor = load_tensor(local_path, mmap=mmap)
+            
+            events.sampled(logging.INFO, 'tensor_downloaded', "✅ Скачан тензор: %s %s%s",
+                           s3_key, tensor.shape, ' (из кэша)' if cached else '', key=s3_key, cached=cached)
+            return {
+                'success': True,
+                's3_key': s3_key,
+                'local_path': local_path,
+                'tensor': tensor,
+                'cached': cached,
+                'message': f"Тензор успешно скачан: {local_path}"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка скачивания тензора: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка скачивания тензора: {e}"
+            }
+    
+    @instrumented('s3')
+    def save_workflow(self, 
+                     workflow_data: Dict, 
+                     workflow_name: Optional[str] = None,
+                     binary: bool = False) -> Dict:
+        """
+        Сохранение workflow в S3
+        
+        Args:
+            workflow_data: Данные workflow
+            workflow_name: Название workflow
+            binary: Сохранить в компактном бинарном формате (.cwf)
+            
+        Returns:
+            Dict с результатом операции
+        """
+        try:
+            if not workflow_name:
+                extension = BINARY_EXTENSION if binary else ".json"
+                workflow_name = self.key_generator.name(f"workflow{extension}")
+            
+            s3_key = f"comfyui/workflows/{workflow_name}"
+            
+            if binary:
+                body = workflow_to_binary(workflow_data)
+                content_type = 'application/octet-stream'
+            else:
+                body = json.dumps(workflow_data, indent=2).encode('utf-8')
+                content_type = 'application/json'
+            
+            # Сохранение workflow
+            stored = self._put_document(s3_key, body, content_type)
+            
+            result = {
+                'success': True,
+                's3_key': s3_key,
+                'workflow_name': workflow_name,
+                'size': stored['size'],
+                'stored_size': stored['stored_size'],
+                'compression': stored['compression'],
+                'message': f"Workflow сохранен: {s3_key}"
+            }
+            
+            events.sampled(logging.INFO, 'workflow_saved', "💾 Сохранен workflow: %s", s3_key, key=s3_key)
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения workflow: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка сохранения workflow: {e}"
+            }
+    
+    @instrumented('s3')
+    def load_workflow(self, workflow_name: str) -> Dict:
+        """
+        Загрузка workflow из S3
+        
+        Args:
+            workflow_name: Название workflow (JSON или бинарный формат определяется автоматически,
+                сжатые workflow распаковываются прозрачно)
+            
+        Returns:
+            Dict с данными workflow
+        """
+        try:
+            s3_key = f"comfyui/workflows/{workflow_name}"
+            
+            body = self._read_document(s3_key)
+            
+            # Формат определяется по сигнатуре: бинарный или JSON
+            if is_binary_workflow(body):
+                workflow_data = decode_workflow_binary(body)
+            else:
+                workflow_data = json.loads(body.decode('utf-8'))
+            
+            result = {
+                'success': True,
+                'workflow_data': workflow_data,
+                's3_key': s3_key,
+                'message': f"Workflow загружен: {s3_key}"
+            }
+            
+            events.sampled(logging.INFO, 'workflow_loaded', "📂 Загружен workflow: %s", s3_key, key=s3_key)
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки workflow: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка загрузки workflow: {e}"
+            }
+    
+    def _load_latest_backup_manifest(self) -> Optional[Dict]:
+        """Загрузка манифеста последней резервной копии (None если копий еще нет)"""
+        try:
+            pointer = json.loads(self._read_document(LATEST_BACKUP_POINTER_KEY).decode('utf-8'))
+            return json.loads(self._read_document(pointer['manifest_key']).decode('utf-8'))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                return None
+            raise
+    
+    def _copy_object(self, source_key: str, target_key: str, size: int) -> None:
+        """
+        Серверное копирование объекта внутри bucket
+        
+        Небольшие объекты копируются одним запросом CopyObject, крупные -
+        управляемым копированием boto3 (multipart UploadPartCopy).
+        """
+        copy_source = {'Bucket': self.bucket_name, 'Key': source_key}
+        if size < BACKUP_MULTIPART_THRESHOLD:
+            self.s3_client.copy_object(
+                Bucket=self.bucket_name,
+                Key=target_key,
+                CopySource=copy_source,
+                MetadataDirective='COPY'
+            )
+        else:
+            self.s3_client.copy(
+                copy_source,
+                self.bucket_name,
+                target_key,
+                Config=TransferConfig(
+                    multipart_threshold=BACKUP_MULTIPART_THRESHOLD,
+                    multipart_chunksize=BACKUP_MULTIPART_CHUNKSIZE,
+                    max_concurrency=4
+                )
+            )
+    
+    @instrumented('s3')
+    def backup_images(self,
+                      backup_name: Optional[str] = None,
+                      source_prefix: str = 'comfyui/images/',
+                      incremental: bool = True,
+                      rebase_after_days: int = 7,
+                      max_workers: int = 16) -> Dict:
+        """
+        Создание резервной копии изображений серверным копированием
+        
+        Объекты копируются в comfyui/backups/<backup_name>/ без передачи данных через
+        клиент. В инкрементальном режиме копируются только объекты, ETag которых
+        изменился со времени последней резервной копии; для остальных манифест
+        ссылается на копию из предыдущей резервной копии. Копии старше
+        rebase_after_days копируются заново, поэтому срок хранения префикса
+        comfyui/backups/ должен превышать rebase_after_days плюс интервал между копиями.
+        
+        Args:
+            backup_name: Название резервной копии
+            source_prefix: Префикс копируемых объектов
+            incremental: Копировать только изменившиеся объекты
+            rebase_after_days: Возраст копии, после которого она копируется заново
+            max_workers: Число параллельных операций копирования
+            
+        Returns:
+            Dict с результатом операции
+        """
+        try:
+            if not backup_name:
+                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+                backup_name = f"backup_{timestamp}"
+            
+            backup_prefix = f"comfyui/backups/{backup_name}/"
+            now = datetime.now(timezone.utc)
+            rebase_before = (now - timedelta(days=rebase_after_days)).isoformat()
+            
+            previous = self._load_latest_backup_manifest() if incremental else None
+            previous_objects = {}
+            if previous and previous.get('source_prefix') == source_prefix:
+                previous_objects = previous.get('objects', {})
+            
+            def backup_object(obj: Dict) -> Tuple[str, Dict, bool, Optional[Dict]]:
+                source_key = obj['Key']
+                etag = obj.get('ETag', '')
+                entry = previous_objects.get(source_key)
+                
+                if entry and entry['etag'] == etag and entry['backed_up_at'] >= rebase_before:
+                    return source_key, entry, False, None
+                
+                target_key = backup_prefix + source_key[len(source_prefix):]
+                try:
+                    self._copy_object(source_key, target_key, obj.get('Size', 0))
+                except Exception as e:
+                    return source_key, {}, False, {'key': source_key, 'error': str(e)}
+                
+                return source_key, {
+                    'etag': etag,
+                    'size': obj.get('Size', 0),
+                    'backup_key': target_key,
+                    'backed_up_at': now.isoformat()
+                }, True, None
+            
+            sources = (obj for obj in self.iter_objects(source_prefix) if obj['Key'] != source_prefix)
+            objects: Dict[str, Dict] = {}
+            errors: List[Dict] = []
+            copied = 0
+            copied_bytes = 0
+            
+            results = bounded_map(backup_object, sources, max_workers, self.governor)
+            for source_key, entry, was_copied, error in results:
+                if error:
+                    errors.append(error)
+                    continue
+                objects[source_key] = entry
+                if was_copied:
+                    copied += 1
+                    copied_bytes += entry['size']
+            
+            manifest = {
+                'backup_name': backup_name,
+                'created_at': now.isoformat(),
+                'source_prefix': source_prefix,
+                'base_backup': previous.get('backup_name') if previous_objects else None,
+                'images_count': len(objects),
+                'objects': objects
+            }
+            
+            # Сохранение манифеста и указателя на последнюю резервную копию
+            s3_key = f"{backup_prefix}{BACKUP_MANIFEST_NAME}"
+            self._put_document(
+                s3_key,
+                json.dumps(manifest, separators=(',', ':')).encode('utf-8'),
+                'application/json'
+            )
+            if not errors:
+                self._put_document(
+                    LATEST_BACKUP_POINTER_KEY,
+                    json.dumps({'backup_name': backup_name, 'manifest_key': s3_key}).encode('utf-8'),
+                    'application/json'
+                )
+            
+            result = {
+                'success': not errors,
+                'backup_name': backup_name,
+                's3_key': s3_key,
+                'images_count': len(objects),
+                'copied': copied,
+                'reused': len(objects) - copied,
+                'copied_bytes': copied_bytes,
+                'errors': errors,
+                'message': f"Резервная копия создана: {backup_name} "
+                           f"(скопировано {copied}, без изменений {len(objects) - copied})"
+            }
+            
+            if errors:
+                result['error'] = f"Не удалось скопировать {len(errors)} объектов"
+                logger.warning(f"⚠️ Резервная копия {backup_name}: {len(errors)} ошибок копирования")
+            events.event(logging.INFO, 'backup_created', "💾 Создана резервная копия: %s, скопировано %d объектов",
+                         backup_name, copied, backup=backup_name, copied=copied, copied_bytes=copied_bytes,
+                         errors=len(errors))
+            return result
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания резервной копии: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка создания резервной копии: {e}"
+            }
+    
+    def sync(self,
+             local_dir: str,
+             prefix: str = 'comfyui/images/',
+             direction: str = 'upload',
+             delete: bool = False,
+             dry_run: bool = False,
+             max_workers: int = 8,
+             state_dir: Optional[str] = None) -> Dict:
+        """
+        Синхронизация локальной директории с префиксом S3
+        
+        Args:
+            local_dir: Локальная директория (например, output/)
+            prefix: Префикс S3
+            direction: 'upload' (локальное -> S3) или 'download' (S3 -> локальное)
+            delete: Удалять файлы, которых нет в источнике
+            dry_run: Только показать, что будет передано и удалено
+            max_workers: Число параллельных передач
+            state_dir: Директория состояния синхронизаций
+            
+        Returns:
+            Dict с результатом синхронизации
+        """
+        try:
+            # Импорт здесь: s3_sync сам импортирует этот модуль
+            try:
+                from .s3_sync import S3DirectorySync
+            except ImportError:
+                from s3_sync import S3DirectorySync
+            
+            report = S3DirectorySync(self, state_dir).sync(
+                local_dir, prefix, direction=direction, delete=delete,
+                dry_run=dry_run, max_workers=max_workers
+            )
+            return {
+                'success': not report['errors'],
+                **report,
+                'message': f"Передано {report['transferred']}, удалено {report['deleted']}"
+            }
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка синхронизации: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'message': f"Ошибка синхронизации: {e}"
+            }
+    
+    def watch(self,
+              local_dir: str,
+              prefix: str = 'comfyui/images/',
+              stop_event: Optional[threading.Event] = None,
+              poll_interval: float = 2.0,
+              state_dir: Optional[str] = None) -> None:
+        """
+        Загрузка новых файлов директории в S3 по мере появления (блокирующий вызов)
+        
+        Args:
+            local_dir: Локальная директория (например, output/)
+            prefix: Префикс S3
+            stop_event: Событие остановки наблюдения
+            poll_interval: Интервал опроса, если inotify недоступен
+            state_dir: Директория состояния синхронизаций
+        """
+        try:
+            from .s3_sync import S3DirectorySync
+        except ImportError:
+            from s3_sync import S3DirectorySync
+        
+        S3DirectorySync(self, state_dir).watch(
+            local_dir, prefix, stop_event=stop_event, poll_interval=poll_interval
+        )
+    
+    def get_retry_state(self) -> Dict:
+        """
+        Состояние повторов и регулятора параллелизма
+        
+        Returns:
+            Dict с лимитом параллелизма, счетчиками throttling и попыток по операциям
+        """
+        return {
+            'governor': self.governor.state(),
+            **self.retry_dispatcher.state()
+        }
+    
+    def get_storage_info(self) -> Dict:
+        """
+        Получение информации о хранилище
+        
+        Returns:
+            Dict с информацией о хранилище
+        """
+        try:
+            # Подсчет файлов по категориям
+            categories = {
+                'images': self.list_images('comfyui/images/'),
                 'workflows': self.list_images('comfyui/workflows/'),
                 'backups': self.list_images('comfyui/backups/')
             }
@@ -520,10 +2380,28 @@ class S3StorageManager:
                 'error': str(e),
                 'message': f"Ошибка получения информации о хранилище: {e}"
             }
+    
+    def close(self) -> None:
+        """Публикация буфера индекса метаданных, закрытие локального кэша и пула соединений"""
+        if self.metadata_index:
+            try:
+                self.metadata_index.close()
+            except Exception as e:
+                logger.warning(f"⚠️ Не удалось опубликовать буфер индекса метаданных: {e}")
+            self.metadata_index = None
+        self.s3_client.close()
+    
+    def __enter__(self) -> 'S3StorageManager':
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
 
 
 # Пример использования
 if __name__ == "__main__":
+    configure_logging()
+    
     # Инициализация менеджера
     s3_manager = S3StorageManager(
         bucket_name="your-comfyui-bucket",
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+S3 Directory Sync для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Синхронизация локальной директории (например, output/) с префиксом S3.
+
+Изменения определяются сравнением размера, mtime и хэша с сохраненным состоянием
+прошлой синхронизации и постраничным листингом S3 (без HEAD-запросов): для файлов
+одинакового размера локальный MD5 сравнивается с ETag. Передаются только измененные
+файлы, параллельно; крупные файлы - multipart. Режим наблюдения загружает новые файлы
+по мере появления (inotify на Linux, опрос директории на остальных системах).
+"""
+
+import ctypes
+import ctypes.util
+import hashlib
+import json
+import os
+import select
+import struct
+import threading
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import logging
+
+from boto3.s3.transfer import TransferConfig
+
+try:
+    from .s3_storage_manager import bounded_map
+    from .structured_logging import EventLogger
+except ImportError:
+    from s3_storage_manager import bounded_map
+    from structured_logging import EventLogger
+
+logger = logging.getLogger(__name__)
+events = EventLogger(logger)
+
+SYNC_DIRECTIONS = ('upload', 'download')
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'comfyui-s3-sync')
+MULTIPART_THRESHOLD = 16 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 16 * 1024 * 1024
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def md5_file(path: str) -> str:
+    """MD5 файла (совпадает с ETag объекта, загруженного одним запросом)"""
+    digest = hashlib.md5()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def scan_local(local_dir: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Рекурсивный список файлов директории
+
+    Args:
+        local_dir: Корневая директория
+
+    Returns:
+        Dict относительный путь (через '/') -> {'size', 'mtime'}
+    """
+    files = {}
+    for root, _, names in os.walk(local_dir):
+        for name in names:
+            path = os.path.join(root, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            relative = os.path.relpath(path, local_dir).replace(os.sep, '/')
+            files[relative] = {'size': stat.st_size, 'mtime': stat.st_mtime}
+    return files
+
+
+def local_file_path(local_dir: str, relative: str) -> str:
+    """
+    Локальный путь файла по относительному пути (ключу без префикса)
+
+    Args:
+        local_dir: Корневая директория
+        relative: Относительный путь через '/' (без сегментов '..')
+
+    Returns:
+        Путь внутри local_dir
+
+    Raises:
+        ValueError: Путь выходит за пределы local_dir
+    """
+    parts = relative.split('/')
+    if '..' in parts:
+        raise ValueError(f"Недопустимый путь: {relative}")
+    return os.path.join(local_dir, *parts)
+
+
+class S3DirectorySync:
+    """
+    Движок синхронизации директории с префиксом S3
+    """
+
+    def __init__(self, manager, state_dir: Optional[str] = None):
+        """
+        Инициализация движка
+
+        Args:
+            manager: Экземпляр S3StorageManager
+            state_dir: Директория состояния синхронизаций (по умолчанию ~/.cache/comfyui-s3-sync)
+        """
+        self.manager = manager
+        self.s3_client = manager.s3_client
+        self.bucket_name = manager.bucket_name
+        self.state_dir = state_dir or DEFAULT_STATE_DIR
+        self.transfer_config = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=4
+        )
+        self._state_lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Состояние
+    # ------------------------------------------------------------------
+
+    def _state_path(self, local_dir: str, prefix: str) -> str:
+        pair = f"{self.bucket_name}\0{prefix}\0{os.path.abspath(local_dir)}"
+        return os.path.join(self.state_dir, hashlib.sha1(pair.encode('utf-8')).hexdigest() + '.json')
+
+    def _load_state(self, local_dir: str, prefix: str) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self._state_path(local_dir, prefix), 'r', encoding='utf-8') as f:
+                return json.load(f).get('files', {})
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_state(self, local_dir: str, prefix: str, files: Dict[str, Dict[str, Any]]) -> None:
+        path = self._state_path(local_dir, prefix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f"{path}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'bucket': self.bucket_name, 'prefix': prefix, 'local_dir': os.path.abspath(local_dir),
+                       'files': files}, f)
+        os.replace(temp_path, path)
+
+    def _list_remote(self, prefix: str) -> Dict[str, Dict[str, Any]]:
+        remote = {}
+        for obj in self.manager.iter_objects(prefix):
+            relative = obj['Key'][len(prefix):]
+            if relative and not relative.endswith('/'):
+                remote[relative] = {'size': obj['Size'], 'etag': obj['ETag'].strip('"')}
+        return remote
+
+    # ------------------------------------------------------------------
+    # Сравнение
+    # ------------------------------------------------------------------
+
+    def _is_same(self,
+                 local_dir: str,
+                 relative: str,
+                 local: Dict[str, Any],
+                 remote: Dict[str, Any],
+                 previous: Optional[Dict[str, Any]],
+                 use_hash: bool) -> Tuple[bool, Optional[str]]:
+        """
+        Совпадают ли локальный файл и объект
+
+        Returns:
+            (совпадают, MD5 локального файла, если вычислялся)
+        """
+        if local['size'] != remote['size']:
+            return False, None
+
+        # Ни файл, ни объект не менялись с прошлой синхронизации
+        if (previous and previous.get('size') == local['size']
+                and previous.get('mtime') == local['mtime']
+                and previous.get('etag') == remote['etag']):
+            return True, previous.get('md5')
+
+        if not use_hash:
+            return False, None
+
+        local_md5 = md5_file(local_file_path(local_dir, relative))
+        if '-' not in remote['etag']:
+            return local_md5 == remote['etag'], local_md5
+        # ETag multipart-объекта не является MD5: сверяем с хэшем прошлой синхронизации
+        return bool(previous and previous.get('etag') == remote['etag']
+                    and previous.get('md5') == local_md5), local_md5
+
+    def plan(self,
+             local_dir: str,
+             prefix: str,
+             direction: str = 'upload',
+             delete: bool = False,
+             use_hash: bool = True) -> Dict[str, Any]:
+        """
+        План синхронизации без передачи данных
+
+        Args:
+            local_dir: Локальная директория
+            prefix: Префикс S3 (с завершающим '/')
+            direction: 'upload' (локальное -> S3) или 'download' (S3 -> локальное)
+            delete: Удалять файлы, которых нет в источнике
+            use_hash: Сравнивать содержимое файлов одинакового размера по MD5
+
+        Ключи с сегментами '..' не скачиваются (попадают в rejected): они указывали бы
+        за пределы local_dir.
+
+        Returns:
+            Dict со списками transfer, delete, unchanged, rejected, состоянием для сохранения
+            и листингом S3
+        """
+        if direction not in SYNC_DIRECTIONS:
+            raise ValueError(f"Неизвестное направление синхронизации: {direction}")
+
+        local_files = scan_local(local_dir) if os.path.isdir(local_dir) else {}
+        remote_files = self._list_remote(prefix)
+        previous_state = self._load_state(local_dir, prefix)
+
+        rejected = []
+        if direction == 'download':
+            rejected = sorted(relative for relative in remote_files if '..' in relative.split('/'))
+            for relative in rejected:
+                del remote_files[relative]
+
+        source, target = (local_files, remote_files) if direction == 'upload' else (remote_files, local_files)
+        transfer, unchanged = [], []
+        state = {}
+
+        for relative in sorted(source):
+            if relative not in target:
+                transfer.append(relative)
+                continue
+            local, remote = local_files[relative], remote_files[relative]
+            same, local_md5 = self._is_same(
+                local_dir, relative, local, remote, previous_state.get(relative), use_hash
+            )
+            if same:
+                unchanged.append(relative)
+                state[relative] = {**local, 'etag': remote['etag'], 'md5': local_md5}
+            else:
+                transfer.append(relative)
+
+        extras = sorted(set(target) - set(source)) if delete else []
+        return {'transfer': transfer, 'delete': extras, 'unchanged': unchanged, 'rejected': rejected,
+                'state': state, 'remote': remote_files}
+
+    # ------------------------------------------------------------------
+    # Передача
+    # ------------------------------------------------------------------
+
+    def _upload(self, local_dir: str, prefix: str, relative: str) -> Dict[str, Any]:
+        path = local_file_path(local_dir, relative)
+        stat = os.stat(path)
+        local_md5 = md5_file(path)
+        key = prefix + relative
+        self.s3_client.upload_file(path, self.bucket_name, key, Config=self.transfer_config)
+        if stat.st_size >= MULTIPART_THRESHOLD:
+            # ETag multipart-объекта не равен MD5 - запоминаем фактический
+            etag = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)['ETag'].strip('"')
+        else:
+            etag = local_md5
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'etag': etag, 'md5': local_md5}
+
+    def _download(self, local_dir: str, prefix: str, relative: str, remote: Dict[str, Any]) -> Dict[str, Any]:
+        path = local_file_path(local_dir, relative)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        temp_path = f"{path}.s3sync"
+        self.s3_client.download_file(self.bucket_name, prefix + relative, temp_path, Config=self.transfer_config)
+        os.replace(temp_path, path)
+        stat = os.stat(path)
+        return {'size': stat.st_size, 'mtime': stat.st_mtime, 'etag': remote['etag'],
+                'md5': remote['etag'] if '-' not in remote['etag'] else None}
+
+    def sync(self,
+             local_dir: str,
+             prefix: str,
+             direction: str = 'upload',
+             delete: bool = False,
+             dry_run: bool = False,
+             use_hash: bool = True,
+             max_workers: int = 8) -> Dict[str, Any]:
+        """
+        Синхронизация директории и префикса S3
+
+        Args:
+            local_dir: Локальная директория
+            prefix: Префикс S3 (с завершающим '/')
+            direction: 'upload' или 'download'
+            delete: Удалять файлы, которых нет в источнике
+            dry_run: Только построить план
+            use_hash: Сравнивать содержимое файлов одинакового размера по MD5
+            max_workers: Число параллельных передач
+
+        Returns:
+            Dict с результатом синхронизации
+        """
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+
+        plan = self.plan(local_dir, prefix, direction, delete, use_hash)
+        errors = [{'path': relative, 'message': f"Недопустимый путь: {relative}"} for relative in plan['rejected']]
+        if dry_run:
+            return {
+                'transferred': 0,
+                'deleted': 0,
+                'to_transfer': plan['transfer'],
+                'to_delete': plan['delete'],
+                'unchanged': len(plan['unchanged']),
+                'errors': errors
+            }
+
+        state = plan['state']
+        transferred_bytes = 0
+        remote_files = plan['remote']
+
+        def transfer(relative: str) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+            try:
+                if direction == 'upload':
+                    return relative, self._upload(local_dir, prefix, relative), None
+                return relative, self._download(local_dir, prefix, relative, remote_files[relative]), None
+            except Exception as e:
+                return relative, None, str(e)
+
+        transferred = 0
+        results = bounded_map(transfer, plan['transfer'], max_workers, getattr(self.manager, 'governor', None))
+        for relative, entry, error in results:
+            if error:
+                errors.append({'path': relative, 'message': error})
+                continue
+            state[relative] = entry
+            transferred += 1
+            transferred_bytes += entry['size']
+
+        deleted = 0
+        if plan['delete']:
+            if direction == 'upload':
+                report = self.manager.delete_many(keys=[prefix + relative for relative in plan['delete']])
+                deleted = report.get('deleted', 0)
+                errors.extend({'path': e['key'], 'message': e['message']} for e in report.get('errors', []))
+            else:
+                for relative in plan['delete']:
+                    try:
+                        os.remove(local_file_path(local_dir, relative))
+                        deleted += 1
+                    except OSError as e:
+                        errors.append({'path': relative, 'message': str(e)})
+
+        with self._state_lock:
+            self._save_state(local_dir, prefix, state)
+
+        events.event(logging.INFO, 'sync_completed', "🔄 Синхронизация %s: передано %d, удалено %d, без изменений %d",
+                     direction, transferred, deleted, len(plan['unchanged']),
+                     direction=direction, transferred=transferred, transferred_bytes=transferred_bytes,
+                     deleted=deleted, unchanged=len(plan['unchanged']), errors=len(errors))
+        return {
+            'transferred': transferred,
+            'transferred_bytes': transferred_bytes,
+            'deleted': deleted,
+            'unchanged': len(plan['unchanged']),
+            'errors': errors
+        }
+
+    # ------------------------------------------------------------------
+    # Наблюдение
+    # ------------------------------------------------------------------
+
+    def watch(self,
+              local_dir: str,
+              prefix: str,
+              stop_event: Optional[threading.Event] = None,
+              poll_interval: float = 2.0,
+              settle_seconds: float = 1.0,
+              on_upload: Optional[Callable[[str, str], None]] = None,
+              use_inotify: bool = True) -> None:
+        """
+        Загрузка новых и измененных файлов по мере появления
+
+        Перед наблюдением выполняется обычная синхронизация upload; watcher создается
+        до нее, поэтому файлы, записанные во время синхронизации, не теряются. Файл
+        загружается, когда запись в него завершена (inotify IN_CLOSE_WRITE/IN_MOVED_TO)
+        или, при опросе, когда его размер и mtime не менялись settle_seconds секунд.
+        При переполнении очереди inotify директория синхронизируется заново.
+
+        Args:
+            local_dir: Локальная директория
+            prefix: Префикс S3
+            stop_event: Событие остановки (по умолчанию - до прерывания)
+            poll_interval: Интервал опроса директории в секундах
+            settle_seconds: Время без изменений, после которого файл считается записанным
+            on_upload: Callback (относительный путь, ключ S3) после загрузки
+            use_inotify: Использовать inotify, если доступен
+        """
+        if prefix and not prefix.endswith('/'):
+            prefix += '/'
+        stop_event = stop_event or threading.Event()
+        os.makedirs(local_dir, exist_ok=True)
+
+        watcher = _InotifyWatcher.create(local_dir) if use_inotify else None
+        state: Dict[str, Dict[str, Any]] = {}
+
+        def rescan() -> None:
+            self.sync(local_dir, prefix, direction='upload')
+            state.clear()
+            state.update(self._load_state(local_dir, prefix))
+
+        def upload(relative: str) -> None:
+            known = state.get(relative)
+            try:
+                stat = os.stat(local_file_path(local_dir, relative))
+                if known and known.get('size') == stat.st_size and known.get('mtime') == stat.st_mtime:
+                    # Уже загружен синхронизацией (событие пришло во время нее)
+                    return
+                entry = self._upload(local_dir, prefix, relative)
+            except FileNotFoundError:
+                return
+            except Exception as e:
+                logger.error(f"❌ Ошибка загрузки {relative}: {e}")
+                return
+            state[relative] = entry
+            with self._state_lock:
+                self._save_state(local_dir, prefix, state)
+            events.sampled(logging.INFO, 'sync_file_uploaded', "⬆️ Загружен новый файл: %s%s",
+                           prefix, relative, key=prefix + relative)
+            if on_upload:
+                on_upload(relative, prefix + relative)
+
+        if watcher:
+            logger.info(f"👀 Наблюдение за {local_dir} (inotify)")
+            try:
+                rescan()
+                while not stop_event.is_set():
+                    for relative in watcher.read_changes(timeout=poll_interval):
+                        if relative is None:
+                            logger.warning(f"⚠️ Очередь inotify переполнена, повторная синхронизация {local_dir}")
+                            rescan()
+                        else:
+                            upload(relative)
+            finally:
+                watcher.close()
+            return
+
+        rescan()
+
+        logger.info(f"👀 Наблюдение за {local_dir} (опрос каждые {poll_interval} с)")
+        pending: Dict[str, Tuple[int, float, float]] = {}
+        while not stop_event.is_set():
+            now = time.monotonic()
+            for relative, info in scan_local(local_dir).items():
+                known = state.get(relative)
+                if known and known.get('size') == info['size'] and known.get('mtime') == info['mtime']:
+                    pending.pop(relative, None)
+                    continue
+                signature = (info['size'], info['mtime'])
+                seen = pending.get(relative)
+                if seen is None or seen[:2] != signature:
+                    pending[relative] = (*signature, now)
+                elif now - seen[2] >= settle_seconds:
+                    pending.pop(relative)
+                    upload(relative)
+            stop_event.wait(poll_interval)
+
+
+class _InotifyWatcher:
+    """Рекурсивное наблюдение за директорией через inotify (Linux, ctypes)"""
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_ISDIR = 0x40000000
+    IN_NONBLOCK = 0o4000
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, libc, fd: int, root: str):
+        self._libc = libc
+        self._fd = fd
+        self.root = root
+        self._dirs: Dict[int, str] = {}
+        for directory, _, _ in os.walk(root):
+            self._add(directory)
+
+    @classmethod
+    def create(cls, root: str) -> Optional['_InotifyWatcher']:
+        """Watcher или None, если inotify недоступен"""
+        if not hasattr(select, 'poll'):
+            return None
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            fd = libc.inotify_init1(cls.IN_NONBLOCK)
+        except (OSError, AttributeError):
+            return None
+        if fd < 0:
+            return None
+        return cls(libc, fd, root)
+
+    def _add(self, directory: str) -> None:
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(directory), mask)
+        if wd >= 0:
+            self._dirs[wd] = directory
+
+    def read_changes(self, timeout: float) -> Iterator[Optional[str]]:
+        """Относительные пути файлов, запись в которые завершена (None - события потеряны)"""
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        if not poller.poll(timeout * 1000):
+            return
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return
+
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+
+            if mask & self.IN_Q_OVERFLOW:
+                yield None
+                continue
+
+            directory = self._dirs.get(wd)
+            if directory is None or not name:
+                continue
+            path = os.path.join(directory, name)
+            if mask & self.IN_ISDIR:
+                # Новая поддиректория: наблюдаем и загружаем уже появившиеся файлы
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    for subdir, _, files in os.walk(path):
+                        self._add(subdir)
+                        for file_name in files:
+                            yield os.path.relpath(os.path.join(subdir, file_name), self.root).replace(os.sep, '/')
+                continue
+            if mask & (self.IN_CLOSE_WRITE | self.IN_MOVED_TO):
+                yield os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def close(self) -> None:
+        os.close(self._fd)
@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+S3 Tensor Format для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Сырой формат тензоров (.tensor) для промежуточных изображений между workflow.
+
+Файл состоит из небольшого заголовка (тип и форма) и непрерывных данных float16
+или float32, при необходимости сжатых zstd. Несжатый файл читается через
+np.memmap без декодирования, а запись идет прямо из буфера массива.
+
+Заголовок (little-endian):
+    magic 'CTNS' | версия (1 байт) | флаги (1 байт) | тип (1 байт) | ndim (1 байт) |
+    форма (ndim x uint64) | выравнивание нулями до TENSOR_ALIGNMENT
+"""
+
+import io
+import struct
+from typing import IO, Tuple
+
+import numpy as np
+
+# Сжатие zstd (опционально)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+TENSOR_MAGIC = b'CTNS'
+TENSOR_VERSION = 1
+TENSOR_EXTENSION = '.tensor'
+TENSOR_CONTENT_TYPE = 'application/x-comfyui-tensor'
+# Данные начинаются с границы, кратной выравниванию (удобно для memmap и SIMD)
+TENSOR_ALIGNMENT = 64
+TENSOR_DTYPES = {'float16': 1, 'float32': 2}
+FLAG_ZSTD = 0x01
+
+_PREFIX = struct.Struct('<4sBBBB')
+_DTYPE_NAMES = {code: name for name, code in TENSOR_DTYPES.items()}
+
+
+def encode_tensor_header(dtype: str, shape: Tuple[int, ...], compressed: bool = False) -> bytes:
+    """
+    Заголовок файла тензора
+
+    Args:
+        dtype: Тип данных ('float16' или 'float32')
+        shape: Форма тензора
+        compressed: Данные сжаты zstd
+
+    Returns:
+        Байты заголовка с выравниванием
+    """
+    if dtype not in TENSOR_DTYPES:
+        raise ValueError(f"Неподдерживаемый тип тензора: {dtype}")
+    header = _PREFIX.pack(TENSOR_MAGIC, TENSOR_VERSION, FLAG_ZSTD if compressed else 0,
+                          TENSOR_DTYPES[dtype], len(shape))
+    header += struct.pack(f'<{len(shape)}Q', *shape)
+    return header + b'\0' * (-len(header) % TENSOR_ALIGNMENT)
+
+
+def decode_tensor_header(data: bytes) -> Tuple[np.dtype, Tuple[int, ...], bool, int]:
+    """
+    Разбор заголовка файла тензора
+
+    Args:
+        data: Начало файла (не меньше размера заголовка)
+
+    Returns:
+        (тип, форма, сжатие zstd, смещение данных)
+    """
+    magic, version, flags, dtype_code, ndim = _PREFIX.unpack_from(data)
+    if magic != TENSOR_MAGIC:
+        raise ValueError("Файл не является тензором ComfyUI")
+    if version != TENSOR_VERSION:
+        raise ValueError(f"Неподдерживаемая версия формата тензора: {version}")
+    if dtype_code not in _DTYPE_NAMES:
+        raise ValueError(f"Неизвестный тип тензора: {dtype_code}")
+    shape = struct.unpack_from(f'<{ndim}Q', data, _PREFIX.size)
+    end = _PREFIX.size + 8 * ndim
+    offset = end + (-end % TENSOR_ALIGNMENT)
+    return np.dtype(_DTYPE_NAMES[dtype_code]), tuple(shape), bool(flags & FLAG_ZSTD), offset
+
+
+def _header_size(ndim: int) -> int:
+    """Размер заголовка с выравниванием для тензора размерности ndim"""
+    end = _PREFIX.size + 8 * ndim
+    return end + (-end % TENSOR_ALIGNMENT)
+
+
+class TensorReader(io.RawIOBase):
+    """
+    Поток байтов файла тензора поверх буфера массива без копирования данных
+
+    Заголовок и память массива отдаются через readinto по частям, поэтому
+    загрузка в S3 не создает промежуточную копию тензора.
+    """
+
+    def __init__(self, array: np.ndarray, dtype: str = 'float32'):
+        """
+        Args:
+            array: Тензор (копируется только если тип или раскладка отличаются)
+            dtype: Тип данных в файле ('float16' или 'float32')
+        """
+        super().__init__()
+        array = np.ascontiguousarray(array, dtype=dtype)
+        self.array = array
+        self._parts = [memoryview(encode_tensor_header(dtype, array.shape)),
+                       memoryview(array).cast('B')]
+        self._part = 0
+        self._offset = 0
+        self.size = sum(part.nbytes for part in self._parts)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        target = memoryview(buffer).cast('B')
+        written = 0
+        while written < len(target) and self._part < len(self._parts):
+            part = self._parts[self._part]
+            count = min(len(target) - written, part.nbytes - self._offset)
+            target[written:written + count] = part[self._offset:self._offset + count]
+            written += count
+            self._offset += count
+            if self._offset == part.nbytes:
+                self._part += 1
+                self._offset = 0
+        return written
+
+
+def tensor_stream(array: np.ndarray,
+                  dtype: str = 'float32',
+                  compress: bool = False,
+                  level: int = 3) -> IO[bytes]:
+    """
+    Поток байтов файла тензора для загрузки
+
+    Args:
+        array: Тензор
+        dtype: Тип данных в файле ('float16' или 'float32')
+        compress: Сжать данные zstd (потоково, без полной копии)
+        level: Уровень сжатия zstd
+
+    Returns:
+        Файлоподобный объект для чтения
+    """
+    if dtype not in TENSOR_DTYPES:
+        raise ValueError(f"Неподдерживаемый тип тензора: {dtype}")
+    reader = TensorReader(array, dtype)
+    if not compress:
+        return io.BufferedReader(reader, buffer_size=1024 * 1024)
+    if zstandard is None:
+        raise ValueError("Для сжатия тензоров установите пакет zstandard")
+
+    # Заголовок не сжимается, чтобы форму можно было прочитать без распаковки
+    header = encode_tensor_header(dtype, reader.array.shape, compressed=True)
+    reader.read(len(header))
+    compressed = zstandard.ZstdCompressor(level=level).stream_reader(reader, size=reader.size - len(header))
+    return io.BufferedReader(_ConcatReader(header, compressed), buffer_size=1024 * 1024)
+
+
+class _ConcatReader(io.RawIOBase):
+    """Поток из заголовка и потока сжатых данных"""
+
+    def __init__(self, header: bytes, stream: IO[bytes]):
+        super().__init__()
+        self._header = memoryview(header)
+        self._stream = stream
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        target = memoryview(buffer).cast('B')
+        if self._header.nbytes:
+            count = min(len(target), self._header.nbytes)
+            target[:count] = self._header[:count]
+            self._header = self._header[count:]
+            return count
+        data = self._stream.read(len(target))
+        target[:len(data)] = data
+        return len(data)
+
+
+def write_tensor(path: str, array: np.ndarray, dtype: str = 'float32', compress: bool = False) -> int:
+    """
+    Запись тензора в файл
+
+    Args:
+        path: Путь к файлу
+        array: Тензор
+        dtype: Тип данных в файле
+        compress: Сжать данные zstd
+
+    Returns:
+        Размер файла в байтах
+    """
+    import shutil
+
+    with tensor_stream(array, dtype, compress) as stream, open(path, 'wb') as f:
+        shutil.copyfileobj(stream, f, 1024 * 1024)
+        return f.tell()
+
+
+def load_tensor(path: str, mmap: bool = True) -> np.ndarray:
+    """
+    Чтение тензора из файла без декодирования
+
+    Несжатый файл отображается в память (np.memmap, только чтение) или читается
+    одним read в np.frombuffer; сжатый распаковывается прямо в буфер массива.
+
+    Args:
+        path: Путь к файлу
+        mmap: Отобразить несжатый файл в память вместо чтения
+
+    Returns:
+        Тензор исходной формы
+    """
+    with open(path, 'rb') as f:
+        prefix = f.read(_PREFIX.size)
+        ndim = _PREFIX.unpack(prefix)[4] if len(prefix) == _PREFIX.size else 0
+        dtype, shape, compressed, offset = decode_tensor_header(prefix + f.read(_header_size(ndim) - len(prefix)))
+
+        if not compressed:
+            if mmap:
+                return np.memmap(path, dtype=dtype, mode='r', offset=offset, shape=shape)
+            return np.frombuffer(f.read(), dtype=dtype).reshape(shape)
+
+        if zstandard is None:
+            raise ValueError("Для распаковки тензоров установите пакет zstandard")
+        array = np.empty(shape, dtype=dtype)
+        target = memoryview(array).cast('B')
+        with zstandard.ZstdDecompressor().stream_reader(f) as reader:
+            filled = 0
+            while filled < target.nbytes:
+                count = reader.readinto(target[filled:])
+                if not count:
+                    raise ValueError("Файл тензора поврежден: данные короче заголовка")
+                filled += count
+        return array
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+S3 URL Cache для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Кэш подписанных (presigned) URL с учетом срока действия.
+
+Запросы с близким сроком действия попадают в одну "корзину" (срок округляется вверх
+до PRESIGNED_URL_BUCKET_SECONDS). URL подписывается с запасом - на срок корзины,
+деленный на (1 - PRESIGNED_URL_SAFETY_FRACTION), и переиспользуется, пока до
+истечения остается не меньше запрошенного срока. Кэш ограничен по размеру (LRU)
+и общий для всех экземпляров менеджера.
+"""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Optional, Tuple
+
+try:
+    from .metrics import record_cache
+except ImportError:
+    from metrics import record_cache
+
+# Шаг округления срока действия URL в секундах
+PRESIGNED_URL_BUCKET_SECONDS = 300
+# Доля срока подписи, в течение которой URL переиспользуется
+PRESIGNED_URL_SAFETY_FRACTION = 0.5
+# Максимальный срок действия подписи SigV4 (7 дней)
+PRESIGNED_URL_MAX_EXPIRES = 7 * 24 * 3600
+DEFAULT_MAX_ENTRIES = 50_000
+
+
+def expiry_bucket(expires_in: int) -> int:
+    """
+    Срок действия, округленный вверх до границы корзины
+
+    Args:
+        expires_in: Запрошенный срок действия в секундах
+
+    Returns:
+        Срок действия корзины в секундах (не меньше запрошенного)
+    """
+    return max(1, math.ceil(expires_in / PRESIGNED_URL_BUCKET_SECONDS)) * PRESIGNED_URL_BUCKET_SECONDS
+
+
+class PresignedUrlCache:
+    """
+    Потокобезопасный LRU кэш подписанных URL
+    """
+
+    def __init__(self,
+                 max_entries: int = DEFAULT_MAX_ENTRIES,
+                 safety_fraction: float = PRESIGNED_URL_SAFETY_FRACTION,
+                 clock: Callable[[], float] = time.time):
+        """
+        Инициализация кэша
+
+        Args:
+            max_entries: Максимальное число URL в кэше
+            safety_fraction: Доля срока подписи, в течение которой URL переиспользуется (0 <= x < 1)
+            clock: Источник времени (секунды)
+        """
+        if not 0 <= safety_fraction < 1:
+            raise ValueError(f"safety_fraction должен быть в [0, 1): {safety_fraction}")
+        self.max_entries = max_entries
+        self.safety_fraction = safety_fraction
+        self._clock = clock
+        self._entries: 'OrderedDict[Hashable, Tuple[str, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def signed_lifetime(self, expires_in: int) -> int:
+        """
+        Срок, на который подписывается URL для запрошенного срока
+
+        Args:
+            expires_in: Запрошенный (минимальный) срок действия в секундах
+
+        Returns:
+            Срок подписи в секундах: не меньше срока корзины, не больше PRESIGNED_URL_MAX_EXPIRES
+        """
+        bucket = expiry_bucket(expires_in)
+        lifetime = expiry_bucket(math.ceil(bucket / (1 - self.safety_fraction)))
+        return min(lifetime, max(bucket, PRESIGNED_URL_MAX_EXPIRES))
+
+    def lookup(self, cache_key: Hashable, expires_in: int) -> Optional[str]:
+        """
+        URL из кэша, если он действителен еще не меньше expires_in секунд
+
+        Args:
+            cache_key: Ключ кэша без учета срока (клиент, bucket, объект, метод)
+            expires_in: Запрошенный срок действия в секундах
+
+        Returns:
+            URL или None
+        """
+        full_key = (cache_key, expiry_bucket(expires_in))
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None:
+                url, expires_at = entry
+                if expires_at - self._clock() >= expires_in:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    record_cache('presigned_url', True)
+                    return url
+                del self._entries[full_key]
+            self.misses += 1
+        record_cache('presigned_url', False)
+        return None
+
+    def store(self, cache_key: Hashable, expires_in: int, url: str, signed_at: float) -> None:
+        """
+        Сохранение подписанного URL
+
+        Args:
+            cache_key: Ключ кэша без учета срока
+            expires_in: Запрошенный срок действия (URL подписан на signed_lifetime(expires_in))
+            url: Подписанный URL
+            signed_at: Время подписи
+        """
+        bucket = expiry_bucket(expires_in)
+        with self._lock:
+            self._entries[(cache_key, bucket)] = (url, signed_at + self.signed_lifetime(expires_in))
+            self._entries.move_to_end((cache_key, bucket))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_or_sign(self,
+                    cache_key: Hashable,
+                    expires_in: int,
+                    sign: Callable[[int], str]) -> str:
+        """
+        URL из кэша или новая подпись
+
+        Args:
+            cache_key: Ключ кэша без учета срока
+            expires_in: Запрошенный срок действия в секундах
+            sign: Функция подписи, принимающая срок подписи (signed_lifetime)
+
+        Returns:
+            Подписанный URL
+        """
+        url = self.lookup(cache_key, expires_in)
+        if url is None:
+            signed_at = self._clock()
+            url = sign(self.signed_lifetime(expires_in))
+            if url:
+                self.store(cache_key, expires_in, url, signed_at)
+        return url
+
+    def clear(self) -> None:
+        """Очистка кэша"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        """Статистика кэша"""
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'max_entries': self.max_entries}
+
+
+# Общий кэш для всех экземпляров менеджеров в процессе
+shared_url_cache = PresignedUrlCache()
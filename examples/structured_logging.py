@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Structured Logging для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Легковесный слой структурированного логирования для горячих путей.
+
+- Ленивое форматирование: сообщение форматируется (%-стиль) только если уровень
+  включен, а при выключенном уровне вызов сводится к одной проверке.
+- Выборка для событий по отдельным элементам: первые sample_first событий, затем
+  каждое sample_every-е (с номером вхождения в полях).
+- Сводные события по пакету: BatchSummary накапливает счетчики и пишет одно
+  событие с итогами и длительностью.
+
+Модули пакета не настраивают корневой логгер при импорте; для скриптов есть
+configure_logging.
+"""
+
+import json
+import logging
+import sys
+import threading
+import time
+from collections import defaultdict
+from typing import IO, Any, Dict, Optional
+
+# Параметры выборки событий по умолчанию
+DEFAULT_SAMPLE_FIRST = 10
+DEFAULT_SAMPLE_EVERY = 1000
+
+
+class EventLogger:
+    """
+    Структурированные события поверх logging.Logger
+
+    Имя события и поля передаются в LogRecord как атрибуты event и fields
+    (их выводит StructuredFormatter).
+    """
+
+    def __init__(self,
+                 logger: logging.Logger,
+                 sample_first: int = DEFAULT_SAMPLE_FIRST,
+                 sample_every: int = DEFAULT_SAMPLE_EVERY):
+        """
+        Args:
+            logger: Логгер модуля
+            sample_first: Сколько первых вхождений события выводить полностью
+            sample_every: Затем выводить каждое N-е вхождение
+        """
+        self.logger = logger
+        self.sample_first = sample_first
+        self.sample_every = sample_every
+        self._counts: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def enabled(self, level: int) -> bool:
+        """Проверка, будет ли событие уровня level записано"""
+        return self.logger.isEnabledFor(level)
+
+    def event(self, level: int, event: str, msg: str, *args: Any, **fields: Any) -> None:
+        """
+        Запись события
+
+        Args:
+            level: Уровень логирования
+            event: Имя события (например 'node_added')
+            msg: Шаблон сообщения в %-стиле
+            *args: Аргументы шаблона (форматируются только при записи)
+            **fields: Структурированные поля события
+        """
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, msg, *args, extra={'event': event, 'fields': fields}, stacklevel=2)
+
+    def sampled(self, level: int, event: str, msg: str, *args: Any, **fields: Any) -> None:
+        """
+        Запись события по отдельному элементу с выборкой
+
+        Выводятся первые sample_first вхождений события и затем каждое
+        sample_every-е; номер вхождения добавляется в поле occurrence.
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+        with self._lock:
+            self._counts[event] += 1
+            count = self._counts[event]
+        if count <= self.sample_first or count % self.sample_every == 0:
+            fields['occurrence'] = count
+            self.logger.log(level, msg, *args, extra={'event': event, 'fields': fields}, stacklevel=2)
+
+    def counts(self) -> Dict[str, int]:
+        """Число вхождений событий с выборкой (включая пропущенные)"""
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self) -> None:
+        """Сброс счетчиков выборки"""
+        with self._lock:
+            self._counts.clear()
+
+    def batch(self, event: str, msg: str, level: int = logging.INFO) -> 'BatchSummary':
+        """
+        Сводное событие по пакету операций
+
+        Args:
+            event: Имя сводного события
+            msg: Описание пакета (выводится со счетчиками и длительностью)
+            level: Уровень логирования
+
+        Returns:
+            Контекстный менеджер BatchSummary
+        """
+        return BatchSummary(self, event, msg, level)
+
+
+class BatchSummary:
+    """
+    Накопление счетчиков пакета и одно итоговое событие при выходе из контекста
+
+    Пример:
+        with events.batch('upload_batch', '⬆️ Загрузка пакета') as summary:
+            for item in items:
+                ...
+                summary.add('uploaded')
+                summary.add('bytes', size)
+    """
+
+    def __init__(self, events: EventLogger, event: str, msg: str, level: int = logging.INFO):
+        self.events = events
+        self.event = event
+        self.msg = msg
+        self.level = level
+        self.counters: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        self._started = 0.0
+
+    def add(self, counter: str, amount: int = 1) -> None:
+        """Увеличение счетчика пакета"""
+        with self._lock:
+            self.counters[counter] += amount
+
+    def __enter__(self) -> 'BatchSummary':
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        if not self.events.enabled(self.level):
+            return
+        elapsed_ms = (time.perf_counter() - self._started) * 1000
+        counters = dict(self.counters)
+        details = ', '.join(f"{name}={value}" for name, value in counters.items())
+        fields = dict(counters, elapsed_ms=round(elapsed_ms, 1))
+        if exc_type is not None:
+            # Пакет прерван исключением - итог все равно записывается
+            fields['exception'] = exc_type.__name__
+        self.events.logger.log(
+            self.level, "%s: %s за %.1f мс", self.msg, details or 'пусто', elapsed_ms,
+            extra={'event': self.event, 'fields': fields}, stacklevel=2
+        )
+
+
+class StructuredFormatter(logging.Formatter):
+    """Форматирование записей в JSON строки (одна запись - одна строка)"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': round(record.created, 3),
+            'level': record.levelname,
+            'logger': record.name,
+            'event': getattr(record, 'event', None),
+            'message': record.getMessage()
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def configure_logging(level: int = logging.INFO,
+                      structured: bool = False,
+                      stream: Optional[IO[str]] = None) -> None:
+    """
+    Настройка корневого логгера для скриптов и CLI
+
+    Вызывается из точек входа (if __name__ == "__main__"), а не при импорте модулей.
+
+    Args:
+        level: Уровень логирования
+        structured: Выводить записи в JSON (StructuredFormatter)
+        stream: Поток вывода (по умолчанию stderr)
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if structured:
+        handler.setFormatter(StructuredFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    logging.basicConfig(level=level, handlers=[handler], force=True)
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Tracing для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Опциональная трассировка запусков узлов с таймингом фаз.
+
+Каждый запуск FUNCTION узла записывается как span категории 'node', а операции
+внутри него (track / instrumented из metrics) - как дочерние span'ы категорий
+'network' (S3, OpenAI, ComfyUI), 'encode' (кодирование и декодирование) и 'disk'.
+
+Trace пишется потоково в JSON файл формата Chrome Trace Event (массив событий
+"ph": "X"), который открывается в chrome://tracing и ui.perfetto.dev. Пока
+трассировка не включена, обертки сводятся к одной проверке.
+
+Включение: переменная окружения COMFYUI_TRACE_FILE при загрузке узлов или
+enable_tracing(path) + trace_node_classes(NODE_CLASS_MAPPINGS).
+"""
+
+import atexit
+import contextvars
+import functools
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Категория span'а по сервису метрик
+SERVICE_CATEGORIES = {
+    's3': 'network',
+    'openai': 'network',
+    'comfyui': 'network',
+    'encode': 'encode',
+    'disk': 'disk',
+}
+
+# Текущий span узла в контексте выполнения (для привязки дочерних span'ов)
+_current_node: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('comfyui_trace_node', default=None)
+
+# Открытый дочерний span (для вложенных track / instrumented)
+_current_span: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar('comfyui_trace_span', default=None)
+
+
+class Tracer:
+    """
+    Потоковая запись span'ов в файл Chrome Trace Event
+
+    События дописываются в JSON массив по мере завершения span'ов; после close()
+    файл - корректный JSON, а до этого его уже можно открыть в просмотрщике
+    (закрывающая скобка массива в формате необязательна).
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: Путь к файлу trace (перезаписывается)
+        """
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'w', encoding='utf-8')
+        self._file.write('[')
+        self._first = True
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._origin_ns = time.perf_counter_ns()
+        self._ids = itertools.count(1)
+        self._named_threads = set()
+        self.closed = False
+
+    def next_id(self) -> int:
+        """Идентификатор нового span'а"""
+        return next(self._ids)
+
+    def now(self) -> int:
+        """Текущее время трассировки в наносекундах"""
+        return time.perf_counter_ns()
+
+    def _write(self, event: Dict[str, Any]) -> None:
+        self._file.write(('\n' if self._first else ',\n') + json.dumps(event, ensure_ascii=False, default=str))
+        self._first = False
+
+    def record(self,
+               name: str,
+               category: str,
+               start_ns: int,
+               end_ns: int,
+               args: Optional[Dict[str, Any]] = None) -> None:
+        """
+        Запись завершенного span'а
+
+        Args:
+            name: Имя span'а
+            category: Категория ('node', 'network', 'encode', 'disk')
+            start_ns: Начало (perf_counter_ns)
+            end_ns: Конец (perf_counter_ns)
+            args: Дополнительные поля события
+        """
+        thread = threading.current_thread()
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': (start_ns - self._origin_ns) / 1000,
+            'dur': (end_ns - start_ns) / 1000,
+            'pid': self._pid,
+            'tid': thread.ident,
+            'args': args or {}
+        }
+        with self._lock:
+            if self.closed:
+                return
+            if thread.ident not in self._named_threads:
+                # Подпись потока в просмотрщике
+                self._named_threads.add(thread.ident)
+                self._write({'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': thread.ident,
+                             'args': {'name': thread.name}})
+            self._write(event)
+            if category == 'node':
+                self._file.flush()
+
+    def close(self) -> None:
+        """Завершение файла trace"""
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+            self._file.write('\n]\n')
+            self._file.close()
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def enable_tracing(path: str) -> Tracer:
+    """
+    Включение трассировки в файл
+
+    Предыдущий trace (если был) закрывается.
+
+    Args:
+        path: Путь к JSON файлу trace
+
+    Returns:
+        Активный Tracer
+    """
+    global _tracer
+    with _tracer_lock:
+        if _tracer is not None:
+            _tracer.close()
+        _tracer = Tracer(path)
+    logger.info(f"🧭 Трассировка узлов: {path}")
+    return _tracer
+
+
+def disable_tracing() -> None:
+    """Выключение трассировки и закрытие файла"""
+    global _tracer
+    with _tracer_lock:
+        tracer, _tracer = _tracer, None
+    if tracer is not None:
+        tracer.close()
+
+
+def tracing_enabled() -> bool:
+    """Включена ли трассировка"""
+    return _tracer is not None
+
+
+atexit.register(disable_tracing)
+
+
+class _SpanToken:
+    """Открытый span (для begin_span / end_span)"""
+
+    __slots__ = ('tracer', 'name', 'category', 'start_ns', 'args', 'context_token')
+
+    def __init__(self, tracer: Tracer, name: str, category: str, args: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+        self.args = args
+        self.context_token = _current_span.set(args['id'])
+        self.start_ns = tracer.now()
+
+
+def begin_span(name: str, category: str, **args: Any) -> Optional[_SpanToken]:
+    """
+    Начало дочернего span'а (None, если трассировка выключена)
+
+    Span, открытый внутри другого дочернего span'а, получает его id в поле
+    'enclosing' - по нему summarize_trace не учитывает вложенное время дважды.
+
+    Args:
+        name: Имя операции
+        category: Категория или сервис метрик (s3/openai/comfyui -> network)
+        **args: Дополнительные поля события
+    """
+    tracer = _tracer
+    if tracer is None:
+        return None
+    node_span = _current_node.get()
+    if node_span is not None:
+        args['parent'] = node_span
+    enclosing = _current_span.get()
+    if enclosing is not None:
+        args['enclosing'] = enclosing
+    args['id'] = tracer.next_id()
+    return _SpanToken(tracer, name, SERVICE_CATEGORIES.get(category, category), args)
+
+
+def end_span(token: Optional[_SpanToken], error: bool = False) -> None:
+    """Завершение span'а, начатого begin_span"""
+    if token is None:
+        return
+    try:
+        _current_span.reset(token.context_token)
+    except ValueError:
+        # Span завершен в другом контексте (например, в другой задаче)
+        pass
+    if error:
+        token.args['error'] = True
+    token.tracer.record(token.name, token.category, token.start_ns, token.tracer.now(), token.args)
+
+
+@contextmanager
+def span(name: str, category: str, **args: Any) -> Iterator[None]:
+    """
+    Дочерний span как контекстный менеджер
+
+    Args:
+        name: Имя операции
+        category: Категория ('network', 'encode', 'disk') или сервис метрик
+        **args: Дополнительные поля события
+    """
+    token = begin_span(name, category, **args)
+    try:
+        yield
+    except BaseException:
+        end_span(token, error=True)
+        raise
+    end_span(token)
+
+
+def _traced_node(node_name: str, method):
+    """Обертка FUNCTION узла: span категории 'node' вокруг каждого запуска"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        tracer = _tracer
+        if tracer is None:
+            return method(*args, **kwargs)
+        span_id = tracer.next_id()
+        context_token = _current_node.set(span_id)
+        span_token = _current_span.set(None)
+        start_ns = tracer.now()
+        error = True
+        try:
+            result = method(*args, **kwargs)
+            error = False
+            return result
+        finally:
+            _current_span.reset(span_token)
+            _current_node.reset(context_token)
+            span_args = {'id': span_id, 'function': method.__name__}
+            if error:
+                span_args['error'] = True
+            tracer.record(node_name, 'node', start_ns, tracer.now(), span_args)
+
+    wrapper.__traced__ = True
+    return wrapper
+
+
+def trace_node_classes(node_class_mappings: Dict[str, type]) -> None:
+    """
+    Обертка FUNCTION всех узлов для трассировки
+
+    Повторный вызов для уже обернутых классов ничего не меняет.
+
+    Args:
+        node_class_mappings: NODE_CLASS_MAPPINGS модуля узлов
+    """
+    for node_name, node_class in node_class_mappings.items():
+        function_name = getattr(node_class, 'FUNCTION', None)
+        method = getattr(node_class, function_name, None) if function_name else None
+        if method is None or getattr(method, '__traced__', False):
+            continue
+        setattr(node_class, function_name, _traced_node(node_name, method))
+
+
+def enable_from_env(node_class_mappings: Optional[Dict[str, type]] = None) -> bool:
+    """
+    Включение трассировки по переменной окружения COMFYUI_TRACE_FILE
+
+    Args:
+        node_class_mappings: Узлы для обертки (если трассировка включена)
+
+    Returns:
+        True если трассировка включена
+    """
+    path = os.getenv('COMFYUI_TRACE_FILE')
+    if not path:
+        return False
+    with _tracer_lock:
+        start = _tracer is None
+    if start:
+        try:
+            enable_tracing(path)
+        except OSError as e:
+            logger.warning(f"⚠️ Не удалось включить трассировку: {e}")
+            return False
+    if node_class_mappings:
+        trace_node_classes(node_class_mappings)
+    return True
+
+
+def load_trace(path: str) -> List[Dict[str, Any]]:
+    """
+    Чтение событий trace (в том числе незавершенного файла)
+
+    Args:
+        path: Путь к файлу trace
+
+    Returns:
+        Список событий "ph": "X"
+    """
+    with open(path, encoding='utf-8') as f:
+        text = f.read().rstrip().rstrip(',')
+    if not text.endswith(']'):
+        text += ']'
+    return [event for event in json.loads(text) if event.get('ph') == 'X']
+
+
+def _percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def summarize_trace(path: str) -> Dict[str, Dict[str, Any]]:
+    """
+    Сводка по узлам: p50/p99 длительности и разбивка медленных запусков по фазам
+
+    Фазы суммируются по собственному времени дочерних span'ов запуска: из
+    длительности span'а вычитаются непосредственно вложенные в него span'ы,
+    поэтому вложенные track / instrumented не учитываются дважды. Задачи в пулах
+    потоков (bounded_map передает контекст) тоже входят в сумму, и при
+    параллельной работе сумма фаз может превышать длительность узла.
+
+    Args:
+        path: Путь к файлу trace
+
+    Returns:
+        {узел: {'count', 'p50_ms', 'p99_ms', 'p99_phases_ms': {категория: мс}}}
+    """
+    events = load_trace(path)
+    runs: Dict[int, Dict[str, Any]] = {}
+    phases: Dict[int, Dict[str, float]] = {}
+    nested: Dict[int, float] = {}
+    for event in events:
+        if 'enclosing' in event['args']:
+            enclosing = event['args']['enclosing']
+            nested[enclosing] = nested.get(enclosing, 0.0) + event['dur']
+    for event in events:
+        if event['cat'] == 'node':
+            runs[event['args']['id']] = event
+        elif 'parent' in event['args']:
+            # Параллельные вложенные span'ы могут перекрывать родителя целиком
+            own = max(0.0, event['dur'] - nested.get(event['args'].get('id'), 0.0))
+            parent_phases = phases.setdefault(event['args']['parent'], {})
+            parent_phases[event['cat']] = parent_phases.get(event['cat'], 0.0) + own / 1000
+
+    by_node: Dict[str, List[Dict[str, Any]]] = {}
+    for run in runs.values():
+        by_node.setdefault(run['name'], []).append(run)
+
+    summary = {}
+    for node_name, node_runs in by_node.items():
+        durations = [run['dur'] / 1000 for run in node_runs]
+        p99 = _percentile(durations, 0.99)
+        slow = [run for run in node_runs if run['dur'] / 1000 >= p99]
+        slow_phases: Dict[str, float] = {}
+        for run in slow:
+            for category, duration in phases.get(run['args']['id'], {}).items():
+                slow_phases[category] = slow_phases.get(category, 0.0) + duration / len(slow)
+        summary[node_name] = {
+            'count': len(node_runs),
+            'p50_ms': round(_percentile(durations, 0.5), 3),
+            'p99_ms': round(p99, 3),
+            'p99_phases_ms': {category: round(value, 3) for category, value in sorted(slow_phases.items())}
+        }
+    return summary
@@ -0,0 +1,762 @@
+#!/usr/bin/env python3
+"""
+Workflow Serialization для ComfyUI
+Автор: AI Assistant
+Версия: 1.0.0
+
+Потоковая запись и инкрементальное чтение workflow в формате JSON.
+Узлы и соединения обрабатываются по одному, поэтому для больших workflow
+не требуется держать в памяти весь документ целиком.
+
+Также содержит компактный бинарный формат (.cwf) для архивного хранения.
+"""
+
+import array
+import json
+import re
+import struct
+import sys
+import zlib
+from typing import Any, Dict, IO, Iterable, Iterator, List, Optional, Tuple
+import logging
+
+# Быстрый JSON backend (опционально)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Быстрый msgpack backend (опционально, формат совместим со встроенным кодеком)
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Ключи верхнего уровня, элементы которых читаются по одному
+STREAMED_KEYS = ("nodes", "links")
+
+_WHITESPACE = re.compile(r'[ \t\n\r]*')
+_DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+def has_fast_backend() -> bool:
+    """Проверка доступности быстрого JSON backend (orjson)"""
+    return orjson is not None
+
+
+def _orjson_matches_json(value: Any) -> bool:
+    """
+    Совпадет ли вывод orjson с выводом стандартного json
+
+    orjson записывает NaN и Infinity как null, а числа в экспоненциальной
+    записи - без '+' и в других диапазонах (1e16 вместо 1e+16, 0.00001 вместо 1e-05).
+    """
+    if isinstance(value, float):
+        # Диапазон, в котором оба кодировщика пишут число без экспоненты (NaN не проходит)
+        return value == 0 or 1e-4 <= abs(value) < 1e16
+    if isinstance(value, dict):
+        return all(_orjson_matches_json(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return all(_orjson_matches_json(item) for item in value)
+    return True
+
+
+def dumps_value(value: Any, compact: bool = False, use_fast_backend: bool = True) -> bytes:
+    """
+    Сериализация одного значения в UTF-8 JSON
+
+    Значения с NaN, Infinity или числами в экспоненциальной записи сериализуются
+    стандартным json даже при установленном orjson, поэтому вывод не зависит от backend.
+
+    Args:
+        value: Сериализуемое значение
+        compact: Компактный вывод без отступов
+        use_fast_backend: Использовать orjson если он установлен
+
+    Returns:
+        JSON в виде байтов
+    """
+    if use_fast_backend and orjson is not None and _orjson_matches_json(value):
+        try:
+            option = 0 if compact else orjson.OPT_INDENT_2
+            return orjson.dumps(value, option=option)
+        except TypeError:
+            # orjson строже стандартного json (например, нестроковые ключи)
+            pass
+
+    if compact:
+        text = json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+    else:
+        text = json.dumps(value, ensure_ascii=False, indent=2)
+    return text.encode('utf-8')
+
+
+def write_workflow_stream(fileobj: IO[bytes],
+                          header: Dict[str, Any],
+                          nodes: Iterable[Dict[str, Any]],
+                          links: Iterable[List[Any]],
+                          compact: bool = False,
+                          use_fast_backend: bool = True) -> Tuple[int, int]:
+    """
+    Потоковая запись workflow в бинарный файловый объект
+
+    Узлы и соединения сериализуются по одному по мере поступления из итераторов.
+    Вывод с отступами побайтно совпадает с json.dump(workflow, indent=2, ensure_ascii=False).
+
+    Args:
+        fileobj: Файловый объект, открытый в режиме 'wb'
+        header: Скалярные поля верхнего уровня (last_node_id, last_link_id, ...)
+        nodes: Итератор данных узлов
+        links: Итератор данных соединений
+        compact: Компактный вывод без отступов и пробелов
+        use_fast_backend: Использовать orjson если он установлен
+
+    Returns:
+        Кортеж (количество узлов, количество соединений)
+    """
+    if compact:
+        item_sep, key_sep = b',', b':'
+        open_obj, close_obj = b'{', b'}'
+        open_items, close_items = b'[', b']'
+        indent = b''
+    else:
+        item_sep, key_sep = b',\n', b': '
+        open_obj, close_obj = b'{\n', b'\n}'
+        open_items, close_items = b'[\n', b'\n  ]'
+        indent = b'  '
+
+    def encode(value: Any, depth: int) -> bytes:
+        data = dumps_value(value, compact=compact, use_fast_backend=use_fast_backend)
+        if not compact and depth:
+            data = data.replace(b'\n', b'\n' + b'  ' * depth)
+        return data
+
+    counts = {}
+    fileobj.write(open_obj)
+    first_field = True
+
+    fields: List[Tuple[str, Any]] = [(k, v) for k, v in header.items() if k not in STREAMED_KEYS]
+    fields.extend([("nodes", nodes), ("links", links)])
+
+    for key, value in fields:
+        if not first_field:
+            fileobj.write(item_sep)
+        first_field = False
+        fileobj.write(indent + encode(key, 0) + key_sep)
+
+        if key not in STREAMED_KEYS:
+            fileobj.write(encode(value, 1))
+            continue
+
+        count = 0
+        for item in value:
+            fileobj.write((open_items if count == 0 else item_sep) + indent * 2 + encode(item, 2))
+            count += 1
+        fileobj.write(close_items if count else b'[]')
+        counts[key] = count
+
+    fileobj.write(close_obj)
+    return counts["nodes"], counts["links"]
+
+
+class _IncrementalReader:
+    """Инкрементальный разбор JSON поверх буфера, пополняемого по частям"""
+
+    def __init__(self, fileobj: IO[str], chunk_size: int = _DEFAULT_CHUNK_SIZE):
+        self.fileobj = fileobj
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: Optional[int] = None) -> None:
+        """Чтение следующей порции данных с отбрасыванием уже разобранной части"""
+        chunk = self.fileobj.read(size or self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+
+    def peek(self) -> str:
+        """Следующий значимый символ (пустая строка в конце файла)"""
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self._fill()
+
+    def expect(self, char: str) -> None:
+        """Проверка и пропуск ожидаемого символа"""
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Ожидался символ '{char}', получен '{found}' (позиция {self.pos})")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Разбор одного полного JSON значения"""
+        self.peek()
+        read_size = self.chunk_size
+        while True:
+            try:
+                obj, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            else:
+                # Число в конце буфера может быть обрезано - дочитываем
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return obj
+            # Значение не поместилось в буфер: увеличиваем порцию чтения
+            self._fill(read_size)
+            read_size *= 2
+
+
+def iter_workflow_items(fileobj: IO[str],
+                        chunk_size: int = _DEFAULT_CHUNK_SIZE) -> Iterator[Tuple[str, Any, Any]]:
+    """
+    Инкрементальный разбор workflow
+
+    Выдает элементы по одному, не загружая документ целиком:
+        ("field", key, value) - поле верхнего уровня
+        ("node", index, node_data) - очередной узел
+        ("link", index, link_data) - очередное соединение
+
+    Args:
+        fileobj: Файловый объект, открытый в текстовом режиме
+        chunk_size: Размер порции чтения в символах
+
+    Returns:
+        Итератор элементов workflow
+    """
+    reader = _IncrementalReader(fileobj, chunk_size)
+    reader.expect('{')
+
+    if reader.peek() == '}':
+        return
+
+    while True:
+        key = reader.value()
+        if not isinstance(key, str):
+            raise ValueError(f"Некорректный ключ верхнего уровня: {key!r}")
+        reader.expect(':')
+
+        if key in STREAMED_KEYS and reader.peek() == '[':
+            reader.expect('[')
+            kind = key[:-1]
+            index = 0
+            if reader.peek() == ']':
+                reader.expect(']')
+            else:
+                while True:
+                    yield kind, index, reader.value()
+                    index += 1
+                    if reader.peek() == ',':
+                        reader.expect(',')
+                        continue
+                    reader.expect(']')
+                    break
+        else:
+            yield "field", key, reader.value()
+
+        if reader.peek() == ',':
+            reader.expect(',')
+            continue
+        reader.expect('}')
+        break
+
+    if reader.peek():
+        raise ValueError("Лишние данные после окончания workflow")
+
+
+# ---------------------------------------------------------------------------
+# Компактный бинарный формат workflow
+# ---------------------------------------------------------------------------
+#
+# Структура файла (все целые числа little-endian):
+#   magic "CWFB" | version u8 | flags u8 | reserved u16 | payload_len u32 | payload | crc32 u32
+#
+# flags: наличие ключей nodes / links в исходном workflow
+#
+# payload состоит из секций, каждая с префиксом длины u32:
+#   1. поля верхнего уровня (msgpack map); nodes / links записываются в нем
+#      пустыми метками на своих местах, чтобы сохранить порядок ключей
+#   2. таблица строк: типы узлов и типы соединений (msgpack array)
+#   3. таблица узлов: int32 x NODE_COLUMNS на узел
+#   4. остальные поля узлов: inputs, flags, title... (msgpack array of maps)
+#   5. соединения: int32 x LINK_COLUMNS на соединение, либо msgpack при нестандартном формате
+
+BINARY_MAGIC = b"CWFB"
+BINARY_VERSION = 1
+BINARY_EXTENSION = ".cwf"
+
+_BINARY_HEADER = struct.Struct('<4sBBHI')
+_U32 = struct.Struct('<I')
+
+# Флаги заголовка: наличие ключей nodes / links
+_FLAG_NODES, _FLAG_LINKS = 1, 2
+_STREAMED_FLAGS = {"nodes": _FLAG_NODES, "links": _FLAG_LINKS}
+
+# Колонки таблицы узлов
+NODE_COLUMNS = 10
+_HAS_ID, _HAS_TYPE, _HAS_ORDER, _HAS_MODE, _HAS_POS, _HAS_SIZE = (1 << i for i in range(6))
+_SIZE_AS_DICT, _SIZE_AS_LIST = 0, 1
+_INT32_MIN, _INT32_MAX = -2 ** 31, 2 ** 31 - 1
+
+# Колонки таблицы соединений: link_id, from_node, from_slot, to_node, to_slot, type_index
+LINK_COLUMNS = 6
+_LINKS_PACKED, _LINKS_MSGPACK = 0, 1
+
+
+def _is_int32(value: Any) -> bool:
+    """Проверка, что значение - целое число, помещающееся в int32"""
+    return type(value) is int and _INT32_MIN <= value <= _INT32_MAX
+
+
+def _pack_obj(obj: Any, out: bytearray) -> None:
+    """Кодирование значения в подмножество формата msgpack"""
+    if obj is None:
+        out.append(0xc0)
+    elif obj is True:
+        out.append(0xc3)
+    elif obj is False:
+        out.append(0xc2)
+    elif type(obj) is int:
+        if 0 <= obj < 128:
+            out.append(obj)
+        elif -32 <= obj < 0:
+            out.append(obj & 0xff)
+        elif _INT32_MIN <= obj <= _INT32_MAX:
+            out += b'\xd2' + struct.pack('>i', obj)
+        elif -2 ** 63 <= obj < 2 ** 63:
+            out += b'\xd3' + struct.pack('>q', obj)
+        else:
+            out += b'\xcf' + struct.pack('>Q', obj)
+    elif isinstance(obj, float):
+        out += b'\xcb' + struct.pack('>d', obj)
+    elif isinstance(obj, str):
+        data = obj.encode('utf-8')
+        n = len(data)
+        if n < 32:
+            out.append(0xa0 | n)
+        elif n < 0x100:
+            out += b'\xd9' + struct.pack('>B', n)
+        elif n < 0x10000:
+            out += b'\xda' + struct.pack('>H', n)
+        else:
+            out += b'\xdb' + struct.pack('>I', n)
+        out += data
+    elif isinstance(obj, (bytes, bytearray)):
+        n = len(obj)
+        if n < 0x100:
+            out += b'\xc4' + struct.pack('>B', n)
+        elif n < 0x10000:
+            out += b'\xc5' + struct.pack('>H', n)
+        else:
+            out += b'\xc6' + struct.pack('>I', n)
+        out += obj
+    elif isinstance(obj, (list, tuple)):
+        n = len(obj)
+        if n < 16:
+            out.append(0x90 | n)
+        elif n < 0x10000:
+            out += b'\xdc' + struct.pack('>H', n)
+        else:
+            out += b'\xdd' + struct.pack('>I', n)
+        for item in obj:
+            _pack_obj(item, out)
+    elif isinstance(obj, dict):
+        n = len(obj)
+        if n < 16:
+            out.append(0x80 | n)
+        elif n < 0x10000:
+            out += b'\xde' + struct.pack('>H', n)
+        else:
+            out += b'\xdf' + struct.pack('>I', n)
+        for key, value in obj.items():
+            _pack_obj(key, out)
+            _pack_obj(value, out)
+    else:
+        raise TypeError(f"Тип {type(obj).__name__} не поддерживается бинарным форматом")
+
+
+# Форматы целых и вещественных чисел msgpack: код -> (struct формат, размер)
+_MSGPACK_NUMBERS = {
+    0xca: ('>f', 4), 0xcb: ('>d', 8),
+    0xcc: ('>B', 1), 0xcd: ('>H', 2), 0xce: ('>I', 4), 0xcf: ('>Q', 8),
+    0xd0: ('>b', 1), 0xd1: ('>h', 2), 0xd2: ('>i', 4), 0xd3: ('>q', 8),
+}
+_MSGPACK_LENGTHS = {0xd9: ('>B', 1), 0xda: ('>H', 2), 0xdb: ('>I', 4),
+                    0xc4: ('>B', 1), 0xc5: ('>H', 2), 0xc6: ('>I', 4),
+                    0xdc: ('>H', 2), 0xdd: ('>I', 4), 0xde: ('>H', 2), 0xdf: ('>I', 4)}
+
+
+def _unpack_obj(data: bytes, pos: int) -> Tuple[Any, int]:
+    """Декодирование значения msgpack начиная с позиции pos"""
+    code = data[pos]
+    pos += 1
+
+    if code < 0x80:
+        return code, pos
+    if code >= 0xe0:
+        return code - 0x100, pos
+    if 0xa0 <= code <= 0xbf:
+        end = pos + (code & 0x1f)
+        return data[pos:end].decode('utf-8'), end
+    if 0x90 <= code <= 0x9f:
+        return _unpack_array(data, pos, code & 0x0f)
+    if 0x80 <= code <= 0x8f:
+        return _unpack_map(data, pos, code & 0x0f)
+    if code == 0xc0:
+        return None, pos
+    if code == 0xc2:
+        return False, pos
+    if code == 0xc3:
+        return True, pos
+    if code in _MSGPACK_NUMBERS:
+        fmt, size = _MSGPACK_NUMBERS[code]
+        return struct.unpack_from(fmt, data, pos)[0], pos + size
+    if code in _MSGPACK_LENGTHS:
+        fmt, size = _MSGPACK_LENGTHS[code]
+        n = struct.unpack_from(fmt, data, pos)[0]
+        pos += size
+        if code in (0xd9, 0xda, 0xdb):
+            return data[pos:pos + n].decode('utf-8'), pos + n
+        if code in (0xc4, 0xc5, 0xc6):
+            return bytes(data[pos:pos + n]), pos + n
+        if code in (0xdc, 0xdd):
+            return _unpack_array(data, pos, n)
+        return _unpack_map(data, pos, n)
+
+    raise ValueError(f"Неподдерживаемый код msgpack: 0x{code:02x}")
+
+
+def _unpack_array(data: bytes, pos: int, n: int) -> Tuple[List[Any], int]:
+    items = []
+    for _ in range(n):
+        item, pos = _unpack_obj(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data: bytes, pos: int, n: int) -> Tuple[Dict[Any, Any], int]:
+    result = {}
+    for _ in range(n):
+        key, pos = _unpack_obj(data, pos)
+        result[key], pos = _unpack_obj(data, pos)
+    return result, pos
+
+
+def packb(obj: Any) -> bytes:
+    """Сериализация в msgpack (библиотека msgpack используется если установлена)"""
+    if msgpack is not None:
+        return msgpack.packb(obj, use_bin_type=True)
+    out = bytearray()
+    _pack_obj(obj, out)
+    return bytes(out)
+
+
+def unpackb(data: bytes) -> Any:
+    """Десериализация из msgpack (библиотека msgpack используется если установлена)"""
+    if msgpack is not None:
+        return msgpack.unpackb(data, raw=False, strict_map_key=False)
+    obj, pos = _unpack_obj(data, 0)
+    if pos != len(data):
+        raise ValueError("Лишние данные после значения msgpack")
+    return obj
+
+
+def _int32_bytes(values: array.array) -> bytes:
+    """Байты массива int32 в порядке little-endian"""
+    if sys.byteorder != 'little':
+        values = array.array('i', values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _int32_array(data: bytes) -> array.array:
+    """Массив int32 из байтов little-endian"""
+    values = array.array('i')
+    values.frombytes(data)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+
+class _StringTable:
+    """Таблица интернированных строк"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self.index: Dict[str, int] = {}
+
+    def intern(self, value: str) -> int:
+        idx = self.index.get(value)
+        if idx is None:
+            idx = self.index[value] = len(self.strings)
+            self.strings.append(value)
+        return idx
+
+
+def is_binary_workflow(data: bytes) -> bool:
+    """Проверка, что данные начинаются с сигнатуры бинарного workflow"""
+    return data[:len(BINARY_MAGIC)] == BINARY_MAGIC
+
+
+def encode_workflow_binary(header: Dict[str, Any],
+                           nodes: Optional[Iterable[Dict[str, Any]]],
+                           links: Optional[Iterable[List[Any]]]) -> bytes:
+    """
+    Кодирование workflow в компактный бинарный формат
+
+    Ключи nodes / links сохраняют позицию, которую они занимают в header;
+    отсутствующие в header ключи записываются после остальных полей.
+
+    Args:
+        header: Поля верхнего уровня (last_node_id, last_link_id, ...)
+        nodes: Итератор данных узлов (None - ключа nodes в workflow нет)
+        links: Итератор данных соединений (None - ключа links в workflow нет)
+
+    Returns:
+        Бинарное представление workflow
+    """
+    strings = _StringTable()
+    node_table = array.array('i')
+    node_extras = []
+
+    for node in nodes or ():
+        row = [0] * NODE_COLUMNS
+        extras = {}
+        mask = 0
+        for key, value in node.items():
+            if key == "id" and _is_int32(value):
+                mask |= _HAS_ID
+                row[1] = value
+            elif key == "type" and isinstance(value, str):
+                mask |= _HAS_TYPE
+                row[2] = strings.intern(value)
+            elif key == "order" and _is_int32(value):
+                mask |= _HAS_ORDER
+                row[3] = value
+            elif key == "mode" and _is_int32(value):
+                mask |= _HAS_MODE
+                row[4] = value
+            elif (key == "pos" and isinstance(value, list) and len(value) == 2
+                  and all(_is_int32(v) for v in value)):
+                mask |= _HAS_POS
+                row[5], row[6] = value
+            elif (key == "size" and isinstance(value, dict) and list(value) == ["0", "1"]
+                  and all(_is_int32(v) for v in value.values())):
+                mask |= _HAS_SIZE
+                row[7], row[8], row[9] = value["0"], value["1"], _SIZE_AS_DICT
+            elif (key == "size" and isinstance(value, list) and len(value) == 2
+                  and all(_is_int32(v) for v in value)):
+                mask |= _HAS_SIZE
+                row[7], row[8], row[9] = value[0], value[1], _SIZE_AS_LIST
+            else:
+                extras[key] = value
+        row[0] = mask
+        node_table.extend(row)
+        node_extras.append(extras)
+
+    # Соединения упаковываются в int32, если все они в стандартном формате
+    link_list = list(links or ())
+    link_table = array.array('i')
+    links_mode = _LINKS_PACKED
+    for link in link_list:
+        if (isinstance(link, list) and len(link) in (5, 6)
+                and all(_is_int32(v) for v in link[:5])
+                and (len(link) == 5 or isinstance(link[5], str))):
+            type_index = strings.intern(link[5]) if len(link) == 6 else -1
+            link_table.extend(link[:5])
+            link_table.append(type_index)
+        else:
+            links_mode = _LINKS_MSGPACK
+            break
+
+    if links_mode == _LINKS_PACKED:
+        links_section = _U32.pack(len(link_list)) + _int32_bytes(link_table)
+    else:
+        links_section = packb(link_list)
+
+    # Метки на месте nodes / links сохраняют порядок ключей верхнего уровня
+    flags = 0
+    fields = {}
+    for key, value in header.items():
+        if key not in STREAMED_KEYS:
+            fields[key] = value
+        elif (nodes if key == "nodes" else links) is not None:
+            fields[key] = None
+    for key, items in (("nodes", nodes), ("links", links)):
+        if items is not None:
+            flags |= _STREAMED_FLAGS[key]
+            fields.setdefault(key, None)
+
+    sections = [
+        packb(fields),
+        packb(strings.strings),
+        _U32.pack(len(node_extras)) + _int32_bytes(node_table),
+        packb(node_extras),
+        bytes([links_mode]) + links_section,
+    ]
+
+    payload = b''.join(_U32.pack(len(section)) + section for section in sections)
+    head = _BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, flags, 0, len(payload))
+    return head + payload + _U32.pack(zlib.crc32(payload))
+
+
+def _read_binary_sections(data: bytes) -> Tuple[int, List[memoryview]]:
+    """
+    Проверка заголовка и контрольной суммы, разбиение payload на секции
+
+    Args:
+        data: Бинарное представление workflow
+
+    Returns:
+        Флаги заголовка и секции payload
+    """
+    if len(data) < _BINARY_HEADER.size + _U32.size:
+        raise ValueError("Бинарный workflow поврежден: слишком короткие данные")
+
+    magic, version, flags, _, payload_len = _BINARY_HEADER.unpack_from(data, 0)
+    if magic != BINARY_MAGIC:
+        raise ValueError("Неверная сигнатура бинарного workflow")
+    if version != BINARY_VERSION:
+        raise ValueError(f"Неподдерживаемая версия бинарного workflow: {version}")
+
+    start = _BINARY_HEADER.size
+    end = start + payload_len
+    if len(data) != end + _U32.size:
+        raise ValueError("Бинарный workflow поврежден: неверная длина данных")
+
+    payload = memoryview(data)[start:end]
+    (checksum,) = _U32.unpack_from(data, end)
+    if zlib.crc32(payload) != checksum:
+        raise ValueError("Бинарный workflow поврежден: контрольная сумма не совпадает")
+
+    sections = []
+    pos = 0
+    while pos < len(payload):
+        (size,) = _U32.unpack_from(payload, pos)
+        sections.append(payload[pos + _U32.size:pos + _U32.size + size])
+        pos += _U32.size + size
+    if len(sections) != 5:
+        raise ValueError("Бинарный workflow поврежден: неверное число секций")
+    return flags, sections
+
+
+def _iter_binary_records(sections: List[memoryview]) -> Iterator[Tuple[str, Any, Any]]:
+    """
+    Выдача узлов и соединений из секций бинарного workflow
+
+    Args:
+        sections: Секции payload
+
+    Returns:
+        Итератор элементов ("node", ...) и ("link", ...)
+    """
+    _, strings_section, nodes_section, extras_section, links_section = sections
+
+    strings = unpackb(bytes(strings_section))
+    (node_count,) = _U32.unpack_from(nodes_section, 0)
+    node_table = _int32_array(bytes(nodes_section[_U32.size:]))
+    node_extras = unpackb(bytes(extras_section))
+    if len(node_table) != node_count * NODE_COLUMNS or len(node_extras) != node_count:
+        raise ValueError("Бинарный workflow поврежден: неверная таблица узлов")
+
+    for index in range(node_count):
+        row = node_table[index * NODE_COLUMNS:(index + 1) * NODE_COLUMNS]
+        mask = row[0]
+        node: Dict[str, Any] = {}
+        if mask & _HAS_ID:
+            node["id"] = row[1]
+        if mask & _HAS_TYPE:
+            node["type"] = strings[row[2]]
+        if mask & _HAS_POS:
+            node["pos"] = [row[5], row[6]]
+        if mask & _HAS_SIZE:
+            node["size"] = {"0": row[7], "1": row[8]} if row[9] == _SIZE_AS_DICT else [row[7], row[8]]
+        if mask & _HAS_ORDER:
+            node["order"] = row[3]
+        if mask & _HAS_MODE:
+            node["mode"] = row[4]
+        node.update(node_extras[index])
+        yield "node", index, node
+
+    links_mode = links_section[0]
+    if links_mode == _LINKS_PACKED:
+        (link_count,) = _U32.unpack_from(links_section, 1)
+        link_table = _int32_array(bytes(links_section[1 + _U32.size:]))
+        if len(link_table) != link_count * LINK_COLUMNS:
+            raise ValueError("Бинарный workflow поврежден: неверная таблица соединений")
+        for index in range(link_count):
+            row = link_table[index * LINK_COLUMNS:(index + 1) * LINK_COLUMNS]
+            link = list(row[:5])
+            if row[5] >= 0:
+                link.append(strings[row[5]])
+            yield "link", index, link
+    else:
+        for index, link in enumerate(unpackb(bytes(links_section[1:]))):
+            yield "link", index, link
+
+
+def iter_binary_workflow_items(data: bytes) -> Iterator[Tuple[str, Any, Any]]:
+    """
+    Разбор бинарного workflow
+
+    Выдает те же элементы, что и iter_workflow_items для JSON.
+
+    Args:
+        data: Бинарное представление workflow
+
+    Returns:
+        Итератор элементов workflow
+    """
+    _, sections = _read_binary_sections(data)
+    for key, value in unpackb(bytes(sections[0])).items():
+        if key not in STREAMED_KEYS:
+            yield "field", key, value
+    yield from _iter_binary_records(sections)
+
+
+def decode_workflow_binary(data: bytes) -> Dict[str, Any]:
+    """
+    Декодирование бинарного workflow в словарь
+
+    Ключи nodes / links восстанавливаются, только если они были в исходном
+    workflow, и на своих местах среди полей верхнего уровня.
+
+    Args:
+        data: Бинарное представление workflow
+
+    Returns:
+        Словарь с workflow
+    """
+    flags, sections = _read_binary_sections(data)
+    workflow: Dict[str, Any] = {}
+    for key, value in unpackb(bytes(sections[0])).items():
+        workflow[key] = [] if key in STREAMED_KEYS else value
+    for key, flag in _STREAMED_FLAGS.items():
+        if flags & flag:
+            workflow.setdefault(key, [])
+
+    for kind, _, value in _iter_binary_records(sections):
+        workflow[kind + "s"].append(value)
+    return workflow
+
+
+def workflow_to_binary(workflow: Dict[str, Any]) -> bytes:
+    """
+    Кодирование словаря workflow в бинарный формат
+
+    Args:
+        workflow: Словарь с workflow
+
+    Returns:
+        Бинарное представление workflow
+    """
+    return encode_workflow_binary(workflow, workflow.get("nodes"), workflow.get("links"))
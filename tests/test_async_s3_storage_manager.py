@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Тесты Async S3 Storage Manager на локальном сервере moto
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import aiobotocore  # noqa: F401
+    import boto3
+    import requests
+    from moto.server import ThreadedMotoServer
+    ThreadedMotoServer(port=0)
+except ImportError:
+    ThreadedMotoServer = None
+
+from examples.async_s3_storage_manager import AsyncS3StorageManager
+
+BUCKET = "comfyui-test-bucket"
+
+
+@unittest.skipIf(ThreadedMotoServer is None, "aiobotocore или moto[server] не установлены")
+class TestAsyncS3StorageManager(unittest.IsolatedAsyncioTestCase):
+    """Тесты асинхронного менеджера"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Запуск локального сервера S3"""
+        cls.server = ThreadedMotoServer(ip_address='127.0.0.1', port=0, verbose=False)
+        cls.server.start()
+        host, port = cls.server.get_host_and_port()
+        cls.endpoint_url = f"http://{host}:{port}"
+
+    @classmethod
+    def tearDownClass(cls):
+        """Остановка локального сервера S3"""
+        cls.server.stop()
+
+    async def asyncSetUp(self):
+        """Создание bucket и менеджера"""
+        requests.post(f"{self.endpoint_url}/moto-api/reset")
+        boto3.client(
+            's3', region_name='us-east-1', endpoint_url=self.endpoint_url,
+            aws_access_key_id='test-key', aws_secret_access_key='test-secret'
+        ).create_bucket(Bucket=BUCKET)
+
+        self.temp_dir = tempfile.mkdtemp()
+        self.manager = AsyncS3StorageManager(
+            bucket_name=BUCKET,
+            aws_access_key_id='test-key',
+            aws_secret_access_key='test-secret',
+            endpoint_url=self.endpoint_url,
+            metadata_cache_dir=os.path.join(self.temp_dir, 'index'),
+            deduplicate='skip'
+        )
+        await self.manager.open()
+
+    async def asyncTearDown(self):
+        """Закрытие клиента"""
+        await self.manager.close()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def make_images(self, count: int):
+        """Создание набора разных файлов изображений"""
+        paths = []
+        for i in range(count):
+            path = os.path.join(self.temp_dir, f"image_{i}.png")
+            with open(path, 'wb') as f:
+                f.write(f"png-{i}".encode() * 50)
+            paths.append(path)
+        return paths
+
+    async def test_upload_download_round_trip(self):
+        """Загрузка и скачивание с метаданными и дедупликацией"""
+        path = self.make_images(1)[0]
+        first = await self.manager.upload_image(path, metadata={'prompt': 'закат'})
+        second = await self.manager.upload_image(path)
+        self.assertTrue(first['success'])
+        self.assertEqual(first['s3_key'], second['s3_key'])
+        self.assertTrue(second['deduplicated'])
+
+        local_path = os.path.join(self.temp_dir, 'out', 'result.png')
+        result = await self.manager.download_image(first['s3_key'], local_path)
+        self.assertTrue(result['success'])
+        self.assertEqual(result['metadata']['prompt'], 'закат')
+        with open(local_path, 'rb') as f, open(path, 'rb') as original:
+            self.assertEqual(f.read(), original.read())
+
+    async def test_metadata_index(self):
+        """Загрузка и удаление обновляют индекс метаданных, общий с синхронным менеджером"""
+        first, second = self.make_images(2)
+        uploaded = await self.manager.upload_image(first, metadata={'prompt': 'горный закат'})
+        other = await self.manager.upload_image(second)
+        index = self.manager.metadata_index
+        self.assertEqual(index.get(uploaded['s3_key'], refresh=False)['prompt'], 'горный закат')
+        self.assertEqual([item['key'] for item in index.find(prompt='закат')], [uploaded['s3_key']])
+
+        self.assertTrue((await self.manager.delete_image(uploaded['s3_key']))['success'])
+        self.assertIsNone(index.get(uploaded['s3_key'], refresh=False))
+        deleted = await self.manager.delete_many(keys=[other['s3_key']])
+        self.assertEqual(deleted['deleted'], 1)
+        self.assertIsNone(index.get(other['s3_key'], refresh=False))
+
+    async def test_workflow_round_trip(self):
+        """Сохранение и загрузка сжатого и бинарного workflow"""
+        workflow = {"last_node_id": 1, "nodes": [{"id": 1, "type": "KSampler", "pos": [0, 0]}], "links": []}
+        for binary in (False, True):
+            saved = await self.manager.save_workflow(workflow, binary=binary)
+            self.assertTrue(saved['success'])
+            loaded = await self.manager.load_workflow(saved['workflow_name'])
+            self.assertEqual(loaded['workflow_data'], workflow)
+
+    async def test_bulk_helpers(self):
+        """Массовые загрузка, листинг, скачивание и удаление"""
+        upload = await self.manager.upload_many(self.make_images(12), max_concurrency=4)
+        self.assertEqual(upload['uploaded'], 12)
+
+        keys = [obj['Key'] async for obj in self.manager.iter_objects('comfyui/images/', page_size=5)]
+        self.assertEqual(len(keys), 12)
+
+        download = await self.manager.download_many(keys, os.path.join(self.temp_dir, 'dl'), max_concurrency=4)
+        self.assertEqual(download['downloaded'], 12)
+
+        dry_run = await self.manager.delete_many(prefix='comfyui/images/', dry_run=True)
+        self.assertEqual((dry_run['matched'], dry_run['deleted']), (12, 0))
+        self.assertEqual(len(dry_run['sample_keys']), 12)
+
+        with patch.object(self.manager, '_delete_batch', wraps=self.manager._delete_batch) as delete_batch:
+            deleted = await self.manager.delete_many(prefix='comfyui/images/', batch_size=5)
+        self.assertEqual(deleted['deleted'], 12)
+        self.assertEqual([len(call.args[0]) for call in delete_batch.call_args_list], [5, 5, 2])
+        listing = await self.manager.list_images()
+        self.assertEqual(listing['count'], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
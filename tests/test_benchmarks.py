@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Тесты бенчмарков и локальных замен сервисов
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stdout
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    from moto.server import ThreadedMotoServer
+except ImportError:
+    ThreadedMotoServer = None
+
+from benchmarks.run_benchmarks import BenchmarkConfig, BenchmarkRunner, compare_results, main
+from benchmarks.stand_ins import FakeComfyUIServer
+from examples.comfyui_pipeline_builder import PipelineTemplates
+
+
+class TestFakeComfyUI(unittest.TestCase):
+    """Тесты имитации ComfyUI"""
+
+    def test_queue_and_throttling(self):
+        """Слоты выполнения, очередь и 429 при переполнении"""
+        with FakeComfyUIServer(execution_time=0.15, workers=1, max_queue=1) as server:
+            builder = PipelineTemplates.openai_to_s3_pipeline("test", "test-bucket")
+            builder.comfyui_url = server.url
+
+            first = builder.execute_workflow("test", wait_for_completion=False)
+            second = builder.execute_workflow("test", wait_for_completion=False)
+            third = builder.execute_workflow("test", wait_for_completion=False)
+            self.assertTrue(first['success'])
+            self.assertTrue(second['success'])
+            self.assertFalse(third['success'])
+            self.assertIn('429', third['error'])
+
+            _, status = server.execution_info(second['execution_id'], results=False)
+            self.assertEqual(status['status'], 'queued')
+            time.sleep(0.4)
+            _, status = server.execution_info(second['execution_id'], results=False)
+            self.assertEqual(status['status'], 'completed')
+            self.assertEqual(server.stats(), {'accepted': 2, 'rejected': 1, 'finished': 2})
+
+
+@unittest.skipIf(ThreadedMotoServer is None, "moto[server] не установлен")
+class TestBenchmarkRunner(unittest.TestCase):
+    """Прогон всех наборов на минимальных параметрах"""
+
+    def test_all_suites_json(self):
+        """Все наборы выполняются, результаты сохраняются в JSON и сравниваются"""
+        config = BenchmarkConfig(iterations=1, warmup=0, image_sizes=(16,), batch_sizes=(2,),
+                                 batch_image_size=16, workflow_nodes=(5,), list_keys=(20,),
+                                 openai_latency=0.0, openai_concurrency=(2,))
+        with redirect_stdout(io.StringIO()):
+            report = BenchmarkRunner(config).run()
+
+        names = {(result['suite'], result['name']) for result in report['results']}
+        for expected in [('s3', 'upload_image'), ('s3', 'load_image_batch'), ('tensor', 'tensor_load'),
+                         ('workflow', 'load'), ('listing', 'iter_objects'), ('openai', 'generate_and_fetch'),
+                         ('comfyui', 'submit_workflow')]:
+            self.assertIn(expected, names)
+        for result in report['results']:
+            self.assertGreater(result['throughput']['ops_per_s'], 0)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['max'])
+        json.dumps(report)
+
+        slower = json.loads(json.dumps(report))
+        for result in slower['results']:
+            result['latency_ms']['p50'] *= 2
+        comparison = compare_results(report, slower, threshold=0.5)
+        self.assertEqual(len(comparison), len(report['results']))
+        self.assertTrue(all(item['regression'] for item in comparison))
+        self.assertFalse(any(item['regression'] for item in compare_results(slower, report)))
+
+    def test_cli_compare_exit_code(self):
+        """CLI пишет JSON и возвращает 1 при регрессии относительно базового запуска"""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output = os.path.join(temp_dir, 'results.json')
+            args = ['--suites', 'workflow', '--workflow-nodes', '5', '--iterations', '2', '--output', output]
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args), 0)
+
+            with open(output, encoding='utf-8') as f:
+                baseline = json.load(f)
+            self.assertEqual(baseline['meta']['version'], 1)
+            for result in baseline['results']:
+                result['latency_ms']['p50'] = 1e-6
+            baseline_path = os.path.join(temp_dir, 'baseline.json')
+            with open(baseline_path, 'w', encoding='utf-8') as f:
+                json.dump(baseline, f)
+
+            with redirect_stdout(io.StringIO()):
+                self.assertEqual(main(args + ['--compare', baseline_path]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+Тесты узлов ComfyUI для S3
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import json
+import os
+import subprocess
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+from PIL import Image
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.test_s3_storage_manager import S3TestCase, BUCKET
+from examples.comfyui_s3_nodes import (
+    get_storage_manager, S3BatchImageDownloader, S3ImageDownloader, S3ImageStream, S3ImageStreamLoader, S3ImageUploader,
+    load_image_batch, parse_key_list, warmup
+)
+
+
+def encode_image(width: int, height: int, color, image_format: str = 'PNG') -> bytes:
+    """Создание изображения одного цвета в памяти"""
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), color).save(buffer, image_format)
+    return buffer.getvalue()
+
+
+class TestParseKeyList(unittest.TestCase):
+    """Тесты разбора списка ключей"""
+
+    def test_formats(self):
+        """JSON выход S3ImageLister, JSON строк и ключи через строки и запятые"""
+        lister_output = json.dumps([{'key': 'a.png', 'url': 'u'}, {'key': 'b.png', 'url': 'u'}])
+        self.assertEqual(parse_key_list(lister_output), ['a.png', 'b.png'])
+        self.assertEqual(parse_key_list('["a.png", "b.png"]'), ['a.png', 'b.png'])
+        self.assertEqual(parse_key_list('a.png, b.png\n c.png\n\n'), ['a.png', 'b.png', 'c.png'])
+        self.assertEqual(parse_key_list('  '), [])
+
+
+class TestLazyImports(unittest.TestCase):
+    """Тесты отложенного импорта тяжелых зависимостей"""
+
+    def test_builder_does_not_import_boto3(self):
+        """Пакет и строитель пайплайнов не импортируют boto3, PIL и requests"""
+        code = ("import sys, examples; examples.ComfyUIPipelineBuilder; examples.PipelineManager; "
+                "import examples.comfyui_s3_nodes, examples.comfyui_openai_node; "
+                "print([m for m in ('boto3', 'PIL', 'requests') if m in sys.modules])")
+        root = os.path.join(os.path.dirname(__file__), '..')
+        output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True,
+                                text=True, check=True).stdout
+        self.assertEqual(output.strip(), '[]')
+
+
+class NodeTestCase(S3TestCase):
+    """Базовый класс тестов узлов с очисткой кэша менеджеров"""
+
+    def setUp(self):
+        """Очистка кэша менеджеров между тестами"""
+        super().setUp()
+        get_storage_manager.cache_clear()
+
+    def tearDown(self):
+        """Очистка кэша менеджеров"""
+        get_storage_manager.cache_clear()
+        super().tearDown()
+
+
+class TestBatchImageDownloader(NodeTestCase):
+    """Тесты пакетного скачивания изображений"""
+
+    def setUp(self):
+        """Загрузка тестовых изображений"""
+        super().setUp()
+        self.manager = self.make_manager(metadata_index=False)
+        self.keys = []
+        for i, (size, color) in enumerate([((8, 4), (255, 0, 0)), ((16, 8), (0, 255, 0)),
+                                           ((12, 12), (0, 0, 255))]):
+            key = f"comfyui/images/batch_{i}.{'jpg' if i == 2 else 'png'}"
+            self.client.put_object(Bucket=BUCKET, Key=key,
+                                   Body=encode_image(*size, color, 'JPEG' if i == 2 else 'PNG'))
+            self.keys.append(key)
+
+    def test_shape_from_first_image(self):
+        """Размер пакета берется из первого изображения, остальные приводятся к нему"""
+        batch = load_image_batch(self.manager, self.keys, max_workers=3, decode_workers=2)
+        self.assertEqual(batch.shape, (3, 4, 8, 3))
+        self.assertEqual(batch.dtype, np.float32)
+        np.testing.assert_allclose(batch[0, :, :, 0], 1.0)
+        np.testing.assert_allclose(batch[1, 1:-1, 1:-1, 1], 1.0, atol=0.02)
+        self.assertGreater(batch[2, 1:-1, 1:-1, 2].min(), 0.9)
+
+        crop = load_image_batch(self.manager, self.keys, width=6, height=6, resize_mode='crop')
+        self.assertEqual(crop.shape, (3, 6, 6, 3))
+
+        with self.assertRaises(ValueError):
+            load_image_batch(self.manager, self.keys, resize_mode='none')
+
+    def test_node_prefix_and_limit(self):
+        """Узел берет ключи изображений из листинга префикса с ограничением limit"""
+        self.client.put_object(Bucket=BUCKET, Key="comfyui/images/batch_0.tensor", Body=b"tensor")
+        self.client.put_object(Bucket=BUCKET, Key="comfyui/images/batch_00.png", Body=b"")
+        images, keys, count, status = S3BatchImageDownloader().download_batch(
+            BUCKET, "test-key", "test-secret", "us-east-1",
+            keys="", prefix="comfyui/images/", limit=2,
+            width=32, height=16, resize_mode="resize", max_workers=4
+        )
+        self.assertTrue(status.startswith("✅"), status)
+        self.assertEqual(count, 2)
+        self.assertEqual(json.loads(keys), self.keys[:2])
+        self.assertEqual(images.shape, (2, 16, 32, 3))
+
+
+class TestSharedManagers(NodeTestCase):
+    """Тесты общего кэша менеджеров узлов"""
+
+    def test_uploader_reuses_warmed_manager(self):
+        """Узел загрузки использует менеджер, созданный warmup, и формат миниатюр вызова"""
+        env = {'AWS_ACCESS_KEY_ID': 'test-key', 'AWS_SECRET_ACCESS_KEY': 'test-secret',
+               'AWS_DEFAULT_BUCKET': BUCKET, 'AWS_DEFAULT_REGION': 'us-east-1'}
+        with patch.dict(os.environ, env):
+            warmup(background=False)
+        warmed = get_storage_manager(bucket_name=BUCKET, aws_access_key_id='test-key',
+                                     aws_secret_access_key='test-secret', region_name='us-east-1')
+
+        image = np.full((1, 32, 32, 3), 0.5, dtype=np.float32)
+        with patch('examples.s3_storage_manager.S3StorageManager.__init__',
+                   side_effect=AssertionError("new manager")):
+            s3_key, _, status = S3ImageUploader().upload_image(
+                image, BUCKET, "test-key", "test-secret", "us-east-1", s3_key="comfyui/images/thumb.png",
+                metadata="{}", thumbnail_sizes="16", thumbnail_format="jpeg"
+            )
+        self.assertTrue(status.startswith("✅"), status)
+        self.assertEqual(warmed._thumbnail_variants(s3_key), ([16], 'jpeg'))
+        self.client.head_object(Bucket=BUCKET, Key="comfyui/thumbnails/16/thumb.jpg")
+
+    def test_evicted_managers_stay_open(self):
+        """Вытесненный из кэша менеджер не закрывается: им могут пользоваться узлы и потоки"""
+        with patch('examples.comfyui_s3_nodes.STORAGE_MANAGER_CACHE_SIZE', 1):
+            first = get_storage_manager(bucket_name=BUCKET, aws_access_key_id='test-key',
+                                        aws_secret_access_key='test-secret', metadata_index=False)
+            with patch.object(first, 'close', wraps=first.close) as close:
+                second = get_storage_manager(bucket_name=BUCKET, aws_access_key_id='other-key',
+                                             aws_secret_access_key='test-secret', metadata_index=False)
+            close.assert_not_called()
+            self.assertIsNot(first, second)
+            self.assertTrue(first.list_images()['success'])
+            third = get_storage_manager(bucket_name=BUCKET, aws_access_key_id='test-key',
+                                        aws_secret_access_key='test-secret', metadata_index=False)
+        self.assertIsNot(first, third)
+        first.close()
+
+
+class TestTensorHandoff(NodeTestCase):
+    """Тесты передачи промежуточных изображений сырым тензором"""
+
+    def test_uploader_downloader_round_trip(self):
+        """Пакет float32 проходит через S3ImageUploader и S3ImageDownloader без потерь"""
+        batch = np.random.default_rng(1).random((2, 6, 5, 3), dtype=np.float32)
+        credentials = (BUCKET, "test-key", "test-secret", "us-east-1")
+
+        s3_key, url, status = S3ImageUploader().upload_image(
+            batch, *credentials, s3_key="", metadata="{}", storage_format="tensor_f32"
+        )
+        self.assertTrue(status.startswith("✅"), status)
+
+        with patch('examples.s3_storage_manager.DEFAULT_TENSOR_CACHE_DIR', self.temp_dir):
+            image, local_path, status = S3ImageDownloader().download_image(s3_key, *credentials)
+        self.assertTrue(status.startswith("✅"), status)
+        np.testing.assert_array_equal(image, batch)
+
+
+class TestImageStream(NodeTestCase):
+    """Тесты потока изображений с упреждающей загрузкой"""
+
+    def setUp(self):
+        """Загрузка тестовых изображений"""
+        super().setUp()
+        self.manager = self.make_manager(metadata_index=False)
+        self.keys = [f"comfyui/images/stream_{i:02d}.png" for i in range(7)]
+        for i, key in enumerate(self.keys):
+            self.client.put_object(Bucket=BUCKET, Key=key, Body=encode_image(4 + i, 4, (i * 30, 0, 0)))
+        self.client.put_object(Bucket=BUCKET, Key="comfyui/images/notes.json", Body=b"{}")
+
+    def test_order_and_bounded_window(self):
+        """Изображения выдаются в порядке листинга, заранее загружается не больше окна"""
+        started = []
+        lock = threading.Lock()
+        read_image = self.manager.read_image
+
+        def counting_read(key):
+            with lock:
+                started.append(key)
+            return read_image(key)
+
+        self.manager.read_image = counting_read
+        with S3ImageStream(self.manager, lookahead=3, page_size=2) as stream:
+            key, image = next(stream)
+            self.assertEqual(key, self.keys[0])
+            self.assertEqual(image.shape, (1, 4, 4, 3))
+            self.assertLessEqual(len(started), 4)
+            rest = [key for key, image in stream]
+
+        self.assertEqual(rest, self.keys[1:])
+        self.assertEqual(stream.position, 7)
+
+    def test_node_advances_and_loops(self):
+        """Узел выдает следующее изображение при каждом запуске и начинает заново с loop"""
+        node = S3ImageStreamLoader()
+        args = (BUCKET, "test-key", "test-secret", "us-east-1", "comfyui/images/", 2, 8, 8, "resize")
+        try:
+            outputs = [node.next_image(*args, loop=False) for _ in range(8)]
+            self.assertEqual([output[1] for output in outputs[:7]], self.keys)
+            self.assertEqual(outputs[3][2], 3)
+            self.assertEqual(outputs[3][0].shape, (1, 8, 8, 3))
+            self.assertTrue(outputs[7][3].startswith("⏹️"))
+
+            self.assertEqual(node.next_image(*args, loop=True)[1], self.keys[0])
+        finally:
+            S3ImageStreamLoader.close_streams()
+
+    def test_node_stream_registry(self):
+        """Потоки узла ограничены LRU, пустой префикс с loop не оставляет открытый поток"""
+        self.addCleanup(S3ImageStreamLoader.close_streams)
+        node = S3ImageStreamLoader()
+        credentials = (BUCKET, "test-key", "test-secret", "us-east-1")
+
+        empty = node.next_image(*credentials, "comfyui/empty/", 2, 8, 8, "resize", loop=True)
+        self.assertTrue(empty[3].startswith("❌"), empty[3])
+        self.assertEqual(len(S3ImageStreamLoader._streams), 0)
+
+        with patch('examples.comfyui_s3_nodes.STREAM_CACHE_SIZE', 2), \
+                patch.object(S3ImageStream, 'close', autospec=True, side_effect=S3ImageStream.close) as close:
+            for lookahead in (1, 2, 3):
+                node.next_image(*credentials, "comfyui/images/", lookahead, 8, 8, "resize", loop=False)
+            self.assertEqual(len(S3ImageStreamLoader._streams), 2)
+            self.assertEqual(close.call_count, 1)
+            self.assertEqual(close.call_args.args[0].lookahead, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
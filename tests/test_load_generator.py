@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Тесты нагрузочного генератора пайплайнов
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import os
+import sys
+import unittest
+from contextlib import redirect_stdout
+from unittest import mock
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from benchmarks.load_generator import LoadConfig, LoadGenerator, find_sustainable_rate, meets_slo, parse_mix
+from benchmarks.stand_ins import FakeComfyUIServer
+from examples.comfyui_pipeline_builder import PipelineTemplates
+
+
+class MockTestCase(unittest.TestCase):
+    """Базовый класс с имитацией ComfyUI"""
+
+    def start_mock(self, **kwargs) -> FakeComfyUIServer:
+        server = FakeComfyUIServer(**kwargs).start()
+        self.addCleanup(server.stop)
+        return server
+
+
+class TestBuilderPolling(MockTestCase):
+    """Тесты ожидания выполнения в строителе"""
+
+    def test_wait_for_execution_poll_interval(self):
+        """Завершение обнаруживается с частотой опроса, 429 возвращает status_code"""
+        server = self.start_mock(execution_time=0.05, max_queue=1)
+        builder = PipelineTemplates.s3_to_preview_pipeline("comfyui/images/a.png", "test-bucket")
+        builder.comfyui_url = server.url
+
+        result = builder.execute_workflow("test", timeout=5, poll_interval=0.01)
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['status'], 'completed')
+        self.assertEqual(result['results']['nodes'], 2)
+
+        builder.execute_workflow("test", wait_for_completion=False)
+        builder.execute_workflow("test", wait_for_completion=False)
+        throttled = builder.execute_workflow("test", wait_for_completion=False)
+        self.assertFalse(throttled['success'])
+        self.assertEqual(throttled['status_code'], 429)
+
+
+class TestLoadGenerator(MockTestCase):
+    """Тесты открытой и закрытой модели нагрузки"""
+
+    def test_closed_loop(self):
+        """Закрытая модель: все запросы завершаются, задержки не меньше времени выполнения"""
+        server = self.start_mock(execution_time=0.05, workers=2)
+        config = LoadConfig(url=server.url, mix=parse_mix("openai_to_s3=2,complex"), concurrency=2,
+                            duration=0.5, poll_interval=0.01)
+        report = LoadGenerator(config).run()
+
+        self.assertGreater(report['requests'], 2)
+        self.assertEqual(report['outcomes']['completed'], report['requests'])
+        self.assertEqual(report['error_rate'], 0.0)
+        self.assertGreaterEqual(report['completion_latency_ms']['p50'], 50)
+        self.assertGreater(report['throughput_per_s'], 0)
+        self.assertEqual(set(report['by_template']) - {'openai_to_s3', 'complex'}, set())
+        self.assertTrue(meets_slo(report))
+
+    def test_open_loop_throttling(self):
+        """Открытая модель сверх емкости: отказы 429 учитываются в throttle_rate"""
+        server = self.start_mock(execution_time=0.1, workers=1, max_queue=1)
+        config = LoadConfig(url=server.url, rate=50, duration=0.4, poll_interval=0.01)
+        report = LoadGenerator(config).run()
+
+        self.assertEqual(report['requests'], 20)
+        self.assertGreater(report['throttle_rate'], 0.5)
+        self.assertEqual(report['outcomes']['throttled'], server.stats()['rejected'])
+        self.assertFalse(meets_slo(report))
+
+    def test_exceptions_recorded_as_errors(self):
+        """Исключения в запросах учитываются как ошибки в обеих моделях"""
+        server = self.start_mock(execution_time=0.01, workers=2)
+        for kwargs in ({'rate': 50}, {'concurrency': 2}):
+            with self.subTest(**kwargs):
+                config = LoadConfig(url=server.url, duration=0.2, requests=6, poll_interval=0.01, **kwargs)
+                generator = LoadGenerator(config)
+                with mock.patch.object(generator.manager, 'execute_pipeline',
+                                       side_effect=ConnectionError("сброс соединения")), \
+                        self.assertLogs('benchmarks.load_generator', level='WARNING'):
+                    report = generator.run()
+
+                self.assertEqual(report['requests'], 6)
+                self.assertEqual(report['outcomes']['error'], 6)
+                self.assertEqual(report['error_rate'], 1.0)
+                self.assertFalse(meets_slo(report))
+
+    def test_sustainable_rate(self):
+        """Ступени нагрузки останавливаются на первой, не укладывающейся в SLO"""
+        server = self.start_mock(execution_time=0.05, workers=1, max_queue=1)
+        config = LoadConfig(url=server.url, duration=1.0, poll_interval=0.01)
+        with redirect_stdout(io.StringIO()):
+            result = find_sustainable_rate(config, [5, 100, 200], max_error_rate=0.0)
+
+        self.assertEqual(result['sustainable_rate_per_s'], 5)
+        self.assertEqual(len(result['steps']), 2)
+        self.assertFalse(result['steps'][-1]['meets_slo'])
+
+    def test_config_validation(self):
+        """Ровно один из rate и concurrency, известные шаблоны"""
+        with self.assertRaises(ValueError):
+            LoadGenerator(LoadConfig())
+        with self.assertRaises(ValueError):
+            LoadGenerator(LoadConfig(rate=1, concurrency=1))
+        with self.assertRaises(ValueError):
+            parse_mix("unknown=1")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Тесты метрик в стиле Prometheus
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import sys
+import tempfile
+import unittest
+import urllib.request
+
+from PIL import Image
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from examples import metrics
+from examples.metrics import MetricsRegistry, serve_metrics, write_metrics_file
+from tests.test_s3_storage_manager import S3TestCase
+
+
+def sample_value(registry_or_text, sample: str) -> float:
+    """Значение строки экспозиции по имени с метками"""
+    text = registry_or_text if isinstance(registry_or_text, str) else registry_or_text.render()
+    for line in text.splitlines():
+        if line.startswith(sample + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0.0
+
+
+class TestRegistry(unittest.TestCase):
+    """Тесты реестра и текстового формата"""
+
+    def test_exposition_format(self):
+        """Счетчики, индикаторы и гистограммы в текстовом формате"""
+        registry = MetricsRegistry()
+        requests = registry.counter('test_requests_total', 'Запросы', ('operation',))
+        in_flight = registry.gauge('test_in_flight', 'В процессе')
+        latency = registry.histogram('test_duration_seconds', 'Длительность', ('operation',), buckets=(0.1, 1.0))
+
+        requests.labels('put "a"').inc(3)
+        in_flight.labels().inc()
+        for value in (0.05, 0.5, 5.0):
+            latency.labels('get').observe(value)
+
+        text = registry.render()
+        self.assertIn('# TYPE test_requests_total counter', text)
+        self.assertEqual(sample_value(text, 'test_requests_total{operation="put \\"a\\""}'), 3)
+        self.assertEqual(sample_value(text, 'test_in_flight'), 1)
+        self.assertEqual(sample_value(text, 'test_duration_seconds_bucket{operation="get",le="0.1"}'), 1)
+        self.assertEqual(sample_value(text, 'test_duration_seconds_bucket{operation="get",le="1"}'), 2)
+        self.assertEqual(sample_value(text, 'test_duration_seconds_bucket{operation="get",le="+Inf"}'), 3)
+        self.assertEqual(sample_value(text, 'test_duration_seconds_count{operation="get"}'), 3)
+        self.assertAlmostEqual(sample_value(text, 'test_duration_seconds_sum{operation="get"}'), 5.55)
+
+        with self.assertRaises(ValueError):
+            registry.gauge('test_requests_total', 'Другой тип')
+
+    def test_instrumented_status(self):
+        """Результат False и {'success': False} считаются ошибками"""
+        @metrics.instrumented('test', 'op_status')
+        def operation(result):
+            return result
+
+        before_ok = sample_value(metrics.REGISTRY, 'comfyui_operations_total{service="test",operation="op_status",status="ok"}')
+        before_error = sample_value(metrics.REGISTRY, 'comfyui_operations_total{service="test",operation="op_status",status="error"}')
+        operation({'success': True})
+        operation({'success': False})
+        operation(False)
+
+        text = metrics.render_metrics()
+        self.assertEqual(sample_value(text, 'comfyui_operations_total{service="test",operation="op_status",status="ok"}'),
+                         before_ok + 1)
+        self.assertEqual(sample_value(text, 'comfyui_operations_total{service="test",operation="op_status",status="error"}'),
+                         before_error + 2)
+        self.assertEqual(sample_value(text, 'comfyui_operations_in_flight{service="test",operation="op_status"}'), 0)
+
+    def test_file_and_http_export(self):
+        """Экспорт в файл и через HTTP endpoint"""
+        registry = MetricsRegistry()
+        registry.counter('test_exported_total', 'Экспорт').labels().inc()
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = os.path.join(temp_dir, 'comfyui.prom')
+            write_metrics_file(path, registry)
+            with open(path, encoding='utf-8') as f:
+                self.assertEqual(sample_value(f.read(), 'test_exported_total'), 1)
+
+        server = serve_metrics(port=0, registry=registry)
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{server.server_port}/metrics") as response:
+                self.assertIn('text/plain', response.headers['Content-Type'])
+                self.assertEqual(sample_value(response.read().decode('utf-8'), 'test_exported_total'), 1)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+class TestStorageMetrics(S3TestCase):
+    """Тесты метрик S3StorageManager"""
+
+    def test_upload_download_metrics(self):
+        """Операции, байты и кэш URL учитываются в метриках"""
+        image_path = os.path.join(self.temp_dir, 'image.png')
+        Image.new('RGB', (32, 32), 'red').save(image_path)
+        size = os.path.getsize(image_path)
+
+        ok = 'comfyui_operations_total{service="s3",operation="upload_image",status="ok"}'
+        uploaded = 'comfyui_transferred_bytes_total{service="s3",direction="upload"}'
+        downloaded = 'comfyui_transferred_bytes_total{service="s3",direction="download"}'
+        url_hits = 'comfyui_cache_requests_total{cache="presigned_url",result="hit"}'
+        before = {name: sample_value(metrics.REGISTRY, name) for name in (ok, uploaded, downloaded, url_hits)}
+
+        manager = self.make_manager()
+        result = manager.upload_image(image_path, s3_key='comfyui/images/metrics.png')
+        self.assertTrue(result['success'])
+        self.assertEqual(manager.read_image(result['s3_key'])[:4], b'\x89PNG')
+        manager.get_file_url(result['s3_key'])
+
+        text = metrics.render_metrics()
+        self.assertEqual(sample_value(text, ok), before[ok] + 1)
+        self.assertGreaterEqual(sample_value(text, uploaded) - before[uploaded], size)
+        self.assertGreaterEqual(sample_value(text, downloaded) - before[downloaded], size)
+        self.assertEqual(sample_value(text, url_hits), before[url_hits] + 1)
+        self.assertIn('comfyui_operation_duration_seconds_count{service="s3",operation="read_image"}', text)
+
+
+if __name__ == '__main__':
+    unittest.main()
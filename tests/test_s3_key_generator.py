@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Тесты генерации ключей S3
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import re
+import sys
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from config.settings import AWSSettings
+from examples.s3_key_generator import KeyGenerator, ULIDGenerator, NAMING_SCHEMES, register_naming_scheme
+
+
+class TestULIDGenerator(unittest.TestCase):
+    """Тесты монотонных ULID"""
+
+    def test_monotonic_and_unique(self):
+        """Идентификаторы уникальны и строго возрастают"""
+        generator = ULIDGenerator()
+        ids = [generator.new() for _ in range(10000)]
+
+        self.assertEqual(len(set(ids)), len(ids))
+        self.assertEqual(ids, sorted(ids))
+        self.assertTrue(all(re.fullmatch(r'[0-9A-HJKMNP-TV-Z]{26}', i) for i in ids))
+
+    def test_unique_across_threads(self):
+        """Параллельная генерация не дает коллизий"""
+        generator = ULIDGenerator()
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            ids = list(executor.map(lambda _: generator.new(), range(20000)))
+        self.assertEqual(len(set(ids)), len(ids))
+
+
+class TestKeyGenerator(unittest.TestCase):
+    """Тесты схем имен и шардирования"""
+
+    def test_same_filename_distinct_keys(self):
+        """Одинаковые имена файлов получают разные ключи"""
+        generator = KeyGenerator()
+        keys = {generator.key('comfyui/images/', 'image.png') for _ in range(1000)}
+        self.assertEqual(len(keys), 1000)
+        self.assertTrue(all(k.startswith('comfyui/images/') and k.endswith('_image.png') for k in keys))
+
+    def test_hash_prefix_sharding(self):
+        """Хэш-префикс распределяет ключи по нескольким префиксам"""
+        generator = KeyGenerator(shard_chars=2)
+        shards = {generator.name('a.png').split('/')[0] for _ in range(2000)}
+        self.assertTrue(all(re.fullmatch(r'[0-9a-f]{2}', shard) for shard in shards))
+        self.assertGreater(len(shards), 200)
+
+    def test_custom_scheme_and_settings(self):
+        """Пользовательская схема выбирается через настройки"""
+        register_naming_scheme('flat-test')(lambda ulid, filename: ulid.lower())
+        try:
+            generator = KeyGenerator.from_settings(AWSSettings(key_naming_scheme='flat-test'))
+            self.assertTrue(re.fullmatch(r'[0-9a-z]{26}', generator.name('x.png')))
+        finally:
+            del NAMING_SCHEMES['flat-test']
+
+        with self.assertRaises(ValueError):
+            KeyGenerator(scheme='missing')
+
+
+if __name__ == "__main__":
+    unittest.main()
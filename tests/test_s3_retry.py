@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Тесты повторов S3 и регулятора параллелизма
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import boto3
+    from botocore.awsrequest import AWSResponse
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+from examples.s3_retry import ConcurrencyGovernor, OperationBudget
+
+BUCKET = "comfyui-test-bucket"
+
+_SLOW_DOWN = (b'<?xml version="1.0" encoding="UTF-8"?><Error><Code>SlowDown</Code>'
+              b'<Message>Please reduce your request rate.</Message></Error>')
+
+
+class _RawBody:
+    """Тело HTTP ответа для подмены в before-send"""
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def stream(self, **kwargs):
+        yield self.data
+
+
+class TestConcurrencyGovernor(unittest.TestCase):
+    """Тесты AIMD регулятора"""
+
+    def test_multiplicative_decrease_additive_increase(self):
+        """Throttling уменьшает лимит вдвое, серия успехов увеличивает на единицу"""
+        governor = ConcurrencyGovernor(max_limit=16, min_limit=2, cooldown=0)
+        governor.on_throttle()
+        self.assertEqual(governor.limit, 8)
+        for _ in range(3):
+            governor.on_throttle()
+        self.assertEqual(governor.limit, 2)
+
+        for _ in range(2):
+            governor.on_success()
+        self.assertEqual(governor.limit, 3)
+
+        state = governor.state()
+        self.assertEqual(state['throttles'], 4)
+        self.assertEqual(state['successes'], 2)
+
+    def test_cooldown_limits_decreases(self):
+        """Пачка throttling-ответов уменьшает лимит один раз за cooldown"""
+        governor = ConcurrencyGovernor(max_limit=16, cooldown=60)
+        for _ in range(10):
+            governor.on_throttle()
+        self.assertEqual(governor.limit, 8)
+
+    def test_acquire_respects_limit(self):
+        """Число одновременных слотов не превышает лимит"""
+        governor = ConcurrencyGovernor(max_limit=2)
+        peak = []
+        barrier = threading.Barrier(2)
+
+        def worker():
+            with governor.slot():
+                peak.append(governor.state()['in_flight'])
+                try:
+                    barrier.wait(timeout=0.2)
+                except threading.BrokenBarrierError:
+                    pass
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLessEqual(max(peak), 2)
+        self.assertEqual(governor.state()['in_flight'], 0)
+
+
+@unittest.skipIf(mock_aws is None, "moto не установлен")
+class TestRetryBudgets(unittest.TestCase):
+    """Тесты повторов S3StorageManager при 503 SlowDown"""
+
+    def setUp(self):
+        """Запуск локальной замены S3"""
+        from examples.s3_storage_manager import S3StorageManager
+
+        self.mock = mock_aws()
+        self.mock.start()
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=BUCKET)
+        self.manager = S3StorageManager(
+            bucket_name=BUCKET,
+            aws_access_key_id="test-key",
+            aws_secret_access_key="test-secret",
+            metadata_index=False,
+            operation_budgets={'HeadObject': OperationBudget(max_attempts=2, max_seconds=10)}
+        )
+        self.manager.s3_client.put_object(Bucket=BUCKET, Key='comfyui/images/a.png', Body=b'x')
+        self.sleep = patch('botocore.endpoint.time.sleep')
+        self.sleep.start()
+
+    def tearDown(self):
+        """Остановка локальной замены S3"""
+        self.sleep.stop()
+        self.mock.stop()
+
+    def throttle(self, operation: str, times: int):
+        """Ответ 503 SlowDown на первые `times` попыток операции"""
+        remaining = [times]
+
+        def before_send(request, **kwargs):
+            if remaining[0] > 0:
+                remaining[0] -= 1
+                return AWSResponse(request.url, 503, {}, _RawBody(_SLOW_DOWN))
+            return None
+
+        self.manager.s3_client.meta.events.register_first(f'before-send.s3.{operation}', before_send)
+
+    def test_transient_slowdown_is_retried(self):
+        """Единичный SlowDown не приводит к ошибке операции"""
+        self.throttle('GetObject', 2)
+        result = self.manager.download_image('comfyui/images/a.png', '/tmp/comfyui_retry_test.png')
+        self.assertTrue(result['success'])
+
+        state = self.manager.get_retry_state()
+        self.assertEqual(state['operations']['GetObject']['throttles'], 2)
+        self.assertEqual(state['operations']['GetObject']['retries'], 2)
+        self.assertLess(state['governor']['limit'], state['governor']['max_limit'])
+
+    def test_operation_budget_is_enforced(self):
+        """Бюджет операции ограничивает число попыток"""
+        self.throttle('HeadObject', 10)
+        self.assertEqual(self.manager.get_file_metadata('comfyui/images/a.png'), {})
+
+        stats = self.manager.get_retry_state()['operations']['HeadObject']
+        self.assertEqual(stats['attempts'], 2)
+        self.assertEqual(stats['exhausted'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
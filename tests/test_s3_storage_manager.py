@@ -0,0 +1,667 @@
+#!/usr/bin/env python3
+"""
+Тесты S3 Storage Manager на локальной замене S3 (moto)
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+try:
+    import boto3
+    import requests
+    from moto import mock_aws
+except ImportError:
+    mock_aws = None
+
+from examples.s3_storage_manager import (
+    S3StorageManager, RetentionPolicy, BloomFilter, COMPRESSION_METADATA_KEY, CONTENT_PREFIX,
+    thumbnail_key
+)
+from examples.s3_metadata_index import S3MetadataIndex
+from examples.s3_url_cache import PresignedUrlCache
+
+BUCKET = "comfyui-test-bucket"
+
+
+@unittest.skipIf(mock_aws is None, "moto не установлен")
+class S3TestCase(unittest.TestCase):
+    """Базовый класс тестов с bucket в moto"""
+
+    def setUp(self):
+        """Запуск локальной замены S3 и создание bucket"""
+        # Очистка в обратном порядке: менеджеры закрываются до остановки moto
+        self.mock = mock_aws()
+        self.mock.start()
+        self.addCleanup(self.mock.stop)
+        self.client = boto3.client('s3', region_name='us-east-1')
+        self.client.create_bucket(Bucket=BUCKET)
+        self.temp_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.temp_dir, ignore_errors=True)
+
+    def make_manager(self, **kwargs) -> S3StorageManager:
+        """Создание менеджера для тестового bucket"""
+        kwargs.setdefault('metadata_cache_dir', os.path.join(self.temp_dir, 'index'))
+        manager = S3StorageManager(
+            bucket_name=BUCKET,
+            aws_access_key_id="test-key",
+            aws_secret_access_key="test-secret",
+            **kwargs
+        )
+        self.addCleanup(manager.close)
+        return manager
+
+    def put_objects(self, prefix: str, count: int, body: bytes = b"data"):
+        """Создание набора тестовых объектов"""
+        keys = [f"{prefix}{i:05d}.png" for i in range(count)]
+        for key in keys:
+            self.client.put_object(Bucket=BUCKET, Key=key, Body=body)
+        return keys
+
+
+class TestCompression(S3TestCase):
+    """Тесты сжатия workflow и резервных копий"""
+
+    def test_workflow_round_trip_gzip(self):
+        """Workflow сжимается при записи и распаковывается при чтении"""
+        manager = self.make_manager(compression_level=9)
+        workflow = {"nodes": [{"id": i, "type": "KSampler", "inputs": {}} for i in range(200)], "links": []}
+
+        result = manager.save_workflow(workflow, "big.json")
+        self.assertTrue(result['success'])
+        self.assertLess(result['stored_size'] * 5, result['size'])
+
+        head = self.client.head_object(Bucket=BUCKET, Key=result['s3_key'])
+        self.assertEqual(head['ContentEncoding'], 'gzip')
+        self.assertEqual(head['Metadata'][COMPRESSION_METADATA_KEY], 'gzip')
+
+        loaded = manager.load_workflow("big.json")
+        self.assertTrue(loaded['success'])
+        self.assertEqual(loaded['workflow_data'], workflow)
+
+    def test_uncompressed_and_legacy_objects(self):
+        """Несжатые объекты читаются как раньше"""
+        manager = self.make_manager(compression=None)
+        manager.save_workflow({"nodes": []}, "plain.json")
+        head = self.client.head_object(Bucket=BUCKET, Key="comfyui/workflows/plain.json")
+        self.assertNotIn('ContentEncoding', head)
+
+        compressed = self.make_manager()
+        self.assertEqual(compressed.load_workflow("plain.json")['workflow_data'], {"nodes": []})
+
+    def test_binary_workflow_compressed(self):
+        """Бинарный workflow также сжимается"""
+        manager = self.make_manager()
+        result = manager.save_workflow({"nodes": [], "links": []}, binary=True)
+        self.assertTrue(result['s3_key'].endswith('.cwf'))
+        loaded = manager.load_workflow(result['workflow_name'])
+        self.assertEqual(loaded['workflow_data'], {"nodes": [], "links": []})
+
+
+
+class TestBulkDelete(S3TestCase):
+    """Тесты массового удаления"""
+
+    def test_delete_prefix_in_batches(self):
+        """Удаление всех объектов префикса пакетами"""
+        manager = self.make_manager()
+        self.put_objects("comfyui/temp/", 25)
+        keep = self.put_objects("comfyui/images/", 3)
+
+        result = manager.delete_many(prefix="comfyui/temp/", batch_size=10, max_workers=3)
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['deleted'], 25)
+        self.assertEqual(result['batches'], 3)
+        remaining = [obj['Key'] for obj in manager.iter_objects("comfyui/temp/")]
+        self.assertEqual(remaining, ["comfyui/temp/"])
+        self.assertEqual(len([o for o in manager.iter_objects("comfyui/images/") if o['Key'] in keep]), 3)
+
+    def test_dry_run(self):
+        """Пробный запуск ничего не удаляет"""
+        manager = self.make_manager()
+        self.put_objects("comfyui/temp/", 5)
+
+        result = manager.delete_many(prefix="comfyui/temp/", dry_run=True)
+
+        self.assertTrue(result['dry_run'])
+        self.assertEqual(result['matched'], 5)
+        self.assertEqual(len(list(manager.iter_objects("comfyui/temp/"))), 6)
+
+    def test_per_key_errors(self):
+        """Ошибки отдельных ключей попадают в отчет"""
+        manager = self.make_manager()
+        keys = self.put_objects("comfyui/temp/", 4)
+        original = manager.s3_client.delete_objects
+
+        def failing_delete(**kwargs):
+            response = original(**kwargs)
+            response['Errors'] = [{'Key': keys[0], 'Code': 'AccessDenied', 'Message': 'Access Denied'}]
+            return response
+
+        with patch.object(manager.s3_client, 'delete_objects', side_effect=failing_delete):
+            result = manager.delete_many(keys=iter(keys))
+
+        self.assertFalse(result['success'])
+        self.assertEqual(result['deleted'], 3)
+        self.assertEqual(result['errors'][0]['key'], keys[0])
+        self.assertEqual(result['errors'][0]['code'], 'AccessDenied')
+
+    def test_requires_single_source(self):
+        """Нужно указать либо ключи, либо префикс"""
+        manager = self.make_manager()
+        self.assertFalse(manager.delete_many()['success'])
+        self.assertFalse(manager.delete_many(keys=[], prefix="comfyui/")['success'])
+
+
+
+class TestRetention(S3TestCase):
+    """Тесты политик хранения"""
+
+    def test_max_age(self):
+        """Удаление объектов старше заданного возраста"""
+        manager = self.make_manager()
+        self.put_objects("comfyui/temp/", 4)
+        future = datetime.now(timezone.utc) + timedelta(days=3)
+
+        result = manager.enforce_retention(
+            [RetentionPolicy(prefix="comfyui/temp/", max_age_days=1)], now=future
+        )
+
+        self.assertTrue(result['success'])
+        self.assertEqual(result['policies'][0]['expired'], 4)
+        self.assertEqual([o['Key'] for o in manager.iter_objects("comfyui/temp/")], ["comfyui/temp/"])
+
+    def test_max_count_and_bytes(self):
+        """Ограничения по количеству и объему оставляют самые новые объекты"""
+        manager = self.make_manager()
+        keys = self.put_objects("comfyui/backups/", 6, body=b"x" * 100)
+        newest = keys[-2:]
+
+        # Объекты создаются в одну секунду - задаем явный порядок по времени
+        listing = list(manager.iter_objects("comfyui/backups/"))
+        base = datetime.now(timezone.utc)
+        for i, obj in enumerate(sorted(listing, key=lambda o: o['Key'])):
+            obj['LastModified'] = base + timedelta(seconds=i)
+        policy = RetentionPolicy(prefix="comfyui/backups/", max_count=3, max_bytes=250)
+
+        with patch.object(manager, 'iter_objects', side_effect=lambda prefix: iter(listing)):
+            dry = manager.enforce_retention([policy], dry_run=True)
+            self.assertEqual(dry['policies'][0]['evicted'], 4)
+            self.assertEqual(dry['policies'][0]['deleted'], 0)
+
+            result = manager.enforce_retention([policy])
+            self.assertEqual(result['policies'][0]['deleted'], 4)
+            self.assertEqual(result['policies'][0]['bytes_freed'], 400)
+
+        remaining = [o['Key'] for o in manager.iter_objects("comfyui/backups/") if o['Key'] != "comfyui/backups/"]
+        self.assertEqual(remaining, newest)
+
+    def test_lifecycle_rules(self):
+        """Установка правил жизненного цикла с сохранением чужих правил"""
+        manager = self.make_manager()
+        self.client.put_bucket_lifecycle_configuration(
+            Bucket=BUCKET,
+            LifecycleConfiguration={'Rules': [{
+                'ID': 'custom', 'Filter': {'Prefix': 'logs/'}, 'Status': 'Enabled', 'Expiration': {'Days': 7}
+            }]}
+        )
+
+        result = manager.apply_lifecycle_rules([
+            RetentionPolicy(prefix="comfyui/temp/", max_age_days=2),
+            RetentionPolicy(prefix="comfyui/backups/", max_count=10)
+        ])
+        self.assertTrue(result['success'])
+        self.assertEqual(result['skipped_prefixes'], ["comfyui/backups/"])
+
+        manager.apply_lifecycle_rules([RetentionPolicy(prefix="comfyui/temp/", max_age_days=3)])
+        rules = self.client.get_bucket_lifecycle_configuration(Bucket=BUCKET)['Rules']
+        self.assertEqual(sorted(rule['ID'] for rule in rules), ['comfyui-retention-comfyui/temp/', 'custom'])
+        temp_rule = [rule for rule in rules if rule['ID'] != 'custom'][0]
+        self.assertEqual(temp_rule['Expiration']['Days'], 3)
+
+
+
+class TestBackups(S3TestCase):
+    """Тесты инкрементальных резервных копий"""
+
+    def test_incremental_backup(self):
+        """Повторная копия копирует только изменившиеся объекты"""
+        manager = self.make_manager()
+        keys = self.put_objects("comfyui/images/", 3)
+
+        first = manager.backup_images("b1")
+        self.assertTrue(first['success'])
+        self.assertEqual((first['copied'], first['reused']), (3, 0))
+        copy = self.client.get_object(Bucket=BUCKET, Key="comfyui/backups/b1/00000.png")
+        self.assertEqual(copy['Body'].read(), b"data")
+
+        self.client.put_object(Bucket=BUCKET, Key=keys[1], Body=b"changed")
+        self.put_objects("comfyui/images/new_", 1)
+        second = manager.backup_images("b2")
+        self.assertEqual((second['copied'], second['reused']), (2, 2))
+
+        manifest = manager._load_latest_backup_manifest()
+        self.assertEqual(manifest['backup_name'], "b2")
+        self.assertEqual(manifest['base_backup'], "b1")
+        self.assertEqual(manifest['objects'][keys[0]]['backup_key'], "comfyui/backups/b1/00000.png")
+        self.assertEqual(manifest['objects'][keys[1]]['backup_key'], "comfyui/backups/b2/00001.png")
+
+    def test_full_backup_and_rebase(self):
+        """Полная копия и повторное копирование устаревших копий"""
+        manager = self.make_manager()
+        self.put_objects("comfyui/images/", 2)
+        manager.backup_images("b1")
+
+        self.assertEqual(manager.backup_images("b2", incremental=False)['copied'], 2)
+        self.assertEqual(manager.backup_images("b3", rebase_after_days=0)['copied'], 2)
+
+    def test_multipart_copy(self):
+        """Крупные объекты копируются через multipart"""
+        manager = self.make_manager()
+        self.client.put_object(Bucket=BUCKET, Key="comfyui/images/big.png", Body=b"x" * (6 * 1024 * 1024))
+
+        with patch('examples.s3_storage_manager.BACKUP_MULTIPART_THRESHOLD', 5 * 1024 * 1024), \
+                patch('examples.s3_storage_manager.BACKUP_MULTIPART_CHUNKSIZE', 5 * 1024 * 1024), \
+                patch.object(manager.s3_client, 'copy_object', side_effect=AssertionError("copy_object")):
+            result = manager.backup_images("big")
+
+        self.assertTrue(result['success'])
+        head = self.client.head_object(Bucket=BUCKET, Key="comfyui/backups/big/big.png")
+        self.assertEqual(head['ContentLength'], 6 * 1024 * 1024)
+
+
+class TestMetadataIndex(S3TestCase):
+    """Тесты индекса метаданных"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        super().setUp()
+        self.image_path = os.path.join(self.temp_dir, 'image.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(b"png-bytes")
+
+    def test_download_uses_index_without_head(self):
+        """Скачивание берет метаданные из индекса без HEAD-запроса"""
+        manager = self.make_manager()
+        upload = manager.upload_image(self.image_path, metadata={'prompt': 'закат', 'model': 'dall-e-3'})
+        self.assertTrue(upload['success'])
+
+        with patch.object(manager.s3_client, 'head_object', side_effect=AssertionError("HEAD")):
+            result = manager.download_image(upload['s3_key'], os.path.join(self.temp_dir, 'out.png'))
+        self.assertTrue(result['success'])
+        self.assertEqual(result['metadata']['prompt'], 'закат')
+
+        # Без индекса метаданные читаются HEAD-запросом и декодируются
+        plain = self.make_manager(metadata_index=False)
+        self.assertEqual(plain.get_file_metadata(upload['s3_key'])['prompt'], 'закат')
+
+    def test_find_across_instances(self):
+        """Второй экземпляр видит записи первого после синхронизации"""
+        writer = self.make_manager()
+        writer.upload_image(self.image_path, 'comfyui/images/a.png', {'prompt': 'Red sunset', 'model': 'm1'})
+        writer.upload_image(self.image_path, 'comfyui/images/b.png', {'prompt': 'blue sea', 'model': 'm2'})
+
+        # Записи публикуются пачкой, а не отдельным сегментом на каждую загрузку
+        self.assertEqual(writer.metadata_index._list_segments(), [])
+        self.assertEqual(writer.metadata_index.flush(), 2)
+
+        reader = self.make_manager(metadata_cache_dir=os.path.join(self.temp_dir, 'other'))
+        found = reader.find_images(prompt='sunset')
+        self.assertEqual([f['key'] for f in found['files']], ['comfyui/images/a.png'])
+        self.assertEqual(reader.find_images(model='m2')['count'], 1)
+
+        writer.delete_image('comfyui/images/a.png')
+        writer.close()
+        self.assertEqual(reader.find_images(prompt='sunset')['count'], 0)
+
+    def test_compaction(self):
+        """Слияние оставляет по одному сегменту на шард, сохраняет записи и отметки об удалении"""
+        manager = self.make_manager()
+        for i in range(20):
+            manager.upload_image(self.image_path, f'comfyui/images/{i:03d}.png', {'prompt': f'p{i}'})
+            manager.metadata_index.flush()
+
+        # Кэш, синхронизированный до удаления, получает отметку из слитого сегмента
+        stale = self.make_manager(metadata_cache_dir=os.path.join(self.temp_dir, 'stale'))
+        self.assertEqual(stale.find_images(limit=100)['count'], 20)
+        manager.delete_many(keys=['comfyui/images/000.png'])
+
+        stats = manager.compact_metadata_index()
+        self.assertTrue(stats['success'])
+        self.assertEqual(stats['records'], 19)
+        self.assertEqual(stats['tombstones'], 1)
+
+        index = manager.metadata_index
+        segments = index._list_segments()
+        shards = {key.split('/')[-2] for key in segments}
+        self.assertEqual(len(segments), len(shards))
+
+        self.assertEqual(stale.find_images(limit=100)['count'], 19)
+        reader = self.make_manager(metadata_cache_dir=os.path.join(self.temp_dir, 'fresh'))
+        self.assertEqual(reader.find_images(limit=100)['count'], 19)
+
+    def test_auto_compaction(self):
+        """Шард сливается автоматически, когда в нем набирается compact_threshold сегментов"""
+        manager = self.make_manager()
+        index = S3MetadataIndex(manager.s3_client, BUCKET, cache_dir=os.path.join(self.temp_dir, 'auto'),
+                                shard_count=1, flush_threshold=1, compact_threshold=3)
+        self.addCleanup(index.close)
+        for i in range(3):
+            index.record(f'comfyui/images/{i}.png', {'prompt': f'p{i}'})
+        self.assertEqual(len(index._list_segments()), 1)
+        self.assertEqual(index._known_segment_count(0), 1)
+
+        index.record('comfyui/images/3.png', {'prompt': 'p3'})
+        self.assertEqual(len(index._list_segments()), 2)
+        self.assertEqual(len(index.find(limit=10)), 4)
+
+
+class TestMetadataSearch(S3TestCase):
+    """Тесты поиска по обратному индексу"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        super().setUp()
+        self.image_path = os.path.join(self.temp_dir, 'image.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(b"png-bytes")
+
+    def test_token_and_filters(self):
+        """Все слова запроса должны встречаться, фильтры сужают выборку"""
+        manager = self.make_manager()
+        manager.upload_image(self.image_path, 'comfyui/images/1.png',
+                             {'prompt': 'Red sunset over the sea', 'model': 'm1', 'upload_time': '2024-01-01T10:00:00'})
+        manager.upload_image(self.image_path, 'comfyui/images/2.png',
+                             {'prompt': 'Sunset, mountains', 'model': 'm2', 'upload_time': '2024-02-01T10:00:00'})
+        manager.upload_image(self.image_path, 'comfyui/images/3.png',
+                             {'prompt': 'Закат над морем', 'model': 'm1', 'upload_time': '2024-03-01T10:00:00'})
+
+        def keys(**kwargs):
+            return [f['key'] for f in manager.search_images(scan=False, **kwargs)['files']]
+
+        self.assertEqual(keys(query='sunset'), ['comfyui/images/2.png', 'comfyui/images/1.png'])
+        self.assertEqual(keys(query='SUNSET sea'), ['comfyui/images/1.png'])
+        self.assertEqual(keys(query='закат'), ['comfyui/images/3.png'])
+        self.assertEqual(keys(model='m1', since='2024-02-01'), ['comfyui/images/3.png'])
+        self.assertEqual(keys(until='2024-01-15'), ['comfyui/images/1.png'])
+
+        manager.delete_image('comfyui/images/1.png')
+        self.assertEqual(keys(query='sea'), [])
+
+    @unittest.skipUnless(hasattr(time, 'tzset'), "нужен time.tzset")
+    def test_time_filters_in_utc(self):
+        """upload_time хранится в UTC, фильтры по времени не зависят от часового пояса хоста"""
+        previous_tz = os.environ.get('TZ')
+        os.environ['TZ'] = 'Asia/Tokyo'
+        time.tzset()
+
+        def restore_tz():
+            if previous_tz is None:
+                os.environ.pop('TZ', None)
+            else:
+                os.environ['TZ'] = previous_tz
+            time.tzset()
+        self.addCleanup(restore_tz)
+
+        manager = self.make_manager()
+        uploaded = manager.upload_image(self.image_path, 'comfyui/images/new.png', {'prompt': 'new'})
+        self.assertTrue(uploaded['metadata']['upload_time'].endswith('+00:00'))
+        # Старая запись с локальным временем без пояса: 12:00 в Токио - 03:00 UTC
+        manager.upload_image(self.image_path, 'comfyui/images/old.png',
+                             {'prompt': 'old', 'upload_time': '2024-01-01T12:00:00'})
+
+        def keys(**kwargs):
+            return [f['key'] for f in manager.search_images(scan=False, **kwargs)['files']]
+
+        recent = datetime.now(timezone.utc) - timedelta(minutes=5)
+        self.assertEqual(keys(since=recent), ['comfyui/images/new.png'])
+        self.assertEqual(keys(since=recent.astimezone().replace(tzinfo=None)), ['comfyui/images/new.png'])
+        self.assertEqual(keys(since=datetime(2024, 1, 1, 2, tzinfo=timezone.utc),
+                              until=datetime(2024, 1, 1, 4, tzinfo=timezone.utc)), ['comfyui/images/old.png'])
+        self.assertEqual(keys(until='2024-01-01T03:00:00Z'), [])
+
+    def test_scan_picks_up_foreign_uploads(self):
+        """Сканирование листинга добавляет объекты, загруженные в обход менеджера"""
+        manager = self.make_manager()
+        self.client.put_object(Bucket=BUCKET, Key='comfyui/images/ext.png', Body=b"x",
+                               Metadata={'prompt': 'external cat'})
+
+        self.assertEqual(manager.search_images(query='cat', scan=False)['count'], 0)
+        with patch.object(manager, 'get_file_metadata', wraps=manager.get_file_metadata) as head:
+            self.assertEqual(manager.search_images(query='cat', scan=True)['count'], 1)
+            manager.scan_metadata_index()
+        self.assertEqual(head.call_count, 1)
+
+    def test_scan_publishes_in_batch(self):
+        """Сканирование публикует найденные записи пачкой, а не сегментом на объект"""
+        manager = self.make_manager()
+        for key in self.put_objects('comfyui/images/ext/', 40):
+            self.client.copy_object(Bucket=BUCKET, Key=key, CopySource={'Bucket': BUCKET, 'Key': key},
+                                    Metadata={'prompt': 'external'}, MetadataDirective='REPLACE')
+
+        with patch.object(manager.metadata_index, 'flush', wraps=manager.metadata_index.flush) as flush:
+            result = manager.scan_metadata_index()
+        self.assertEqual(result['added'], 40)
+        self.assertLessEqual(flush.call_count, 1)
+        manager.metadata_index.flush()
+        self.assertLessEqual(len(manager.metadata_index._list_segments()), manager.metadata_index.shard_count)
+
+
+class TestDeduplication(S3TestCase):
+    """Тесты дедупликации загрузок по содержимому"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        super().setUp()
+        self.image_path = os.path.join(self.temp_dir, 'image.png')
+        with open(self.image_path, 'wb') as f:
+            f.write(b"png-bytes" * 100)
+
+    def test_disabled_by_default(self):
+        """Без deduplicate ключи генерируются обычным образом и содержимое не хэшируется"""
+        manager = self.make_manager()
+        with patch('examples.s3_storage_manager.hash_file', side_effect=AssertionError("hash")):
+            first = manager.upload_image(self.image_path)
+            second = manager.upload_image(self.image_path)
+        self.assertTrue(first['s3_key'].startswith('comfyui/images/'))
+        self.assertFalse(first['s3_key'].startswith(CONTENT_PREFIX))
+        self.assertNotEqual(first['s3_key'], second['s3_key'])
+        self.assertFalse(second['deduplicated'])
+
+    def test_identical_upload_is_skipped(self):
+        """Повторная загрузка тех же байтов возвращает тот же ключ"""
+        manager = self.make_manager(deduplicate='skip')
+        first = manager.upload_image(self.image_path, metadata={'prompt': 'a'})
+        with patch.object(manager.s3_client, 'upload_fileobj') as upload:
+            second = manager.upload_image(self.image_path, metadata={'prompt': 'a'})
+        upload.assert_not_called()
+
+        self.assertTrue(first['s3_key'].startswith(CONTENT_PREFIX))
+        self.assertEqual(first['s3_key'], second['s3_key'])
+        self.assertFalse(first['deduplicated'])
+        self.assertTrue(second['deduplicated'])
+        self.assertEqual(len(list(manager.iter_objects(CONTENT_PREFIX))), 1)
+
+    def test_new_content_skips_head(self):
+        """Для нового содержимого фильтр Блума исключает HEAD-запрос"""
+        manager = self.make_manager(deduplicate='skip')
+        manager.upload_image(self.image_path)
+        with open(self.image_path, 'wb') as f:
+            f.write(b"other-bytes")
+        with patch.object(manager.s3_client, 'head_object', side_effect=AssertionError("HEAD")):
+            self.assertTrue(manager.upload_image(self.image_path)['success'])
+
+    def test_alias_for_explicit_key(self):
+        """В режиме alias дубликат с явным ключом становится ссылкой"""
+        manager = self.make_manager(deduplicate='alias')
+        original = manager.upload_image(self.image_path)
+        alias = manager.upload_image(self.image_path, 'comfyui/images/named.png', {'prompt': 'named'})
+
+        self.assertTrue(alias['deduplicated'])
+        head = self.client.head_object(Bucket=BUCKET, Key='comfyui/images/named.png')
+        self.assertEqual(head['ContentLength'], 0)
+
+        local_path = os.path.join(self.temp_dir, 'out.png')
+        result = manager.download_image('comfyui/images/named.png', local_path)
+        with open(local_path, 'rb') as f:
+            self.assertEqual(f.read(), b"png-bytes" * 100)
+        self.assertEqual(result['metadata']['comfyui-alias-of'], original['s3_key'])
+
+    def test_bloom_filter(self):
+        """Фильтр Блума не дает ложноотрицательных ответов"""
+        import hashlib
+        bloom = BloomFilter(capacity=1000)
+        digests = [hashlib.sha256(str(i).encode()).hexdigest() for i in range(2000)]
+        for digest in digests[:1000]:
+            bloom.add(digest)
+        self.assertTrue(all(d in bloom for d in digests[:1000]))
+        false_positives = sum(d in bloom for d in digests[1000:])
+        self.assertLess(false_positives, 50)
+
+
+class TestPresignedUrlCache(S3TestCase):
+    """Тесты кэша подписанных URL"""
+
+    def test_reuse_across_instances(self):
+        """URL переиспользуется разными менеджерами и повторно не подписывается"""
+        cache = PresignedUrlCache()
+        first = self.make_manager(metadata_index=False, url_cache=cache)
+        second = self.make_manager(metadata_index=False, url_cache=cache)
+
+        url = first.get_file_url('comfyui/images/a.png')
+        with patch.object(second.s3_client, 'generate_presigned_url') as sign:
+            self.assertEqual(second.get_file_url('comfyui/images/a.png', expires_in=3500), url)
+        sign.assert_not_called()
+        self.assertNotEqual(first.get_file_url('comfyui/images/b.png'), url)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_expiry_margin_and_lru(self):
+        """URL у границы срока действия подписывается заново, размер кэша ограничен"""
+        now = [1000.0]
+        cache = PresignedUrlCache(max_entries=2, clock=lambda: now[0])
+        urls = iter(f"url-{i}" for i in range(10))
+        lifetimes = []
+        sign = lambda expires_in: lifetimes.append(expires_in) or next(urls)
+
+        # URL подписывается с запасом и отдается, пока действителен не меньше запрошенного срока
+        self.assertEqual(cache.get_or_sign('a', 3600, sign), 'url-0')
+        self.assertEqual(lifetimes, [7200])
+        now[0] += 3600
+        self.assertEqual(cache.get_or_sign('a', 3600, sign), 'url-0')
+        now[0] += 1
+        self.assertEqual(cache.get_or_sign('a', 3600, sign), 'url-1')
+        self.assertEqual(cache.signed_lifetime(7 * 24 * 3600), 7 * 24 * 3600)
+
+        cache.get_or_sign('b', 3600, sign)
+        cache.get_or_sign('c', 3600, sign)
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.get_or_sign('a', 3600, sign), 'url-4')
+
+
+class TestDirectUploads(S3TestCase):
+    """Тесты прямых загрузок клиентов по подписанным URL"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        super().setUp()
+        self.manager = self.make_manager()
+
+    def test_presigned_put_and_post(self):
+        """Клиент загружает PUT и POST формой, complete_upload индексирует метаданные"""
+        put = self.manager.create_upload("ref.png", metadata={'prompt': 'горы'})
+        response = requests.put(put['url'], data=b'put-bytes', headers=put['headers'])
+        self.assertEqual(response.status_code, 200)
+
+        post = self.manager.create_upload("ref.jpg", method='post', max_size=1024)
+        response = requests.post(post['url'], data=post['fields'], files={'file': b'post-bytes'})
+        self.assertLess(response.status_code, 300)
+
+        done = self.manager.complete_upload(put['s3_key'], metadata={'model': 'sdxl'})
+        self.assertTrue(done['success'])
+        self.assertEqual(done['metadata']['file_size'], 9)
+        self.assertEqual(self.manager.get_file_metadata(put['s3_key'])['prompt'], 'горы')
+        self.assertEqual(self.manager.metadata_index.get(put['s3_key'])['model'], 'sdxl')
+        self.assertTrue(self.manager.complete_upload(post['s3_key'])['success'])
+        head = self.client.head_object(Bucket=BUCKET, Key=post['s3_key'])
+        self.assertEqual(head['ContentType'], 'image/jpeg')
+
+    def test_multipart_part_urls(self):
+        """Части загружаются по подписанным URL и собираются при завершении"""
+        data = os.urandom(5 * 1024 * 1024 + 100)
+        upload = self.manager.create_multipart_upload("big.png", len(data), part_size=1)
+        self.assertEqual(len(upload['parts']), 2)
+
+        for part in reversed(upload['parts']):
+            start = (part['part_number'] - 1) * upload['part_size']
+            response = requests.put(part['url'], data=data[start:start + upload['part_size']])
+            self.assertEqual(response.status_code, 200)
+
+        done = self.manager.complete_upload(upload['s3_key'], upload_id=upload['upload_id'])
+        self.assertTrue(done['success'])
+        body = self.client.get_object(Bucket=BUCKET, Key=upload['s3_key'])['Body'].read()
+        self.assertEqual(body, data)
+
+
+class TestThumbnails(S3TestCase):
+    """Тесты миниатюр при загрузке"""
+
+    def test_pyramid_upload_list_and_delete(self):
+        """Миниатюры создаются при загрузке, попадают в листинг и удаляются с изображением"""
+        from PIL import Image
+
+        path = os.path.join(self.temp_dir, "large.png")
+        Image.new('RGB', (640, 320), (10, 200, 30)).save(path)
+        manager = self.make_manager(thumbnail_sizes=(64, 256))
+
+        result = manager.upload_image(path, s3_key="comfyui/images/gallery/large.png")
+        self.assertTrue(result['success'])
+        self.assertEqual(sorted(result['thumbnails']), [64, 256])
+        self.assertEqual(result['metadata']['thumbnail_sizes'], '64,256')
+
+        body = self.client.get_object(Bucket=BUCKET, Key=thumbnail_key(result['s3_key'], 64))['Body'].read()
+        with Image.open(io.BytesIO(body)) as thumbnail:
+            self.assertEqual((thumbnail.format, thumbnail.size), ('WEBP', (64, 32)))
+
+        listing = manager.list_images('comfyui/images/gallery/', thumbnail_size=100)
+        self.assertIn('/thumbnails/256/gallery/large.webp', listing['files'][0]['thumbnail_url'])
+
+        plain = self.make_manager()
+        jpeg = plain.upload_image(path, image=Image.open(path), thumbnail_sizes=[128])
+        self.assertEqual(jpeg['metadata']['thumbnail_format'], 'webp')
+        self.assertIsNone(plain.get_thumbnail_url(CONTENT_PREFIX + 'unknown.png', 128))
+
+        manager.delete_image(result['s3_key'])
+        remaining = [obj['Key'] for obj in manager.iter_objects('comfyui/thumbnails/')
+                     if not obj['Key'].endswith('/')]
+        self.assertEqual(remaining, [thumbnail_key(jpeg['s3_key'], 128)])
+
+    def test_failed_upload_removes_thumbnails(self):
+        """Если оригинал не загрузился, уже записанные миниатюры удаляются"""
+        from PIL import Image
+
+        path = os.path.join(self.temp_dir, "large.png")
+        Image.new('RGB', (320, 320), (10, 200, 30)).save(path)
+        manager = self.make_manager(thumbnail_sizes=(32, 64, 128))
+
+        with patch.object(manager.s3_client, 'upload_fileobj', side_effect=RuntimeError("network")):
+            result = manager.upload_image(path, s3_key="comfyui/images/broken.png")
+        self.assertFalse(result['success'])
+        remaining = [obj['Key'] for obj in manager.iter_objects('comfyui/thumbnails/')
+                     if not obj['Key'].endswith('/')]
+        self.assertEqual(remaining, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
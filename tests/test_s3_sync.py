@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Тесты синхронизации директории с S3
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import patch
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from tests.test_s3_storage_manager import S3TestCase, BUCKET
+from examples.s3_sync import S3DirectorySync, _InotifyWatcher
+
+PREFIX = 'comfyui/output/'
+
+
+class TestDirectorySync(S3TestCase):
+    """Тесты движка синхронизации"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        super().setUp()
+        self.local_dir = os.path.join(self.temp_dir, 'output')
+        self.state_dir = os.path.join(self.temp_dir, 'state')
+        self.manager = self.make_manager(metadata_index=False)
+
+    def write(self, relative: str, data: bytes):
+        """Запись локального файла"""
+        path = os.path.join(self.local_dir, relative)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(data)
+        return path
+
+    def sync(self, **kwargs):
+        """Синхронизация тестовой директории"""
+        return self.manager.sync(self.local_dir, PREFIX, state_dir=self.state_dir, **kwargs)
+
+    def test_upload_only_changes(self):
+        """Повторная синхронизация передает только измененные файлы"""
+        self.write('a.png', b'aaa')
+        self.write('sub/b.png', b'bbb')
+        self.assertEqual(self.sync()['transferred'], 2)
+
+        with patch('examples.s3_sync.md5_file') as md5:
+            second = self.sync()
+        md5.assert_not_called()
+        self.assertEqual((second['transferred'], second['unchanged']), (0, 2))
+
+        self.write('a.png', b'AAA')
+        third = self.sync()
+        self.assertEqual((third['transferred'], third['unchanged']), (1, 1))
+        body = self.client.get_object(Bucket=BUCKET, Key=PREFIX + 'a.png')['Body'].read()
+        self.assertEqual(body, b'AAA')
+
+    def test_hash_comparison_without_state(self):
+        """Без сохраненного состояния одинаковые файлы определяются по MD5 и ETag"""
+        self.write('a.png', b'same')
+        self.client.put_object(Bucket=BUCKET, Key=PREFIX + 'a.png', Body=b'same')
+        self.assertEqual(self.sync()['unchanged'], 1)
+
+    def test_delete_extras_and_dry_run(self):
+        """Лишние объекты удаляются только с delete=True"""
+        self.write('keep.png', b'k')
+        self.client.put_object(Bucket=BUCKET, Key=PREFIX + 'extra.png', Body=b'x')
+
+        plan = self.sync(delete=True, dry_run=True)
+        self.assertEqual(plan['to_transfer'], ['keep.png'])
+        self.assertEqual(plan['to_delete'], ['extra.png'])
+
+        self.assertEqual(self.sync(delete=True)['deleted'], 1)
+        keys = [obj['Key'] for obj in self.manager.iter_objects(PREFIX)]
+        self.assertEqual(keys, [PREFIX + 'keep.png'])
+
+    def test_download_direction(self):
+        """Скачивание создает вложенные директории и удаляет лишние локальные файлы"""
+        self.client.put_object(Bucket=BUCKET, Key=PREFIX + 'x/y.png', Body=b'remote')
+        self.write('stale.png', b'old')
+
+        result = self.sync(direction='download', delete=True)
+        self.assertEqual((result['transferred'], result['deleted']), (1, 1))
+        with open(os.path.join(self.local_dir, 'x', 'y.png'), 'rb') as f:
+            self.assertEqual(f.read(), b'remote')
+        self.assertFalse(os.path.exists(os.path.join(self.local_dir, 'stale.png')))
+
+    def test_download_rejects_parent_segments(self):
+        """Ключи с '..' не скачиваются за пределы директории и попадают в ошибки"""
+        self.client.put_object(Bucket=BUCKET, Key=PREFIX + '../../escaped.png', Body=b'evil')
+        self.client.put_object(Bucket=BUCKET, Key=PREFIX + 'safe.png', Body=b'ok')
+
+        planned = self.sync(direction='download', dry_run=True)
+        self.assertEqual(planned['to_transfer'], ['safe.png'])
+        result = self.sync(direction='download')
+        self.assertEqual(result['transferred'], 1)
+        self.assertEqual([error['path'] for error in result['errors']], ['../../escaped.png'])
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, 'escaped.png')))
+        self.assertFalse(os.path.exists(os.path.join(os.path.dirname(self.temp_dir), 'escaped.png')))
+
+    def test_watch_uploads_new_files(self):
+        """Режим наблюдения загружает появившиеся файлы (inotify и опрос)"""
+        for use_inotify in (True, False):
+            with self.subTest(use_inotify=use_inotify):
+                name = f'new_{use_inotify}.png'
+                uploaded = threading.Event()
+                stop = threading.Event()
+                engine = S3DirectorySync(self.manager, self.state_dir)
+                thread = threading.Thread(target=engine.watch, args=(self.local_dir, PREFIX), kwargs={
+                    'stop_event': stop, 'poll_interval': 0.1, 'settle_seconds': 0.2,
+                    'use_inotify': use_inotify,
+                    'on_upload': lambda relative, key: relative == name and uploaded.set()
+                })
+                thread.start()
+                time.sleep(0.5)
+                self.write(name, b'fresh')
+                try:
+                    self.assertTrue(uploaded.wait(10))
+                finally:
+                    stop.set()
+                    thread.join(10)
+
+    def test_watch_catches_writes_during_initial_sync(self):
+        """Файл, записанный во время начальной синхронизации, загружается; переполнение - повторная синхронизация"""
+        engine = S3DirectorySync(self.manager, self.state_dir)
+        original_sync = engine.sync
+        uploaded = threading.Event()
+        stop = threading.Event()
+
+        def sync_and_write(*args, **kwargs):
+            result = original_sync(*args, **kwargs)
+            if not os.path.exists(os.path.join(self.local_dir, 'late.png')):
+                self.write('late.png', b'late')
+            return result
+
+        thread = threading.Thread(target=engine.watch, args=(self.local_dir, PREFIX), kwargs={
+            'stop_event': stop, 'poll_interval': 0.1,
+            'on_upload': lambda relative, key: relative == 'late.png' and uploaded.set()
+        })
+        with patch.object(engine, 'sync', side_effect=sync_and_write) as sync:
+            thread.start()
+            try:
+                self.assertTrue(uploaded.wait(10))
+            finally:
+                stop.set()
+                thread.join(10)
+        self.assertEqual(sync.call_count, 1)
+
+        # Переполнение очереди событий заменяется полной синхронизацией
+        watcher = _InotifyWatcher.create(self.local_dir)
+        if watcher is None:
+            self.skipTest("inotify недоступен")
+        self.addCleanup(watcher.close)
+        overflow = _InotifyWatcher._EVENT.pack(-1, _InotifyWatcher.IN_Q_OVERFLOW, 0, 0)
+        with patch('examples.s3_sync.os.read', return_value=overflow), \
+                patch('select.poll') as poll:
+            poll.return_value.poll.return_value = [(0, 1)]
+            self.assertEqual(list(watcher.read_changes(timeout=0)), [None])
+
+
+if __name__ == "__main__":
+    unittest.main()
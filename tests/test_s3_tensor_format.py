@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Тесты сырого формата тензоров
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from examples import s3_tensor_format
+from examples.s3_tensor_format import (
+    TENSOR_ALIGNMENT, decode_tensor_header, encode_tensor_header, load_tensor, write_tensor
+)
+from tests.test_s3_storage_manager import S3TestCase
+
+
+class TestTensorFormat(unittest.TestCase):
+    """Тесты записи и чтения файлов тензоров"""
+
+    def setUp(self):
+        """Создание временной директории"""
+        self.temp_dir = tempfile.mkdtemp()
+        self.batch = np.random.default_rng(0).random((2, 5, 7, 3), dtype=np.float32)
+
+    def tearDown(self):
+        """Удаление временной директории"""
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+    def test_header_round_trip(self):
+        """Заголовок хранит тип и форму, данные выровнены"""
+        header = encode_tensor_header('float16', (2, 5, 7, 3))
+        self.assertEqual(len(header) % TENSOR_ALIGNMENT, 0)
+        dtype, shape, compressed, offset = decode_tensor_header(header)
+        self.assertEqual((dtype, shape, compressed, offset), (np.float16, (2, 5, 7, 3), False, len(header)))
+        with self.assertRaises(ValueError):
+            decode_tensor_header(b'PNG\0' + header[4:])
+
+    def test_memmap_round_trip(self):
+        """float32 читается без потерь через memmap, float16 - с точностью половинного типа"""
+        path = os.path.join(self.temp_dir, 'batch.tensor')
+        write_tensor(path, self.batch)
+        loaded = load_tensor(path)
+        self.assertIsInstance(loaded, np.memmap)
+        np.testing.assert_array_equal(loaded, self.batch)
+
+        write_tensor(path, self.batch, dtype='float16')
+        loaded = load_tensor(path, mmap=False)
+        self.assertEqual(loaded.dtype, np.float16)
+        np.testing.assert_allclose(loaded, self.batch, atol=1e-3)
+
+    @unittest.skipIf(s3_tensor_format.zstandard is None, "zstandard не установлен")
+    def test_zstd_round_trip(self):
+        """Сжатые zstd данные распаковываются прямо в массив"""
+        path = os.path.join(self.temp_dir, 'batch.tensor')
+        write_tensor(path, np.zeros((64, 64, 3), dtype=np.float32), compress=True)
+        self.assertLess(os.path.getsize(path), 64 * 64 * 3)
+        np.testing.assert_array_equal(load_tensor(path), 0)
+
+
+class TestTensorStorage(S3TestCase):
+    """Тесты загрузки и скачивания тензоров через S3"""
+
+    def test_upload_download_cached(self):
+        """Тензор загружается из буфера массива и повторно читается из локального кэша"""
+        manager = self.make_manager()
+        batch = np.linspace(0, 1, 2 * 4 * 4 * 3, dtype=np.float32).reshape(2, 4, 4, 3)
+
+        uploaded = manager.upload_tensor(batch, dtype='float32', metadata={'stage': 'refiner'})
+        self.assertTrue(uploaded['success'])
+        self.assertTrue(uploaded['s3_key'].endswith('.tensor'))
+        self.assertEqual(uploaded['metadata']['tensor_shape'], '2x4x4x3')
+        self.assertEqual(manager.get_file_metadata(uploaded['s3_key'])['stage'], 'refiner')
+
+        local_path = os.path.join(self.temp_dir, 'cache', 'batch.tensor')
+        first = manager.download_tensor(uploaded['s3_key'], local_path)
+        np.testing.assert_array_equal(first['tensor'], batch)
+        self.assertFalse(first['cached'])
+        self.assertTrue(manager.download_tensor(uploaded['s3_key'], local_path)['cached'])
+
+        # Перезаписанный ключ скачивается заново по изменившемуся ETag
+        replaced = manager.upload_tensor(batch * 2, s3_key=uploaded['s3_key'], dtype='float32')
+        self.assertTrue(replaced['success'])
+        second = manager.download_tensor(uploaded['s3_key'], local_path)
+        self.assertFalse(second['cached'])
+        np.testing.assert_array_equal(second['tensor'], batch * 2)
+
+    def test_key_outside_cache_rejected(self):
+        """Ключ с сегментом '..' не превращается в путь вне кэша"""
+        manager = self.make_manager()
+        result = manager.download_tensor('comfyui/../../escape.tensor')
+        self.assertFalse(result['success'])
+        self.assertIn('..', result['error'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Тесты структурированного логирования
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import json
+import logging
+import os
+import subprocess
+import sys
+import unittest
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from examples.comfyui_pipeline_builder import ComfyUIPipelineBuilder
+from examples.structured_logging import EventLogger, StructuredFormatter
+
+
+class RecordingHandler(logging.Handler):
+    """Обработчик, сохраняющий записи"""
+
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class LoggingTestCase(unittest.TestCase):
+    """Базовый класс с отдельным логгером и обработчиком"""
+
+    def setUp(self):
+        self.logger = logging.getLogger(f"test.structured.{self.id()}")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handler = RecordingHandler()
+        self.logger.addHandler(self.handler)
+
+    def tearDown(self):
+        self.logger.removeHandler(self.handler)
+
+
+class TestEventLogger(LoggingTestCase):
+    """Тесты событий, выборки и сводок"""
+
+    def test_event_is_lazy(self):
+        """Аргументы не форматируются при выключенном уровне"""
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("форматирование при выключенном уровне")
+
+        events = EventLogger(self.logger)
+        events.event(logging.DEBUG, 'skipped', "значение %s", Exploding())
+        self.assertEqual(self.handler.records, [])
+
+        events.event(logging.INFO, 'written', "значение %s", 42, key='a')
+        record, = self.handler.records
+        self.assertEqual(record.getMessage(), "значение 42")
+        self.assertEqual(record.event, 'written')
+        self.assertEqual(record.fields, {'key': 'a'})
+        self.assertEqual(record.funcName, 'test_event_is_lazy')
+
+    def test_sampling(self):
+        """Первые события пишутся целиком, затем каждое N-е"""
+        events = EventLogger(self.logger, sample_first=3, sample_every=10)
+        for i in range(1, 31):
+            events.sampled(logging.INFO, 'item', "элемент %d", i)
+
+        occurrences = [record.fields['occurrence'] for record in self.handler.records]
+        self.assertEqual(occurrences, [1, 2, 3, 10, 20, 30])
+        self.assertEqual(events.counts(), {'item': 30})
+
+    def test_batch_summary(self):
+        """Сводка пакета пишется одним событием со счетчиками"""
+        events = EventLogger(self.logger)
+        with events.batch('upload_batch', "⬆️ Загрузка") as summary:
+            for _ in range(5):
+                summary.add('uploaded')
+                summary.add('bytes', 100)
+
+        record, = self.handler.records
+        self.assertEqual(record.event, 'upload_batch')
+        self.assertEqual(record.fields['uploaded'], 5)
+        self.assertEqual(record.fields['bytes'], 500)
+        self.assertIn('elapsed_ms', record.fields)
+        self.assertIn("uploaded=5", record.getMessage())
+
+    def test_structured_formatter(self):
+        """JSON строка содержит событие и поля"""
+        stream = io.StringIO()
+        handler = logging.StreamHandler(stream)
+        handler.setFormatter(StructuredFormatter())
+        self.logger.addHandler(handler)
+        try:
+            EventLogger(self.logger).event(logging.INFO, 'image_uploaded', "✅ %s", 'a.png', key='a.png')
+        finally:
+            self.logger.removeHandler(handler)
+
+        entry = json.loads(stream.getvalue())
+        self.assertEqual(entry['event'], 'image_uploaded')
+        self.assertEqual(entry['message'], "✅ a.png")
+        self.assertEqual(entry['key'], 'a.png')
+
+
+class TestBuilderLogging(unittest.TestCase):
+    """Тесты логирования строителя пайплайнов"""
+
+    def test_no_root_configuration_on_import(self):
+        """Импорт модулей не настраивает корневой логгер"""
+        code = (
+            "import logging\n"
+            "import examples.comfyui_pipeline_builder, examples.pipeline_manager, examples.comfyui_s3_nodes\n"
+            "root = logging.getLogger()\n"
+            "assert not root.handlers, root.handlers\n"
+            "assert root.level == logging.WARNING, root.level\n"
+        )
+        root_dir = os.path.join(os.path.dirname(__file__), '..')
+        subprocess.run([sys.executable, '-c', code], cwd=root_dir, check=True)
+
+    def test_per_node_events_sampled(self):
+        """События по узлам и соединениям пишутся с выборкой"""
+        builder = ComfyUIPipelineBuilder()
+        builder._events.sample_first = 2
+        with self.assertLogs('examples.comfyui_pipeline_builder', level=logging.DEBUG) as logs:
+            previous = None
+            for i in range(20):
+                node_id = builder.add_node("PreviewImage", inputs={})
+                if previous is not None:
+                    builder.connect_nodes(previous, 0, node_id, 0)
+                previous = node_id
+
+        events = [record.event for record in logs.records]
+        self.assertEqual(events.count('node_added'), 2)
+        self.assertEqual(events.count('nodes_connected'), 2)
+        self.assertEqual(builder._events.counts(), {'node_added': 20, 'nodes_connected': 19})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+Тесты трассировки запусков узлов
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from examples import tracing
+from examples.comfyui_s3_nodes import S3ImageDownloader
+from examples.metrics import track
+from examples.s3_storage_manager import bounded_map
+from tests.test_comfyui_s3_nodes import NodeTestCase, encode_image
+from tests.test_s3_storage_manager import BUCKET
+
+
+class FakeNode:
+    """Узел с фазами сети, кодирования и диска"""
+
+    FUNCTION = "run"
+
+    def run(self, fail=False):
+        with track('s3', 'fake_get'):
+            time.sleep(0.002)
+        # Задачи пула привязываются к запуску узла через контекст
+        list(bounded_map(self.encode, range(3), max_workers=3))
+        with track('disk', 'fake_write'):
+            pass
+        if fail:
+            raise RuntimeError("ошибка узла")
+        return ("ok",)
+
+    def encode(self, item):
+        with track('encode', 'fake_encode'):
+            return item
+
+
+class TracingTestCase(unittest.TestCase):
+    """Базовый класс с временным файлом trace"""
+
+    def setUp(self):
+        self.temp_dir = tempfile.mkdtemp()
+        self.trace_path = os.path.join(self.temp_dir, 'trace.json')
+
+    def tearDown(self):
+        tracing.disable_tracing()
+        shutil.rmtree(self.temp_dir, ignore_errors=True)
+
+
+class TestNodeTracing(TracingTestCase):
+    """Тесты span'ов узлов и формата Chrome Trace"""
+
+    def setUp(self):
+        super().setUp()
+        self.node_class = type('TracedFakeNode', (FakeNode,), {})
+        tracing.trace_node_classes({'FakeNode': self.node_class})
+
+    def test_disabled_is_passthrough(self):
+        """Без включенной трассировки узел работает как обычно"""
+        self.assertEqual(self.node_class().run(), ("ok",))
+        self.assertFalse(tracing.tracing_enabled())
+        self.assertFalse(os.path.exists(self.trace_path))
+
+    def test_node_span_with_phases(self):
+        """Запуск узла - span 'node' с дочерними фазами, файл - корректный JSON"""
+        tracing.enable_tracing(self.trace_path)
+        node = self.node_class()
+        node.run()
+        with self.assertRaises(RuntimeError):
+            node.run(fail=True)
+
+        # До закрытия файл уже читается (без закрывающей скобки)
+        self.assertEqual(len([e for e in tracing.load_trace(self.trace_path) if e['cat'] == 'node']), 2)
+        tracing.disable_tracing()
+
+        with open(self.trace_path, encoding='utf-8') as f:
+            events = [event for event in json.load(f) if event['ph'] == 'X']
+        nodes = [event for event in events if event['cat'] == 'node']
+        self.assertEqual([node['name'] for node in nodes], ['FakeNode', 'FakeNode'])
+        self.assertTrue(nodes[1]['args']['error'])
+
+        first_id = nodes[0]['args']['id']
+        children = [event for event in events if event['args'].get('parent') == first_id]
+        self.assertEqual(sorted(event['cat'] for event in children),
+                         ['disk', 'encode', 'encode', 'encode', 'network'])
+        for child in children:
+            self.assertGreaterEqual(child['ts'], nodes[0]['ts'])
+            self.assertLessEqual(child['ts'] + child['dur'], nodes[0]['ts'] + nodes[0]['dur'] + 1)
+
+        summary = tracing.summarize_trace(self.trace_path)['FakeNode']
+        self.assertEqual(summary['count'], 2)
+        self.assertGreaterEqual(summary['p99_ms'], summary['p50_ms'])
+        self.assertGreater(summary['p99_phases_ms']['network'], 1.0)
+
+    def test_nested_spans_counted_once(self):
+        """Вложенные span'ы входят в фазы собственным временем, без двойного учета"""
+        def run(node_self):
+            with track('s3', 'outer'):
+                with track('s3', 'inner'):
+                    time.sleep(0.02)
+                with track('encode', 'inner_encode'):
+                    time.sleep(0.01)
+            return ("ok",)
+
+        node_class = type('NestedNode', (), {'FUNCTION': 'run', 'run': run})
+        tracing.trace_node_classes({'NestedNode': node_class})
+        tracing.enable_tracing(self.trace_path)
+        node_class().run()
+        tracing.disable_tracing()
+
+        events = tracing.load_trace(self.trace_path)
+        spans = {event['name']: event for event in events}
+        self.assertEqual(spans['inner']['args']['enclosing'], spans['outer']['args']['id'])
+        self.assertEqual(spans['inner_encode']['args']['enclosing'], spans['outer']['args']['id'])
+        self.assertNotIn('enclosing', spans['outer']['args'])
+
+        phases = tracing.summarize_trace(self.trace_path)['NestedNode']['p99_phases_ms']
+        node_ms = spans['NestedNode']['dur'] / 1000
+        self.assertLessEqual(sum(phases.values()), node_ms)
+        self.assertGreaterEqual(phases['encode'], 10)
+        self.assertLess(phases['network'], spans['outer']['dur'] / 1000)
+        self.assertGreaterEqual(phases['network'], 20)
+
+
+class TestS3NodeTracing(NodeTestCase):
+    """Трассировка узла S3ImageDownloader"""
+
+    def setUp(self):
+        super().setUp()
+        self.trace_path = os.path.join(self.temp_dir, 'trace.json')
+
+    def tearDown(self):
+        tracing.disable_tracing()
+        super().tearDown()
+
+    def test_download_node_phases(self):
+        """Скачивание узлом записывается со спанами сети и декодирования"""
+        self.client.put_object(Bucket=BUCKET, Key='comfyui/images/traced.png',
+                               Body=encode_image(8, 8, (255, 0, 0), 'PNG'))
+        node_class = type('TracedDownloader', (S3ImageDownloader,), {})
+        tracing.trace_node_classes({'S3ImageDownloader': node_class})
+        tracing.enable_tracing(self.trace_path)
+
+        image, _, status = node_class().download_image(
+            'comfyui/images/traced.png', BUCKET, 'test-key', 'test-secret', 'us-east-1'
+        )
+        self.assertTrue(status.startswith('✅'), status)
+        tracing.disable_tracing()
+
+        events = tracing.load_trace(self.trace_path)
+        node, = [event for event in events if event['cat'] == 'node']
+        self.assertEqual(node['name'], 'S3ImageDownloader')
+        phases = {(event['cat'], event['name']) for event in events
+                  if event['args'].get('parent') == node['args']['id']}
+        self.assertIn(('network', 'download_image'), phases)
+        self.assertIn(('encode', 'decode_image'), phases)
+
+
+if __name__ == '__main__':
+    unittest.main()
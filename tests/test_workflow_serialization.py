@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Тесты сериализации workflow
+Автор: AI Assistant
+Версия: 1.0.0
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+# Добавление пути к модулям
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+from examples.comfyui_pipeline_builder import ComfyUIPipelineBuilder
+from examples import workflow_serialization
+from examples.workflow_serialization import (
+    decode_workflow_binary, iter_workflow_items, workflow_to_binary, write_workflow_stream
+)
+
+
+def _make_builder(node_count: int = 5) -> ComfyUIPipelineBuilder:
+    """Создание тестового пайплайна-цепочки"""
+    builder = ComfyUIPipelineBuilder()
+    previous = None
+    for i in range(node_count):
+        node_id = builder.add_node(
+            "CLIPTextEncode",
+            {"text": f"тайл {i}", "weights": [0.5, 1.25e-3], "nested": {"seed": i}},
+            title=f"Node {i}"
+        )
+        if previous is not None:
+            builder.connect_nodes(previous, 0, node_id, 0)
+        previous = node_id
+    return builder
+
+
+class TestStreamingJSON(unittest.TestCase):
+    """Тесты потоковой записи и инкрементального чтения"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        fd, self.temp_file = tempfile.mkstemp(suffix='.json')
+        os.close(fd)
+
+    def tearDown(self):
+        """Удаление временного файла"""
+        if os.path.exists(self.temp_file):
+            os.unlink(self.temp_file)
+
+    def test_indented_output_matches_json_dump(self):
+        """Вывод с отступами совпадает с json.dump(indent=2)"""
+        builder = _make_builder()
+        buffer = io.BytesIO()
+        write_workflow_stream(
+            buffer,
+            {"last_node_id": builder.next_node_id - 1, "last_link_id": builder.next_link_id - 1},
+            builder.iter_node_data(),
+            builder.iter_link_data(),
+            use_fast_backend=False
+        )
+
+        expected = json.dumps(builder.build_workflow(), indent=2, ensure_ascii=False)
+        self.assertEqual(buffer.getvalue().decode('utf-8'), expected)
+
+    @unittest.skipUnless(workflow_serialization.has_fast_backend(), "orjson не установлен")
+    def test_fast_backend_matches_json_dump(self):
+        """С orjson вывод тот же, включая NaN, Infinity и экспоненциальную запись чисел"""
+        values = {"nan": float("nan"), "inf": [float("inf"), -float("inf")], "big": 1e20,
+                  "small": 1e-05, "plain": [0.5, 1.25e-3, -0.0, 12]}
+        for compact, separators, indent in ((False, None, 2), (True, (',', ':'), None)):
+            for value in (values, {"plain": values["plain"]}):
+                expected = json.dumps(value, ensure_ascii=False, indent=indent, separators=separators)
+                self.assertEqual(workflow_serialization.dumps_value(value, compact=compact).decode('utf-8'),
+                                 expected)
+
+    def test_empty_workflow(self):
+        """Пустой workflow остается валидным JSON"""
+        buffer = io.BytesIO()
+        counts = write_workflow_stream(buffer, {"last_node_id": 0}, [], [])
+
+        self.assertEqual(counts, (0, 0))
+        self.assertEqual(json.loads(buffer.getvalue()), {"last_node_id": 0, "nodes": [], "links": []})
+
+    def test_compact_round_trip(self):
+        """Компактное сохранение и загрузка"""
+        builder = _make_builder(50)
+        self.assertTrue(builder.save_workflow(self.temp_file, compact=True))
+
+        with open(self.temp_file, 'r', encoding='utf-8') as f:
+            content = f.read()
+        self.assertNotIn('\n', content)
+        self.assertEqual(json.loads(content), builder.build_workflow())
+
+        new_builder = ComfyUIPipelineBuilder()
+        self.assertTrue(new_builder.load_workflow(self.temp_file))
+        self.assertEqual(new_builder.build_workflow(), builder.build_workflow())
+
+    def test_incremental_parser_small_chunks(self):
+        """Разбор с порциями меньше одного узла"""
+        builder = _make_builder(20)
+        workflow = builder.build_workflow()
+        workflow["extra"] = {"ds": {"scale": 1.0}}
+        text = json.dumps(workflow, indent=2, ensure_ascii=False)
+
+        items = list(iter_workflow_items(io.StringIO(text), chunk_size=7))
+        nodes = [data for kind, _, data in items if kind == "node"]
+        links = [data for kind, _, data in items if kind == "link"]
+        fields = {key: data for kind, key, data in items if kind == "field"}
+
+        self.assertEqual(nodes, workflow["nodes"])
+        self.assertEqual(links, workflow["links"])
+        self.assertEqual(fields["extra"], workflow["extra"])
+        self.assertEqual(fields["last_node_id"], 20)
+
+    def test_load_invalid_keeps_state(self):
+        """Ошибка разбора не портит текущее состояние"""
+        builder = _make_builder(3)
+        with open(self.temp_file, 'w', encoding='utf-8') as f:
+            f.write('{"nodes": [{"id": 1, "type": "X", "pos": [0, 0]')
+
+        self.assertFalse(builder.load_workflow(self.temp_file))
+        self.assertEqual(len(builder.nodes), 3)
+
+
+class TestBinaryWorkflow(unittest.TestCase):
+    """Тесты бинарного формата workflow"""
+
+    def setUp(self):
+        """Настройка тестов"""
+        fd, self.temp_file = tempfile.mkstemp(suffix='.cwf')
+        os.close(fd)
+
+    def tearDown(self):
+        """Удаление временного файла"""
+        if os.path.exists(self.temp_file):
+            os.unlink(self.temp_file)
+
+    def test_builder_round_trip(self):
+        """Сохранение и загрузка бинарного workflow через строитель"""
+        builder = _make_builder(30)
+        self.assertTrue(builder.save_workflow(self.temp_file))
+
+        with open(self.temp_file, 'rb') as f:
+            data = f.read()
+        self.assertTrue(data.startswith(b"CWFB"))
+        json_size = len(json.dumps(builder.build_workflow(), indent=2).encode('utf-8'))
+        self.assertLess(len(data), json_size)
+
+        new_builder = ComfyUIPipelineBuilder()
+        self.assertTrue(new_builder.load_workflow(self.temp_file))
+        self.assertEqual(new_builder.build_workflow(), builder.build_workflow())
+
+    def test_foreign_workflow_round_trip(self):
+        """Нестандартные поля узлов и соединений сохраняются без потерь"""
+        workflow = {
+            "last_node_id": 2,
+            "version": 0.4,
+            "nodes": [
+                {"id": 1, "type": "KSampler", "pos": [10.5, 20], "size": [315, 262],
+                 "flags": {}, "widgets_values": [42, "fixed", 20, 8.0, None, True]},
+                {"id": 2, "type": "SaveImage", "pos": [400, 20], "size": {"0": 300, "1": 150},
+                 "order": 1, "mode": 0, "inputs": [{"name": "images", "link": 1}],
+                 "big": 2 ** 40, "negative": -100000, "text": "x" * 300, "blob": b"\x00\x01"}
+            ],
+            "links": [[1, 1, 0, 2, 0, "IMAGE"]]
+        }
+        self.assertEqual(decode_workflow_binary(workflow_to_binary(workflow)), workflow)
+
+        workflow["links"].append({"id": 2})
+        self.assertEqual(decode_workflow_binary(workflow_to_binary(workflow)), workflow)
+
+    def test_api_format_round_trip(self):
+        """API-формат без nodes / links восстанавливается без лишних ключей и с исходным порядком"""
+        workflow = {
+            "3": {"class_type": "KSampler", "inputs": {"seed": 42, "model": ["4", 0]}},
+            "4": {"class_type": "CheckpointLoaderSimple", "inputs": {"ckpt_name": "model.safetensors"}}
+        }
+        decoded = decode_workflow_binary(workflow_to_binary(workflow))
+        self.assertEqual(decoded, workflow)
+        self.assertEqual(list(decoded), ["3", "4"])
+
+        ordered = {"nodes": [{"id": 1}], "version": 0.4, "links": [], "extra": {}}
+        self.assertEqual(list(decode_workflow_binary(workflow_to_binary(ordered))),
+                         ["nodes", "version", "links", "extra"])
+
+    def test_checksum_mismatch(self):
+        """Поврежденные данные отклоняются"""
+        data = bytearray(workflow_to_binary(_make_builder(3).build_workflow()))
+        data[20] ^= 0xff
+        with self.assertRaises(ValueError):
+            decode_workflow_binary(bytes(data))
+
+    def test_builtin_codec_matches_msgpack(self):
+        """Встроенный кодек совместим с библиотекой msgpack"""
+        try:
+            import msgpack
+        except ImportError:
+            self.skipTest("msgpack не установлен")
+
+        value = {"a": [1, -5, 300, -70000, 2 ** 40, 1.5, None, True, "строка", b"raw"], "b": {}}
+        out = bytearray()
+        workflow_serialization._pack_obj(value, out)
+        self.assertEqual(msgpack.unpackb(bytes(out), raw=False), value)
+        packed = msgpack.packb(value, use_bin_type=True)
+        self.assertEqual(workflow_serialization._unpack_obj(packed, 0)[0], value)
+
+
+if __name__ == "__main__":
+    unittest.main()